@@ -281,6 +281,40 @@ class Configuration:
         if not str(config.get("download_timeout", "0")).isnumeric():
             errors.append("Setting download_timeout must be a number.")
 
+        if not isinstance(config.get("preload_route_search", False), bool):
+            errors.append("Setting preload_route_search must be a bool.")
+
+        if not isinstance(config.get("lookup_index_table", False), bool):
+            errors.append("Setting lookup_index_table must be a bool.")
+        if not isinstance(config.get("lookup_index_table_queries", False), bool):
+            errors.append("Setting lookup_index_table_queries must be a bool.")
+        elif config.get("lookup_index_table_queries") and config.get("lookup_index_table") is not True:
+            errors.append("Setting lookup_index_table_queries requires lookup_index_table to be enabled.")
+
+        preload_snapshot_path = config.get("preload_snapshot_path")
+        if preload_snapshot_path and (
+            not isinstance(preload_snapshot_path, str)
+            or not os.path.isdir(os.path.dirname(preload_snapshot_path) or ".")
+        ):
+            errors.append("Setting preload_snapshot_path must be a path in an existing directory.")
+
+        if not str(config.get("server.http.database_connections", "1")).isnumeric() or not int(
+            config.get("server.http.database_connections", "1")
+        ):
+            errors.append("Setting server.http.database_connections must be a number of at least 1.")
+
+        if not str(config.get("server.http.query_timeout", "0")).isnumeric():
+            errors.append("Setting server.http.query_timeout must be a number.")
+
+        if not str(config.get("server.http.graphql_max_query_cost", "0")).isnumeric():
+            errors.append("Setting server.http.graphql_max_query_cost must be a number.")
+
+        try:
+            if config.get("server.http.graphql_cost_limit"):
+                limits.parse(config.get("server.http.graphql_cost_limit", ""))
+        except ValueError:
+            errors.append("Setting server.http.graphql_cost_limit is invalid.")
+
         expected_access_lists = {
             config.get("server.whois.access_list"),
             config.get("server.http.status_access_list"),
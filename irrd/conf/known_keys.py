@@ -13,6 +13,10 @@ KNOWN_CONFIG_KEYS = DottedDict(
         "user": {},
         "group": {},
         "download_timeout": {},
+        "preload_route_search": {},
+        "preload_snapshot_path": {},
+        "lookup_index_table": {},
+        "lookup_index_table_queries": {},
         "server": {
             "http": {
                 "interface": {},
@@ -20,6 +24,10 @@ KNOWN_CONFIG_KEYS = DottedDict(
                 "status_access_list": {},
                 "event_stream_access_list": {},
                 "workers": {},
+                "database_connections": {},
+                "query_timeout": {},
+                "graphql_max_query_cost": {},
+                "graphql_cost_limit": {},
                 "forwarded_allowed_ips": {},
                 "url": {},
             },
@@ -110,6 +118,7 @@ KNOWN_SOURCES_KEYS = {
     "nrtm4_server_private_key_next",
     "nrtm4_server_local_path",
     "nrtm4_server_snapshot_frequency",
+    "nrtm4_server_coalesce_deltas",
     "strict_import_keycert_objects",
     "rpki_excluded",
     "scopefilter_excluded",
@@ -268,6 +268,10 @@ class TestConfiguration:
                 "piddir": str(tmpdir + "/does-not-exist"),
                 "user": "a",
                 "download_timeout": "not-number",
+                "preload_route_search": "yes",
+                "preload_snapshot_path": "/does/not/exist/snapshot",
+                "lookup_index_table": "yes",
+                "lookup_index_table_queries": True,
                 "server": {
                     "whois": {
                         "access_list": "doesnotexist",
@@ -275,6 +279,10 @@ class TestConfiguration:
                     "http": {
                         "url": "💩",
                         "status_access_list": ["foo"],
+                        "database_connections": 0,
+                        "query_timeout": "not-a-number",
+                        "graphql_max_query_cost": "not-a-number",
+                        "graphql_cost_limit": "invalid",
                     },
                 },
                 "email": {
@@ -373,6 +381,16 @@ class TestConfiguration:
         assert "Setting redis_url is required." in str(ce.value)
         assert "Setting piddir is required and must point to an existing directory." in str(ce.value)
         assert "Setting download_timeout must be a number." in str(ce.value)
+        assert "Setting preload_route_search must be a bool." in str(ce.value)
+        assert "Setting preload_snapshot_path must be a path in an existing directory." in str(ce.value)
+        assert "Setting lookup_index_table must be a bool." in str(ce.value)
+        assert "Setting lookup_index_table_queries requires lookup_index_table to be enabled." in str(
+            ce.value
+        )
+        assert "Setting server.http.database_connections must be a number of at least 1." in str(ce.value)
+        assert "Setting server.http.query_timeout must be a number." in str(ce.value)
+        assert "Setting server.http.graphql_max_query_cost must be a number." in str(ce.value)
+        assert "Setting server.http.graphql_cost_limit is invalid." in str(ce.value)
         assert "Setting email.from is required and must be an email address." in str(ce.value)
         assert "Setting email.smtp is required." in str(ce.value)
         assert "Setting email.footer must be a string, if defined." in str(ce.value)
@@ -1,7 +1,12 @@
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 
+from irrd.conf import RPKI_IRR_PSEUDO_SOURCE, get_setting
 from irrd.storage.database_handler import DatabaseHandler
+from irrd.storage.journal_partitions import (
+    JOURNAL_PARTITION_MONTHS_AHEAD,
+    next_month_start,
+)
 from irrd.storage.preload import Preloader
 
 logger = logging.getLogger(__name__)
@@ -42,3 +47,37 @@ class TransactionTimePreloadSignaller:
                 )
         finally:
             self.database_handler.close()
+
+
+class PartitionRunner:
+    """
+    Create the RPSL object partitions for all sources, and the journal
+    partitions for the current month and upcoming months, for all
+    sources that keep a journal.
+    """
+
+    def run(self):
+        self.database_handler = DatabaseHandler()
+        months = [datetime.now(timezone.utc)]
+        for _ in range(JOURNAL_PARTITION_MONTHS_AHEAD):
+            months.append(next_month_start(months[-1]))
+
+        sources = list(get_setting("sources", {}).keys())
+        if get_setting("rpki.roa_source"):
+            sources.append(RPKI_IRR_PSEUDO_SOURCE)
+
+        try:
+            for source in sources:
+                try:
+                    self.database_handler.create_rpsl_objects_partition(source)
+                    if get_setting(f"sources.{source}.keep_journal"):
+                        self.database_handler.create_journal_partitions(source, months)
+                    self.database_handler.commit()
+                except Exception as exc:
+                    self.database_handler.rollback()
+                    logger.error(
+                        f"An exception occurred while attempting to create partitions for {source}: {exc}",
+                        exc_info=exc,
+                    )
+        finally:
+            self.database_handler.close()
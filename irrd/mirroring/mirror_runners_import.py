@@ -156,7 +156,9 @@ class RPSLMirrorFullImportRunner:
                 )
                 return
 
-        database_handler.delete_all_rpsl_objects_with_journal(self.source)
+        # The current objects are only replaced on commit, so that they
+        # remain available, and unlocked, while the new objects are loaded.
+        database_handler.start_rpsl_staging(self.source)
         import_data = [
             retrieve_file(import_source, return_contents=False) for import_source in import_sources
         ]
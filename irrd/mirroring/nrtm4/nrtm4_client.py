@@ -1,18 +1,24 @@
 import logging
 import os
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from typing import Any
 
 import pydantic
 from joserfc.jws import CompactSignature
+from typing_extensions import Self
 
 from irrd.conf import get_setting
 from irrd.mirroring.nrtm4.jsonseq import jsonseq_decode
 from irrd.mirroring.nrtm4.nrtm4_types import (
     NRTM4DeltaHeader,
+    NRTM4FileReference,
     NRTM4SnapshotHeader,
     NRTM4UpdateNotificationFile,
 )
-from irrd.mirroring.nrtm_operation import NRTMOperation
+from irrd.mirroring.nrtm_operation import NRTMOperation, save_nrtm_operations
 from irrd.mirroring.parsers import (
     MirrorFileImportParserBase,
     get_object_class_filter_for_source,
@@ -36,6 +42,14 @@ NRTM4_OPERATION_MAPPING = {
     "add_modify": DatabaseOperation.add_or_update,
     "delete": DatabaseOperation.delete,
 }
+# Maximum number of deltas being downloaded, or downloaded and waiting
+# to be loaded, while loading the current delta
+NRTM4_DELTA_DOWNLOAD_CONCURRENCY = 4
+# No further deltas are downloaded ahead while the downloaded deltas
+# waiting to be loaded take up this many bytes on disk
+NRTM4_DELTA_DOWNLOAD_MAX_BYTES = 256 * 1024 * 1024
+# Number of delta items that are parsed and then saved together
+NRTM4_DELTA_APPLY_BATCH_SIZE = 1000
 
 
 class NRTM4ClientError(ValueError):
@@ -338,50 +352,57 @@ class NRTM4Client:
     def _load_deltas(self, unf: NRTM4UpdateNotificationFile, next_version: int):
         """
         Load all deltas found in the UNF, starting with next_version.
-        Each delta file is downloaded, parsed, then all changes processed,
-        until reaching the final version.
+        Deltas are downloaded ahead in the background, while each delta
+        is parsed and all changes processed in order, until reaching
+        the final version.
         """
         object_class_filter = get_object_class_filter_for_source(self.source)
+        deltas = [delta for delta in unf.deltas if delta.version >= next_version]
+
+        with NRTM4DeltaDownloader(deltas, self.notification_file_url) as downloader:
+            for delta, delta_path in downloader:
+                with open(delta_path, "rb") as delta_file:
+                    self._load_delta(unf, delta, delta_file, object_class_filter)
+
+    def _load_delta(
+        self,
+        unf: NRTM4UpdateNotificationFile,
+        delta: NRTM4FileReference,
+        delta_file,
+        object_class_filter: list[str] | None,
+    ):
+        """
+        Load a single delta file. Items are parsed into NRTM operations
+        and saved in batches of NRTM4_DELTA_APPLY_BATCH_SIZE.
+        """
+        delta_iterator = jsonseq_decode(delta_file)
+        header = NRTM4DeltaHeader.model_validate(
+            next(delta_iterator),
+            context={
+                "expected_values": {
+                    "source": self.source,
+                    "session_id": unf.session_id,
+                    "version": delta.version,
+                }
+            },
+        )
 
-        for delta in unf.deltas:
-            if delta.version < next_version:
-                continue
-            url = delta.full_url(self.notification_file_url)
-            delta_path, should_delete = retrieve_file(url, return_contents=False, expected_hash=delta.hash)
-            try:
-                delta_file = open(delta_path, "rb")
-                delta_iterator = jsonseq_decode(delta_file)
-
-                header = NRTM4DeltaHeader.model_validate(
-                    next(delta_iterator),
-                    context={
-                        "expected_values": {
-                            "source": self.source,
-                            "session_id": unf.session_id,
-                            "version": delta.version,
-                        }
-                    },
-                )
-
-                delta_has_items = False
-                for delta_item in delta_iterator:
-                    self._process_delta_item(header, delta_item, object_class_filter)
-                    delta_has_items = True
-
-                if not delta_has_items:
-                    raise NRTM4ClientError(
-                        f"Delta file {self.source}/{unf.session_id}/{delta.version} did not contain any"
-                        " entries."
-                    )
+        delta_has_items = False
+        while batch := list(islice(delta_iterator, NRTM4_DELTA_APPLY_BATCH_SIZE)):
+            operations = [
+                self._process_delta_item(header, delta_item, object_class_filter) for delta_item in batch
+            ]
+            save_nrtm_operations(operations, self.database_handler)
+            delta_has_items = True
 
-                delta_file.close()
-            finally:
-                if should_delete:
-                    os.unlink(delta_path)
+        if not delta_has_items:
+            raise NRTM4ClientError(
+                f"Delta file {self.source}/{unf.session_id}/{delta.version} did not contain any entries."
+            )
 
     def _process_delta_item(
         self, header: NRTM4DeltaHeader, delta_item: dict, object_class_filter: list[str] | None
-    ) -> None:
+    ) -> NRTMOperation:
         """Process a single item from a delta file into an NRTMOperation."""
         try:
             operation = NRTM4_OPERATION_MAPPING[delta_item["action"]]
@@ -404,9 +425,82 @@ class NRTM4Client:
                     object_class=delta_item["object_class"].lower(),
                     **nrtm_kwargs,
                 )
-            nrtm_operation.save(self.database_handler)
+            return nrtm_operation
         except KeyError as ke:
             raise NRTM4ClientError(
                 f"Delta file {self.source}/{header.session_id}/{header.version} contained invalid entry:"
                 f" {ke}: {delta_item}"
             )
+
+
+class NRTM4DeltaDownloader:
+    """
+    Download NRTMv4 delta files ahead of loading them.
+    Iterating yields each delta with the path of its downloaded,
+    hash verified file, in order. Meanwhile, the next deltas are
+    downloaded in background threads, up to NRTM4_DELTA_DOWNLOAD_CONCURRENCY
+    deltas ahead, and as long as the downloaded deltas waiting to be
+    loaded stay within NRTM4_DELTA_DOWNLOAD_MAX_BYTES.
+    Downloaded files are removed once the caller is done with each
+    delta, and on close(), which must always be called.
+    """
+
+    def __init__(self, deltas: list[NRTM4FileReference], notification_file_url: str):
+        self.deltas_to_download = deque(deltas)
+        self.notification_file_url = notification_file_url
+        self.downloads: deque[tuple[NRTM4FileReference, Future]] = deque()
+        self.executor = ThreadPoolExecutor(
+            max_workers=NRTM4_DELTA_DOWNLOAD_CONCURRENCY, thread_name_prefix="irrd-nrtm4-delta-download"
+        )
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[tuple[NRTM4FileReference, str]]:
+        self._start_downloads()
+        while self.downloads:
+            delta, future = self.downloads[0]
+            delta_path, should_delete = future.result()
+            self.downloads.popleft()
+            self._start_downloads()
+            try:
+                yield delta, delta_path
+            finally:
+                if should_delete:
+                    os.unlink(delta_path)
+
+    def close(self) -> None:
+        """Cancel any remaining downloads and remove their files."""
+        for _, future in self.downloads:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        for _, future in self.downloads:
+            if future.cancelled() or future.exception():
+                continue
+            delta_path, should_delete = future.result()
+            if should_delete:
+                os.unlink(delta_path)
+        self.downloads.clear()
+
+    def _start_downloads(self) -> None:
+        while self.deltas_to_download and len(self.downloads) < NRTM4_DELTA_DOWNLOAD_CONCURRENCY:
+            if self.downloads and self._downloaded_bytes() >= NRTM4_DELTA_DOWNLOAD_MAX_BYTES:
+                break
+            delta = self.deltas_to_download.popleft()
+            future = self.executor.submit(
+                retrieve_file,
+                delta.full_url(self.notification_file_url),
+                return_contents=False,
+                expected_hash=delta.hash,
+            )
+            self.downloads.append((delta, future))
+
+    def _downloaded_bytes(self) -> int:
+        total = 0
+        for _, future in self.downloads:
+            if future.done() and not future.cancelled() and not future.exception():
+                total += os.path.getsize(future.result()[0])
+        return total
@@ -1,6 +1,7 @@
 import copy
 import datetime
 import gzip
+import itertools
 import logging
 import os
 import secrets
@@ -350,14 +351,24 @@ class NRTM4ServerWriter:
         Write a delta file, starting at the provided global serial, at NRTMv4 version {version}
         Returns the filename if a delta was written.
         If there are no changes, returns None and does not create any file.
+
+        Journal entries are streamed from the database into the file.
+        If nrtm4_server_coalesce_deltas is set, only the latest entry for
+        each object is included, i.e. its final state in this delta.
         """
         assert self.status
         filename = f"nrtm-delta.{self.status.session_id}.{version}.{secrets.token_hex(16)}.json.gz"
         query = (
-            RPSLDatabaseJournalQuery().sources([self.source]).serial_global_range(start=serial_global_start)
+            RPSLDatabaseJournalQuery()
+            .sources([self.source])
+            .serial_global_range(start=serial_global_start)
+            .stream_results()
         )
-        journal_entries = list(self.database_handler.execute_query(query))
-        if not journal_entries:
+        if get_setting(f"sources.{self.source}.nrtm4_server_coalesce_deltas"):
+            query = query.latest_per_object()
+        journal_entries = self.database_handler.execute_query(query)
+        first_journal_entry = next(journal_entries, None)
+        if not first_journal_entry:
             return None
 
         with gzip.open(self.path / filename, "wb") as outstream:
@@ -372,27 +383,32 @@ class NRTM4ServerWriter:
                 header.model_dump(mode="json", include=header.model_fields_set),
                 outstream,
             )
-            for journal_entry in journal_entries:
-                if journal_entry["operation"] == DatabaseOperation.add_or_update:
-                    object_text = remove_auth_hashes(journal_entry["object_text"])
-                    object_text = dummify_object_text(
-                        object_text, journal_entry["object_class"], self.source, journal_entry["rpsl_pk"]
-                    )
-                    entry_encoded = {
-                        "action": "add_modify",
-                        "object": object_text,
-                    }
-                elif journal_entry["operation"] == DatabaseOperation.delete:
-                    entry_encoded = {
-                        "action": "delete",
-                        "object_class": journal_entry["object_class"],
-                        "primary_key": journal_entry["rpsl_pk"],
-                    }
-                else:  # pragma: no cover
-                    raise ValueError(f"Unknown journal action: {journal_entry}")
-                jsonseq_encode_one(entry_encoded, outstream)
+            entries_encoded = (
+                self._encode_journal_entry(journal_entry)
+                for journal_entry in itertools.chain([first_journal_entry], journal_entries)
+            )
+            jsonseq_encode(entries_encoded, outstream)
         return filename
 
+    def _encode_journal_entry(self, journal_entry: dict) -> dict[str, str]:
+        """Encode a journal entry into a delta file entry."""
+        if journal_entry["operation"] == DatabaseOperation.add_or_update:
+            object_text = remove_auth_hashes(journal_entry["object_text"])
+            object_text = dummify_object_text(
+                object_text, journal_entry["object_class"], self.source, journal_entry["rpsl_pk"]
+            )
+            return {
+                "action": "add_modify",
+                "object": object_text,
+            }
+        elif journal_entry["operation"] == DatabaseOperation.delete:
+            return {
+                "action": "delete",
+                "object_class": journal_entry["object_class"],
+                "primary_key": journal_entry["rpsl_pk"],
+            }
+        raise ValueError(f"Unknown journal action: {journal_entry}")  # pragma: no cover
+
     def _verify_integrity(self) -> bool:
         """
         Verify the integrity of current on disk status, by checking all files
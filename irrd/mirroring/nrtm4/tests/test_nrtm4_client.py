@@ -1,5 +1,7 @@
 import datetime
 import json
+import os
+import threading
 from tempfile import NamedTemporaryFile
 from uuid import UUID, uuid4
 
@@ -9,7 +11,12 @@ from joserfc import jws
 
 from irrd.mirroring.nrtm4 import UPDATE_NOTIFICATION_FILENAME
 from irrd.mirroring.nrtm4.jsonseq import jsonseq_encode
-from irrd.mirroring.nrtm4.nrtm4_client import NRTM4Client, NRTM4ClientError
+from irrd.mirroring.nrtm4.nrtm4_client import (
+    NRTM4Client,
+    NRTM4ClientError,
+    NRTM4DeltaDownloader,
+)
+from irrd.mirroring.nrtm4.nrtm4_types import NRTM4FileReference
 from irrd.mirroring.nrtm4.tests import (
     MOCK_UNF_PRIVATE_KEY,
     MOCK_UNF_PUBLIC_KEY,
@@ -183,7 +190,7 @@ class TestNRTM4Client:
         assert "import of snapshot at version 3" in caplog.text
         assert "Loaded snapshot at version 3, deferring deltas to next run" in caplog.text
         assert "Updating from deltas" not in caplog.text
-        assert "delete_rpsl_object" not in {call[0] for call in mock_dh.other_calls}
+        assert "delete_rpsl_objects" not in {call[0] for call in mock_dh.other_calls}
         assert (
             "record_nrtm4_client_status",
             {
@@ -643,15 +650,11 @@ class TestNRTM4Client:
             )
             + [
                 (
-                    "delete_rpsl_object",
+                    "delete_rpsl_objects",
                     {
                         "origin": "mirror",
-                        "rpsl_object": None,
                         "source": "TEST",
-                        "rpsl_pk": "192.0.2.0/24AS65530",
-                        "object_class": "route",
-                        "source_serial": None,
-                        "protect_rpsl_name": False,
+                        "deletions": [("192.0.2.0/24AS65530", "route", None)],
                     },
                 ),
                 (
@@ -671,3 +674,81 @@ class TestNRTM4Client:
         )
 
         assert mock_dh.other_calls == expected
+
+
+class TestNRTM4DeltaDownloader:
+    def _deltas(self, count):
+        return [
+            NRTM4FileReference(version=version, url=f"delta.{version}.json", hash=f"hash{version}")
+            for version in range(1, count + 1)
+        ]
+
+    def test_download_ahead_in_order(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("irrd.mirroring.nrtm4.nrtm4_client.NRTM4_DELTA_DOWNLOAD_CONCURRENCY", 2)
+        started = []
+        released = {version: threading.Event() for version in range(1, 5)}
+
+        def mock_retrieve_file(url, expected_hash=None, return_contents=True):
+            version = int(url.split(".")[-2])
+            assert expected_hash == f"hash{version}"
+            assert not return_contents
+            started.append(version)
+            assert released[version].wait(timeout=5)
+            path = tmp_path / f"delta.{version}"
+            path.write_text("content")
+            return str(path), True
+
+        monkeypatch.setattr("irrd.mirroring.nrtm4.nrtm4_client.retrieve_file", mock_retrieve_file)
+
+        loaded = []
+        with NRTM4DeltaDownloader(self._deltas(4), MOCK_UNF_URL) as downloader:
+            iterator = iter(downloader)
+            released[2].set()
+            released[1].set()
+            for delta, delta_path in iterator:
+                assert os.path.exists(delta_path)
+                loaded.append((delta.version, delta_path))
+                # At most two deltas are downloading or waiting
+                assert len(downloader.downloads) <= 2
+                for event in released.values():
+                    event.set()
+
+        assert [version for version, _ in loaded] == [1, 2, 3, 4]
+        assert sorted(started) == [1, 2, 3, 4]
+        assert not any(os.path.exists(delta_path) for _, delta_path in loaded)
+
+    def test_download_max_bytes(self, monkeypatch, tmp_path):
+        monkeypatch.setattr("irrd.mirroring.nrtm4.nrtm4_client.NRTM4_DELTA_DOWNLOAD_MAX_BYTES", 5)
+        started = []
+
+        def mock_retrieve_file(url, expected_hash=None, return_contents=True):
+            started.append(url)
+            path = tmp_path / url.split("/")[-1]
+            path.write_text("content")
+            return str(path), True
+
+        monkeypatch.setattr("irrd.mirroring.nrtm4.nrtm4_client.retrieve_file", mock_retrieve_file)
+
+        with NRTM4DeltaDownloader(self._deltas(3), MOCK_UNF_URL) as downloader:
+            monkeypatch.setattr("irrd.mirroring.nrtm4.nrtm4_client.NRTM4_DELTA_DOWNLOAD_CONCURRENCY", 1)
+            downloader._start_downloads()
+            downloader.downloads[0][1].result()
+            monkeypatch.setattr("irrd.mirroring.nrtm4.nrtm4_client.NRTM4_DELTA_DOWNLOAD_CONCURRENCY", 3)
+            downloader._start_downloads()
+            # The first download exceeds the budget, so nothing more is downloaded ahead
+            assert len(started) == 1
+            assert [delta.version for delta, _ in downloader] == [1, 2, 3]
+
+    def test_cleanup_on_error(self, monkeypatch, tmp_path):
+        def mock_retrieve_file(url, expected_hash=None, return_contents=True):
+            path = tmp_path / url.split("/")[-1]
+            path.write_text("content")
+            return str(path), True
+
+        monkeypatch.setattr("irrd.mirroring.nrtm4.nrtm4_client.retrieve_file", mock_retrieve_file)
+
+        with pytest.raises(ValueError):
+            with NRTM4DeltaDownloader(self._deltas(3), MOCK_UNF_URL) as downloader:
+                for _ in downloader:
+                    raise ValueError()
+        assert not list(tmp_path.iterdir())
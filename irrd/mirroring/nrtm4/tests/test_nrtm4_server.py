@@ -151,7 +151,8 @@ class TestNRTM4ServerWriter:
             DatabaseStatusQuery().source("TEST"),
             RPSLDatabaseJournalQuery()
             .sources(["TEST"])
-            .serial_global_range(status.last_snapshot_global_serial + 1),
+            .serial_global_range(status.last_snapshot_global_serial + 1)
+            .stream_results(),
         ]
         new_unf = self._load_unf(nrtm_path)
         assert new_unf["version"] == 2
@@ -199,7 +200,8 @@ class TestNRTM4ServerWriter:
             DatabaseStatusQuery().source("TEST"),
             RPSLDatabaseJournalQuery()
             .sources(["TEST"])
-            .serial_global_range(status.last_snapshot_global_serial + 1),
+            .serial_global_range(status.last_snapshot_global_serial + 1)
+            .stream_results(),
         ]
         newest_unf = self._load_unf(nrtm_path)
         assert newest_unf["version"] == 3
@@ -233,7 +235,8 @@ class TestNRTM4ServerWriter:
             DatabaseStatusQuery().source("TEST"),
             RPSLDatabaseJournalQuery()
             .sources(["TEST"])
-            .serial_global_range(status.last_snapshot_global_serial + 1),
+            .serial_global_range(status.last_snapshot_global_serial + 1)
+            .stream_results(),
         ]
         expiry_unf = self._load_unf(nrtm_path)
         assert expiry_unf["version"] == newest_unf["version"]
@@ -258,6 +261,48 @@ class TestNRTM4ServerWriter:
         assert [type(q) for q in mock_dh.queries] == [RPSLDatabaseJournalStatisticsQuery, DatabaseStatusQuery]
         assert not mock_dh.other_calls
 
+    def test_nrtm4_server_coalesce_deltas(self, tmpdir, config_override):
+        nrtm_path = Path(tmpdir / "nrtm4")
+        nrtm_path.mkdir()
+        config_override(
+            {
+                "piddir": str(tmpdir),
+                "sources": {
+                    "TEST": {
+                        "nrtm4_server_private_key": MOCK_UNF_PRIVATE_KEY_STR,
+                        "nrtm4_server_local_path": str(nrtm_path),
+                        "nrtm4_server_coalesce_deltas": True,
+                    }
+                },
+            }
+        )
+        mock_dh = MockDatabaseHandler()
+        self._run_writer(mock_dh, [self.empty_status])
+        status = mock_dh.other_calls[0][1]["status"]
+
+        self._run_writer(
+            mock_dh,
+            [self._status_to_dict(status)],
+            [
+                {
+                    "operation": DatabaseOperation.delete,
+                    "object_class": "mntner",
+                    "rpsl_pk": "TEST-MNT",
+                }
+            ],
+        )
+        journal_query = mock_dh.queries[-1]
+        assert journal_query == RPSLDatabaseJournalQuery().sources(["TEST"]).serial_global_range(
+            status.last_snapshot_global_serial + 1
+        )
+        assert journal_query._latest_per_object
+        assert journal_query._stream_results
+
+        unf = self._load_unf(nrtm_path)
+        with gzip.open(nrtm_path / unf["deltas"][0]["url"].split("/")[-1], "rb") as delta_file:
+            delta = list(jsonseq_decode(delta_file))
+        assert delta[1:] == [{"action": "delete", "object_class": "mntner", "primary_key": "TEST-MNT"}]
+
     def _load_unf(self, nrtm_path):
         with open(nrtm_path / UPDATE_NOTIFICATION_FILENAME, "rb") as f:
             unf_content = f.read()
@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Iterable
 
 from irrd.rpki.validators import SingleRouteROAValidator
 from irrd.rpsl.parser import UnknownRPSLObjectClassException
@@ -78,7 +79,7 @@ class NRTMOperation:
         if not self.object_class:  # pragma: no cover
             raise RuntimeError("NRTMOperation called with neither object_text nor object_class")
 
-        if self.object_class_filter and self.object_class.lower() not in self.object_class_filter:
+        if self._filtered_out():
             return False
 
         if obj and obj.messages.errors():
@@ -128,5 +129,45 @@ class NRTMOperation:
         logger.info(log)
         return True
 
+    def is_deletion_by_pk(self) -> bool:
+        """Whether this is a deletion by RPSL PK and object class, without object text."""
+        return self.operation == DatabaseOperation.delete and not self.object_text
+
+    def _filtered_out(self) -> bool:
+        assert self.object_class
+        return bool(self.object_class_filter and self.object_class.lower() not in self.object_class_filter)
+
     def __repr__(self):
         return f"{self.source}/{self.origin_identifier}/{self.operation.value}"
+
+
+def save_nrtm_operations(operations: Iterable[NRTMOperation], database_handler: DatabaseHandler) -> None:
+    """
+    Save a sequence of NRTM operations, in order.
+    Consecutive deletions by RPSL PK and object class from the same source
+    are saved with a single statement. Other operations are saved one
+    at a time, as the database handler already buffers upserts.
+    """
+    deletions: list[NRTMOperation] = []
+    for operation in operations:
+        if deletions and (not operation.is_deletion_by_pk() or operation.source != deletions[0].source):
+            _save_deletions(deletions, database_handler)
+            deletions = []
+        if not operation.is_deletion_by_pk():
+            operation.save(database_handler)
+        elif not operation._filtered_out():
+            deletions.append(operation)
+    if deletions:
+        _save_deletions(deletions, database_handler)
+
+
+def _save_deletions(deletions: list[NRTMOperation], database_handler: DatabaseHandler) -> None:
+    keys = []
+    for deletion in deletions:
+        assert deletion.rpsl_pk and deletion.object_class
+        keys.append((deletion.rpsl_pk, deletion.object_class, deletion.serial))
+    database_handler.delete_rpsl_objects(
+        origin=JournalEntryOrigin.mirror, source=deletions[0].source, deletions=keys
+    )
+    for deletion in deletions:
+        logger.info(f"Completed NRTM operation {deletion!s}/{deletion.object_class}/{deletion.rpsl_pk}")
@@ -8,7 +8,7 @@ from irrd.rpsl.rpsl_objects import RPSLKeyCert, rpsl_object_from_text
 from irrd.scopefilter.validators import ScopeFilterValidator
 from irrd.storage.database_handler import DatabaseHandler
 from irrd.storage.models import DatabaseOperation, JournalEntryOrigin
-from irrd.utils.text import remove_last_modified, split_paragraphs_rpsl
+from irrd.utils.text import rpsl_content_hash, split_paragraphs_rpsl
 
 from ..storage.queries import RPSLDatabaseQuery
 from .nrtm_operation import NRTMOperation
@@ -224,8 +224,26 @@ class MirrorUpdateFileImportParser(MirrorFileImportParserBase):
         """
         Run the actual import. If direct_error_return is set, returns an error
         string on encountering the first error. Otherwise, returns None.
+
+        Changes are detected by comparing the content hash of each object
+        in the file to the hash stored in the database. Only the RPSL PK,
+        object class and content hash of current objects are kept in memory,
+        and objects from the file are written as they are read, if new or
+        modified. Objects not in the file are deleted afterwards.
         """
-        objs_from_file = []
+        query = RPSLDatabaseQuery(
+            ordered_by_sources=False,
+            enable_ordering=False,
+            column_names=["rpsl_pk", "object_class", "content_hash"],
+        ).sources([self.source])
+        current_hashes = {
+            (row["rpsl_pk"], row["object_class"]): row["content_hash"]
+            for row in self.database_handler.execute_query(query)
+        }
+        current_pks = set(current_hashes.keys())
+        file_pks = set()
+        modified_pks = set()
+
         f = open(self.filename, encoding="utf-8", errors="backslashreplace")
         for paragraph in split_paragraphs_rpsl(f):
             try:
@@ -234,30 +252,19 @@ class MirrorUpdateFileImportParser(MirrorFileImportParserBase):
                 if self.direct_error_return:
                     return e.message
             else:
-                if rpsl_obj:
-                    objs_from_file.append(rpsl_obj)
+                if not rpsl_obj:
+                    continue
+                pk = (rpsl_obj.pk(), rpsl_obj.rpsl_object_class)
+                file_pks.add(pk)
+                content_hash = rpsl_content_hash(rpsl_obj.render_rpsl_text())
+                if current_hashes.get(pk) != content_hash:
+                    self.database_handler.upsert_rpsl_object(rpsl_obj, JournalEntryOrigin.synthetic_nrtm)
+                    current_hashes[pk] = content_hash
+                    if pk in current_pks:
+                        modified_pks.add(pk)
         f.close()
 
-        query = RPSLDatabaseQuery(
-            ordered_by_sources=False, enable_ordering=False, column_names=["rpsl_pk", "object_class"]
-        ).sources([self.source])
-        current_pks = {
-            (row["rpsl_pk"], row["object_class"]) for row in self.database_handler.execute_query(query)
-        }
-
-        file_objs_by_pk = {(obj.pk(), obj.rpsl_object_class): obj for obj in objs_from_file}
-        file_pks = set(file_objs_by_pk.keys())
-        new_pks = file_pks - current_pks
         deleted_pks = current_pks - file_pks
-        retained_pks = file_pks.intersection(current_pks)
-
-        self.obj_new = len(new_pks)
-        self.obj_deleted = len(deleted_pks)
-        self.obj_retained = len(retained_pks)
-
-        for (rpsl_pk, object_class), file_obj in filter(lambda i: i[0] in new_pks, file_objs_by_pk.items()):
-            self.database_handler.upsert_rpsl_object(file_obj, JournalEntryOrigin.synthetic_nrtm)
-
         for rpsl_pk, object_class in deleted_pks:
             self.database_handler.delete_rpsl_object(
                 rpsl_pk=rpsl_pk,
@@ -266,22 +273,10 @@ class MirrorUpdateFileImportParser(MirrorFileImportParserBase):
                 origin=JournalEntryOrigin.synthetic_nrtm,
             )
 
-        # This query does not filter on retained_pks. The expectation is that most
-        # objects are retained, and therefore it is much faster to query the entire source.
-        query = RPSLDatabaseQuery(
-            ordered_by_sources=False,
-            enable_ordering=False,
-            column_names=["rpsl_pk", "object_class", "object_text"],
-        )
-        query = query.sources([self.source])
-        for row in self.database_handler.execute_query(query):
-            try:
-                file_obj = file_objs_by_pk[(row["rpsl_pk"], row["object_class"])]
-            except KeyError:
-                continue
-            if file_obj.render_rpsl_text() != remove_last_modified(row["object_text"]):
-                self.database_handler.upsert_rpsl_object(file_obj, JournalEntryOrigin.synthetic_nrtm)
-                self.obj_modified += 1
+        self.obj_new = len(file_pks - current_pks)
+        self.obj_deleted = len(deleted_pks)
+        self.obj_retained = len(file_pks & current_pks)
+        self.obj_modified = len(modified_pks)
 
         self.log_report()
         return None
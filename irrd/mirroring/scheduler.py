@@ -14,7 +14,7 @@ from irrd.conf.defaults import (
     DEFAULT_SOURCE_IMPORT_TIMER,
     DEFAULT_SOURCE_IMPORT_TIMER_NRTM4,
 )
-from irrd.mirroring.jobs import TransactionTimePreloadSignaller
+from irrd.mirroring.jobs import PartitionRunner, TransactionTimePreloadSignaller
 
 from .mirror_runners_export import SourceExportRunner
 from .mirror_runners_import import (
@@ -28,6 +28,7 @@ from .nrtm4.nrtm4_server import NRTM4Server
 logger = logging.getLogger(__name__)
 
 MAX_SIMULTANEOUS_RUNS = 1
+PARTITION_TIMER = 3600
 
 
 class ScheduledTaskProcess(multiprocessing.Process):
@@ -88,6 +89,9 @@ class MirrorScheduler:
         if self._check_scopefilter_change():
             self.run_if_relevant(None, ScopeFilterUpdateRunner, 0)
 
+        if get_setting("sources") or get_setting("rpki.roa_source"):
+            self.run_if_relevant(None, PartitionRunner, PARTITION_TIMER)
+
         sources_started = 0
         for source in get_setting("sources", {}).keys():
             if sources_started >= MAX_SIMULTANEOUS_RUNS:
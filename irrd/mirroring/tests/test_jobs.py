@@ -1,11 +1,13 @@
 import datetime
 from unittest.mock import create_autospec
 
+import time_machine
+
 from irrd.storage.database_handler import DatabaseHandler
 from irrd.storage.preload import Preloader
 
 from ...utils.test_utils import flatten_mock_calls
-from ..jobs import TransactionTimePreloadSignaller
+from ..jobs import PartitionRunner, TransactionTimePreloadSignaller
 
 
 class TestTransactionTimePreloadSignaller:
@@ -55,3 +57,48 @@ class TestTransactionTimePreloadSignaller:
         signaller = TransactionTimePreloadSignaller()
         signaller.run()
         assert "Failed to send" in caplog.text
+
+
+class TestPartitionRunner:
+    @time_machine.travel(
+        datetime.datetime(2022, 12, 14, 12, 34, 56, tzinfo=datetime.timezone.utc), tick=False
+    )
+    def test_run(self, monkeypatch, config_override, caplog):
+        mock_dh = create_autospec(DatabaseHandler)
+        monkeypatch.setattr("irrd.mirroring.jobs.DatabaseHandler", lambda: mock_dh)
+        config_override(
+            {
+                "rpki": {"roa_source": "https://example.com/roa.json"},
+                "sources": {
+                    "TEST": {"keep_journal": True},
+                    "TEST2": {},
+                    "TEST3": {"keep_journal": True},
+                },
+            }
+        )
+
+        def create_journal_partitions(source, months):
+            if source == "TEST3":
+                raise Exception("lock timeout")
+
+        mock_dh.create_journal_partitions.side_effect = create_journal_partitions
+
+        PartitionRunner().run()
+        months = [
+            datetime.datetime(2022, 12, 14, 12, 34, 56, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc),
+        ]
+        assert flatten_mock_calls(mock_dh) == [
+            ["create_rpsl_objects_partition", ("TEST",), {}],
+            ["create_journal_partitions", ("TEST", months), {}],
+            ["commit", (), {}],
+            ["create_rpsl_objects_partition", ("TEST2",), {}],
+            ["commit", (), {}],
+            ["create_rpsl_objects_partition", ("TEST3",), {}],
+            ["create_journal_partitions", ("TEST3", months), {}],
+            ["rollback", (), {}],
+            ["create_rpsl_objects_partition", ("RPKI",), {}],
+            ["commit", (), {}],
+            ["close", (), {}],
+        ]
+        assert "create partitions for TEST3: lock timeout" in caplog.text
@@ -227,7 +227,7 @@ class TestRPSLMirrorFullImportRunner:
 
         assert MockMirrorFileImportParser.rpsl_data_calls == ["source1", "source2"]
         assert flatten_mock_calls(mock_dh) == [
-            ["delete_all_rpsl_objects_with_journal", ("TEST",), {}],
+            ["start_rpsl_staging", ("TEST",), {}],
             ["disable_journaling", (), {}],
             ["record_serial_newest_mirror", ("TEST", 424242), {}],
         ]
@@ -299,7 +299,7 @@ class TestRPSLMirrorFullImportRunner:
 
         assert MockMirrorFileImportParser.rpsl_data_calls == ["source1", "source2"]
         assert flatten_mock_calls(mock_dh) == [
-            ["delete_all_rpsl_objects_with_journal", ("TEST",), {}],
+            ["start_rpsl_staging", ("TEST",), {}],
             ["disable_journaling", (), {}],
             ["record_serial_newest_mirror", ("TEST", 424242), {}],
         ]
@@ -334,7 +334,7 @@ class TestRPSLMirrorFullImportRunner:
 
         assert MockMirrorFileImportParser.rpsl_data_calls == ["source1", "source2"]
         assert flatten_mock_calls(mock_dh) == [
-            ["delete_all_rpsl_objects_with_journal", ("TEST",), {}],
+            ["start_rpsl_staging", ("TEST",), {}],
             ["disable_journaling", (), {}],
         ]
 
@@ -403,7 +403,7 @@ class TestRPSLMirrorFullImportRunner:
 
         assert MockMirrorFileImportParser.rpsl_data_calls == ["source1", "source2"]
         assert flatten_mock_calls(mock_dh) == [
-            ["delete_all_rpsl_objects_with_journal", ("TEST",), {}],
+            ["start_rpsl_staging", ("TEST",), {}],
             ["disable_journaling", (), {}],
             ["record_serial_newest_mirror", ("TEST", 424242), {}],
         ]
@@ -13,8 +13,9 @@ from irrd.utils.rpsl_samples import (
     SAMPLE_ROUTE,
     SAMPLE_UNKNOWN_CLASS,
 )
+from irrd.utils.test_utils import flatten_mock_calls
 
-from ..nrtm_operation import NRTMOperation
+from ..nrtm_operation import NRTMOperation, save_nrtm_operations
 
 
 class TestNRTMOperation:
@@ -202,3 +203,69 @@ class TestNRTMOperation:
         )
         assert not operation.save(database_handler=mock_dh)
         assert not mock_dh.upsert_rpsl_object.call_count
+
+    def test_save_nrtm_operations(self):
+        mock_dh = Mock()
+
+        def deletion(rpsl_pk, object_class, serial, source="TEST"):
+            return NRTMOperation(
+                source=source,
+                operation=DatabaseOperation.delete,
+                serial=serial,
+                rpsl_pk=rpsl_pk,
+                object_class=object_class,
+                object_class_filter=["mntner", "route"],
+            )
+
+        addition = NRTMOperation(
+            source="TEST",
+            operation=DatabaseOperation.add_or_update,
+            serial=3,
+            object_text=SAMPLE_MNTNER,
+        )
+        save_nrtm_operations(
+            [
+                deletion("192.0.2.0/24AS65537", "route", 1),
+                deletion("PERSON-TEST", "person", 2),
+                deletion("TEST-MNT", "mntner", 2),
+                addition,
+                deletion("TEST-MNT", "mntner", 4),
+                deletion("TEST-MNT", "mntner", 5, source="TEST2"),
+            ],
+            database_handler=mock_dh,
+        )
+
+        assert flatten_mock_calls(mock_dh, flatten_objects=True) == [
+            [
+                "delete_rpsl_objects",
+                (),
+                {
+                    "origin": JournalEntryOrigin.mirror,
+                    "source": "TEST",
+                    "deletions": [("192.0.2.0/24AS65537", "route", 1), ("TEST-MNT", "mntner", 2)],
+                },
+            ],
+            [
+                "upsert_rpsl_object",
+                ("mntner/TEST-MNT/TEST", "JournalEntryOrigin.mirror"),
+                {"source_serial": 3},
+            ],
+            [
+                "delete_rpsl_objects",
+                (),
+                {
+                    "origin": JournalEntryOrigin.mirror,
+                    "source": "TEST",
+                    "deletions": [("TEST-MNT", "mntner", 4)],
+                },
+            ],
+            [
+                "delete_rpsl_objects",
+                (),
+                {
+                    "origin": JournalEntryOrigin.mirror,
+                    "source": "TEST2",
+                    "deletions": [("TEST-MNT", "mntner", 5)],
+                },
+            ],
+        ]
@@ -22,6 +22,7 @@ from irrd.utils.rpsl_samples import (
     SAMPLE_UNKNOWN_CLASS,
 )
 from irrd.utils.test_utils import flatten_mock_calls
+from irrd.utils.text import rpsl_content_hash
 
 from ..parsers import (
     MirrorFileImportParser,
@@ -233,19 +234,21 @@ class TestMirrorUpdateFileImportParser:
                 # includes a last-modified which should be ignored in the comparison
                 "rpsl_pk": "192.0.2.0/24AS65537",
                 "object_class": "route",
-                "object_text": rpsl_object_from_text(route_with_last_modified).render_rpsl_text(),
+                "content_hash": rpsl_content_hash(
+                    rpsl_object_from_text(route_with_last_modified).render_rpsl_text()
+                ),
             },
             {
                 # Modified object
                 "rpsl_pk": "2001:DB8::/48AS65537",
                 "object_class": "route6",
-                "object_text": SAMPLE_ROUTE6.replace("test-MNT", "existing-mnt"),
+                "content_hash": rpsl_content_hash(SAMPLE_ROUTE6.replace("test-MNT", "existing-mnt")),
             },
             {
                 # Deleted object
                 "rpsl_pk": "rtrs-settest",
                 "object_class": "route-set",
-                "object_text": SAMPLE_RTR_SET,
+                "content_hash": rpsl_content_hash(SAMPLE_RTR_SET),
             },
         ]
         mock_dh.execute_query = lambda query: mock_query_result
@@ -261,17 +264,17 @@ class TestMirrorUpdateFileImportParser:
             parser.run_import()
 
         assert len(mock_dh.mock_calls) == 5
-        assert mock_dh.mock_calls[0][0] == "record_mirror_error"
-        assert mock_dh.mock_calls[1][0] == "record_mirror_error"
-        assert mock_dh.mock_calls[2][0] == "upsert_rpsl_object"
-        assert mock_dh.mock_calls[2][1][0].pk() == "ROLE-TEST"
-        assert mock_dh.mock_calls[3][0] == "delete_rpsl_object"
-        assert mock_dh.mock_calls[3][2]["source"] == "TEST"
-        assert mock_dh.mock_calls[3][2]["rpsl_pk"] == "rtrs-settest"
-        assert mock_dh.mock_calls[3][2]["object_class"] == "route-set"
-        assert mock_dh.mock_calls[3][2]["origin"] == JournalEntryOrigin.synthetic_nrtm
-        assert mock_dh.mock_calls[4][0] == "upsert_rpsl_object"
-        assert mock_dh.mock_calls[4][1][0].pk() == "2001:DB8::/48AS65537"
+        assert mock_dh.mock_calls[0][0] == "upsert_rpsl_object"
+        assert mock_dh.mock_calls[0][1][0].pk() == "2001:DB8::/48AS65537"
+        assert mock_dh.mock_calls[1][0] == "upsert_rpsl_object"
+        assert mock_dh.mock_calls[1][1][0].pk() == "ROLE-TEST"
+        assert mock_dh.mock_calls[2][0] == "record_mirror_error"
+        assert mock_dh.mock_calls[3][0] == "record_mirror_error"
+        assert mock_dh.mock_calls[4][0] == "delete_rpsl_object"
+        assert mock_dh.mock_calls[4][2]["source"] == "TEST"
+        assert mock_dh.mock_calls[4][2]["rpsl_pk"] == "rtrs-settest"
+        assert mock_dh.mock_calls[4][2]["object_class"] == "route-set"
+        assert mock_dh.mock_calls[4][2]["origin"] == JournalEntryOrigin.synthetic_nrtm
 
         assert "Invalid source BADSOURCE for object" in caplog.text
         assert "Invalid address prefix" in caplog.text
@@ -285,6 +288,7 @@ class TestMirrorUpdateFileImportParser:
     def test_direct_error_return(self, mock_scopefilter, config_override):
         config_override({"sources": {"TEST": {}}})
         mock_dh = Mock()
+        mock_dh.execute_query = lambda query: []
 
         test_data = [
             SAMPLE_UNKNOWN_CLASS,
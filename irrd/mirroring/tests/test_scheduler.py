@@ -2,6 +2,8 @@ import threading
 import time
 from unittest.mock import create_autospec
 
+import pytest
+
 from irrd.mirroring.jobs import TransactionTimePreloadSignaller
 
 from ...utils.test_utils import flatten_mock_calls
@@ -10,6 +12,12 @@ from ..scheduler import MAX_SIMULTANEOUS_RUNS, MirrorScheduler, ScheduledTaskPro
 thread_run_count = 0
 
 
+@pytest.fixture(autouse=True)
+def mock_partition_runner(monkeypatch):
+    # The partition runner is started whenever any source is configured
+    monkeypatch.setattr("irrd.mirroring.scheduler.PartitionRunner", MockPartitionRunner)
+
+
 class TestMirrorScheduler:
     def test_scheduler_standby_preload_signaller(self, monkeypatch, config_override):
         mock_preload_signaller = create_autospec(TransactionTimePreloadSignaller)
@@ -133,6 +141,32 @@ class TestMirrorScheduler:
 
         assert thread_run_count == 1
 
+    def test_scheduler_runs_partitions(self, monkeypatch, config_override):
+        monkeypatch.setattr("irrd.mirroring.scheduler.TransactionTimePreloadSignaller", object)
+        monkeypatch.setattr("irrd.mirroring.scheduler.ScheduledTaskProcess", MockScheduledTaskProcess)
+        global thread_run_count
+        thread_run_count = 0
+
+        config_override(
+            {
+                "rpki": {"roa_source": None},
+                "sources": {"TEST": {}},
+            }
+        )
+
+        monkeypatch.setattr("irrd.mirroring.scheduler.PartitionRunner", MockRunner)
+        MockRunner.run_sleep = False
+
+        scheduler = MirrorScheduler()
+        scheduler.run()
+        time.sleep(0.5)
+        scheduler.update_process_state()
+        # Second run will not start the thread, as the timer has not expired
+        scheduler.run()
+        time.sleep(0.5)
+
+        assert thread_run_count == 1
+
     def test_scheduler_runs_scopefilter(self, monkeypatch, config_override):
         monkeypatch.setattr("irrd.mirroring.scheduler.TransactionTimePreloadSignaller", object)
         monkeypatch.setattr("irrd.mirroring.scheduler.ScheduledTaskProcess", MockScheduledTaskProcess)
@@ -368,6 +402,11 @@ class MockRunner:
             time.sleep(1.5)
 
 
+class MockPartitionRunner:
+    def run(self):
+        pass
+
+
 class MockScheduledTaskProcess(threading.Thread):
     def __init__(self, runner, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -12,7 +12,11 @@ from irrd.storage.queries import RPSLDatabaseQuery
 from .status import RoutePreferenceStatus
 
 logger = logging.getLogger(__name__)
-MAX_FILTER_PREFIX_LEN = 5000
+# Above this number of changed prefixes, a full evaluation is done.
+# Filtered runs cost two queries regardless of the number of prefixes,
+# so this only guards against fetching most of the table in a roundabout way.
+MAX_FILTER_PREFIX_LEN = 50000
+VALIDATOR_COLUMNS = ["prefix", "source", "pk", "route_preference_status"]
 
 
 class RoutePreferenceValidator:
@@ -60,11 +64,17 @@ class RoutePreferenceValidator:
                 rnode.data = {}
             rnode.data[route_object["pk"]] = (preference, route_object["route_preference_status"])
 
-    def validate_known_routes(self) -> tuple[list[str], list[str]]:
+    def validate_known_routes(
+        self, evaluate_prefixes: Iterable[IP] | None = None
+    ) -> tuple[list[str], list[str]]:
         """
         Validate all routes known to this validator, based on the
         previously built tree. Returns a tuple of two lists:
         pks of "currently suppressed, should be visible" and vice versa.
+
+        If evaluate_prefixes is set, only routes overlapping those prefixes
+        are evaluated. The tree must then also contain all routes overlapping
+        those routes, as build_validator() ensures.
         """
         if not self.source_preferences:
             # All objects should be visible if there is no setting,
@@ -73,7 +83,7 @@ class RoutePreferenceValidator:
             return [], []
         to_be_visible = []
         to_be_suppressed = []
-        for evaluated_node in self.rtree:
+        for evaluated_node in self._nodes_to_evaluate(evaluate_prefixes):
             search_args = {"packed": evaluated_node.packed, "masklen": evaluated_node.prefixlen}
             overlapping_nodes = self.rtree.search_covered(**search_args) + self.rtree.search_covering(
                 **search_args
@@ -88,6 +98,20 @@ class RoutePreferenceValidator:
                         to_be_visible.append(evaluated_key)
         return to_be_visible, to_be_suppressed
 
+    def _nodes_to_evaluate(self, evaluate_prefixes: Iterable[IP] | None) -> Iterable[RadixNode]:
+        """
+        Return the nodes to evaluate: all nodes, or only those
+        overlapping any of evaluate_prefixes, if set.
+        """
+        if evaluate_prefixes is None:
+            return self.rtree
+        nodes = {}
+        for prefix in evaluate_prefixes:
+            search_args = {"network": str(prefix)}
+            for node in self.rtree.search_covered(**search_args) + self.rtree.search_covering(**search_args):
+                nodes[node.prefix] = node
+        return nodes.values()
+
     def _evaluate_route(
         self, route_preference: int, overlapping_nodes: list[RadixNode]
     ) -> RoutePreferenceStatus:
@@ -111,23 +135,50 @@ def build_validator(
     """
     Build a RouteValidator instance given a database handler
     and an optional set of prefixes to limit the query.
-    """
-    columns = ["prefix", "source", "pk", "route_preference_status"]
-    object_classes = ["route", "route6"]
 
+    With filter_prefixes, the validator needs every route overlapping
+    any route that overlaps a filter prefix, as those all determine the
+    state of the affected routes. This is found in two queries: first the
+    routes overlapping the filter prefixes, then all routes overlapping
+    the least specific prefixes among those and the filter prefixes.
+    """
     if not filter_prefixes:
-        q = RPSLDatabaseQuery(column_names=columns, ordered_by_sources=False).object_classes(object_classes)
+        q = RPSLDatabaseQuery(column_names=VALIDATOR_COLUMNS, ordered_by_sources=False).object_classes(
+            ["route", "route6"]
+        )
         return RoutePreferenceValidator(database_handler.execute_query(q))
-    else:
-        rows = []
-        for filter_prefix in filter_prefixes:
-            q = (
-                RPSLDatabaseQuery(column_names=columns, ordered_by_sources=False)
-                .object_classes(object_classes)
-                .ip_any(filter_prefix)
-            )
-            rows += list(database_handler.execute_query(q))
-        return RoutePreferenceValidator(rows)
+
+    filter_prefix_strs = {str(prefix) for prefix in filter_prefixes}
+    rows = _query_overlapping_routes(database_handler, filter_prefix_strs)
+
+    context_prefixes = _least_specific_prefixes(filter_prefix_strs | {row["prefix"] for row in rows})
+    if context_prefixes != _least_specific_prefixes(filter_prefix_strs):
+        rows = _query_overlapping_routes(database_handler, context_prefixes)
+    return RoutePreferenceValidator(rows)
+
+
+def _query_overlapping_routes(database_handler: DatabaseHandler, prefixes: set[str]) -> list[dict[str, str]]:
+    """
+    Retrieve all route(6) objects overlapping any of the given prefixes,
+    deduplicated, as objects are returned once per overlapping prefix.
+    """
+    q = (
+        RPSLDatabaseQuery(column_names=VALIDATOR_COLUMNS, ordered_by_sources=False)
+        .object_classes(["route", "route6"])
+        .ip_any_of([IP(prefix) for prefix in sorted(prefixes)])
+    )
+    return list({row["pk"]: row for row in database_handler.execute_query(q)}.values())
+
+
+def _least_specific_prefixes(prefixes: set[str]) -> set[str]:
+    """
+    Reduce a set of prefixes to those not covered by any other prefix in the set,
+    in the normalised string format of radix.
+    """
+    rtree = radix.Radix()
+    for prefix in prefixes:
+        rtree.add(prefix)
+    return {node.prefix for node in rtree if rtree.search_worst(node.prefix).prefix == node.prefix}
 
 
 def update_route_preference_status(
@@ -146,11 +197,11 @@ def update_route_preference_status(
     ):
         return
 
-    if filter_prefixes and len(filter_prefixes) > MAX_FILTER_PREFIX_LEN:
+    if not filter_prefixes or len(filter_prefixes) > MAX_FILTER_PREFIX_LEN:
         filter_prefixes = None
 
     validator = build_validator(database_handler, filter_prefixes)
-    pks_to_be_visible, pks_to_be_suppressed = validator.validate_known_routes()
+    pks_to_be_visible, pks_to_be_suppressed = validator.validate_known_routes(filter_prefixes)
     pks_to_become_visible = pks_to_be_visible + validator.excluded_currently_suppressed
 
     objs_to_become_visible = enrich_pks(database_handler, pks_to_become_visible)
@@ -85,6 +85,14 @@ def test_route_preference_validator(config_override):
     assert to_be_visible == ["route-A", "route-B", "route-I"]
     assert to_be_suppressed == ["route-D", "route-C", "route-E", "route-F"]
 
+    to_be_visible, to_be_suppressed = validator.validate_known_routes([IP("198.51.100.0/24")])
+    assert to_be_visible == ["route-I"]
+    assert to_be_suppressed == []
+
+    to_be_visible, to_be_suppressed = validator.validate_known_routes([IP("192.0.1.0/24")])
+    assert to_be_visible == ["route-A"]
+    assert sorted(to_be_suppressed) == ["route-C", "route-D", "route-E"]
+
     config_override(
         {
             "sources": {
@@ -165,17 +173,19 @@ def test_update_route_preference_status(config_override, monkeypatch):
         )
     ]
 
-    # Second, test with a filter for specific prefixes
+    # Second, test with a filter for specific prefixes, which first
+    # queries overlaps of those prefixes, and then overlaps of the least
+    # specific routes found, i.e. 192.0.0.0/22 instead of 192.0.0.0/23.
     mock_dh.reset_mock()
-    mock_dh.query_responses[RPSLDatabaseQuery] = iter(route_objects)
+    mock_dh.query_responses[RPSLDatabaseQuery] = route_objects
     update_route_preference_status(mock_dh, [IP("192.0.0.0/23"), IP("198.51.100.0/24")])
     assert mock_dh.queries == [
         RPSLDatabaseQuery(column_names=expected_columns, ordered_by_sources=False)
         .object_classes(object_classes)
-        .ip_any(IP("192.0.0.0/23")),
+        .ip_any_of([IP("192.0.0.0/23"), IP("198.51.100.0/24")]),
         RPSLDatabaseQuery(column_names=expected_columns, ordered_by_sources=False)
         .object_classes(object_classes)
-        .ip_any(IP("198.51.100.0/24")),
+        .ip_any_of([IP("192.0.0.0/22"), IP("198.51.100.0/24")]),
         RPSLDatabaseQuery(
             enrich_columns,
             enable_ordering=False,
@@ -188,10 +198,24 @@ def test_update_route_preference_status(config_override, monkeypatch):
     assert mock_dh.other_calls == [
         (
             "update_route_preference_status",
-            {"rpsl_objs_now_visible": [], "rpsl_objs_now_suppressed": []},
+            {"rpsl_objs_now_visible": route_objects, "rpsl_objs_now_suppressed": route_objects},
         )
     ]
 
+    # If no less specifics are found, the second query is skipped
+    mock_dh.reset_mock()
+    mock_dh.query_responses[RPSLDatabaseQuery] = route_objects
+    update_route_preference_status(mock_dh, [IP("192.0.0.0/22")])
+    assert mock_dh.queries[:2] == [
+        RPSLDatabaseQuery(column_names=expected_columns, ordered_by_sources=False)
+        .object_classes(object_classes)
+        .ip_any_of([IP("192.0.0.0/22")]),
+        RPSLDatabaseQuery(
+            enrich_columns,
+            enable_ordering=False,
+        ).pks(["route-A"]),
+    ]
+
     # Finally, test with a "large" set of prefixes
     monkeypatch.setattr("irrd.routepref.routepref.MAX_FILTER_PREFIX_LEN", 5)
     mock_dh.reset_mock()
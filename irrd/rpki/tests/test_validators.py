@@ -312,6 +312,40 @@ class TestBulkRouteROAValidator:
         ]
         assert flatten_mock_calls(mock_rq) == []  # No filters applied
 
+    def test_validate_nested_roas_sweep_matches_single(self, config_override):
+        config_override({"sources": {"TEST1": {}}})
+        roas = [
+            ROA(IP("192.0.0.0/16"), 65546, "24", "TEST TA"),
+            ROA(IP("192.0.2.0/24"), 65547, "24", "TEST TA"),
+            ROA(IP("192.0.2.0/25"), 65548, "26", "TEST TA"),
+            ROA(IP("192.0.3.0/24"), 0, "24", "TEST TA"),
+            ROA(IP("192.1.0.0/16"), 65549, "16", "TEST TA"),
+            ROA(IP("2001:db8::/32"), 65546, "48", "TEST TA"),
+        ]
+        routes = [
+            ("192.0.2.0", 24, 65546, RPKIStatus.valid),
+            ("192.0.2.0", 24, 65547, RPKIStatus.valid),
+            ("192.0.2.0", 25, 65547, RPKIStatus.invalid),
+            ("192.0.2.0", 26, 65548, RPKIStatus.valid),
+            ("192.0.2.128", 26, 65548, RPKIStatus.invalid),
+            ("192.0.2.128", 25, 65546, RPKIStatus.invalid),
+            ("192.0.3.0", 24, 65546, RPKIStatus.valid),
+            ("192.0.3.0", 24, 0, RPKIStatus.invalid),
+            ("192.0.0.0", 15, 65546, RPKIStatus.not_found),
+            ("192.1.0.0", 16, 65549, RPKIStatus.valid),
+            ("192.2.0.0", 24, 65549, RPKIStatus.not_found),
+            ("2001:db8:1::", 48, 65546, RPKIStatus.valid),
+            ("2001:db8:1::", 64, 65546, RPKIStatus.invalid),
+        ]
+        validator = BulkRouteROAValidator(Mock(spec=DatabaseHandler), roas)
+        route_dicts = [
+            {"ip_first": ip, "prefix_length": length, "asn_first": asn, "source": "TEST1"}
+            for ip, length, asn, _ in routes
+        ]
+        assert validator._validate_routes_sweep(route_dicts) == [status for _, _, _, status in routes]
+        for ip, length, asn, status in routes:
+            assert validator.validate_route(ip, length, asn, "TEST1") == status
+
 
 class TestSingleRouteROAValidator:
     def test_validator_normal_roa(self, monkeypatch, config_override):
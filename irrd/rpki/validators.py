@@ -1,8 +1,7 @@
-import codecs
 import socket
 from collections import defaultdict
+from operator import itemgetter
 
-import datrie
 from IPy import IP
 
 from irrd.conf import RPKI_IRR_PSEUDO_SOURCE, get_setting
@@ -12,10 +11,7 @@ from irrd.storage.queries import ROADatabaseObjectQuery, RPSLDatabaseQuery
 from .importer import ROA
 from .status import RPKIStatus
 
-# Pregenerated conversion from binary to binary strings for performance
-BYTE_BIN = [bin(byte)[2:].zfill(8) for byte in range(256)]
-
-decode_hex = codecs.getdecoder("hex_codec")
+ADDRESS_BITS = {4: 32, 6: 128}
 
 
 class BulkRouteROAValidator:
@@ -23,27 +19,24 @@ class BulkRouteROAValidator:
     The bulk route validator is optimised to validate large amounts
     of routes, e.g. all RPSL route(6)s in the DB.
 
-    As a typical database includes several million route objects,
-    this class builds a trie using datrie. All ROAs are then inserted
-    into that tree. For each route to be validated, the tree is searched
-    to find any matching ROAs.
-
-    ROAs are inserted under a key that is a binary string representation of
-    their prefix, including only network bits. For 192.0.2.0/24, the binary
-    representation is 11000000000000000000001000000000, reducing this to
-    network bits mean the key is 110000000000000000000010.
-    As multiple ROAs may exist for the same prefix, the data under the
-    110000000000000000000010 key is actually a list of tuples, each
-    tuple representing a ROA.
-
-    When searching for ROAs for a route, the entire network address
-    is converted to binary, and also trimmed to network bits.
-    E.g. for 192.0.2.0/25, this would be 1100000000000000000000100.
-    The trie is then searched for any items that are a prefix (inclusive) of
-    1100000000000000000000100, which includes 110000000000000000000010,
-    the key for 192.0.2(.0). A ROA for 192.0.2.0/26 would have key
-    11000000000000000000001000, and therefore will (and should)
-    not be included in the validation process.
+    All prefixes are handled as integer intervals: a prefix is represented
+    by the integer value of its first and last address, per address family.
+    ROAs with an identical prefix are merged into one entry, which maps
+    each ROA ASN to the highest max length for that ASN.
+
+    Prefixes never partially overlap: two prefixes are either disjoint,
+    or one covers the other. Therefore, when all ROA prefixes and all routes
+    are sorted by (first address, -last address), a single sweep
+    over both lists can find all covering ROAs for every route. During the sweep,
+    a stack is kept of ROA prefixes that cover the current position. Every route
+    is covered by exactly the ROA prefixes on the stack, after popping those
+    that end before the start of the route. This makes validation of all
+    routes O((R + N) log(R + N)) for R ROAs and N routes, without per-route
+    tree lookups.
+
+    For validating single routes, e.g. while importing, the ROA prefixes are
+    also indexed by prefix length and network address. Looking up covering
+    ROAs then takes one dict lookup per distinct ROA prefix length.
     """
 
     def __init__(self, dh: DatabaseHandler, roas: list[ROA] | None = None):
@@ -62,12 +55,23 @@ class BulkRouteROAValidator:
             if settings.get("rpki_excluded"):
                 self.excluded_sources.append(source)
 
-        self.roa_tree4 = datrie.Trie("01")
-        self.roa_tree6 = datrie.Trie("01")
+        # Per IP version, maps (first address, prefix length) to a dict of ASN -> max length
+        self.roa_prefixes: dict[int, dict[tuple[int, int], dict[int, int]]] = {4: {}, 6: {}}
         if roas is None:
-            self._build_roa_tree_from_db()
+            self._build_roa_index_from_db()
         else:
-            self._build_roa_tree_from_roa_objs(roas)
+            self._build_roa_index_from_roa_objs(roas)
+
+        # Per IP version, maps prefix length to a dict of network address
+        # (shifted to only network bits) -> ASN -> max length
+        self.roa_lengths: dict[int, dict[int, dict[int, dict[int, int]]]] = {4: {}, 6: {}}
+        for ip_version, roa_prefixes in self.roa_prefixes.items():
+            host_bits = ADDRESS_BITS[ip_version]
+            for (first, length), asn_max_lengths in roa_prefixes.items():
+                networks = self.roa_lengths[ip_version].setdefault(length, {})
+                networks[first >> (host_bits - length)] = asn_max_lengths
+            # Sorted to stop looking at lengths longer than the route
+            self.roa_lengths[ip_version] = dict(sorted(self.roa_lengths[ip_version].items()))
 
     def validate_all_routes(
         self, sources: list[str] | None = None
@@ -91,22 +95,20 @@ class BulkRouteROAValidator:
         q = q.object_classes(["route", "route6"])
         if sources:
             q = q.sources(sources)
-        routes = self.database_handler.execute_query(q)
+        # RPKI_IRR_PSEUDO_SOURCE objects are ROAs, and don't need validation.
+        routes = [
+            result_mapping
+            for result_mapping in self.database_handler.execute_query(q)
+            if result_mapping["source"] != RPKI_IRR_PSEUDO_SOURCE
+        ]
+        new_statuses = self._validate_routes_sweep(routes)
 
         objs_changed: dict[RPKIStatus, list[dict[str, str]]] = defaultdict(list)
-
-        for result_mapping in routes:
-            result = dict(result_mapping)
-            # RPKI_IRR_PSEUDO_SOURCE objects are ROAs, and don't need validation.
-            if result["source"] == RPKI_IRR_PSEUDO_SOURCE:
-                continue
-
-            current_status = result["rpki_status"]
-            result["old_status"] = current_status
-            new_status = self.validate_route(
-                result["ip_first"], result["prefix_length"], result["asn_first"], result["source"]
-            )
+        for result_mapping, new_status in zip(routes, new_statuses):
+            current_status = result_mapping["rpki_status"]
             if new_status != current_status:
+                result = dict(result_mapping)
+                result["old_status"] = current_status
                 result["rpki_status"] = new_status
                 objs_changed[new_status].append(result)
 
@@ -141,55 +143,118 @@ class BulkRouteROAValidator:
         if source in self.excluded_sources:
             return RPKIStatus.not_found
 
-        ip_version, ip_bin_str = self._ip_to_binary_str(prefix_ip)
-        roa_tree = self.roa_tree6 if ip_version == 6 else self.roa_tree4
-        roas_covering = roa_tree.prefix_items(ip_bin_str[:prefix_length])
+        ip_version, ip_int = self._ip_to_int(prefix_ip)
+        host_bits = ADDRESS_BITS[ip_version]
+        roas_covering = []
+        for roa_length, networks in self.roa_lengths[ip_version].items():
+            if roa_length > prefix_length:
+                break
+            asn_max_lengths = networks.get(ip_int >> (host_bits - roa_length))
+            if asn_max_lengths is not None:
+                roas_covering.append(asn_max_lengths)
+        return self._status_for_covering(roas_covering, prefix_length, prefix_asn)
+
+    def _validate_routes_sweep(self, routes: list) -> list[RPKIStatus]:
+        """
+        Validate a list of routes in bulk, returning the new status
+        for each route, in the same order as the routes.
+        See the class docstring for details on the algorithm.
+        """
+        statuses = [RPKIStatus.not_found] * len(routes)
+        intervals_per_version: dict[int, list[tuple[int, int, int]]] = {4: [], 6: []}
+        for idx, route in enumerate(routes):
+            if route["source"] in self.excluded_sources:
+                continue
+            ip_version, first = self._ip_to_int(route["ip_first"])
+            last = first + (1 << (ADDRESS_BITS[ip_version] - route["prefix_length"])) - 1
+            intervals_per_version[ip_version].append((first, -last, idx))
+
+        for ip_version, route_intervals in intervals_per_version.items():
+            host_bits = ADDRESS_BITS[ip_version]
+            roa_intervals = sorted(
+                (first, -(first + (1 << (host_bits - length)) - 1), asn_max_lengths)
+                for (first, length), asn_max_lengths in self.roa_prefixes[ip_version].items()
+            )
+            route_intervals.sort(key=itemgetter(0, 1))
+            roa_count = len(roa_intervals)
+            roa_idx = 0
+            # Stack of (last address, ASN -> max length) for ROA prefixes
+            # that cover the current position, outermost first.
+            stack: list[tuple[int, dict[int, int]]] = []
+
+            for route_first, route_neg_last, route_idx in route_intervals:
+                # Push all ROAs that sort before or equal to this route,
+                # i.e. start earlier, or start at the same address and are at least as large.
+                while roa_idx < roa_count:
+                    roa_first, roa_neg_last, asn_max_lengths = roa_intervals[roa_idx]
+                    if (roa_first, roa_neg_last) > (route_first, route_neg_last):
+                        break
+                    while stack and stack[-1][0] < roa_first:
+                        stack.pop()
+                    stack.append((-roa_neg_last, asn_max_lengths))
+                    roa_idx += 1
+                while stack and stack[-1][0] < route_first:
+                    stack.pop()
+                if stack:
+                    route = routes[route_idx]
+                    statuses[route_idx] = self._status_for_covering(
+                        [asn_max_lengths for _, asn_max_lengths in stack],
+                        route["prefix_length"],
+                        route["asn_first"],
+                    )
+        return statuses
+
+    @staticmethod
+    def _status_for_covering(
+        roas_covering: list[dict[int, int]], prefix_length: int, prefix_asn: int
+    ) -> RPKIStatus:
+        """
+        Determine the status of a route, given the ASN -> max length
+        dicts of all ROA prefixes covering the route.
+        """
         if not roas_covering:
             return RPKIStatus.not_found
-        for key, value in roas_covering:
-            for roa_prefix, roa_asn, roa_max_length in value:
-                if roa_asn != 0 and roa_asn == prefix_asn and prefix_length <= roa_max_length:
+        if prefix_asn != 0:
+            for asn_max_lengths in roas_covering:
+                if prefix_length <= asn_max_lengths.get(prefix_asn, -1):
                     return RPKIStatus.valid
         return RPKIStatus.invalid
 
-    def _build_roa_tree_from_roa_objs(self, roas: list[ROA]):
+    def _add_roa(self, ip_version: int, first: int, length: int, asn: int, max_length: int) -> None:
+        """
+        Add a single ROA to the index.
+        """
+        asn_max_lengths = self.roa_prefixes[ip_version].setdefault((first, length), {})
+        asn_max_lengths[asn] = max(max_length, asn_max_lengths.get(asn, -1))
+
+    def _build_roa_index_from_roa_objs(self, roas: list[ROA]):
         """
-        Build the tree of all ROAs from ROA objects.
+        Build the index of all ROAs from ROA objects.
         """
         for roa in roas:
-            roa_tree = self.roa_tree6 if roa.prefix.version() == 6 else self.roa_tree4
-            key = roa.prefix.strBin()[: roa.prefix.prefixlen()]
-            if key in roa_tree:
-                roa_tree[key].append((roa.prefix_str, roa.asn, roa.max_length))
-            else:
-                roa_tree[key] = [(roa.prefix_str, roa.asn, roa.max_length)]
+            self._add_roa(
+                roa.prefix.version(), roa.prefix.int(), roa.prefix.prefixlen(), roa.asn, roa.max_length
+            )
 
-    def _build_roa_tree_from_db(self):
+    def _build_roa_index_from_db(self):
         """
-        Build the tree of all ROAs from the DB.
+        Build the index of all ROAs from the DB.
         """
         roas = self.database_handler.execute_query(ROADatabaseObjectQuery())
         for roa in roas:
             first_ip, length = roa["prefix"].split("/")
-            ip_version, ip_bin_str = self._ip_to_binary_str(first_ip)
-            key = ip_bin_str[: int(length)]
-            roa_tree = self.roa_tree6 if ip_version == 6 else self.roa_tree4
-            if key in roa_tree:
-                roa_tree[key].append((roa["prefix"], roa["asn"], roa["max_length"]))
-            else:
-                roa_tree[key] = [(roa["prefix"], roa["asn"], roa["max_length"])]
-
-    def _ip_to_binary_str(self, ip: str) -> tuple[int, str]:
-        """
-        Convert an IP string to a binary string, e.g.
-        192.0.2.139 to 11000000000000000000001010001011
-        and return the IP version.
-        """
-        address_family = socket.AF_INET6 if ":" in ip else socket.AF_INET
-        ip_bin = socket.inet_pton(address_family, ip)
-        ip_bin_str = "".join([BYTE_BIN[b] for b in ip_bin]) + "0"
-        ip_version = 6 if address_family == socket.AF_INET6 else 4
-        return ip_version, ip_bin_str
+            ip_version, first = self._ip_to_int(first_ip)
+            self._add_roa(ip_version, first, int(length), roa["asn"], roa["max_length"])
+
+    @staticmethod
+    def _ip_to_int(ip: str) -> tuple[int, int]:
+        """
+        Convert an IP string to its integer value, e.g.
+        192.0.2.139 to 3221226123, and return the IP version.
+        """
+        if ":" in ip:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
 
 
 class SingleRouteROAValidator:
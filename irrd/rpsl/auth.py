@@ -1,9 +1,20 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
 from enum import Enum, unique
 
 from passlib.hash import bcrypt, des_crypt, md5_crypt
 
 from irrd.conf import get_setting
 
+# Password verification results are cached for this many seconds,
+# for at most this many combinations of password and hash.
+VERIFIED_PASSWORD_CACHE_TTL = 300
+VERIFIED_PASSWORD_CACHE_SIZE = 1000
+
 
 @unique
 class PasswordHasherAvailability(Enum):
@@ -41,6 +52,63 @@ def get_password_hashers(permit_legacy=True):
 PASSWORD_REPLACEMENT_HASH = ("BCRYPT-PW", bcrypt)
 
 
+class VerifiedPasswordCache:
+    """
+    A bounded, process-local cache of password verification results.
+    Verifying a password against a hash is slow by design, which adds up
+    for submitters that make many separate submissions with the same password,
+    as their password is also checked against each auth line of each
+    mntner that it does not match.
+
+    Entries are keyed by the scheme and hash from the auth line, so any change
+    to the auth of a mntner invalidates its entries, and a keyed digest of
+    the password, so that passwords are not kept in memory. As the result
+    only depends on the key, both matches and mismatches are cached.
+    """
+
+    def __init__(
+        self, ttl: float = VERIFIED_PASSWORD_CACHE_TTL, max_size: int = VERIFIED_PASSWORD_CACHE_SIZE
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._secret = secrets.token_bytes(32)
+        self._results: OrderedDict[tuple[str, str, bytes], tuple[float, bool]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, scheme: str, hasher, password: str, hash: str) -> bool:
+        """
+        Verify password against hash with hasher, unless that was done
+        recently. Raises ValueError for invalid hashes, like hasher.verify(),
+        which is not cached.
+        """
+        password_digest = hmac.new(self._secret, password.encode("utf-8"), hashlib.sha256).digest()
+        key = (scheme, hash, password_digest)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                expiry, result = cached
+                if expiry > time.monotonic():
+                    self._results.move_to_end(key)
+                    return result
+                del self._results[key]
+
+        result = bool(hasher.verify(password, hash))
+
+        with self._lock:
+            self._results[key] = (time.monotonic() + self.ttl, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+
+verified_password_cache = VerifiedPasswordCache()
+
+
 def verify_auth_lines(
     auth_lines: list[str], passwords: list[str], keycert_obj_pk: str | None = None
 ) -> str | None:
@@ -63,7 +131,7 @@ def verify_auth_lines(
         if hasher:
             for password in passwords:
                 try:
-                    if hasher.verify(password, hash):
+                    if verified_password_cache.verify(scheme, hasher, password, hash):
                         return scheme
                 except ValueError:
                     pass
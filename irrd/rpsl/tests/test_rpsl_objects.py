@@ -1,7 +1,9 @@
 import datetime
+from unittest.mock import Mock
 
 import pytest
 from IPy import IP
+from passlib.hash import bcrypt
 from pytest import raises
 from pytz import timezone
 
@@ -27,6 +29,7 @@ from irrd.utils.rpsl_samples import (
     object_sample_mapping,
 )
 
+from ..auth import VerifiedPasswordCache, verified_password_cache
 from ..parser import UnknownRPSLObjectClassException
 from ..rpsl_objects import (
     OBJECT_CLASS_MAPPING,
@@ -437,6 +440,48 @@ class TestRPSLMntner:
         assert obj.verify_auth([KEY_CERT_SIGNED_MESSAGE_CORRUPT]) is None
         assert obj.verify_auth([KEY_CERT_SIGNED_MESSAGE_WRONG_KEY]) is None
 
+    def test_verify_cached(self, monkeypatch):
+        verified_password_cache.clear()
+        bcrypt_verify = Mock(wraps=bcrypt.verify)
+        monkeypatch.setattr(bcrypt, "verify", bcrypt_verify)
+        rpsl_text = object_sample_mapping[RPSLMntner().rpsl_object_class]
+        obj = rpsl_object_from_text(rpsl_text, strict_validation=False)
+
+        assert obj.verify_auth(["bcrypt-password"]) == "BCRYPT-PW"
+        assert obj.verify_auth(["bcrypt-password"]) == "BCRYPT-PW"
+        assert bcrypt_verify.call_count == 1
+        # Failed verifications are cached as well
+        assert obj.verify_auth(["other-password"]) is None
+        assert bcrypt_verify.call_count == 2
+        assert obj.verify_auth(["other-password"]) is None
+        assert bcrypt_verify.call_count == 2
+
+        # A change of the hash, e.g. a new password on the mntner, is a different entry
+        obj.force_single_new_password("bcrypt-password")
+        assert obj.verify_auth(["bcrypt-password"]) == "BCRYPT-PW"
+        assert bcrypt_verify.call_count == 3
+        verified_password_cache.clear()
+
+    def test_verified_password_cache_expiry_and_size(self):
+        hasher = Mock()
+        hasher.verify = Mock(return_value=True)
+        cache = VerifiedPasswordCache(ttl=0, max_size=2)
+        assert cache.verify("BCRYPT-PW", hasher, "password", "hash")
+        assert cache.verify("BCRYPT-PW", hasher, "password", "hash")
+        assert hasher.verify.call_count == 2
+
+        cache = VerifiedPasswordCache(ttl=60, max_size=2)
+        for password in ["password1", "password2", "password3", "password1"]:
+            assert cache.verify("BCRYPT-PW", hasher, password, "hash")
+        assert hasher.verify.call_count == 6
+        assert cache.verify("BCRYPT-PW", hasher, "password3", "hash")
+        assert hasher.verify.call_count == 6
+
+        hasher.verify = Mock(return_value=False)
+        assert not cache.verify("BCRYPT-PW", hasher, "wrong-password", "hash")
+        assert not cache.verify("BCRYPT-PW", hasher, "wrong-password", "hash")
+        assert hasher.verify.call_count == 1
+
 
 class TestRPSLOrganisation:
     def test_has_mapping(self):
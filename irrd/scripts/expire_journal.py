@@ -24,7 +24,7 @@ from irrd.conf import (
     get_setting,
 )
 from irrd.storage.database_handler import DatabaseHandler
-from irrd.storage.queries import RPSLDatabaseJournalQuery
+from irrd.storage.queries import RPSLDatabaseJournalCountQuery
 
 
 def expire_journal(skip_confirmation: bool, expire_before: datetime.datetime, source: str):
@@ -37,12 +37,8 @@ def expire_journal(skip_confirmation: bool, expire_before: datetime.datetime, so
 
     dh = DatabaseHandler()
 
-    q = (
-        RPSLDatabaseJournalQuery(column_names=["timestamp"])
-        .sources([source])
-        .entries_before_date(expire_before)
-    )
-    affected_object_count = len(list(dh.execute_query(q)))
+    q = RPSLDatabaseJournalCountQuery().sources([source]).entries_before_date(expire_before)
+    affected_object_count = next(dh.execute_query(q))["count"]
 
     if not affected_object_count:
         print("No journal entries found to expire.")
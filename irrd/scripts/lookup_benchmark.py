@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Compare the performance of inverse lookups, like -i mnt-by or !o, through
+the GIN indexes on parsed_data and through the rpsl_object_lookup table,
+on the data in the database. The lookup table must be filled, e.g. with
+irrd_rebuild_lookup_table.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import sqlalchemy as sa
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from irrd.conf import CONFIG_PATH_DEFAULT, config_init
+from irrd.storage.database_handler import DatabaseHandler
+from irrd.storage.models import RPSLObjectLookup
+from irrd.storage.queries import RPSLDatabaseQuery
+
+LOOKUP_METHODS = {"gin": False, "btree": True}
+
+
+def sample_lookups(dh: DatabaseHandler, common_count: int, random_count: int) -> list[tuple[str, str]]:
+    """
+    Return (attribute, value) pairs to look up: for each attribute,
+    the most common values, and random other values.
+    """
+    table = RPSLObjectLookup.__table__
+    lookups: set[tuple[str, str]] = set()
+    attributes = [row.attribute for row in dh.execute_statement(sa.select(table.c.attribute).distinct())]
+    for attribute in attributes:
+        common = (
+            sa.select(table.c.value)
+            .where(table.c.attribute == attribute)
+            .group_by(table.c.value)
+            .order_by(sa.func.count().desc())
+            .limit(common_count)
+        )
+        random = (
+            sa.select(table.c.value)
+            .where(table.c.attribute == attribute)
+            .order_by(sa.func.random())
+            .limit(random_count)
+        )
+        for statement in [common, random]:
+            lookups.update((attribute, row.value) for row in dh.execute_statement(statement))
+    return sorted(lookups)
+
+
+def run_lookup(dh: DatabaseHandler, attribute: str, value: str, sources: list[str], use_lookup_table: bool):
+    query = RPSLDatabaseQuery(column_names=["pk"], enable_ordering=False)
+    query = query.lookup_attrs_in([attribute], [value], use_lookup_table=use_lookup_table)
+    if sources:
+        query = query.sources(sources)
+    start_time = time.perf_counter()
+    pks = {row["pk"] for row in dh.execute_query(query)}
+    return time.perf_counter() - start_time, pks
+
+
+def compare_lookups(
+    dh: DatabaseHandler, lookups: list[tuple[str, str]], sources: list[str], repeat: int
+) -> tuple[dict[tuple[str, str], list[float]], list[tuple[str, str]]]:
+    """
+    Run each lookup repeat times with each method. Returns the elapsed times
+    per attribute and method, and the lookups for which the methods
+    returned different objects.
+    """
+    timings: dict[tuple[str, str], list[float]] = defaultdict(list)
+    mismatches = []
+    for attribute, value in lookups:
+        results = {}
+        for _ in range(repeat):
+            for method, use_lookup_table in LOOKUP_METHODS.items():
+                elapsed, results[method] = run_lookup(dh, attribute, value, sources, use_lookup_table)
+                timings[(attribute, method)].append(elapsed)
+        if results["gin"] != results["btree"]:
+            mismatches.append((attribute, value))
+    return timings, mismatches
+
+
+def summarise_timings(
+    timings: dict[tuple[str, str], list[float]],
+) -> list[tuple[str, str, float, float, float]]:
+    """
+    Return the attribute, method, and the median, 95th percentile and
+    maximum elapsed time in ms, for each attribute and method.
+    """
+    summary = []
+    for (attribute, method), elapsed_times in sorted(timings.items()):
+        elapsed_ms = sorted(elapsed * 1000 for elapsed in elapsed_times)
+        p95 = elapsed_ms[int(len(elapsed_ms) * 0.95) - 1] if len(elapsed_ms) >= 20 else elapsed_ms[-1]
+        summary.append((attribute, method, statistics.median(elapsed_ms), p95, elapsed_ms[-1]))
+    return summary
+
+
+def run_benchmark(common_count: int, random_count: int, repeat: int, sources: list[str]) -> int:
+    dh = DatabaseHandler(readonly=True)
+    lookups = sample_lookups(dh, common_count, random_count)
+    if not lookups:
+        print("The lookup table is empty, run irrd_rebuild_lookup_table first")
+        dh.close()
+        return 1
+
+    timings, mismatches = compare_lookups(dh, lookups, sources, repeat)
+    dh.close()
+
+    print(f"Ran {len(lookups)} lookups {repeat} times with each method, times in ms")
+    print(f"{'attribute':<12} {'method':<6} {'median':>10} {'p95':>10} {'max':>10}")
+    for attribute, method, median, p95, maximum in summarise_timings(timings):
+        print(f"{attribute:<12} {method:<6} {median:>10.2f} {p95:>10.2f} {maximum:>10.2f}")
+    for attribute, value in mismatches:
+        print(f"Different results for {attribute} {value}, the lookup table may be outdated")
+    return 0
+
+
+def main():  # pragma: no cover
+    description = """Compare inverse lookups through GIN indexes and through the lookup table."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--config",
+        dest="config_file_path",
+        type=str,
+        help=f"use a different IRRd config file (default: {CONFIG_PATH_DEFAULT})",
+    )
+    parser.add_argument(
+        "--common", dest="common_count", type=int, default=20, help="most common values per attribute"
+    )
+    parser.add_argument(
+        "--random", dest="random_count", type=int, default=100, help="random values per attribute"
+    )
+    parser.add_argument("--repeat", dest="repeat", type=int, default=3, help="times to run each lookup")
+    parser.add_argument("--sources", dest="sources", nargs="*", default=[], help="restrict to sources")
+    args = parser.parse_args()
+
+    config_init(args.config_file_path)
+    sys.exit(run_benchmark(args.common_count, args.random_count, args.repeat, args.sources))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
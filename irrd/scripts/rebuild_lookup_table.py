@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+"""
+Rebuild the lookup table for inverse queries from all objects.
+"""
+
+logger = logging.getLogger(__name__)
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from irrd.conf import CONFIG_PATH_DEFAULT, config_init, get_setting
+from irrd.storage.database_handler import DatabaseHandler
+
+
+def rebuild_lookup_table():
+    if not get_setting("lookup_index_table"):
+        print("Warning: lookup_index_table is not enabled, the lookup table will not be kept up to date")
+    dh = DatabaseHandler()
+    print("Rebuilding lookup table")
+    dh.rebuild_rpsl_object_lookups()
+    dh.commit()
+    dh.close()
+    print("Lookup table rebuilt")
+    if not get_setting("lookup_index_table_queries"):
+        print("Enable lookup_index_table_queries to use the lookup table for queries")
+
+
+def main():  # pragma: no cover
+    description = """Rebuild the lookup table for inverse queries from all objects."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--config",
+        dest="config_file_path",
+        type=str,
+        help=f"use a different IRRd config file (default: {CONFIG_PATH_DEFAULT})",
+    )
+    args = parser.parse_args()
+
+    config_init(args.config_file_path)
+    if get_setting("readonly_standby"):
+        print("Unable to run, because readonly_standby is set")
+        sys.exit(-1)
+
+    sys.exit(rebuild_lookup_table())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -4,7 +4,7 @@ from datetime import datetime
 import pytz
 import time_machine
 
-from irrd.storage.queries import RPSLDatabaseJournalQuery
+from irrd.storage.queries import RPSLDatabaseJournalCountQuery
 from irrd.utils.test_utils import MockDatabaseHandler
 
 from ..expire_journal import expire_journal
@@ -13,11 +13,7 @@ EXPIRY_DATE = datetime(2022, 1, 1, tzinfo=pytz.utc)
 
 
 class TestExpireJournal:
-    expected_query = (
-        RPSLDatabaseJournalQuery(column_names=["timestamp"])
-        .sources(["TEST"])
-        .entries_before_date(EXPIRY_DATE)
-    )
+    expected_query = RPSLDatabaseJournalCountQuery().sources(["TEST"]).entries_before_date(EXPIRY_DATE)
 
     def test_expire_confirmed(self, capsys, monkeypatch):
         mock_dh = MockDatabaseHandler()
@@ -59,7 +55,7 @@ class TestExpireJournal:
     def test_expire_no_entries(self, capsys, monkeypatch):
         mock_dh = MockDatabaseHandler()
         mock_dh.reset_mock()
-        mock_dh.query_responses[RPSLDatabaseJournalQuery] = iter([])
+        mock_dh.query_responses[RPSLDatabaseJournalCountQuery] = iter([{"count": 0}])
         monkeypatch.setattr("irrd.scripts.expire_journal.DatabaseHandler", MockDatabaseHandler)
 
         expire_journal(
@@ -91,9 +87,7 @@ class TestExpireJournal:
 
         assert mock_dh.closed
         [query] = mock_dh.queries
-        assert query == RPSLDatabaseJournalQuery(column_names=["timestamp"]).sources(
-            ["TEST"]
-        ).entries_before_date(EXPIRY_DATE)
+        assert query == self.expected_query
         assert not mock_dh.other_calls
 
     @time_machine.travel(datetime(2022, 3, 14, 12, 34, 56), tick=False)
@@ -0,0 +1,84 @@
+from unittest.mock import Mock
+
+from irrd.utils.test_utils import flatten_mock_calls
+
+from ..lookup_benchmark import (
+    compare_lookups,
+    run_benchmark,
+    sample_lookups,
+    summarise_timings,
+)
+
+
+def test_sample_lookups():
+    mock_dh = Mock()
+    mock_dh.execute_statement = Mock(
+        side_effect=[
+            [Mock(attribute="mnt-by")],
+            [Mock(value="MNT-B"), Mock(value="MNT-A")],
+            [Mock(value="MNT-C"), Mock(value="MNT-B")],
+        ]
+    )
+
+    assert sample_lookups(mock_dh, 2, 2) == [("mnt-by", "MNT-A"), ("mnt-by", "MNT-B"), ("mnt-by", "MNT-C")]
+    assert mock_dh.execute_statement.call_count == 3
+
+
+def test_compare_lookups(monkeypatch):
+    def mock_run_lookup(dh, attribute, value, sources, use_lookup_table):
+        assert sources == ["TEST"]
+        pks = {"pk1"} if value == "MNT-A" or not use_lookup_table else {"pk2"}
+        return (0.002 if use_lookup_table else 0.001), pks
+
+    monkeypatch.setattr("irrd.scripts.lookup_benchmark.run_lookup", mock_run_lookup)
+
+    timings, mismatches = compare_lookups(Mock(), [("mnt-by", "MNT-A"), ("mnt-by", "MNT-B")], ["TEST"], 3)
+    assert timings == {("mnt-by", "gin"): [0.001] * 6, ("mnt-by", "btree"): [0.002] * 6}
+    assert mismatches == [("mnt-by", "MNT-B")]
+
+
+def test_summarise_timings():
+    timings = {
+        ("origin", "gin"): [0.003, 0.001, 0.002],
+        ("mnt-by", "btree"): [index / 1000 for index in range(1, 41)],
+    }
+    assert summarise_timings(timings) == [
+        ("mnt-by", "btree", 20.5, 38.0, 40.0),
+        ("origin", "gin", 2.0, 3.0, 3.0),
+    ]
+
+
+def test_run_benchmark(capsys, monkeypatch):
+    mock_dh = Mock()
+    monkeypatch.setattr("irrd.scripts.lookup_benchmark.DatabaseHandler", lambda readonly: mock_dh)
+    monkeypatch.setattr(
+        "irrd.scripts.lookup_benchmark.sample_lookups",
+        lambda dh, common_count, random_count: [("mnt-by", "MNT-A")],
+    )
+    monkeypatch.setattr(
+        "irrd.scripts.lookup_benchmark.compare_lookups",
+        lambda dh, lookups, sources, repeat: (
+            {("mnt-by", "btree"): [0.001], ("mnt-by", "gin"): [0.002]},
+            [("mnt-by", "MNT-A")],
+        ),
+    )
+
+    assert run_benchmark(20, 100, 1, []) == 0
+    output = capsys.readouterr().out
+    assert "Ran 1 lookups 1 times with each method" in output
+    assert "mnt-by       btree        1.00       1.00       1.00" in output
+    assert "mnt-by       gin          2.00       2.00       2.00" in output
+    assert "Different results for mnt-by MNT-A" in output
+    assert flatten_mock_calls(mock_dh) == [["close", (), {}]]
+
+
+def test_run_benchmark_empty_lookup_table(capsys, monkeypatch):
+    mock_dh = Mock()
+    monkeypatch.setattr("irrd.scripts.lookup_benchmark.DatabaseHandler", lambda readonly: mock_dh)
+    monkeypatch.setattr(
+        "irrd.scripts.lookup_benchmark.sample_lookups", lambda dh, common_count, random_count: []
+    )
+
+    assert run_benchmark(20, 100, 1, []) == 1
+    assert "The lookup table is empty" in capsys.readouterr().out
+    assert flatten_mock_calls(mock_dh) == [["close", (), {}]]
@@ -0,0 +1,32 @@
+from unittest.mock import Mock
+
+from irrd.utils.test_utils import flatten_mock_calls
+
+from ..rebuild_lookup_table import rebuild_lookup_table
+
+
+def test_rebuild_lookup_table(capsys, monkeypatch, config_override):
+    config_override({"lookup_index_table": True, "lookup_index_table_queries": True})
+    mock_dh = Mock()
+    monkeypatch.setattr("irrd.scripts.rebuild_lookup_table.DatabaseHandler", lambda: mock_dh)
+
+    rebuild_lookup_table()
+
+    assert flatten_mock_calls(mock_dh) == [
+        ["rebuild_rpsl_object_lookups", (), {}],
+        ["commit", (), {}],
+        ["close", (), {}],
+    ]
+    assert capsys.readouterr().out == "Rebuilding lookup table\nLookup table rebuilt\n"
+
+
+def test_rebuild_lookup_table_not_enabled(capsys, monkeypatch):
+    mock_dh = Mock()
+    monkeypatch.setattr("irrd.scripts.rebuild_lookup_table.DatabaseHandler", lambda: mock_dh)
+
+    rebuild_lookup_table()
+
+    assert flatten_mock_calls(mock_dh)[0] == ["rebuild_rpsl_object_lookups", (), {}]
+    output = capsys.readouterr().out
+    assert "lookup_index_table is not enabled" in output
+    assert "Enable lookup_index_table_queries" in output
@@ -1,10 +1,13 @@
 import logging
 import time
+from contextlib import AbstractContextManager
 
 from ariadne import format_error
 from ariadne.types import Extension
 from graphql import GraphQLError
 
+from irrd.storage.query_metrics import QueryTiming, query_timing
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,20 +16,40 @@ class QueryMetadataExtension(Extension):
     Ariadne extension to add query metadata.
     - Returns the execution time
     - Returns SQL queries if SQL trace was enabled
+    - Returns the estimated and actual cost of rpslObjects queries
     - Logs the query and execution time
+    - Records query metrics, per top level field
     """
 
     def __init__(self):
         self.start_timestamp = None
         self.end_timestamp = None
+        self.timing = QueryTiming()
+        self.timing_context: AbstractContextManager | None = None
+        self.root_fields: set[str] = set()
 
     def request_started(self, context):
         self.start_timestamp = time.perf_counter()
+        self.timing_context = query_timing()
+        self.timing = self.timing_context.__enter__()
+
+    def request_finished(self, context):
+        if self.timing_context:
+            self.timing_context.__exit__(None, None, None)
+            self.timing_context = None
+
+    def resolve(self, next_, obj, info, **kwargs):
+        if info.path.prev is None:
+            self.root_fields.add(info.field_name)
+        return next_(obj, info, **kwargs)
 
     def format(self, context):
         data = {}
         if self.start_timestamp:
             data["execution"] = time.perf_counter() - self.start_timestamp
+        if "estimated_cost" in context:
+            data["estimated_cost"] = context["estimated_cost"]
+            data["actual_cost"] = context.get("actual_cost", 0)
         if "sql_queries" in context:
             data["sql_query_count"] = len(context["sql_queries"])
             data["sql_queries"] = context["sql_queries"]
@@ -37,6 +60,10 @@ class QueryMetadataExtension(Extension):
             query["query"] = query["query"].replace(" ", "").replace("\n", " ").replace("\t", "")
             client = context["request"].client.host
             logger.info(f'{client} ran query in {data.get("execution")}s: {query}')
+        if self.start_timestamp and self.root_fields:
+            context["request"].app.state.query_metrics.record(
+                "graphql", "+".join(sorted(self.root_fields)), data["execution"], timing=self.timing
+            )
         return data
 
 
@@ -1,19 +1,26 @@
-from collections import OrderedDict
+import asyncio
+import itertools
+from collections import OrderedDict, defaultdict
 from functools import wraps
 
 import ariadne
 import graphql
+import limits
 from graphql import GraphQLError, GraphQLResolveInfo
 from IPy import IP
 
+from irrd.conf import get_setting
 from irrd.routepref.status import RoutePreferenceStatus
 from irrd.rpki.status import RPKIStatus
 from irrd.rpsl.rpsl_objects import OBJECT_CLASS_MAPPING, lookup_field_names
 from irrd.scopefilter.status import ScopeFilterStatus
-from irrd.server.access_check import is_client_permitted
+from irrd.server.access_check import STARLETTE_TEST_CLIENT_HOST, is_client_permitted
+from irrd.storage.database_handler import DatabaseHandler
 from irrd.storage.queries import RPSLDatabaseJournalQuery, RPSLDatabaseQuery
+from irrd.utils.aggregation import aggregate_prefixes
 from irrd.utils.text import remove_auth_hashes, snake_to_camel_case
 
+from ..http.database_pool import query_timeout
 from ..query_resolver import QueryResolver, QuerySourceManager
 from .schema_generator import SchemaGenerator
 
@@ -27,6 +34,20 @@ appropriate format for GraphQL.
 schema = SchemaGenerator()
 lookup_fields = lookup_field_names()
 
+# Rough static weights for the number of objects returned per parent object
+# for fields that resolve references, used to estimate the cost of rpslObjects
+# queries. These are not derived from the data, see the graphql_max_query_cost docs.
+REFERENCE_FIELD_FANOUT = {
+    "mntByObjs": 1,
+    "adminCObjs": 2,
+    "techCObjs": 2,
+    "mbrsByRefObjs": 1,
+    "memberOfObjs": 2,
+    "membersObjs": 20,
+    "journal": 10,
+}
+RATE_LIMIT_GRAPHQL_COST_NAMESPACE = "graphql_cost"
+
 
 def convert_kwargs_to_snake_case(func):
     # Replaces ariadne.convert_kwargs_to_snake_case (removed in ariadne 0.29).
@@ -42,6 +63,34 @@ def convert_kwargs_to_snake_case(func):
     return wrapper
 
 
+def run_in_database_pool(resolver):
+    """
+    Run a resolver in the database pool of the HTTP worker, which
+    provides its database handler, with the configured query timeout.
+    The resolver must take the GraphQLResolveInfo as its second argument.
+    """
+
+    @wraps(resolver)
+    async def wrapper(obj, info: GraphQLResolveInfo, *args, **kwargs):
+        return await _run_in_database_pool(info, resolver, obj, info, *args, **kwargs)
+
+    return wrapper
+
+
+async def _run_in_database_pool(info: GraphQLResolveInfo, func, *args, **kwargs):
+    """Run func in the database pool of the HTTP worker, with the configured query timeout."""
+    pool = info.context["request"].app.state.database_pool
+    try:
+        return await pool.run(func, *args, timeout=query_timeout(), **kwargs)
+    except asyncio.TimeoutError:
+        raise GraphQLError("Query exceeded the time limit")
+
+
+def _database_handler(info: GraphQLResolveInfo) -> DatabaseHandler:
+    """Database handler for a resolver, which must be running through run_in_database_pool()."""
+    return info.context["request"].app.state.database_pool.database_handler()
+
+
 def resolve_rpsl_object_type(obj: dict[str, str], *_) -> str:
     """
     Find the GraphQL name for an object given its object class.
@@ -51,11 +100,22 @@ def resolve_rpsl_object_type(obj: dict[str, str], *_) -> str:
 
 
 @convert_kwargs_to_snake_case
-def resolve_rpsl_objects(_, info: GraphQLResolveInfo, **kwargs):
+async def resolve_rpsl_objects(_, info: GraphQLResolveInfo, **kwargs):
     """
     Resolve a `rpslObjects` query. This query has a considerable
     number of parameters, each of which is applied to an RPSL
-    database query.
+    database query. The cost of the query is checked before it runs.
+    """
+    query = _rpsl_objects_query(info, **kwargs)
+    await _check_query_cost(info, query, kwargs.get("record_limit"))
+    results = await _run_in_database_pool(info, _rpsl_db_query_to_graphql_out, query, info)
+    _record_actual_cost(info, len(results))
+    return results
+
+
+def _rpsl_objects_query(info: GraphQLResolveInfo, **kwargs) -> RPSLDatabaseQuery:
+    """
+    Build the RPSL database query for a `rpslObjects` query.
     """
     low_specificity_kwargs = {
         "object_class",
@@ -124,37 +184,106 @@ def resolve_rpsl_objects(_, info: GraphQLResolveInfo, **kwargs):
         if ip_filter in kwargs:
             getattr(query, ip_filter)(IP(kwargs[ip_filter]))
 
-    return _rpsl_db_query_to_graphql_out(query, info)
+    return query
+
+
+async def _check_query_cost(info: GraphQLResolveInfo, query: RPSLDatabaseQuery, record_limit: int | None):
+    """
+    Estimate the cost of a `rpslObjects` query before running it, and reject
+    it if it exceeds the maximum cost per query, or the cost budget of the client.
+    The cost is the estimated number of objects returned, including those
+    from nested fields that resolve references, like mntByObjs.
+    The number of top level objects is estimated by the PostgreSQL planner,
+    which is skipped if no cost limit is configured.
+    """
+    max_query_cost = get_setting("server.http.graphql_max_query_cost")
+    cost_limit = get_setting("server.http.graphql_cost_limit")
+    if not max_query_cost and not cost_limit:
+        return
+
+    estimated_rows = await _run_in_database_pool(info, _estimate_row_count, query, info)
+    if record_limit is not None:
+        estimated_rows = min(estimated_rows, record_limit)
+    selection_set = info.field_nodes[0].selection_set
+    selections = selection_set.selections if selection_set else []
+    cost = int(estimated_rows * _selection_cost_factor(selections, info))
+    info.context["estimated_cost"] = info.context.get("estimated_cost", 0) + cost
+
+    if max_query_cost and cost > int(max_query_cost):
+        raise GraphQLError(
+            f"Query estimated to return {cost} objects, which exceeds the maximum of {max_query_cost}. "
+            "Make your query more specific, select fewer nested objects, or set a lower recordLimit."
+        )
+
+    if cost_limit:
+        request = info.context["request"]
+        host = request.client.host if request.client else STARLETTE_TEST_CLIENT_HOST
+        permitted = await request.app.state.rate_limiter.hit(
+            limits.parse(cost_limit), RATE_LIMIT_GRAPHQL_COST_NAMESPACE, host, cost=max(cost, 1)
+        )
+        if not permitted:
+            raise GraphQLError(
+                "Query denied, as your client exceeded its query cost budget. Try again later."
+            )
+
+
+def _estimate_row_count(query: RPSLDatabaseQuery, info: GraphQLResolveInfo) -> int:
+    return _database_handler(info).estimate_row_count(query)
+
+
+def _selection_cost_factor(selections, info: GraphQLResolveInfo) -> float:
+    """
+    Determine the number of objects returned per object for a selection,
+    i.e. 1 for the object itself, plus the estimated number of objects
+    from any nested reference fields, recursively.
+    """
+    factor = 1.0
+    for selection in selections:
+        if isinstance(selection, graphql.InlineFragmentNode):
+            factor += _selection_cost_factor(selection.selection_set.selections, info) - 1
+        elif isinstance(selection, graphql.FragmentSpreadNode):
+            fragment = info.fragments[selection.name.value]
+            factor += _selection_cost_factor(fragment.selection_set.selections, info) - 1
+        elif selection.name.value in REFERENCE_FIELD_FANOUT and selection.selection_set:
+            factor += REFERENCE_FIELD_FANOUT[selection.name.value] * _selection_cost_factor(
+                selection.selection_set.selections, info
+            )
+    return factor
+
+
+def _record_actual_cost(info: GraphQLResolveInfo, object_count: int) -> None:
+    """Record the actual cost, i.e. objects returned, for reporting in QueryMetadataExtension."""
+    info.context["actual_cost"] = info.context.get("actual_cost", 0) + object_count
 
 
-def resolve_rpsl_object_mnt_by_objs(rpsl_object, info: GraphQLResolveInfo):
+async def resolve_rpsl_object_mnt_by_objs(rpsl_object, info: GraphQLResolveInfo):
     """Resolve mntByObjs on RPSL objects"""
-    return _resolve_subquery(rpsl_object, info, ["mntner"], pk_field="mntBy")
+    return await _resolve_subquery(rpsl_object, info, ["mntner"], pk_field="mntBy")
 
 
-def resolve_rpsl_object_adminc_objs(rpsl_object, info: GraphQLResolveInfo):
+async def resolve_rpsl_object_adminc_objs(rpsl_object, info: GraphQLResolveInfo):
     """Resolve adminCObjs on RPSL objects"""
-    return _resolve_subquery(rpsl_object, info, ["role", "person"], pk_field="adminC")
+    return await _resolve_subquery(rpsl_object, info, ["role", "person"], pk_field="adminC")
 
 
-def resolve_rpsl_object_techc_objs(rpsl_object, info: GraphQLResolveInfo):
+async def resolve_rpsl_object_techc_objs(rpsl_object, info: GraphQLResolveInfo):
     """Resolve techCObjs on RPSL objects"""
-    return _resolve_subquery(rpsl_object, info, ["role", "person"], pk_field="techC")
+    return await _resolve_subquery(rpsl_object, info, ["role", "person"], pk_field="techC")
 
 
-def resolve_rpsl_object_members_by_ref_objs(rpsl_object, info: GraphQLResolveInfo):
+async def resolve_rpsl_object_members_by_ref_objs(rpsl_object, info: GraphQLResolveInfo):
     """Resolve mbrsByRefObjs on RPSL objects"""
-    return _resolve_subquery(rpsl_object, info, ["mntner"], pk_field="mbrsByRef")
+    return await _resolve_subquery(rpsl_object, info, ["mntner"], pk_field="mbrsByRef")
 
 
-def resolve_rpsl_object_member_of_objs(rpsl_object, info: GraphQLResolveInfo):
+async def resolve_rpsl_object_member_of_objs(rpsl_object, info: GraphQLResolveInfo):
     """Resolve memberOfObjs on RPSL objects"""
     object_klass = OBJECT_CLASS_MAPPING[rpsl_object["objectClass"]]
     sub_object_classes = object_klass.fields["member-of"].referring  # type: ignore
-    return _resolve_subquery(rpsl_object, info, sub_object_classes, pk_field="memberOf")
+    return await _resolve_subquery(rpsl_object, info, sub_object_classes, pk_field="memberOf")
 
 
-def resolve_rpsl_object_members_objs(rpsl_object, info: GraphQLResolveInfo):
+async def resolve_rpsl_object_members_objs(rpsl_object, info: GraphQLResolveInfo):
     """Resolve membersObjs on RPSL objects"""
     object_klass = OBJECT_CLASS_MAPPING[rpsl_object["objectClass"]]
     sub_object_classes = object_klass.fields["members"].referring  # type: ignore
@@ -164,36 +293,112 @@ def resolve_rpsl_object_members_objs(rpsl_object, info: GraphQLResolveInfo):
         sub_object_classes.remove("aut-num")
     if "inet-rtr" in sub_object_classes:
         sub_object_classes.remove("inet-rtr")
-    return _resolve_subquery(rpsl_object, info, sub_object_classes, "members", sticky_source=False)
+    return await _resolve_subquery(rpsl_object, info, sub_object_classes, "members", sticky_source=False)
 
 
-def _resolve_subquery(
+async def _resolve_subquery(
     rpsl_object, info: GraphQLResolveInfo, object_classes: list[str], pk_field: str, sticky_source=True
 ):
     """
     Resolve a subquery, like techCobjs, on an RPSL object, considering
     a number of object classes, extracting the PK from pk_field.
     If sticky_source is set, the referred object must be from the same source.
+    The query itself is batched with those of other objects by RPSLReferenceLoader.
     """
     pks = rpsl_object.get(pk_field)
     if not pks:
         return []
     if not isinstance(pks, list):
         pks = [pks]
-    query = RPSLDatabaseQuery(
-        column_names=_columns_for_graphql_selection(info), ordered_by_sources=False, enable_ordering=False
+    loader = RPSLReferenceLoader.for_request(info)
+    return await loader.load(
+        object_classes,
+        rpsl_object["source"] if sticky_source else None,
+        _columns_for_graphql_selection(info),
+        pks,
     )
-    query.object_classes(object_classes).rpsl_pks(pks)
-    if sticky_source:
-        query.sources([rpsl_object["source"]])
-    return _rpsl_db_query_to_graphql_out(query, info)
+
+
+class RPSLReferenceLoader:
+    """
+    Per-request loader for objects referred to by other objects,
+    like mntByObjs. Rather than running a query for each referring
+    object, the references are collected until the event loop gets
+    a chance to run, and then resolved in a single query for each
+    combination of object classes, source and selected columns.
+    Results are cached for the rest of the request, so that e.g.
+    a maintainer shared by many objects is only retrieved once.
+    """
+
+    def __init__(self, info: GraphQLResolveInfo):
+        self.info = info
+        self.results: dict[tuple, dict[str, asyncio.Future]] = defaultdict(dict)
+        self.pending: dict[tuple, list[str]] = defaultdict(list)
+        self.dispatch_task: asyncio.Task | None = None
+
+    @classmethod
+    def for_request(cls, info: GraphQLResolveInfo) -> "RPSLReferenceLoader":
+        if "rpsl_reference_loader" not in info.context:
+            info.context["rpsl_reference_loader"] = cls(info)
+        return info.context["rpsl_reference_loader"]
+
+    async def load(
+        self, object_classes: list[str], source: str | None, columns: set[str], pks: list[str]
+    ) -> list[dict]:
+        """
+        Load the objects with any of the given RPSL PKs, in any of the object
+        classes, from the given source, or any source if source is None.
+        """
+        key = (tuple(object_classes), source, frozenset(columns))
+        futures = []
+        for pk in dict.fromkeys(pk.upper().strip() for pk in pks):
+            if pk not in self.results[key]:
+                self.results[key][pk] = asyncio.get_running_loop().create_future()
+                self.pending[key].append(pk)
+            futures.append(self.results[key][pk])
+
+        if self.pending and not self.dispatch_task:
+            self.dispatch_task = asyncio.get_running_loop().create_task(self._dispatch())
+        return list(itertools.chain.from_iterable(await asyncio.gather(*futures)))
+
+    async def _dispatch(self) -> None:
+        """
+        Run the queries for all pending PKs and resolve their futures.
+        """
+        pending, self.pending = self.pending, defaultdict(list)
+        self.dispatch_task = None
+
+        for key, pks in pending.items():
+            object_classes, source, columns = key
+            query = RPSLDatabaseQuery(column_names=columns, ordered_by_sources=False, enable_ordering=False)
+            query.object_classes(list(object_classes)).rpsl_pks(pks)
+            if source:
+                query.sources([source])
+
+            try:
+                rows = await _run_in_database_pool(self.info, self._execute_query, query, self.info)
+            except Exception as exc:
+                for pk in pks:
+                    self.results[key][pk].set_exception(exc)
+                continue
+
+            _record_actual_cost(self.info, len(rows))
+            rows_per_pk = defaultdict(list)
+            for row in rows:
+                rows_per_pk[row["rpslPk"]].append(row)
+            for pk in pks:
+                self.results[key][pk].set_result(rows_per_pk[pk])
+
+    @staticmethod
+    def _execute_query(query: RPSLDatabaseQuery, info: GraphQLResolveInfo) -> list[dict]:
+        return list(_rpsl_db_query_to_graphql_out(query, info))
 
 
 def resolve_rpsl_object_journal(rpsl_object, info: GraphQLResolveInfo):
     """
     Resolve a journal subquery on an RPSL object.
     """
-    database_handler = info.context["request"].app.state.database_handler
+    database_handler = _database_handler(info)
     access_list = f"sources.{rpsl_object['source']}.nrtm_access_list"
     if not is_client_permitted(info.context["request"].client.host, access_list):
         raise GraphQLError(f"Access to journal denied for source {rpsl_object['source']}")
@@ -220,7 +425,7 @@ def _rpsl_db_query_to_graphql_out(query: RPSLDatabaseQuery, info: GraphQLResolve
     - Adding the asn and prefix fields if applicable
     - Ensuring the right fields are returned as a list of strings or a string
     """
-    database_handler = info.context["request"].app.state.database_handler
+    database_handler = _database_handler(info)
     if info.context.get("sql_trace"):
         if "sql_queries" not in info.context:
             info.context["sql_queries"] = [repr(query)]
@@ -250,9 +455,7 @@ def _rpsl_db_query_to_graphql_out(query: RPSLDatabaseQuery, info: GraphQLResolve
 @convert_kwargs_to_snake_case
 def resolve_database_status(_, info: GraphQLResolveInfo, sources: list[str] | None = None):
     """Resolve a databaseStatus query"""
-    query_resolver = QueryResolver(
-        info.context["request"].app.state.preloader, info.context["request"].app.state.database_handler
-    )
+    query_resolver = QueryResolver(info.context["request"].app.state.preloader, _database_handler(info))
     for name, data in query_resolver.database_status(sources=sources).items():
         camel_case_data = OrderedDict(data)
         camel_case_data["source"] = name
@@ -268,14 +471,14 @@ def resolve_asn_prefixes(
     asns: list[int],
     ip_version: int | None = None,
     sources: list[str] | None = None,
+    aggregate: bool = False,
 ):
     """Resolve an asnPrefixes query"""
-    query_resolver = QueryResolver(
-        info.context["request"].app.state.preloader, info.context["request"].app.state.database_handler
-    )
+    query_resolver = QueryResolver(info.context["request"].app.state.preloader, _database_handler(info))
     query_resolver.set_query_sources(sources)
     for asn in asns:
-        yield dict(asn=asn, prefixes=list(query_resolver.routes_for_origin(f"AS{asn}", ip_version)))
+        prefixes = query_resolver.routes_for_origin(f"AS{asn}", ip_version)
+        yield dict(asn=asn, prefixes=aggregate_prefixes(prefixes) if aggregate else list(prefixes))
 
 
 @convert_kwargs_to_snake_case
@@ -287,19 +490,18 @@ def resolve_as_set_prefixes(
     ip_version: int | None = None,
     exclude_sets: list[str] | None = None,
     sql_trace: bool = False,
+    aggregate: bool = False,
 ):
     """Resolve an asSetPrefixes query"""
-    query_resolver = QueryResolver(
-        info.context["request"].app.state.preloader, info.context["request"].app.state.database_handler
-    )
+    query_resolver = QueryResolver(info.context["request"].app.state.preloader, _database_handler(info))
     if sql_trace:
         query_resolver.enable_sql_trace()
     set_names_set = {i.upper() for i in set_names}
     exclude_sets_set = {i.upper() for i in exclude_sets} if exclude_sets else set()
     query_resolver.set_query_sources(sources)
     for set_name in set_names_set:
-        prefixes = list(query_resolver.routes_for_as_set(set_name, ip_version, exclude_sets=exclude_sets_set))
-        yield dict(rpslPk=set_name, prefixes=prefixes)
+        prefixes = query_resolver.routes_for_as_set(set_name, ip_version, exclude_sets=exclude_sets_set)
+        yield dict(rpslPk=set_name, prefixes=aggregate_prefixes(prefixes) if aggregate else list(prefixes))
     if sql_trace:
         info.context["sql_queries"] = query_resolver.retrieve_sql_trace()
 
@@ -315,9 +517,7 @@ def resolve_recursive_set_members(
     sql_trace: bool = False,
 ):
     """Resolve an recursiveSetMembers query"""
-    query_resolver = QueryResolver(
-        info.context["request"].app.state.preloader, info.context["request"].app.state.database_handler
-    )
+    query_resolver = QueryResolver(info.context["request"].app.state.preloader, _database_handler(info))
     if sql_trace:
         query_resolver.enable_sql_trace()
     set_names_set = {i.upper() for i in set_names}
@@ -18,6 +18,7 @@ from .resolvers import (
     resolve_rpsl_object_techc_objs,
     resolve_rpsl_object_type,
     resolve_rpsl_objects,
+    run_in_database_pool,
 )
 from .schema_generator import SchemaGenerator
 
@@ -34,39 +35,31 @@ def build_executable_schema():
     schema.rpsl_object_type.set_type_resolver(sta(resolve_rpsl_object_type, thread_sensitive=False))
     schema.rpsl_contact_union_type.set_type_resolver(sta(resolve_rpsl_object_type, thread_sensitive=False))
 
-    schema.query_type.set_field("rpslObjects", sta(resolve_rpsl_objects, thread_sensitive=False))
-    schema.query_type.set_field("databaseStatus", sta(resolve_database_status, thread_sensitive=False))
-    schema.query_type.set_field("asnPrefixes", sta(resolve_asn_prefixes, thread_sensitive=False))
-    schema.query_type.set_field("asSetPrefixes", sta(resolve_as_set_prefixes, thread_sensitive=False))
-    schema.query_type.set_field(
-        "recursiveSetMembers", sta(resolve_recursive_set_members, thread_sensitive=False)
-    )
+    schema.query_type.set_field("rpslObjects", resolve_rpsl_objects)
+    schema.query_type.set_field("databaseStatus", run_in_database_pool(resolve_database_status))
+    schema.query_type.set_field("asnPrefixes", run_in_database_pool(resolve_asn_prefixes))
+    schema.query_type.set_field("asSetPrefixes", run_in_database_pool(resolve_as_set_prefixes))
+    schema.query_type.set_field("recursiveSetMembers", run_in_database_pool(resolve_recursive_set_members))
 
-    schema.rpsl_object_type.set_field(
-        "mntByObjs", sta(resolve_rpsl_object_mnt_by_objs, thread_sensitive=False)
-    )
-    schema.rpsl_object_type.set_field("journal", sta(resolve_rpsl_object_journal, thread_sensitive=False))
+    # Resolvers for referenced objects are async and not run in the pool
+    # themselves, so that RPSLReferenceLoader can batch them across all objects.
+    schema.rpsl_object_type.set_field("mntByObjs", resolve_rpsl_object_mnt_by_objs)
+    schema.rpsl_object_type.set_field("journal", run_in_database_pool(resolve_rpsl_object_journal))
     for object_type in schema.object_types:
         if "adminCObjs" in schema.graphql_types[object_type.name]:
-            object_type.set_field("adminCObjs", sta(resolve_rpsl_object_adminc_objs, thread_sensitive=False))
+            object_type.set_field("adminCObjs", resolve_rpsl_object_adminc_objs)
     for object_type in schema.object_types:
         if "techCObjs" in schema.graphql_types[object_type.name]:
-            object_type.set_field("techCObjs", sta(resolve_rpsl_object_techc_objs, thread_sensitive=False))
+            object_type.set_field("techCObjs", resolve_rpsl_object_techc_objs)
     for object_type in schema.object_types:
         if "mbrsByRefObjs" in schema.graphql_types[object_type.name]:
-            object_type.set_field(
-                "mbrsByRefObjs", sta(resolve_rpsl_object_members_by_ref_objs, thread_sensitive=False)
-            )
+            object_type.set_field("mbrsByRefObjs", resolve_rpsl_object_members_by_ref_objs)
     for object_type in schema.object_types:
         if "memberOfObjs" in schema.graphql_types[object_type.name]:
-            object_type.set_field(
-                "memberOfObjs", sta(resolve_rpsl_object_member_of_objs, thread_sensitive=False)
-            )
+            object_type.set_field("memberOfObjs", resolve_rpsl_object_member_of_objs)
     for object_type in schema.object_types:
         if "membersObjs" in schema.graphql_types[object_type.name]:
-            object_type.set_field(
-                "membersObjs", sta(resolve_rpsl_object_members_objs, thread_sensitive=False)
-            )
+            object_type.set_field("membersObjs", resolve_rpsl_object_members_objs)
 
     @schema.asn_scalar_type.value_parser
     def parse_asn_scalar(value):
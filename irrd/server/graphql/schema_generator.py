@@ -58,8 +58,8 @@ class SchemaGenerator:
             + self.rpsl_query_fields
             + """): [RPSLObject!]
               databaseStatus(sources: [String!]): [DatabaseStatus]
-              asnPrefixes(asns: [ASN!]!, ipVersion: Int, sources: [String!]): [ASNPrefixes!]
-              asSetPrefixes(setNames: [String!]!, ipVersion: Int, sources: [String!], excludeSets: [String!], sqlTrace: Boolean): [AsSetPrefixes!]
+              asnPrefixes(asns: [ASN!]!, ipVersion: Int, sources: [String!], aggregate: Boolean): [ASNPrefixes!]
+              asSetPrefixes(setNames: [String!]!, ipVersion: Int, sources: [String!], excludeSets: [String!], sqlTrace: Boolean, aggregate: Boolean): [AsSetPrefixes!]
               recursiveSetMembers(setNames: [String!]!, depth: Int, sources: [String!], excludeSets: [String!], sqlTrace: Boolean): [SetMembers!]
             }
 
@@ -1,3 +1,5 @@
+from unittest.mock import Mock
+
 from graphql import GraphQLError
 from starlette.requests import HTTPConnection
 
@@ -11,6 +13,7 @@ def test_query_metedata_extension(caplog):
         {
             "type": "http",
             "client": ("127.0.0.1", "8000"),
+            "app": Mock(),
         }
     )
     mock_request._json = {
@@ -19,15 +22,29 @@ def test_query_metedata_extension(caplog):
     }
     context = {
         "sql_queries": ["sql query"],
+        "estimated_cost": 10,
+        "actual_cost": 5,
         "request": mock_request,
     }
     extension.request_started(context)
+    next_resolver = Mock(return_value="result")
+    root_info = Mock(path=Mock(prev=None), field_name="rpslObjects")
+    assert extension.resolve(next_resolver, None, root_info, arg=1) == "result"
+    next_resolver.assert_called_once_with(None, root_info, arg=1)
+    extension.resolve(next_resolver, None, Mock(field_name="rpslPk"))
+    extension.request_finished(context)
     result = extension.format(context)
     assert "127.0.0.1 ran query in " in caplog.text
     assert ": {'operationName': 'operation', 'query': 'graphqlquery'}" in caplog.text
     assert result["execution"] < 3
     assert result["sql_query_count"] == 1
     assert result["sql_queries"] == ["sql query"]
+    assert result["estimated_cost"] == 10
+    assert result["actual_cost"] == 5
+
+    record_call = mock_request.app.state.query_metrics.record.call_args
+    assert record_call[0] == ("graphql", "rpslObjects", result["execution"])
+    assert record_call[1]["timing"] is extension.timing
 
 
 def test_error_formatter():
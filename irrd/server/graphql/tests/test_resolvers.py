@@ -1,13 +1,18 @@
+import asyncio
 from unittest.mock import Mock
 
+import graphql
 import pytest
 from graphql import GraphQLError
 from IPy import IP
+from limits.aio.storage import MemoryStorage
+from limits.aio.strategies import MovingWindowRateLimiter
 from starlette.requests import HTTPConnection
 
 from irrd.routepref.status import RoutePreferenceStatus
 from irrd.rpki.status import RPKIStatus
 from irrd.scopefilter.status import ScopeFilterStatus
+from irrd.server.http.database_pool import DatabaseHandlerPool
 from irrd.server.query_resolver import QueryResolver
 from irrd.storage.database_handler import DatabaseHandler
 from irrd.storage.models import DatabaseOperation, JournalEntryOrigin
@@ -65,6 +70,8 @@ MOCK_RPSL_DB_RESULT = [
     }
 ]
 
+REFERENCED_RPSL_PK = MOCK_RPSL_DB_RESULT[0]["rpsl_pk"]
+
 
 @pytest.fixture()
 def prepare_resolver(monkeypatch):
@@ -81,17 +88,22 @@ def prepare_resolver(monkeypatch):
         "irrd.server.graphql.resolvers.QueryResolver", lambda preloader, database_handler: mock_query_resolver
     )
 
+    mock_database_handler = Mock(spec=DatabaseHandler)
+    mock_database_handler.execute_query = lambda query, refresh_on_error: MOCK_RPSL_DB_RESULT
+    mock_database_handler.estimate_row_count = Mock(return_value=10)
+    database_pool = DatabaseHandlerPool(size=1)
+    monkeypatch.setattr(database_pool, "database_handler", lambda: mock_database_handler)
     app = Mock(
         state=Mock(
-            database_handler=Mock(spec=DatabaseHandler),
+            database_pool=database_pool,
             preloader=Mock(spec=Preloader),
+            rate_limiter=MovingWindowRateLimiter(MemoryStorage()),
         )
     )
-    app.state.database_handler.execute_query = lambda query, refresh_on_error: MOCK_RPSL_DB_RESULT
 
     info = Mock()
     info.context = {}
-    info.field_nodes = [Mock(selection_set=Mock(selections=Mock()))]
+    info.field_nodes = [Mock(selection_set=Mock(selections=[]))]
     info.context["request"] = HTTPConnection(
         {
             "type": "http",
@@ -104,28 +116,28 @@ def prepare_resolver(monkeypatch):
 
 
 class TestGraphQLResolvers:
-    def test_resolve_rpsl_objects(self, prepare_resolver, config_override):
+    async def test_resolve_rpsl_objects(self, prepare_resolver, config_override):
         config_override({"sources": {"TEST1": {}}})
 
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
         with pytest.raises(ValueError):
-            resolvers.resolve_rpsl_objects(None, info)
+            await resolvers.resolve_rpsl_objects(None, info)
         with pytest.raises(ValueError):
-            resolvers.resolve_rpsl_objects(None, info, object_class="route", sql_trace=True)
+            await resolvers.resolve_rpsl_objects(None, info, object_class="route", sql_trace=True)
         with pytest.raises(ValueError):
-            resolvers.resolve_rpsl_objects(
+            await resolvers.resolve_rpsl_objects(
                 None, info, object_class="route", rpki_status=[RPKIStatus.not_found], sql_trace=True
             )
 
         # Should not raise ValueError
-        resolvers.resolve_rpsl_objects(
+        await resolvers.resolve_rpsl_objects(
             None, info, object_class="route", rpki_status=[RPKIStatus.invalid], sql_trace=True
         )
         mock_database_query.reset_mock()
 
         result = list(
-            resolvers.resolve_rpsl_objects(
+            await resolvers.resolve_rpsl_objects(
                 None,
                 info,
                 sql_trace=True,
@@ -163,7 +175,7 @@ class TestGraphQLResolvers:
         mock_database_query.reset_mock()
         config_override({"sources_default": ["TEST1"], "sources": {"TEST1": {}}})
         result = list(
-            resolvers.resolve_rpsl_objects(
+            await resolvers.resolve_rpsl_objects(
                 None,
                 info,
                 sql_trace=True,
@@ -179,7 +191,7 @@ class TestGraphQLResolvers:
             ["sources", (["TEST1"],), {}],
         ]
 
-    def test_strips_auth_attribute_hashes(self, prepare_resolver):
+    async def test_strips_auth_attribute_hashes(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
         rpsl_db_mntner_result = [
@@ -191,11 +203,11 @@ class TestGraphQLResolvers:
             }
         ]
 
-        info.context["request"].app.state.database_handler.execute_query = (
+        info.context["request"].app.state.database_pool.database_handler().execute_query = (
             lambda query, refresh_on_error: rpsl_db_mntner_result
         )
         result = list(
-            resolvers.resolve_rpsl_objects(
+            await resolvers.resolve_rpsl_objects(
                 None,
                 info,
                 sql_trace=True,
@@ -209,20 +221,64 @@ class TestGraphQLResolvers:
             }
         ]
 
-    def test_resolve_rpsl_object_mnt_by_objs(self, prepare_resolver):
+    async def test_resolve_rpsl_objects_query_cost(self, prepare_resolver, config_override):
+        info, mock_database_query, mock_query_resolver = prepare_resolver
+        document = graphql.parse("""
+            {
+                rpslObjects(rpslPk: "pk") {
+                    rpslPk
+                    mntByObjs { rpslPk adminCObjs { rpslPk } }
+                    ... on RPSLRoute { techCObjs { rpslPk } }
+                    ...members
+                }
+            }
+            fragment members on RPSLRouteSet { membersObjs { rpslPk } }
+        """)
+        info.field_nodes = [document.definitions[0].selection_set.selections[0]]
+        info.fragments = {"members": document.definitions[1]}
+
+        # Without any cost limit, the cost is not estimated
+        await resolvers.resolve_rpsl_objects(None, info, rpsl_pk="pk")
+        assert "estimated_cost" not in info.context
+        mock_database_handler = info.context["request"].app.state.database_pool.database_handler()
+        assert not mock_database_handler.estimate_row_count.called
+        info.context.pop("actual_cost")
+
+        config_override({"server": {"http": {"graphql_max_query_cost": 1000}}})
+        # 10 estimated rows, each with 1 + 1 * (1 + 2) + 2 + 20 objects
+        await resolvers.resolve_rpsl_objects(None, info, rpsl_pk="pk")
+        assert info.context["estimated_cost"] == 260
+        assert info.context["actual_cost"] == 1
+        await resolvers.resolve_rpsl_objects(None, info, rpsl_pk="pk", record_limit=5)
+        assert info.context["estimated_cost"] == 390
+        assert info.context["actual_cost"] == 2
+
+        config_override({"server": {"http": {"graphql_max_query_cost": 200}}})
+        with pytest.raises(GraphQLError) as ge:
+            await resolvers.resolve_rpsl_objects(None, info, rpsl_pk="pk")
+        assert "exceeds the maximum of 200" in str(ge.value)
+        await resolvers.resolve_rpsl_objects(None, info, rpsl_pk="pk", record_limit=5)
+
+        config_override({"server": {"http": {"graphql_cost_limit": "500/hour"}}})
+        await resolvers.resolve_rpsl_objects(None, info, rpsl_pk="pk")
+        with pytest.raises(GraphQLError) as ge:
+            await resolvers.resolve_rpsl_objects(None, info, rpsl_pk="pk")
+        assert "exceeded its query cost budget" in str(ge.value)
+
+    async def test_resolve_rpsl_object_mnt_by_objs(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
         mock_rpsl_object = {
             "objectClass": "route",
-            "mntBy": "mntBy",
+            "mntBy": REFERENCED_RPSL_PK,
             "source": "source",
         }
-        result = list(resolvers.resolve_rpsl_object_mnt_by_objs(mock_rpsl_object, info))
+        result = await resolvers.resolve_rpsl_object_mnt_by_objs(mock_rpsl_object, info)
 
         assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
         assert flatten_mock_calls(mock_database_query) == [
             ["object_classes", (["mntner"],), {}],
-            ["rpsl_pks", (["mntBy"],), {}],
+            ["rpsl_pks", ([REFERENCED_RPSL_PK],), {}],
             ["sources", (["source"],), {}],
         ]
 
@@ -231,106 +287,140 @@ class TestGraphQLResolvers:
             "objectClass": "route",
             "source": "source",
         }
-        assert not list(resolvers.resolve_rpsl_object_mnt_by_objs(mock_rpsl_object, info))
+        assert not await resolvers.resolve_rpsl_object_mnt_by_objs(mock_rpsl_object, info)
 
-    def test_resolve_rpsl_object_adminc_objs(self, prepare_resolver):
+    async def test_resolve_rpsl_object_adminc_objs(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
         mock_rpsl_object = {
             "objectClass": "route",
-            "adminC": "adminC",
+            "adminC": REFERENCED_RPSL_PK,
             "source": "source",
         }
-        result = list(resolvers.resolve_rpsl_object_adminc_objs(mock_rpsl_object, info))
+        result = await resolvers.resolve_rpsl_object_adminc_objs(mock_rpsl_object, info)
 
         assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
         assert flatten_mock_calls(mock_database_query) == [
             ["object_classes", (["role", "person"],), {}],
-            ["rpsl_pks", (["adminC"],), {}],
+            ["rpsl_pks", ([REFERENCED_RPSL_PK],), {}],
             ["sources", (["source"],), {}],
         ]
 
-    def test_resolve_rpsl_object_techc_objs(self, prepare_resolver):
+    async def test_resolve_rpsl_object_techc_objs(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
         mock_rpsl_object = {
             "objectClass": "route",
-            "techC": "techC",
+            "techC": REFERENCED_RPSL_PK,
             "source": "source",
         }
-        result = list(resolvers.resolve_rpsl_object_techc_objs(mock_rpsl_object, info))
+        result = await resolvers.resolve_rpsl_object_techc_objs(mock_rpsl_object, info)
 
         assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
         assert flatten_mock_calls(mock_database_query) == [
             ["object_classes", (["role", "person"],), {}],
-            ["rpsl_pks", (["techC"],), {}],
+            ["rpsl_pks", ([REFERENCED_RPSL_PK],), {}],
             ["sources", (["source"],), {}],
         ]
 
-    def test_resolve_rpsl_object_members_by_ref_objs(self, prepare_resolver):
+    async def test_resolve_rpsl_object_members_by_ref_objs(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
         mock_rpsl_object = {
             "objectClass": "route",
-            "mbrsByRef": "mbrsByRef",
+            "mbrsByRef": REFERENCED_RPSL_PK,
             "source": "source",
         }
-        result = list(resolvers.resolve_rpsl_object_members_by_ref_objs(mock_rpsl_object, info))
+        result = await resolvers.resolve_rpsl_object_members_by_ref_objs(mock_rpsl_object, info)
 
         assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
         assert flatten_mock_calls(mock_database_query) == [
             ["object_classes", (["mntner"],), {}],
-            ["rpsl_pks", (["mbrsByRef"],), {}],
+            ["rpsl_pks", ([REFERENCED_RPSL_PK],), {}],
             ["sources", (["source"],), {}],
         ]
 
-    def test_resolve_rpsl_object_member_of_objs(self, prepare_resolver):
+    async def test_resolve_rpsl_object_member_of_objs(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
         mock_rpsl_object = {
             "objectClass": "route",
-            "memberOf": "memberOf",
+            "memberOf": REFERENCED_RPSL_PK,
             "source": "source",
         }
-        result = list(resolvers.resolve_rpsl_object_member_of_objs(mock_rpsl_object, info))
+        result = await resolvers.resolve_rpsl_object_member_of_objs(mock_rpsl_object, info)
 
         assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
         assert flatten_mock_calls(mock_database_query) == [
             ["object_classes", (["route-set"],), {}],
-            ["rpsl_pks", (["memberOf"],), {}],
+            ["rpsl_pks", ([REFERENCED_RPSL_PK],), {}],
             ["sources", (["source"],), {}],
         ]
 
-    def test_resolve_rpsl_object_members_objs(self, prepare_resolver):
+    async def test_resolve_rpsl_object_members_objs(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
         mock_rpsl_object = {
             "objectClass": "as-set",
-            "members": "members",
+            "members": REFERENCED_RPSL_PK,
             "source": "source",
         }
-        result = list(resolvers.resolve_rpsl_object_members_objs(mock_rpsl_object, info))
+        result = await resolvers.resolve_rpsl_object_members_objs(mock_rpsl_object, info)
 
         assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
         assert flatten_mock_calls(mock_database_query) == [
             ["object_classes", (["as-set"],), {}],
-            ["rpsl_pks", (["members"],), {}],
+            ["rpsl_pks", ([REFERENCED_RPSL_PK],), {}],
         ]
         mock_database_query.reset_mock()
 
         mock_rpsl_object = {
             "objectClass": "rtr-set",
-            "members": "members",
+            "members": REFERENCED_RPSL_PK,
             "source": "source",
         }
-        result = list(resolvers.resolve_rpsl_object_members_objs(mock_rpsl_object, info))
+        result = await resolvers.resolve_rpsl_object_members_objs(mock_rpsl_object, info)
 
         assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
         assert flatten_mock_calls(mock_database_query) == [
             ["object_classes", (["rtr-set"],), {}],
-            ["rpsl_pks", (["members"],), {}],
+            ["rpsl_pks", ([REFERENCED_RPSL_PK],), {}],
         ]
 
+    async def test_resolve_rpsl_object_references_batched(self, prepare_resolver):
+        info, mock_database_query, mock_query_resolver = prepare_resolver
+        queries = []
+        info.context["request"].app.state.database_pool.database_handler().execute_query = (
+            lambda query, refresh_on_error: queries.append(query) or MOCK_RPSL_DB_RESULT
+        )
+
+        mock_rpsl_objects = [
+            {"objectClass": "route", "mntBy": [REFERENCED_RPSL_PK, "OTHER-MNT"], "source": "source"},
+            {"objectClass": "route", "mntBy": REFERENCED_RPSL_PK.lower(), "source": "source"},
+            {"objectClass": "route", "mntBy": "OTHER-MNT", "source": "source"},
+        ]
+        results = await asyncio.gather(
+            *[resolvers.resolve_rpsl_object_mnt_by_objs(obj, info) for obj in mock_rpsl_objects]
+        )
+        assert results == [EXPECTED_RPSL_GRAPHQL_OUTPUT, EXPECTED_RPSL_GRAPHQL_OUTPUT, []]
+        assert len(queries) == 1
+        assert flatten_mock_calls(mock_database_query) == [
+            ["object_classes", (["mntner"],), {}],
+            ["rpsl_pks", ([REFERENCED_RPSL_PK, "OTHER-MNT"],), {}],
+            ["sources", (["source"],), {}],
+        ]
+
+        # Repeated references are answered from the per-request cache
+        result = await resolvers.resolve_rpsl_object_mnt_by_objs(mock_rpsl_objects[1], info)
+        assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
+        assert len(queries) == 1
+
+        # A different source is a separate query
+        mock_rpsl_object = {"objectClass": "route", "mntBy": REFERENCED_RPSL_PK, "source": "other"}
+        result = await resolvers.resolve_rpsl_object_mnt_by_objs(mock_rpsl_object, info)
+        assert result == EXPECTED_RPSL_GRAPHQL_OUTPUT
+        assert len(queries) == 2
+
     def test_resolve_rpsl_object_journal(self, prepare_resolver, monkeypatch, config_override):
         info, mock_database_query, mock_query_resolver = prepare_resolver
 
@@ -393,6 +483,10 @@ class TestGraphQLResolvers:
         ]
         mock_query_resolver.set_query_sources.assert_called_once()
 
+        mock_query_resolver.routes_for_origin = lambda asn, ip_version: {"192.0.2.0/25", "192.0.2.128/25"}
+        result = list(resolvers.resolve_asn_prefixes(None, info, asns=[65550], aggregate=True))
+        assert result == [{"asn": 65550, "prefixes": ["192.0.2.0/24^25"]}]
+
     def test_resolve_as_set_prefixes(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
         mock_query_resolver.routes_for_as_set = lambda set_name, ip_version, exclude_sets: [
@@ -417,6 +511,13 @@ class TestGraphQLResolvers:
         )
         mock_query_resolver.set_query_sources.assert_called_once()
 
+        mock_query_resolver.routes_for_as_set = lambda set_name, ip_version, exclude_sets: {
+            "192.0.2.0/25",
+            "192.0.2.128/25",
+        }
+        result = list(resolvers.resolve_as_set_prefixes(None, info, set_names=["AS-A"], aggregate=True))
+        assert result == [{"rpslPk": "AS-A", "prefixes": ["192.0.2.0/24^25"]}]
+
     def test_resolve_recursive_set_members(self, prepare_resolver):
         info, mock_database_query, mock_query_resolver = prepare_resolver
         mock_query_resolver.members_for_set_per_source = lambda set_name, exclude_sets, depth, recursive: {
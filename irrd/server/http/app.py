@@ -29,9 +29,11 @@ from irrd.server.graphql import ENV_UVICORN_WORKER_CONFIG_PATH
 from irrd.server.graphql.extensions import QueryMetadataExtension, error_formatter
 from irrd.server.graphql.graphiql_csp import GRAPHIQL_CDN_ORIGIN, build_explorer
 from irrd.server.graphql.schema_builder import build_executable_schema
+from irrd.server.http.database_pool import DatabaseHandlerPool
 from irrd.server.http.endpoints_api import (
     MetricsEndpoint,
     ObjectSubmissionEndpoint,
+    SetBatchQueryEndpoint,
     StatusEndpoint,
     SuspensionSubmissionEndpoint,
     WhoisQueryEndpoint,
@@ -40,8 +42,8 @@ from irrd.server.http.event_stream import (
     EventStreamEndpoint,
     EventStreamInitialDownloadEndpoint,
 )
-from irrd.storage.database_handler import DatabaseHandler
 from irrd.storage.preload import Preloader
+from irrd.storage.query_metrics import QueryMetricsRecorder
 from irrd.utils.process_support import memory_trim, set_traceback_handler
 from irrd.webui.auth.users import auth_middleware
 from irrd.webui.helpers import secret_key_derive
@@ -57,8 +59,8 @@ logger = logging.getLogger(__name__)
 @contextlib.asynccontextmanager
 async def lifespan(app):
     """
-    Prepare the database connection and preloader, which
-    is shared between different queries in this process.
+    Prepare the database pool and preloader, which
+    are shared between different queries in this process.
     As these are run in a separate process, the config file
     is read from the environment.
     """
@@ -68,8 +70,9 @@ async def lifespan(app):
     config_init(config_path)
     set_middleware(app)
     try:
-        app.state.database_handler = DatabaseHandler(readonly=True)
+        app.state.database_pool = DatabaseHandlerPool()
         app.state.preloader = Preloader(enable_queries=True)
+        app.state.query_metrics = QueryMetricsRecorder()
         async_redis_prefix = ""
         if get_setting("redis_url").startswith("redis://"):
             async_redis_prefix = "async+"
@@ -97,8 +100,9 @@ async def lifespan(app):
 
     yield
 
-    app.state.database_handler.close()
+    app.state.database_pool.close()
     app.state.preloader = None
+    app.state.query_metrics.flush()
     app.state.rate_limiter = None
 
 
@@ -121,6 +125,7 @@ routes = [
     Route("/", lambda request: RedirectResponse("/ui/", status_code=302)),
     Mount("/v1/status", StatusEndpoint),
     Mount("/v1/whois", WhoisQueryEndpoint),
+    Mount("/v1/sets", SetBatchQueryEndpoint),
     Mount("/v1/submit", ObjectSubmissionEndpoint),
     Mount("/v1/suspension", SuspensionSubmissionEndpoint),
     Mount("/graphql", graphql),
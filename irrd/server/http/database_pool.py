@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from starlette.requests import Request
+
+from irrd.conf import get_setting
+from irrd.storage.database_handler import DatabaseHandler, DatabaseQueryCancelledError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ClientDisconnectedError(Exception):
+    pass
+
+
+class DatabaseHandlerPool:
+    """
+    Pool of readonly database handlers for an HTTP worker.
+
+    DatabaseHandler is blocking and has a single connection, so sharing
+    one between the concurrent requests of a worker serialises them,
+    and running queries on the event loop stalls all other requests.
+    This pool runs database work in a bounded thread pool instead,
+    where each thread has its own DatabaseHandler and connection.
+    """
+
+    def __init__(self, size: int | None = None):
+        self.size = size if size else int(get_setting("server.http.database_connections"))
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="irrd-http-database")
+        self._thread_local = threading.local()
+        self._handlers: list[DatabaseHandler] = []
+        self._handlers_lock = threading.Lock()
+
+    def database_handler(self) -> DatabaseHandler:
+        """
+        Return the database handler for the current pool thread,
+        creating it if needed. Must only be called from within run().
+        """
+        database_handler = getattr(self._thread_local, "database_handler", None)
+        if database_handler is None:
+            database_handler = DatabaseHandler(readonly=True)
+            self._thread_local.database_handler = database_handler
+            with self._handlers_lock:
+                self._handlers.append(database_handler)
+        return database_handler
+
+    async def run(self, func: Callable[..., T], *args, timeout: float | None = None, **kwargs) -> T:
+        """
+        Run func(*args, **kwargs) in a pool thread, in which func can
+        use database_handler(). Iterators returned by func are consumed
+        in the pool thread, as they are usually lazy database results.
+
+        Raises asyncio.TimeoutError if timeout expires. On a timeout,
+        or if the calling task is cancelled, e.g. when the client
+        disconnected, the running query is cancelled, and func can
+        not run any further queries.
+        """
+        lock = threading.Lock()
+        call_state: dict[str, Any] = {"cancelled": False, "database_handler": None}
+
+        def call() -> T:
+            with lock:
+                if call_state["cancelled"]:
+                    raise DatabaseQueryCancelledError("Call was cancelled before it started")
+                database_handler = self.database_handler()
+                database_handler.reset_cancellation()
+                call_state["database_handler"] = database_handler
+            try:
+                result = func(*args, **kwargs)
+                if isinstance(result, Iterator):
+                    result = list(result)  # type: ignore
+                return result
+            finally:
+                with lock:
+                    call_state["database_handler"] = None
+
+        # The call runs in a copy of the current context, e.g. to record query timing
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, context.run, call)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            with lock:
+                call_state["cancelled"] = True
+                if call_state["database_handler"]:
+                    call_state["database_handler"].cancel_query()
+            raise
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._handlers_lock:
+            for database_handler in self._handlers:
+                try:
+                    database_handler.close()
+                except Exception as exc:  # pragma: no cover
+                    logger.info(f"Failed to close database handler in pool: {exc}")
+            self._handlers = []
+
+
+def query_timeout() -> float | None:
+    """Return the configured HTTP query timeout, or None if not set."""
+    timeout = get_setting("server.http.query_timeout")
+    return int(timeout) if timeout else None
+
+
+async def run_until_disconnected(request: Request, func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run func in the database pool of the app of this request, with the
+    configured query timeout. If the client disconnects before func
+    finishes, the call is cancelled and ClientDisconnectedError is raised.
+    """
+    pool: DatabaseHandlerPool = request.app.state.database_pool
+    call_task = asyncio.ensure_future(pool.run(func, *args, timeout=query_timeout(), **kwargs))
+    disconnect_task = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait([call_task, disconnect_task], return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        call_task.cancel()
+        raise
+    finally:
+        disconnect_task.cancel()
+    if not call_task.done():
+        call_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await call_task
+        raise ClientDisconnectedError()
+    return call_task.result()
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 import time
@@ -12,12 +13,20 @@ from starlette.responses import JSONResponse, PlainTextResponse, Response
 
 from irrd.server.access_check import STARLETTE_TEST_CLIENT_HOST, is_client_permitted
 from irrd.updates.handler import ChangeSubmissionHandler
-from irrd.utils.validators import RPSLChangeSubmission, RPSLSuspensionSubmission
+from irrd.utils.aggregation import aggregate_prefixes
+from irrd.utils.validators import (
+    RPSLChangeSubmission,
+    RPSLSuspensionSubmission,
+    SetBatchQuery,
+)
 
 from ... import META_KEY_HTTP_CLIENT_IP
 from ...storage.models import AuthoritativeChangeOrigin
-from ..whois.query_parser import WhoisQueryParser
-from ..whois.query_response import WhoisQueryResponseType
+from ...storage.query_metrics import query_timing
+from ..query_resolver import InvalidQueryException, QueryResolver
+from ..whois.query_parser import WhoisQueryParser, query_command
+from ..whois.query_response import WhoisQueryResponse, WhoisQueryResponseType
+from .database_pool import ClientDisconnectedError, run_until_disconnected
 from .metrics_generator import MetricsGenerator
 from .status_generator import StatusGenerator
 
@@ -45,7 +54,7 @@ class MetricsEndpoint(HTTPEndpoint):
 
 
 class WhoisQueryEndpoint(HTTPEndpoint):
-    def get(self, request: Request) -> Response:
+    async def get(self, request: Request) -> Response:
         host = request.client.host if request.client else STARLETTE_TEST_CLIENT_HOST
         port = request.client.port if request.client else 0
         start_time = time.perf_counter()
@@ -54,14 +63,21 @@ class WhoisQueryEndpoint(HTTPEndpoint):
         client_str = host + ":" + str(port)
         query = request.query_params["q"]
 
-        parser = WhoisQueryParser(
-            host, client_str, request.app.state.preloader, request.app.state.database_handler
-        )
-        response = parser.handle_query(query)
-        response.clean_response()
+        try:
+            with query_timing() as timing:
+                response = await run_until_disconnected(
+                    request, self._handle_query, request, host, client_str, query
+                )
+        except asyncio.TimeoutError:
+            logger.info(f"{client_str}: HTTP query exceeded time limit, cancelled: {query}")
+            return PlainTextResponse("Query exceeded the time limit", status_code=504)
+        except ClientDisconnectedError:
+            logger.info(f"{client_str}: client disconnected, HTTP query cancelled: {query}")
+            return Response(status_code=499)
 
         elapsed = time.perf_counter() - start_time
         length = len(response.result) if response.result else 0
+        request.app.state.query_metrics.record("http", query_command(query), elapsed, length, timing)
         logger.info(
             f"{client_str}: sent answer to HTTP query, elapsed {elapsed:.9f}s, {length} chars: {query}"
         )
@@ -75,6 +91,68 @@ class WhoisQueryEndpoint(HTTPEndpoint):
         else:
             return Response(status_code=204)
 
+    @staticmethod
+    def _handle_query(request: Request, host: str, client_str: str, query: str) -> WhoisQueryResponse:
+        """Run the query itself, in a thread of the database pool."""
+        parser = WhoisQueryParser(
+            host, client_str, request.app.state.preloader, request.app.state.database_pool.database_handler()
+        )
+        response = parser.handle_query(query)
+        response.clean_response()
+        return response
+
+
+class SetBatchQueryEndpoint(HTTPEndpoint):
+    async def post(self, request: Request) -> Response:
+        host = request.client.host if request.client else STARLETTE_TEST_CLIENT_HOST
+        port = request.client.port if request.client else 0
+        start_time = time.perf_counter()
+        client_str = host + ":" + str(port)
+        try:
+            data = SetBatchQuery.model_validate(await request.json())
+        except (JSONDecodeError, pydantic.ValidationError) as error:
+            return PlainTextResponse(str(error), status_code=400)
+
+        try:
+            with query_timing() as timing:
+                result = await run_until_disconnected(request, self._resolve, request, data)
+        except InvalidQueryException as iqe:
+            return PlainTextResponse(str(iqe), status_code=400)
+        except asyncio.TimeoutError:
+            logger.info(f"{client_str}: HTTP set batch query exceeded time limit, cancelled")
+            return PlainTextResponse("Query exceeded the time limit", status_code=504)
+        except ClientDisconnectedError:
+            logger.info(f"{client_str}: client disconnected, HTTP set batch query cancelled")
+            return Response(status_code=499)
+
+        elapsed = time.perf_counter() - start_time
+        request.app.state.query_metrics.record("http", f"sets-{data.query}", elapsed, timing=timing)
+        logger.info(
+            f"{client_str}: sent answer to HTTP set batch query, elapsed {elapsed:.9f}s, "
+            f"{data.query} for {len(result)} sets"
+        )
+        return JSONResponse(result)
+
+    @staticmethod
+    def _resolve(request: Request, data: SetBatchQuery) -> dict[str, list[str]]:
+        """Resolve the sets, in a thread of the database pool."""
+        query_resolver = QueryResolver(
+            request.app.state.preloader, request.app.state.database_pool.database_handler()
+        )
+        query_resolver.set_query_sources(data.sources)
+        set_names = list(dict.fromkeys(set_name.upper() for set_name in data.set_names))
+        exclude_sets = {set_name.upper() for set_name in data.exclude_sets}
+        if data.query == "members":
+            return query_resolver.members_for_sets(
+                set_names, exclude_sets=exclude_sets, recursive=data.recursive
+            )
+
+        prefixes = query_resolver.routes_for_as_sets(set_names, data.ip_version, exclude_sets=exclude_sets)
+        return {
+            set_name: aggregate_prefixes(set_prefixes) if data.aggregate else sorted(set_prefixes)
+            for set_name, set_prefixes in prefixes.items()
+        }
+
 
 class ObjectSubmissionEndpoint(HTTPEndpoint):
     async def post(self, request: Request) -> Response:
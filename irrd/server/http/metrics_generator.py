@@ -9,6 +9,11 @@ from typing import Any
 from irrd import ENV_MAIN_STARTUP_TIME, __version__
 from irrd.storage.database_handler import DatabaseHandler
 from irrd.storage.queries import DatabaseStatusQuery, RPSLDatabaseObjectStatisticsQuery
+from irrd.storage.query_metrics import (
+    QUERY_METRICS_FIELD_SEPARATOR,
+    QUERY_METRICS_LATENCY_BUCKETS,
+    load_query_metrics,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +60,7 @@ class MetricsGenerator:
             self._generate_field(
                 status, "serial_newest_journal", "irrd_newest_journal_serial", "Newest serial in the journal"
             ),
+            self._generate_query_metrics(load_query_metrics()),
         ]
         database_handler.close()
         return "\n".join(results) + "\n"
@@ -208,3 +214,54 @@ class MetricsGenerator:
         # HELP {metric_key} {help_text}
         # TYPE {metric_key} gauge
         """).lstrip() + "\n".join(lines) + "\n"
+
+    def _generate_query_metrics(self, query_metrics: dict[tuple[str, str], dict[str, float]]) -> str:
+        """
+        Generate statistics about queries per interface and command,
+        aggregated over all worker processes
+        """
+        lines = [
+            "# HELP irrd_query_duration_seconds Time to process queries, per interface and command",
+            "# TYPE irrd_query_duration_seconds histogram",
+        ]
+        for (interface, command), stats in sorted(query_metrics.items()):
+            labels = f'interface="{interface}", command="{command}"'
+            count = _format_number(stats.get("count", 0))
+            cumulative_count = 0.0
+            for bound in QUERY_METRICS_LATENCY_BUCKETS:
+                cumulative_count += stats.get(f"bucket{QUERY_METRICS_FIELD_SEPARATOR}{bound}", 0)
+                bucket_count = _format_number(cumulative_count)
+                lines.append(f'irrd_query_duration_seconds_bucket{{{labels}, le="{bound}"}} {bucket_count}')
+            lines += [
+                f'irrd_query_duration_seconds_bucket{{{labels}, le="+Inf"}} {count}',
+                f"irrd_query_duration_seconds_sum{{{labels}}} {stats.get('duration_seconds', 0)}",
+                f"irrd_query_duration_seconds_count{{{labels}}} {count}",
+            ]
+
+        counters = [
+            ("response_bytes", "irrd_query_response_bytes_total", "Size of query responses in bytes"),
+            (
+                "database_seconds",
+                "irrd_query_database_seconds_total",
+                "Time spent in database queries while processing queries",
+            ),
+            (
+                "preload_seconds",
+                "irrd_query_preload_seconds_total",
+                "Time spent in, or waiting for, the preload store while processing queries",
+            ),
+            ("cache_hits", "irrd_query_cache_hits_total", "Number of query cache hits"),
+            ("cache_misses", "irrd_query_cache_misses_total", "Number of query cache misses"),
+        ]
+        for statistic, metric_key, help_text in counters:
+            lines += ["", f"# HELP {metric_key} {help_text}", f"# TYPE {metric_key} counter"]
+            for (interface, command), stats in sorted(query_metrics.items()):
+                if statistic in stats:
+                    value = _format_number(stats[statistic])
+                    lines.append(f'{metric_key}{{interface="{interface}", command="{command}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+import sqlalchemy as sa
+
+from irrd.storage.database_handler import DatabaseQueryCancelledError
+from irrd.storage.queries import DatabaseStatusQuery
+
+from ..database_pool import DatabaseHandlerPool
+
+
+async def test_database_pool(irrd_db):
+    pool = DatabaseHandlerPool(size=1)
+
+    def select(value):
+        return pool.database_handler().execute_statement(sa.text(f"SELECT {value}")).scalar()
+
+    def status_query():
+        return pool.database_handler().execute_query(DatabaseStatusQuery())
+
+    def sleep_then_query():
+        try:
+            pool.database_handler().execute_statement(sa.text("SELECT pg_sleep(10)"))
+        except sa.exc.OperationalError:
+            pass
+        return list(pool.database_handler().execute_query(DatabaseStatusQuery()))
+
+    try:
+        assert await pool.run(select, 1) == 1
+        # Lazy query results are consumed in the pool thread
+        assert await pool.run(status_query) == []
+
+        start = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(sleep_then_query, timeout=0.2)
+        # The sleep is cancelled, and the handler is usable again for the next call
+        assert await pool.run(select, 2) == 2
+        assert time.perf_counter() - start < 5
+
+        # After cancellation, further queries are refused, without a retry
+        handler = await pool.run(pool.database_handler)
+        handler.cancel_query()
+        with pytest.raises(DatabaseQueryCancelledError):
+            list(handler.execute_query(DatabaseStatusQuery(), refresh_on_error=True))
+    finally:
+        pool.close()
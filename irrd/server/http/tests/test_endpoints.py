@@ -1,7 +1,10 @@
+import asyncio
+import threading
+import time
 from unittest.mock import Mock
 
 import ujson
-from starlette.requests import HTTPConnection
+from starlette.requests import HTTPConnection, Request
 from starlette.testclient import TestClient
 
 from irrd import META_KEY_HTTP_CLIENT_IP
@@ -11,6 +14,7 @@ from irrd.storage.preload import Preloader
 from irrd.updates.handler import ChangeSubmissionHandler
 from irrd.utils.validators import RPSLChangeSubmission, RPSLSuspensionSubmission
 
+from ...query_resolver import InvalidQueryException, QueryResolver
 from ...whois.query_parser import WhoisQueryParser
 from ...whois.query_response import (
     WhoisQueryResponse,
@@ -18,11 +22,21 @@ from ...whois.query_response import (
     WhoisQueryResponseType,
 )
 from ..app import app
-from ..endpoints_api import MetricsEndpoint, StatusEndpoint, WhoisQueryEndpoint
+from ..database_pool import DatabaseHandlerPool
+from ..endpoints_api import (
+    MetricsEndpoint,
+    SetBatchQueryEndpoint,
+    StatusEndpoint,
+    WhoisQueryEndpoint,
+)
 from ..metrics_generator import MetricsGenerator
 from ..status_generator import StatusGenerator
 
 
+async def receive_never_disconnect():
+    await asyncio.Event().wait()
+
+
 class StatusAccessListEndpointBase:
     def setup_method(self):
         self.mock_request = HTTPConnection(
@@ -95,39 +109,43 @@ class TestMetricsEndpoint(StatusAccessListEndpointBase):
 
 
 class TestWhoisQueryEndpoint:
-    def test_query_endpoint(self, monkeypatch):
+    async def test_query_endpoint(self, monkeypatch):
         mock_query_parser = Mock(spec=WhoisQueryParser)
         monkeypatch.setattr(
             "irrd.server.http.endpoints_api.WhoisQueryParser",
             lambda client_ip, client_str, preloader, database_handler: mock_query_parser,
         )
+        database_pool = DatabaseHandlerPool(size=1)
+        monkeypatch.setattr(database_pool, "database_handler", lambda: Mock(spec=DatabaseHandler))
         app = Mock(
             state=Mock(
-                database_handler=Mock(spec=DatabaseHandler),
+                database_pool=database_pool,
                 preloader=Mock(spec=Preloader),
             )
         )
-        mock_request = HTTPConnection(
+        mock_request = Request(
             {
                 "type": "http",
                 "client": ("127.0.0.1", "8000"),
                 "app": app,
                 "query_string": "",
-            }
+            },
+            receive_never_disconnect,
         )
         endpoint = WhoisQueryEndpoint(scope=mock_request, receive=None, send=None)
 
-        result = endpoint.get(mock_request)
+        result = await endpoint.get(mock_request)
         assert result.status_code == 400
         assert result.body.startswith(b"Missing required query")
 
-        mock_request = HTTPConnection(
+        mock_request = Request(
             {
                 "type": "http",
                 "client": ("127.0.0.1", "8000"),
                 "app": app,
                 "query_string": "q=query",
-            }
+            },
+            receive_never_disconnect,
         )
 
         mock_query_parser.handle_query = lambda query: WhoisQueryResponse(
@@ -135,7 +153,7 @@ class TestWhoisQueryEndpoint:
             mode=WhoisQueryResponseMode.IRRD,  # irrelevant
             result=f"result {query} 🦄",
         )
-        result = endpoint.get(mock_request)
+        result = await endpoint.get(mock_request)
         assert result.status_code == 200
         assert result.body.decode("utf-8") == "result query 🦄"
 
@@ -144,7 +162,7 @@ class TestWhoisQueryEndpoint:
             mode=WhoisQueryResponseMode.IRRD,  # irrelevant
             result="",
         )
-        result = endpoint.get(mock_request)
+        result = await endpoint.get(mock_request)
         assert result.status_code == 204
         assert not result.body
 
@@ -153,7 +171,7 @@ class TestWhoisQueryEndpoint:
             mode=WhoisQueryResponseMode.IRRD,  # irrelevant
             result=f"result {query} 🦄",
         )
-        result = endpoint.get(mock_request)
+        result = await endpoint.get(mock_request)
         assert result.status_code == 400
         assert result.body.decode("utf-8") == "result query 🦄"
 
@@ -162,10 +180,117 @@ class TestWhoisQueryEndpoint:
             mode=WhoisQueryResponseMode.IRRD,  # irrelevant
             result=f"result {query} 🦄",
         )
-        result = endpoint.get(mock_request)
+        result = await endpoint.get(mock_request)
         assert result.status_code == 500
         assert result.body.decode("utf-8") == "result query 🦄"
 
+    async def test_query_endpoint_timeout_disconnect(self, monkeypatch, config_override):
+        config_override({"server": {"http": {"query_timeout": 1}}})
+        mock_query_parser = Mock(spec=WhoisQueryParser)
+        monkeypatch.setattr(
+            "irrd.server.http.endpoints_api.WhoisQueryParser",
+            lambda client_ip, client_str, preloader, database_handler: mock_query_parser,
+        )
+        mock_database_handler = Mock(spec=DatabaseHandler)
+        database_pool = DatabaseHandlerPool(size=1)
+        monkeypatch.setattr(database_pool, "database_handler", lambda: mock_database_handler)
+        app = Mock(state=Mock(database_pool=database_pool, preloader=Mock(spec=Preloader)))
+        query_release = threading.Event()
+        mock_query_parser.handle_query = lambda query: query_release.wait(5)
+
+        async def receive_disconnect():
+            return {"type": "http.disconnect"}
+
+        mock_request = Request(
+            {"type": "http", "client": ("127.0.0.1", "8000"), "app": app, "query_string": "q=query"},
+            receive_disconnect,
+        )
+        endpoint = WhoisQueryEndpoint(scope=mock_request, receive=None, send=None)
+        result = await endpoint.get(mock_request)
+        assert result.status_code == 499
+        mock_database_handler.cancel_query.assert_called_once()
+        query_release.set()
+
+        mock_request = Request(
+            {"type": "http", "client": ("127.0.0.1", "8000"), "app": app, "query_string": "q=query"},
+            receive_never_disconnect,
+        )
+        mock_query_parser.handle_query = lambda query: time.sleep(2)
+        result = await endpoint.get(mock_request)
+        assert result.status_code == 504
+        assert result.body == b"Query exceeded the time limit"
+
+
+class TestSetBatchQueryEndpoint:
+    async def test_endpoint(self, monkeypatch):
+        mock_query_resolver = Mock(spec=QueryResolver)
+        monkeypatch.setattr(
+            "irrd.server.http.endpoints_api.QueryResolver",
+            lambda preloader, database_handler: mock_query_resolver,
+        )
+        database_pool = DatabaseHandlerPool(size=1)
+        monkeypatch.setattr(database_pool, "database_handler", lambda: Mock(spec=DatabaseHandler))
+        app = Mock(state=Mock(database_pool=database_pool, preloader=Mock(spec=Preloader)))
+
+        async def post(data):
+            body = data if isinstance(data, bytes) else ujson.dumps(data).encode("utf-8")
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                return await receive_never_disconnect()
+
+            request = Request({"type": "http", "client": ("127.0.0.1", "8000"), "app": app}, receive)
+            endpoint = SetBatchQueryEndpoint(scope=request, receive=None, send=None)
+            return await endpoint.post(request)
+
+        mock_query_resolver.members_for_sets = Mock(return_value={"AS-FOO": ["AS65547"], "AS-BAR": []})
+        result = await post(
+            {"set_names": ["as-foo", "AS-BAR", "AS-FOO"], "query": "members", "recursive": True}
+        )
+        assert result.status_code == 200
+        assert ujson.loads(result.body) == {"AS-FOO": ["AS65547"], "AS-BAR": []}
+        mock_query_resolver.set_query_sources.assert_called_once_with(None)
+        mock_query_resolver.members_for_sets.assert_called_once_with(
+            ["AS-FOO", "AS-BAR"], exclude_sets=set(), recursive=True
+        )
+
+        mock_query_resolver.routes_for_as_sets = Mock(
+            return_value={"AS-FOO": {"192.0.2.128/25", "192.0.2.0/25"}}
+        )
+        result = await post({"set_names": ["AS-FOO"], "query": "prefixes", "ip_version": 4})
+        assert ujson.loads(result.body) == {"AS-FOO": ["192.0.2.0/25", "192.0.2.128/25"]}
+        mock_query_resolver.routes_for_as_sets.assert_called_once_with(["AS-FOO"], 4, exclude_sets=set())
+
+        result = await post(
+            {
+                "set_names": ["AS-FOO"],
+                "query": "prefixes",
+                "aggregate": True,
+                "sources": ["TEST"],
+                "exclude_sets": ["as-excluded"],
+            }
+        )
+        assert ujson.loads(result.body) == {"AS-FOO": ["192.0.2.0/24^25"]}
+        mock_query_resolver.set_query_sources.assert_called_with(["TEST"])
+        assert mock_query_resolver.routes_for_as_sets.mock_calls[-1][2] == {"exclude_sets": {"AS-EXCLUDED"}}
+
+        mock_query_resolver.set_query_sources = Mock(
+            side_effect=InvalidQueryException("One or more selected sources are unavailable.")
+        )
+        result = await post({"set_names": ["AS-FOO"], "query": "members", "sources": ["INVALID"]})
+        assert result.status_code == 400
+        assert result.body == b"One or more selected sources are unavailable."
+
+        result = await post({"set_names": ["AS-FOO"], "query": "invalid"})
+        assert result.status_code == 400
+        result = await post({"set_names": ["AS-FOO"], "query": "prefixes", "ip_version": 5})
+        assert result.status_code == 400
+        result = await post(b"{invalid")
+        assert result.status_code == 400
+        database_pool.close()
+
 
 class TestObjectSubmissionEndpoint:
     def test_endpoint(self, monkeypatch):
@@ -27,6 +27,21 @@ class TestMetricsGenerator:
             lambda: mock_statistics_query,
         )
         monkeypatch.setenv(ENV_MAIN_STARTUP_TIME, "5")
+        monkeypatch.setattr(
+            "irrd.server.http.metrics_generator.load_query_metrics",
+            lambda: {
+                ("whois", "!g"): {
+                    "count": 3,
+                    "duration_seconds": 0.5,
+                    "bucket|0.01": 2,
+                    "bucket|0.5": 1,
+                    "response_bytes": 300,
+                    "preload_seconds": 0.25,
+                    "cache_hits": 1,
+                    "cache_misses": 2,
+                },
+            },
+        )
 
         nrtm4_client_session_id = "7c94d3eb-1d7f-4197-9fff-9e6101cdec80"
         mock_query_result = iter(
@@ -141,7 +156,43 @@ class TestMetricsGenerator:
             
             # HELP irrd_newest_journal_serial Newest serial in the journal
             # TYPE irrd_newest_journal_serial gauge
-            irrd_newest_journal_serial{source="TEST1"} 20\n\n"""
+            irrd_newest_journal_serial{source="TEST1"} 20
+            
+            # HELP irrd_query_duration_seconds Time to process queries, per interface and command
+            # TYPE irrd_query_duration_seconds histogram
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="0.001"} 0
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="0.005"} 0
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="0.01"} 2
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="0.05"} 2
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="0.1"} 2
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="0.5"} 3
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="1.0"} 3
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="5.0"} 3
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="10.0"} 3
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="30.0"} 3
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="60.0"} 3
+            irrd_query_duration_seconds_bucket{interface="whois", command="!g", le="+Inf"} 3
+            irrd_query_duration_seconds_sum{interface="whois", command="!g"} 0.5
+            irrd_query_duration_seconds_count{interface="whois", command="!g"} 3
+            
+            # HELP irrd_query_response_bytes_total Size of query responses in bytes
+            # TYPE irrd_query_response_bytes_total counter
+            irrd_query_response_bytes_total{interface="whois", command="!g"} 300
+            
+            # HELP irrd_query_database_seconds_total Time spent in database queries while processing queries
+            # TYPE irrd_query_database_seconds_total counter
+            
+            # HELP irrd_query_preload_seconds_total Time spent in, or waiting for, the preload store while processing queries
+            # TYPE irrd_query_preload_seconds_total counter
+            irrd_query_preload_seconds_total{interface="whois", command="!g"} 0.25
+            
+            # HELP irrd_query_cache_hits_total Number of query cache hits
+            # TYPE irrd_query_cache_hits_total counter
+            irrd_query_cache_hits_total{interface="whois", command="!g"} 1
+            
+            # HELP irrd_query_cache_misses_total Number of query cache misses
+            # TYPE irrd_query_cache_misses_total counter
+            irrd_query_cache_misses_total{interface="whois", command="!g"} 2\n\n"""
         ).lstrip()
         print(status_metrics)
 
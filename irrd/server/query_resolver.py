@@ -1,5 +1,7 @@
+import contextlib
 import logging
 from collections import OrderedDict
+from collections.abc import Iterable, Iterator
 from enum import Enum
 from typing import Any
 
@@ -21,17 +23,33 @@ from irrd.storage.database_handler import (
     RPSLDatabaseResponse,
     is_serial_synchronised,
 )
-from irrd.storage.preload import Preloader
+from irrd.storage.preload import PreloadedRoute, Preloader, SetMembers
 from irrd.storage.queries import DatabaseStatusQuery, RPSLDatabaseQuery
+from irrd.storage.query_metrics import record_cache_lookup
 from irrd.utils.validators import parse_as_number
 
 logger = logging.getLogger(__name__)
 
+# Preloaded route searches with more matches than this use a prefix query
+# on the database instead of retrieving all matching objects by PK.
+MAX_PRELOADED_ROUTE_SEARCH_PKS = 1000
+
 
 class InvalidQueryException(ValueError):
     pass
 
 
+class SetLookupCache:
+    """
+    Cache of preload store lookups, shared between the sets resolved in a batch query.
+    """
+
+    def __init__(self, sources: list[str]):
+        self.sources = sources
+        self.set_members: dict[tuple, SetMembers | None] = {}
+        self.origin_routes: dict[tuple[str, int | None], set[str]] = {}
+
+
 class RouteLookupType(Enum):
     EXACT = "EXACT"
     LESS_SPECIFIC_ONE_LEVEL = "LESS_SPECIFIC_ONE_LEVEL"
@@ -106,6 +124,7 @@ class QueryResolver:
         self.database_handler = database_handler
         self.sql_queries: list[str] = []
         self.sql_trace = False
+        self._set_lookup_cache: SetLookupCache | None = None
 
     def set_query_sources(self, sources: list[str] | None) -> None:
         self.source_manager.set_query_sources(sources)
@@ -134,6 +153,16 @@ class QueryResolver:
 
     def route_search(self, address: IP, lookup_type: RouteLookupType):
         """Route(6) object search for an address, supporting exact/less/more specific."""
+        preloaded_routes = self._preloaded_route_search(address, lookup_type)
+        if preloaded_routes is not None and len(preloaded_routes) <= MAX_PRELOADED_ROUTE_SEARCH_PKS:
+            if not preloaded_routes:
+                return []
+            # The preload store only knows the matching objects, not their text,
+            # but retrieving them by PK is much cheaper than a prefix search.
+            rpsl_pks = sorted({route.rpsl_pk for route in preloaded_routes})
+            query = self._prepare_query(ordered_by_sources=False).object_classes(["route", "route6"])
+            return self._execute_query(query.rpsl_pks(rpsl_pks))
+
         query = self._prepare_query(ordered_by_sources=False).object_classes(["route", "route6"])
         lookup_queries = {
             RouteLookupType.EXACT: query.ip_exact,
@@ -144,6 +173,70 @@ class QueryResolver:
         query = lookup_queries[lookup_type](address)
         return self._execute_query(query)
 
+    def route_search_origins(self, address: IP, lookup_type: RouteLookupType) -> list[str]:
+        """
+        Route(6) object search for an address like route_search(),
+        returning only the origin of each matching object.
+        """
+        preloaded_routes = self._preloaded_route_search(address, lookup_type)
+        if preloaded_routes is None:
+            return [r["parsed_data"]["origin"] for r in self.route_search(address, lookup_type)]
+
+        # Same order as the database query: by first IP, origin, PK
+        def sort_key(route: PreloadedRoute):
+            prefix = IP(route.prefix)
+            return prefix.version(), prefix.int(), int(route.origin[2:]), route.rpsl_pk
+
+        return [route.origin for route in sorted(preloaded_routes, key=sort_key)]
+
+    def _preloaded_route_search(
+        self, address: IP, lookup_type: RouteLookupType
+    ) -> list[PreloadedRoute] | None:
+        """
+        Perform a route search on the preload store, if enabled.
+        Returns None if the preload store can not answer this query,
+        which is also the case if any of the default filters are disabled,
+        as the preload store only contains objects that pass them.
+        """
+        if (
+            self.object_class_filter
+            or (self.rpki_aware and not self.rpki_invalid_filter_enabled)
+            or not self.out_scope_filter_enabled
+            or not self.route_preference_filter_enabled
+        ):
+            return None
+        trees = self.preloader.route_prefix_trees(self.source_manager.sources_resolved)
+        if trees is None:
+            return None
+
+        search_prefix = str(address)
+        nodes = []
+        for tree in trees.values():
+            if lookup_type == RouteLookupType.EXACT:
+                node = tree.search_exact(search_prefix)
+                nodes += [node] if node else []
+            elif lookup_type == RouteLookupType.LESS_SPECIFIC_WITH_EXACT:
+                nodes += tree.search_covering(search_prefix)
+            elif lookup_type == RouteLookupType.LESS_SPECIFIC_ONE_LEVEL:
+                nodes += [
+                    node
+                    for node in tree.search_covering(search_prefix)
+                    if node.prefixlen < address.prefixlen()
+                ]
+            elif lookup_type == RouteLookupType.MORE_SPECIFIC_WITHOUT_EXACT:
+                nodes += [
+                    node
+                    for node in tree.search_covered(search_prefix)
+                    if node.prefixlen > address.prefixlen()
+                ]
+
+        if lookup_type == RouteLookupType.LESS_SPECIFIC_ONE_LEVEL and nodes:
+            # Only the most specific less specific, in any source
+            longest_prefixlen = max(node.prefixlen for node in nodes)
+            nodes = [node for node in nodes if node.prefixlen == longest_prefixlen]
+
+        return [route for node in nodes for route in node.data]
+
     def rpsl_attribute_search(self, attribute: str, value: str) -> RPSLDatabaseResponse:
         """
         -i/!o query - inverse search for attribute values
@@ -181,9 +274,36 @@ class QueryResolver:
         self._current_excluded_sets = exclude_sets if exclude_sets else set()
         self._current_set_maximum_depth = 0
         members = self._recursive_set_resolve({set_name})
-        return self.preloader.routes_for_origins(
-            members, self.source_manager.sources_resolved, ip_version=ip_version
-        )
+        return self._routes_for_origins(members, ip_version=ip_version)
+
+    def routes_for_as_sets(
+        self, set_names: Iterable[str], ip_version: int | None = None, exclude_sets: set[str] | None = None
+    ) -> dict[str, set[str]]:
+        """
+        Find all originating prefixes for each of a number of AS-sets,
+        like routes_for_as_set(). Returns a dict with set names as keys.
+        Lookups of set members and prefixes per origin are shared between
+        the sets, so that common sub-sets and origins are looked up once.
+        """
+        with self._batch_set_lookups():
+            return {
+                set_name: self.routes_for_as_set(set_name, ip_version, exclude_sets=exclude_sets)
+                for set_name in set_names
+            }
+
+    def members_for_sets(
+        self, set_names: Iterable[str], exclude_sets: set[str] | None = None, recursive=False
+    ) -> dict[str, list[str]]:
+        """
+        Find all members of each of a number of as-sets or route-sets,
+        like members_for_set(). Returns a dict with set names as keys.
+        Lookups are shared between the sets, like routes_for_as_sets().
+        """
+        with self._batch_set_lookups():
+            return {
+                set_name: self.members_for_set(set_name, exclude_sets=exclude_sets, recursive=recursive)
+                for set_name in set_names
+            }
 
     def members_for_set_per_source(
         self, parameter: str, exclude_sets: set[str] | None = None, depth=0, recursive=False
@@ -292,11 +412,7 @@ class QueryResolver:
             try:
                 as_number_formatted, _ = parse_as_number(sub_member)
                 if self._current_set_root_object_class == "route-set":
-                    set_members.update(
-                        self.preloader.routes_for_origins(
-                            [as_number_formatted], self.source_manager.sources_resolved
-                        )
-                    )
+                    set_members.update(self._routes_for_origins([as_number_formatted]))
                     resolved_as_members.add(sub_member)
                 else:
                     set_members.add(sub_member)
@@ -335,7 +451,12 @@ class QueryResolver:
         members: set[str] = set()
         leaf_members = set()
 
-        sources = self.source_manager.sources_resolved if not limit_source else [limit_source]
+        if limit_source:
+            sources = [limit_source]
+        elif self._set_lookup_cache:
+            sources = self._set_lookup_cache.sources
+        else:
+            sources = self.source_manager.sources_resolved
         # Per RFC 2622 5.3, route-sets can refer to as-sets,
         # but as-sets can only refer to other as-sets.
         if self._current_set_root_object_class == "as-set":
@@ -344,7 +465,7 @@ class QueryResolver:
             object_classes = ["route-set", "as-set"]
 
         for set_name in set_names:
-            set_members = self.preloader.set_members(set_name, sources, object_classes)
+            set_members = self._preloaded_set_members(set_name, sources, object_classes)
             if set_members is None:
                 leaf_members.add(set_name)
             else:
@@ -354,6 +475,47 @@ class QueryResolver:
 
         return members, leaf_members
 
+    def _preloaded_set_members(
+        self, set_name: str, sources: list[str], object_classes: list[str]
+    ) -> SetMembers | None:
+        if not self._set_lookup_cache:
+            return self.preloader.set_members(set_name, sources, object_classes)
+        key = (set_name, tuple(sources), tuple(object_classes))
+        cache_hit = key in self._set_lookup_cache.set_members
+        record_cache_lookup(cache_hit)
+        if not cache_hit:
+            self._set_lookup_cache.set_members[key] = self.preloader.set_members(
+                set_name, sources, object_classes
+            )
+        return self._set_lookup_cache.set_members[key]
+
+    def _routes_for_origins(self, origins: list[str] | set[str], ip_version: int | None = None) -> set[str]:
+        if not self._set_lookup_cache:
+            return self.preloader.routes_for_origins(
+                origins, self.source_manager.sources_resolved, ip_version=ip_version
+            )
+        prefixes: set[str] = set()
+        origin_routes = self._set_lookup_cache.origin_routes
+        for origin in origins:
+            key = (origin, ip_version)
+            cache_hit = key in origin_routes
+            record_cache_lookup(cache_hit)
+            if not cache_hit:
+                origin_routes[key] = self.preloader.routes_for_origins(
+                    [origin], self._set_lookup_cache.sources, ip_version=ip_version
+                )
+            prefixes.update(origin_routes[key])
+        return prefixes
+
+    @contextlib.contextmanager
+    def _batch_set_lookups(self) -> Iterator[None]:
+        """Share preload store lookups between all set resolving in this context."""
+        self._set_lookup_cache = SetLookupCache(self.source_manager.sources_resolved)
+        try:
+            yield
+        finally:
+            self._set_lookup_cache = None
+
     def database_status(self, sources: list[str] | None = None) -> "OrderedDict[str, OrderedDict[str, Any]]":
         """Database status. If sources is None, return all valid sources."""
         if sources is None:
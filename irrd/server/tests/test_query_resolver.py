@@ -4,13 +4,14 @@ from collections import OrderedDict
 from unittest.mock import Mock
 
 import pytest
+import radix
 from IPy import IP
 from pytz import timezone
 
 from irrd.routepref.status import RoutePreferenceStatus
 from irrd.rpki.status import RPKIStatus
 from irrd.scopefilter.status import ScopeFilterStatus
-from irrd.storage.preload import Preloader, SetMembers
+from irrd.storage.preload import PreloadedRoute, Preloader, SetMembers
 from irrd.utils.test_utils import flatten_mock_calls
 
 from ..query_resolver import InvalidQueryException, QueryResolver, RouteLookupType
@@ -258,6 +259,82 @@ class TestQueryResolver:
             ["ip_more_specific", (IP("192.0.2.0/25"),), {}],
         ]
 
+    def test_route_search_origins(self, prepare_resolver):
+        mock_dq, mock_dh, mock_preloader, mock_query_result, resolver = prepare_resolver
+        mock_preloader.route_prefix_trees = Mock(return_value=None)
+
+        result = resolver.route_search_origins(IP("192.0.2.0/25"), RouteLookupType.EXACT)
+        assert result == ["AS65547", "AS65544", "AS65545"]
+        assert flatten_mock_calls(mock_dq) == [
+            ["sources", (["TEST1", "TEST2"],), {}],
+            ["object_classes", (["route", "route6"],), {}],
+            ["ip_exact", (IP("192.0.2.0/25"),), {}],
+        ]
+
+    def test_route_search_preloaded(self, prepare_resolver):
+        mock_dq, mock_dh, mock_preloader, mock_query_result, resolver = prepare_resolver
+        resolver.out_scope_filter_enabled = True
+        resolver.route_preference_filter_enabled = True
+
+        trees = {"TEST1": radix.Radix(), "TEST2": radix.Radix()}
+        for source, prefix, origin in [
+            ("TEST1", "192.0.0.0/16", "AS65540"),
+            ("TEST2", "192.0.2.0/24", "AS65542"),
+            ("TEST2", "192.0.2.0/24", "AS65541"),
+            ("TEST1", "192.0.2.0/25", "AS65547"),
+            ("TEST2", "192.0.2.0/26", "AS65544"),
+            ("TEST2", "192.0.2.64/26", "AS65545"),
+        ]:
+            node = trees[source].search_exact(prefix) or trees[source].add(prefix)
+            node.data = (node.data or []) + [PreloadedRoute(prefix, origin, prefix + origin)]
+        mock_preloader.route_prefix_trees = Mock(return_value=trees)
+
+        def origins(prefix, lookup_type):
+            return resolver.route_search_origins(IP(prefix), lookup_type)
+
+        assert origins("192.0.2.0/25", RouteLookupType.EXACT) == ["AS65547"]
+        assert origins("192.0.2.0/24", RouteLookupType.EXACT) == ["AS65541", "AS65542"]
+        assert origins("192.0.2.0/25", RouteLookupType.LESS_SPECIFIC_ONE_LEVEL) == ["AS65541", "AS65542"]
+        assert origins("192.0.2.0/25", RouteLookupType.LESS_SPECIFIC_WITH_EXACT) == [
+            "AS65540",
+            "AS65541",
+            "AS65542",
+            "AS65547",
+        ]
+        assert origins("192.0.2.0/24", RouteLookupType.MORE_SPECIFIC_WITHOUT_EXACT) == [
+            "AS65544",
+            "AS65547",
+            "AS65545",
+        ]
+        assert origins("198.51.100.0/24", RouteLookupType.LESS_SPECIFIC_WITH_EXACT) == []
+        assert not flatten_mock_calls(mock_dq)
+        assert flatten_mock_calls(mock_preloader.route_prefix_trees)[0] == [
+            "",
+            (["TEST1", "TEST2"],),
+            {},
+        ]
+
+        # Full objects are retrieved by PK
+        result = resolver.route_search(IP("192.0.2.0/24"), RouteLookupType.EXACT)
+        assert list(result) == mock_query_result
+        assert flatten_mock_calls(mock_dq) == [
+            ["sources", (["TEST1", "TEST2"],), {}],
+            ["scopefilter_status", ([ScopeFilterStatus.in_scope],), {}],
+            ["route_preference_status", ([RoutePreferenceStatus.visible],), {}],
+            ["object_classes", (["route", "route6"],), {}],
+            ["rpsl_pks", (["192.0.2.0/24AS65541", "192.0.2.0/24AS65542"],), {}],
+        ]
+        mock_dq.reset_mock()
+
+        assert list(resolver.route_search(IP("198.51.100.0/24"), RouteLookupType.EXACT)) == []
+        assert not flatten_mock_calls(mock_dq)
+
+        # The preload store only has default visible objects
+        resolver.disable_route_preference_filter()
+        result = resolver.route_search(IP("192.0.2.0/24"), RouteLookupType.EXACT)
+        assert list(result) == mock_query_result
+        assert flatten_mock_calls(mock_dq)[-1] == ["ip_exact", (IP("192.0.2.0/24"),), {}]
+
     def test_route_search_exact_rpki_aware(self, prepare_resolver, config_override):
         mock_dq, mock_dh, mock_preloader, mock_query_result, resolver = prepare_resolver
         config_override(
@@ -406,6 +483,54 @@ class TestQueryResolver:
 
         assert not mock_dq.mock_calls
 
+    def test_batch_set_queries(self, prepare_resolver):
+        mock_dq, mock_dh, mock_preloader, mock_query_result, resolver = prepare_resolver
+
+        mock_set_members = {
+            "AS-FIRST": ["AS65547", "AS-COMMON"],
+            "AS-SECOND": ["AS65548", "AS-COMMON"],
+            "AS-COMMON": ["AS65549", "AS65547"],
+        }
+        mock_preloader.set_members = Mock(
+            side_effect=lambda set_pk, sources, object_classes: (
+                SetMembers(mock_set_members[set_pk], "as-set") if set_pk in mock_set_members else None
+            )
+        )
+        mock_preloader.routes_for_origins = Mock(
+            side_effect=lambda origins, sources, ip_version: {f"prefix-{origin}" for origin in origins}
+        )
+
+        result = resolver.routes_for_as_sets(["AS-FIRST", "AS-SECOND", "AS-UNKNOWN"], 4)
+        assert result == {
+            "AS-FIRST": {"prefix-AS65547", "prefix-AS65549"},
+            "AS-SECOND": {"prefix-AS65547", "prefix-AS65548", "prefix-AS65549"},
+            "AS-UNKNOWN": set(),
+        }
+        # Each set and origin is only looked up once
+        assert sorted(call[1][0] for call in mock_preloader.set_members.mock_calls) == [
+            "AS-COMMON",
+            "AS-FIRST",
+            "AS-SECOND",
+            "AS-UNKNOWN",
+        ]
+        assert sorted(call[1][0][0] for call in mock_preloader.routes_for_origins.mock_calls) == [
+            "AS65547",
+            "AS65548",
+            "AS65549",
+        ]
+        assert resolver._set_lookup_cache is None
+
+        mock_preloader.set_members.reset_mock()
+        result = resolver.members_for_sets(["AS-FIRST", "AS-SECOND"], recursive=True)
+        assert result == {
+            "AS-FIRST": ["AS65547", "AS65549"],
+            "AS-SECOND": ["AS65547", "AS65548", "AS65549"],
+        }
+        assert len(mock_preloader.set_members.mock_calls) == 3
+
+        result = resolver.members_for_sets(["AS-FIRST"], exclude_sets={"AS-COMMON"}, recursive=True)
+        assert result == {"AS-FIRST": ["AS65547"]}
+
     def test_as_set_members(self, prepare_resolver):
         mock_dq, mock_dh, mock_preloader, mock_query_result, resolver = prepare_resolver
 
@@ -489,7 +614,7 @@ class TestQueryResolver:
                 ["set_members", ("RS-SECONDLEVEL", ["TEST1", "TEST2"], ["route-set", "as-set"]), {}],
                 ["set_members", ("RS-2nd-UNKNOWN", ["TEST1", "TEST2"], ["route-set", "as-set"]), {}],
                 ["set_members", ("AS-REFERRED", ["TEST1", "TEST2"], ["route-set", "as-set"]), {}],
-                ["routes_for_origins", (["AS65545"], ["TEST1", "TEST2"]), {}],
+                ["routes_for_origins", (["AS65545"], ["TEST1", "TEST2"]), {"ip_version": None}],
             ]
         )
 
@@ -1,3 +1,4 @@
+import copy
 import logging
 import re
 
@@ -18,6 +19,7 @@ from irrd.server.query_resolver import (
 from irrd.storage.database_handler import DatabaseHandler, RPSLDatabaseResponse
 from irrd.storage.preload import Preloader
 from irrd.storage.queries import DatabaseStatusQuery
+from irrd.utils.aggregation import aggregate_prefixes
 from irrd.utils.validators import ValidationError, parse_as_number
 
 from ..access_check import is_client_permitted
@@ -30,6 +32,22 @@ from .query_response import (
 logger = logging.getLogger(__name__)
 
 
+def query_command(query: str) -> str:
+    """
+    Return the command of a whois query, e.g. !g or -i, to group queries
+    in metrics. RIPE-style queries without flags, i.e. object lookups,
+    are "lookup". Other invalid commands are "!" or "-".
+    """
+    if query.startswith("-V "):
+        query = query.split(" ", 2)[-1]
+    if query.startswith("!"):
+        return query[:2] if query[1:2].isalnum() else "!"
+    flag = query.split(" ", 1)[0]
+    if not flag.startswith("-"):
+        return "lookup"
+    return flag if len(flag) == 2 and flag[1].isalpha() else "-"
+
+
 class WhoisQueryParser:
     """
     Parser for all whois-style queries.
@@ -58,6 +76,18 @@ class WhoisQueryParser:
             database_handler=database_handler,
         )
 
+    def copy(self) -> "WhoisQueryParser":
+        """
+        Return a copy of this parser with the current session state, which can
+        handle a query concurrently with this parser. Only suitable for queries
+        answered from the preload store, as the database handler is shared.
+        """
+        parser = copy.copy(self)
+        parser.excluded_sets = list(self.excluded_sets)
+        parser.query_resolver = copy.copy(self.query_resolver)
+        parser.query_resolver.source_manager = copy.copy(self.query_resolver.source_manager)
+        return parser
+
     def handle_query(self, query: str) -> WhoisQueryResponse:
         """
         Process a single query. Always returns a WhoisQueryResponse object.
@@ -132,7 +162,7 @@ class WhoisQueryParser:
         result = None
 
         # A is not tested here because it is already handled in handle_irrd_routes_for_as_set
-        queries_with_parameter = list("tg6ijmnors")
+        queries_with_parameter = list("tg6ijmnorsb")
         if command in queries_with_parameter and not parameter:
             raise InvalidQueryException(f"Missing parameter for {command} query")
 
@@ -178,6 +208,8 @@ class WhoisQueryParser:
             result = self.handle_irrd_set_members(parameter)
             if not result:
                 response_type = WhoisQueryResponseType.KEY_NOT_FOUND
+        elif command == "b":
+            result = self.handle_irrd_batch_sets(parameter)
         elif command == "j":
             result = self.handle_irrd_database_serial_range(parameter)
         elif command == "J":
@@ -222,11 +254,17 @@ class WhoisQueryParser:
             raise InvalidQueryException(f"Invalid value for timeout: {timeout}")
 
     def handle_irrd_routes_for_origin_v4(self, origin: str) -> str:
-        """!g query - find all originating IPv4 prefixes from an origin, e.g. !gAS65537"""
+        """
+        !g query - find all originating IPv4 prefixes from an origin, e.g. !gAS65537,
+        or !gAS65537,a for aggregated prefixes
+        """
         return self._routes_for_origin(origin, 4)
 
     def handle_irrd_routes_for_origin_v6(self, origin: str) -> str:
-        """!6 query - find all originating IPv6 prefixes from an origin, e.g. !6as65537"""
+        """
+        !6 query - find all originating IPv6 prefixes from an origin, e.g. !6as65537,
+        or !6as65537,a for aggregated prefixes
+        """
         return self._routes_for_origin(origin, 6)
 
     def _routes_for_origin(self, origin: str, ip_version: int | None = None) -> str:
@@ -234,18 +272,21 @@ class WhoisQueryParser:
         Resolve all route(6)s prefixes for an origin, returning a space-separated list
         of all originating prefixes, not including duplicates.
         """
+        origin, aggregate = self._parse_aggregate_option(origin)
         try:
             origin_formatted, _ = parse_as_number(origin, asdot_permitted=True)
         except ValidationError as ve:
             raise InvalidQueryException(str(ve))
 
         prefixes = self.query_resolver.routes_for_origin(origin_formatted, ip_version)
-        return " ".join(prefixes)
+        return " ".join(aggregate_prefixes(prefixes) if aggregate else prefixes)
 
     def handle_irrd_routes_for_as_set(self, set_name: str) -> str:
         """
-        !a query - find all originating prefixes for all members of an AS-set, e.g. !a4AS-FOO or !a6AS-FOO
+        !a query - find all originating prefixes for all members of an AS-set, e.g. !a4AS-FOO or !a6AS-FOO,
+        or !a4AS-FOO,a for aggregated prefixes
         """
+        set_name, aggregate = self._parse_aggregate_option(set_name)
         ip_version: int | None = None
         if set_name.startswith("4"):
             set_name = set_name[1:]
@@ -260,7 +301,19 @@ class WhoisQueryParser:
         prefixes = self.query_resolver.routes_for_as_set(
             set_name, ip_version, exclude_sets=set(self.excluded_sets)
         )
-        return " ".join(prefixes)
+        return " ".join(aggregate_prefixes(prefixes) if aggregate else prefixes)
+
+    def _parse_aggregate_option(self, parameter: str) -> tuple[str, bool]:
+        """
+        Split the ,a option for aggregated prefixes from a query parameter.
+        Returns the remaining parameter, and whether to aggregate.
+        """
+        if "," not in parameter:
+            return parameter, False
+        parameter, option = parameter.rsplit(",", 1)
+        if option != "a":
+            raise InvalidQueryException(f"Invalid option: {option}")
+        return parameter, True
 
     def handle_irrd_set_members(self, parameter: str) -> str:
         """
@@ -277,6 +330,43 @@ class WhoisQueryParser:
         )
         return " ".join(members)
 
+    def handle_irrd_batch_sets(self, parameter: str) -> str:
+        """
+        !b query - run an !i or !a query for a number of sets in one query, e.g.
+        !bi,1 AS-FOO RS-BAR or !ba4,a AS-FOO AS-BAR. Returns one line per set,
+        with the set name followed by the members or prefixes.
+        """
+        batch_command, *set_names = parameter.split()
+        if not set_names:
+            raise InvalidQueryException("Missing required set names for batch query")
+        # Unique names, in the order of the query
+        set_names = list(dict.fromkeys(set_name.upper() for set_name in set_names))
+        exclude_sets = set(self.excluded_sets)
+
+        results: dict[str, list[str] | set[str]]
+        if batch_command in ["i", "i,1"]:
+            results = dict(
+                self.query_resolver.members_for_sets(
+                    set_names, exclude_sets=exclude_sets, recursive=batch_command == "i,1"
+                )
+            )
+        elif batch_command.startswith("a"):
+            ip_version_str, aggregate = self._parse_aggregate_option(batch_command[1:])
+            ip_versions = {"": None, "4": 4, "6": 6}
+            if ip_version_str not in ip_versions:
+                raise InvalidQueryException(f"Invalid batch query: {batch_command}")
+            results = dict(
+                self.query_resolver.routes_for_as_sets(
+                    set_names, ip_versions[ip_version_str], exclude_sets=exclude_sets
+                )
+            )
+            if aggregate:
+                results = {set_name: aggregate_prefixes(prefixes) for set_name, prefixes in results.items()}
+        else:
+            raise InvalidQueryException(f"Invalid batch query: {batch_command}")
+
+        return "\n".join(" ".join([set_name, *results[set_name]]) for set_name in set_names)
+
     def handle_irrd_database_serial_range(self, parameter: str) -> str:
         """
         !j query - database serial range
@@ -363,10 +453,10 @@ class WhoisQueryParser:
         except KeyError:
             raise InvalidQueryException(f"Invalid route search option: {option}")
 
-        result = self.query_resolver.route_search(address, lookup_type)
         if option == "o":
-            prefixes = [r["parsed_data"]["origin"] for r in result]
-            return " ".join(prefixes)
+            origins = self.query_resolver.route_search_origins(address, lookup_type)
+            return " ".join(origins)
+        result = self.query_resolver.route_search(address, lookup_type)
         return self._flatten_query_output(result)
 
     def handle_irrd_sources_list(self, parameter: str) -> str | None:
@@ -1,11 +1,13 @@
 import logging
 import multiprocessing as mp
 import os
+import queue
 import signal
 import socket
 import socketserver
 import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from IPy import IP
 from setproctitle import setproctitle
@@ -14,14 +16,23 @@ from daemon.daemon import change_process_owner
 from irrd import ENV_MAIN_PROCESS_PID
 from irrd.conf import get_setting
 from irrd.server.access_check import is_client_permitted
-from irrd.server.whois.query_parser import WhoisQueryParser
+from irrd.server.whois.query_parser import WhoisQueryParser, query_command
+from irrd.server.whois.query_response import WhoisQueryResponse
 from irrd.storage.database_handler import DatabaseHandler
 from irrd.storage.preload import Preloader
+from irrd.storage.query_metrics import QueryMetricsRecorder, QueryTiming, query_timing
 from irrd.utils.process_support import memory_trim
 
 logger = logging.getLogger(__name__)
 mp.allow_connection_pickling()
 
+# Maximum number of queries read ahead from a client that pipelines queries
+MAX_PIPELINED_QUERIES = 100
+# Number of threads per connection for running pipelined preload queries
+PIPELINED_QUERY_THREADS = 4
+# Queries answered entirely from the preload store, which can run concurrently
+PRELOAD_QUERY_PREFIXES = ("!g", "!6", "!i", "!a", "!b")
+
 
 # Covered by integration tests
 def start_whois_server(uid, gid):  # pragma: no cover
@@ -129,6 +140,7 @@ class WhoisWorker(mp.Process, socketserver.StreamRequestHandler):
         try:
             self.preloader = Preloader()
             self.database_handler = DatabaseHandler(readonly=True)
+            self.query_metrics = QueryMetricsRecorder()
         except Exception as e:
             logger.critical(
                 "Whois worker failed to initialise preloader or database, "
@@ -191,22 +203,117 @@ class WhoisWorker(mp.Process, socketserver.StreamRequestHandler):
         self.query_parser = WhoisQueryParser(
             client_ip, self.client_str, self.preloader, self.database_handler
         )
+        self._executor: ThreadPoolExecutor | None = None
+
+        # Queries are read ahead in a separate thread, so that queries
+        # pipelined by the client can be handled together.
+        query_queue: queue.Queue[str | None] = queue.Queue(maxsize=MAX_PIPELINED_QUERIES)
+        stop_reading = threading.Event()
+        reader = threading.Thread(
+            target=self._read_queries,
+            args=(self.rfile, query_queue, stop_reading),
+            name="irrd-whois-reader",
+            daemon=True,
+        )
+        reader.start()
+        try:
+            while True:
+                try:
+                    query = query_queue.get(timeout=self.query_parser.timeout)
+                except queue.Empty:
+                    logger.debug(f"{self.client_str}: closed connection after timeout")
+                    return
+                queries = [query]
+                while queries[-1] is not None and len(queries) < MAX_PIPELINED_QUERIES:
+                    try:
+                        queries.append(query_queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                if not self.handle_queries([query for query in queries if query is not None]):
+                    return
+                if queries[-1] is None:
+                    return
+        finally:
+            stop_reading.set()
+            # Unblock a pending readline(), so that the reader is finished
+            # before this worker moves on to the next connection.
+            try:
+                self.request.shutdown(socket.SHUT_RD)
+            except OSError:  # pragma: no cover
+                pass
+            reader.join()
+            if self._executor:
+                self._executor.shutdown(cancel_futures=True)
+
+    def _read_queries(self, rfile, query_queue: queue.Queue, stop_reading: threading.Event) -> None:
+        """
+        Read queries from the client on rfile into query_queue, until the
+        connection is closed or stop_reading is set. None is queued when no
+        more queries can be read.
+        """
+        query: str | None
+        while not stop_reading.is_set():
+            try:
+                data = rfile.readline()
+            except (OSError, ValueError):
+                data = b""
+            if data:
+                query = data.decode("utf-8", errors="backslashreplace").strip()
+                if not query:
+                    continue
+            else:
+                query = None
 
-        data = True
-        while data:
-            timer = threading.Timer(self.query_parser.timeout, self.close_request)
-            timer.start()
-            data = self.rfile.readline()
-            timer.cancel()
+            while not stop_reading.is_set():
+                try:
+                    query_queue.put(query, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+            if query is None:
+                return
 
-            query = data.decode("utf-8", errors="backslashreplace").strip()
-            if not query:
+    def handle_queries(self, queries: list[str]) -> bool:
+        """
+        Handle a number of queries that were pipelined by the client,
+        writing the responses in the order of the queries.
+        In multiple command mode, consecutive queries that are answered from
+        the preload store are run concurrently, each with a copy of the
+        session state at that point.
+        Returns False when the connection should be closed,
+        True when more queries should be read.
+        """
+        concurrent_queries: list[tuple[str, float, Future]] = []
+        for query in queries:
+            if (
+                len(queries) > 1
+                and self.query_parser.multiple_command_mode
+                and query.startswith(PRELOAD_QUERY_PREFIXES)
+            ):
+                if not self._executor:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=PIPELINED_QUERY_THREADS, thread_name_prefix="irrd-whois-query"
+                    )
+                logger.debug(f"{self.client_str}: processing pipelined query: {query}")
+                future = self._executor.submit(self._run_query, self.query_parser.copy(), query)
+                concurrent_queries.append((query, time.perf_counter(), future))
                 continue
 
+            if not self._write_concurrent_responses(concurrent_queries):
+                return False
+            concurrent_queries = []
             logger.debug(f"{self.client_str}: processing query: {query}")
-
             if not self.handle_query(query):
-                return
+                return False
+        return self._write_concurrent_responses(concurrent_queries)
+
+    def _write_concurrent_responses(self, concurrent_queries: list[tuple[str, float, Future]]) -> bool:
+        for query, start_time, future in concurrent_queries:
+            response, timing = future.result()
+            if not self._write_response(query, response, timing, start_time):
+                return False
+        return True
 
     def handle_query(self, query: str) -> bool:
         """
@@ -219,7 +326,23 @@ class WhoisWorker(mp.Process, socketserver.StreamRequestHandler):
             logger.debug(f"{self.client_str}: closed connection per request")
             return False
 
-        response = self.query_parser.handle_query(query)
+        response, timing = self._run_query(self.query_parser, query)
+        if not self._write_response(query, response, timing, start_time):
+            return False
+
+        if not self.query_parser.multiple_command_mode:
+            logger.debug(f"{self.client_str}: auto-closed connection")
+            return False
+        return True
+
+    @staticmethod
+    def _run_query(query_parser: WhoisQueryParser, query: str) -> tuple[WhoisQueryResponse, QueryTiming]:
+        with query_timing() as timing:
+            return query_parser.handle_query(query), timing
+
+    def _write_response(
+        self, query: str, response: WhoisQueryResponse, timing: QueryTiming, start_time: float
+    ) -> bool:
         response_bytes = response.generate_response()
         try:
             self.wfile.write(response_bytes)
@@ -227,14 +350,11 @@ class WhoisWorker(mp.Process, socketserver.StreamRequestHandler):
             return False
 
         elapsed = time.perf_counter() - start_time
+        self.query_metrics.record("whois", query_command(query), elapsed, len(response_bytes), timing)
         logger.info(
             f"{self.client_str}: sent answer to query, elapsed {elapsed:.9f}s, "
             f"{len(response_bytes)} bytes: {query}"
         )
-
-        if not self.query_parser.multiple_command_mode:
-            logger.debug(f"{self.client_str}: auto-closed connection")
-            return False
         return True
 
     def is_client_permitted(self, ip: str) -> bool:
@@ -15,7 +15,7 @@ from irrd.server.query_resolver import (
 from irrd.storage.database_handler import DatabaseHandler
 from irrd.utils.test_utils import flatten_mock_calls
 
-from ..query_parser import WhoisQueryParser
+from ..query_parser import WhoisQueryParser, query_command
 from ..query_response import WhoisQueryResponseMode, WhoisQueryResponseType
 
 # Note that these mock objects are not entirely valid RPSL objects,
@@ -589,6 +589,56 @@ class TestWhoisQueryParserIRRD:
         assert response.mode == WhoisQueryResponseMode.IRRD
         assert not response.result
 
+        mock_query_resolver.routes_for_origin = Mock(return_value=["192.0.2.0/25", "192.0.2.128/25"])
+        response = parser.handle_query("!gAS65547,a")
+        assert response.response_type == WhoisQueryResponseType.SUCCESS
+        assert response.result == "192.0.2.0/24^25"
+        mock_query_resolver.routes_for_origin.assert_called_once_with("AS65547", 4)
+
+    def test_batch_sets(self, prepare_parser):
+        mock_query_resolver, mock_dh, parser = prepare_parser
+        mock_query_resolver.members_for_sets = Mock(
+            return_value={"AS-FOO": ["AS65547", "AS65548"], "RS-BAR": []}
+        )
+
+        response = parser.handle_query("!bi,1 AS-FOO rs-bar AS-FOO")
+        assert response.response_type == WhoisQueryResponseType.SUCCESS
+        assert response.mode == WhoisQueryResponseMode.IRRD
+        assert response.result == "AS-FOO AS65547 AS65548\nRS-BAR"
+        mock_query_resolver.members_for_sets.assert_called_once_with(
+            ["AS-FOO", "RS-BAR"], exclude_sets=set(), recursive=True
+        )
+
+        response = parser.handle_query("!bi AS-FOO RS-BAR")
+        assert response.response_type == WhoisQueryResponseType.SUCCESS
+        assert mock_query_resolver.members_for_sets.mock_calls[-1][2]["recursive"] is False
+
+        mock_query_resolver.routes_for_as_sets = Mock(
+            return_value={"AS-FOO": {"192.0.2.0/25", "192.0.2.128/25"}, "AS-BAR": set()}
+        )
+        parser.excluded_sets = ["AS-EXCLUDED"]
+        response = parser.handle_query("!ba4,a AS-FOO AS-BAR")
+        assert response.response_type == WhoisQueryResponseType.SUCCESS
+        assert response.result == "AS-FOO 192.0.2.0/24^25\nAS-BAR"
+        mock_query_resolver.routes_for_as_sets.assert_called_once_with(
+            ["AS-FOO", "AS-BAR"], 4, exclude_sets={"AS-EXCLUDED"}
+        )
+
+        response = parser.handle_query("!ba AS-FOO")
+        assert response.response_type == WhoisQueryResponseType.SUCCESS
+        assert mock_query_resolver.routes_for_as_sets.mock_calls[-1][1][1] is None
+
+        for query, error in [
+            ("!b", "Missing parameter for b query"),
+            ("!bi", "Missing required set names for batch query"),
+            ("!bx AS-FOO", "Invalid batch query: x"),
+            ("!ba5 AS-FOO", "Invalid batch query: a5"),
+            ("!ba4,x AS-FOO", "Invalid option: x"),
+        ]:
+            response = parser.handle_query(query)
+            assert response.response_type == WhoisQueryResponseType.ERROR_USER
+            assert response.result == error
+
     def test_routes_for_origin_invalid(self, prepare_parser):
         mock_query_resolver, mock_dh, parser = prepare_parser
 
@@ -597,6 +647,11 @@ class TestWhoisQueryParserIRRD:
         assert response.mode == WhoisQueryResponseMode.IRRD
         assert response.result == "Invalid AS number ASFOOBAR: number part is not numeric"
 
+        response = parser.handle_query("!gAS65547,x")
+        assert response.response_type == WhoisQueryResponseType.ERROR_USER
+        assert response.mode == WhoisQueryResponseMode.IRRD
+        assert response.result == "Invalid option: x"
+
     def test_handle_irrd_routes_for_as_set(self, prepare_parser, monkeypatch):
         mock_query_resolver, mock_dh, parser = prepare_parser
 
@@ -632,6 +687,14 @@ class TestWhoisQueryParserIRRD:
         )
         mock_query_resolver.routes_for_as_set.reset_mock()
 
+        response = parser.handle_query("!a4AS-FOO,a")
+        assert response.response_type == WhoisQueryResponseType.SUCCESS
+        assert response.mode == WhoisQueryResponseMode.IRRD
+        assert response.result == "192.0.2.0/24^25"
+        mock_query_resolver.routes_for_as_set.assert_called_once_with(
+            "AS-FOO", 4, exclude_sets={"AS-EXCLUDED"}
+        )
+
         mock_query_resolver.routes_for_as_set = Mock(return_value=[])
         response = parser.handle_query("!a6AS-FOO")
         assert response.response_type == WhoisQueryResponseType.KEY_NOT_FOUND
@@ -805,16 +868,18 @@ class TestWhoisQueryParserIRRD:
         )
         mock_query_resolver.route_search.reset_mock()
 
+        mock_query_resolver.route_search_origins = Mock(return_value=["AS65547", "AS65544", "AS65545"])
         response = parser.handle_query("!r192.0.2.0/25,o")
         assert response.response_type == WhoisQueryResponseType.SUCCESS
         assert response.mode == WhoisQueryResponseMode.IRRD
         assert response.result == "AS65547 AS65544 AS65545"
-        mock_query_resolver.route_search.assert_called_once_with(
+        mock_query_resolver.route_search_origins.assert_called_once_with(
             IP("192.0.2.0/25"),
             RouteLookupType.EXACT,
         )
+        assert not mock_query_resolver.route_search.called
 
-        mock_query_resolver.route_search = Mock(return_value=[])
+        mock_query_resolver.route_search_origins = Mock(return_value=[])
         response = parser.handle_query("!r192.0.2.0/32,o")
         assert response.response_type == WhoisQueryResponseType.KEY_NOT_FOUND
         assert response.mode == WhoisQueryResponseMode.IRRD
@@ -1006,3 +1071,14 @@ class TestWhoisQueryParserIRRD:
         assert response.response_type == WhoisQueryResponseType.ERROR_USER
         assert response.mode == WhoisQueryResponseMode.IRRD
         assert response.result == "user error"
+
+
+def test_query_command():
+    assert query_command("!gAS65537") == "!g"
+    assert query_command("!6AS65537,a") == "!6"
+    assert query_command("!!") == "!"
+    assert query_command("-V agent !iAS-TEST") == "!i"
+    assert query_command("-i mnt-by TEST-MNT") == "-i"
+    assert query_command("-K 192.0.2.0/24") == "-K"
+    assert query_command("--long 192.0.2.0/24") == "-"
+    assert query_command("AS65537") == "lookup"
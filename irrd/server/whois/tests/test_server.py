@@ -1,4 +1,5 @@
 import socket
+import threading
 import time
 from io import BytesIO
 from queue import Queue
@@ -41,6 +42,8 @@ class MockSocket:
 def create_worker(config_override, monkeypatch):
     mock_preloader = Mock(spec=Preloader)
     monkeypatch.setattr("irrd.server.whois.server.Preloader", lambda: mock_preloader)
+    mock_query_metrics = Mock()
+    monkeypatch.setattr("irrd.server.whois.server.QueryMetricsRecorder", lambda: mock_query_metrics)
 
     config_override(
         {
@@ -66,9 +69,51 @@ class TestWhoisWorker:
         request.wfile.seek(0)
         assert b"IRRd -- version" in request.wfile.read()
         assert request.shutdown_called
+        assert not any(thread.name == "irrd-whois-reader" for thread in threading.enumerate())
         assert request.close_called
         assert request.timeout_set == 5
 
+        interface, command, elapsed, response_bytes, timing = worker.query_metrics.record.call_args[0]
+        assert (interface, command) == ("whois", "!v")
+        assert 0 < elapsed < 5
+        assert response_bytes > 10
+        assert timing.database_seconds == 0
+
+    def test_whois_request_worker_pipelined(self, create_worker, config_override, monkeypatch):
+        config_override(
+            {
+                "redis_url": "redis://invalid-host.example.com",  # Not actually used
+                "sources": {"TEST1": {}, "TEST2": {}},
+                "rpki": {"roa_source": None},
+            }
+        )
+        worker, request = create_worker
+        threads_used = set()
+
+        def mock_routes_for_origins(origins, sources, ip_version):
+            threads_used.add(threading.current_thread().name)
+            # Slow down the first query, so that it completes last
+            if "AS65537" in origins:
+                time.sleep(0.5)
+            return {f"{origin}-{'-'.join(sources)}" for origin in origins}
+
+        mock_preloader = Mock(spec=Preloader)
+        mock_preloader.routes_for_origins = mock_routes_for_origins
+        monkeypatch.setattr("irrd.server.whois.server.Preloader", lambda: mock_preloader)
+
+        # Queries after !q are not answered
+        request.rfile.write(b"!!\n!gAS65537\n!gAS65538\n!sTEST2\n!gAS65539\n!q\n!gAS65540\n")
+        request.rfile.seek(0)
+        worker.run(keep_running=False)
+
+        request.wfile.seek(0)
+        # Responses are in query order, and reflect the sources at the time of each query
+        assert request.wfile.read().decode("utf-8") == (
+            "A20\nAS65537-TEST1-TEST2\nC\n" "A20\nAS65538-TEST1-TEST2\nC\n" "C\n" "A14\nAS65539-TEST2\nC\n"
+        )
+        assert threads_used and all(name.startswith("irrd-whois-query") for name in threads_used)
+        assert request.close_called
+
     def test_whois_request_worker_exception(self, create_worker, monkeypatch, caplog):
         monkeypatch.setattr(
             "irrd.server.whois.server.WhoisQueryParser", Mock(side_effect=OSError("expected"))
@@ -0,0 +1,31 @@
+"""Add rpsl_objects.content_hash
+
+Revision ID: a9c4f2d6b8e3
+Revises: d7a3b9e2c5f1
+Create Date: 2026-10-19 16:41:52.208113
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a9c4f2d6b8e3"
+down_revision = "d7a3b9e2c5f1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("rpsl_objects", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    # Equivalent to irrd.utils.text.rpsl_content_hash()
+    op.execute(r"""
+        UPDATE rpsl_objects SET content_hash = encode(
+            sha256(convert_to(regexp_replace(object_text, '^last-modified: [^\n]+\n', '', 'gn'), 'UTF8')),
+            'hex'
+        )
+    """)
+
+
+def downgrade():
+    op.drop_column("rpsl_objects", "content_hash")
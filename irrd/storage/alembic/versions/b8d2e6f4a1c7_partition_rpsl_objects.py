@@ -0,0 +1,117 @@
+"""Partition rpsl_objects by source
+
+Revision ID: b8d2e6f4a1c7
+Revises: a9c4f2d6b8e3
+Create Date: 2026-10-19 19:12:44.680217
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from irrd.storage.rpsl_object_partitions import create_rpsl_objects_partition
+
+# revision identifiers, used by Alembic.
+revision = "b8d2e6f4a1c7"
+down_revision = "a9c4f2d6b8e3"
+branch_labels = None
+depends_on = None
+
+RPSL_OBJECTS_COLUMNS = (
+    "pk, rpsl_pk, source, object_class, parsed_data, object_text, ip_version, ip_first, ip_last, ip_size,"
+    " asn_first, asn_last, created, updated, rpki_status, prefix_length, scopefilter_status, prefix,"
+    " route_preference_status, content_hash"
+)
+# Created separately, as the primary key changes
+CONSTRAINT_INDEXES = ["rpsl_objects_pkey", "rpsl_objects_rpsl_pk_source_class_unique"]
+
+
+def upgrade():
+    connection = op.get_bind()
+    index_definitions = _index_definitions(connection)
+    op.drop_constraint("auth_mntner_rpsl_mntner_obj_id_fkey", "auth_mntner", type_="foreignkey")
+    op.rename_table("rpsl_objects", "rpsl_objects_unpartitioned")
+
+    op.execute("""
+        CREATE TABLE rpsl_objects
+        (LIKE rpsl_objects_unpartitioned INCLUDING DEFAULTS)
+        PARTITION BY LIST (source)
+    """)
+    op.execute("CREATE TABLE rpsl_objects_default PARTITION OF rpsl_objects DEFAULT")
+
+    sources = connection.execute(sa.text("SELECT DISTINCT source FROM rpsl_objects_unpartitioned"))
+    for (source,) in sources.fetchall():
+        create_rpsl_objects_partition(connection, source)
+
+    op.execute(f"""
+        INSERT INTO rpsl_objects ({RPSL_OBJECTS_COLUMNS})
+        SELECT {RPSL_OBJECTS_COLUMNS} FROM rpsl_objects_unpartitioned
+    """)
+    op.drop_table("rpsl_objects_unpartitioned")
+
+    op.create_primary_key("rpsl_objects_pkey", "rpsl_objects", ["pk", "source"])
+    op.create_unique_constraint(
+        "rpsl_objects_rpsl_pk_source_class_unique", "rpsl_objects", ["rpsl_pk", "source", "object_class"]
+    )
+    for index_definition in index_definitions:
+        op.execute(index_definition)
+    op.create_foreign_key(
+        "auth_mntner_rpsl_mntner_obj_fkey",
+        "auth_mntner",
+        "rpsl_objects",
+        ["rpsl_mntner_obj_id", "rpsl_mntner_source"],
+        ["pk", "source"],
+        ondelete="RESTRICT",
+    )
+
+
+def downgrade():
+    connection = op.get_bind()
+    index_definitions = _index_definitions(connection)
+    op.drop_constraint("auth_mntner_rpsl_mntner_obj_fkey", "auth_mntner", type_="foreignkey")
+    op.rename_table("rpsl_objects", "rpsl_objects_partitioned")
+
+    op.execute("""
+        CREATE TABLE rpsl_objects
+        (LIKE rpsl_objects_partitioned INCLUDING DEFAULTS)
+    """)
+    op.execute(f"""
+        INSERT INTO rpsl_objects ({RPSL_OBJECTS_COLUMNS})
+        SELECT {RPSL_OBJECTS_COLUMNS} FROM rpsl_objects_partitioned
+    """)
+    # Dropping the partitioned table drops all partitions as well
+    op.drop_table("rpsl_objects_partitioned")
+
+    op.create_primary_key("rpsl_objects_pkey", "rpsl_objects", ["pk"])
+    op.create_unique_constraint(
+        "rpsl_objects_rpsl_pk_source_class_unique", "rpsl_objects", ["rpsl_pk", "source", "object_class"]
+    )
+    for index_definition in index_definitions:
+        op.execute(index_definition)
+    op.create_foreign_key(
+        "auth_mntner_rpsl_mntner_obj_id_fkey",
+        "auth_mntner",
+        "rpsl_objects",
+        ["rpsl_mntner_obj_id"],
+        ["pk"],
+        ondelete="RESTRICT",
+    )
+
+
+def _index_definitions(connection) -> list[str]:
+    """
+    Return the CREATE INDEX statements for all current indexes on rpsl_objects,
+    except those for constraints. This includes the indexes on lookup fields,
+    which depend on the IRRd version that created them.
+    """
+    result = connection.execute(
+        sa.text("""
+            SELECT indexdef FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = 'rpsl_objects'
+            AND indexname != ALL(:constraint_indexes)
+            ORDER BY indexname
+        """),
+        {"constraint_indexes": CONSTRAINT_INDEXES},
+    )
+    # Indexes on partitioned tables are defined ON ONLY the parent table
+    return [indexdef.replace(" ON ONLY ", " ON ") for (indexdef,) in result.fetchall()]
@@ -0,0 +1,42 @@
+"""Add rpsl_object_lookup table
+
+Revision ID: c3f7a9d1e5b2
+Revises: b8d2e6f4a1c7
+Create Date: 2026-10-19 21:03:17.512840
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "c3f7a9d1e5b2"
+down_revision = "b8d2e6f4a1c7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The table is only filled when lookup_index_table is enabled, by irrd_rebuild_lookup_table
+    op.create_table(
+        "rpsl_object_lookup",
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("rpsl_object_pk", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("attribute", sa.String(), nullable=False),
+        sa.Column("value", sa.String(), nullable=False),
+        sa.Column("object_class", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("source", "rpsl_object_pk", "attribute", "value"),
+    )
+    op.create_index(
+        "ix_rpsl_object_lookup_attribute_value",
+        "rpsl_object_lookup",
+        ["attribute", "value"],
+        unique=False,
+        postgresql_include=["source", "rpsl_object_pk"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_rpsl_object_lookup_attribute_value", table_name="rpsl_object_lookup")
+    op.drop_table("rpsl_object_lookup")
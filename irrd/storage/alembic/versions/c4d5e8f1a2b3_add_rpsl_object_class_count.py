@@ -0,0 +1,34 @@
+"""Add rpsl_object_class_count table
+
+Revision ID: c4d5e8f1a2b3
+Revises: e1e649b5f8bb
+Create Date: 2026-10-19 10:12:31.482210
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4d5e8f1a2b3"
+down_revision = "e1e649b5f8bb"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "rpsl_object_class_count",
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("object_class", sa.String(), nullable=False),
+        sa.Column("count", sa.BigInteger(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("source", "object_class"),
+    )
+    op.execute("""
+        INSERT INTO rpsl_object_class_count (source, object_class, count)
+        SELECT source, object_class, COUNT(*) FROM rpsl_objects GROUP BY source, object_class
+    """)
+
+
+def downgrade():
+    op.drop_table("rpsl_object_class_count")
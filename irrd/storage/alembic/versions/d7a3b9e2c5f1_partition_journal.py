@@ -0,0 +1,112 @@
+"""Partition rpsl_database_journal by source and month
+
+Revision ID: d7a3b9e2c5f1
+Revises: c4d5e8f1a2b3
+Create Date: 2026-10-19 14:02:17.391045
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from irrd.storage.journal_partitions import create_journal_partitions
+
+# revision identifiers, used by Alembic.
+revision = "d7a3b9e2c5f1"
+down_revision = "c4d5e8f1a2b3"
+branch_labels = None
+depends_on = None
+
+JOURNAL_COLUMNS = (
+    "pk, rpsl_pk, source, serial_nrtm, operation, object_class, object_text, timestamp, origin, serial_global"
+)
+# Single column indexes of the unpartitioned journal
+UNPARTITIONED_INDEX_COLUMNS = [
+    "object_class",
+    "rpsl_pk",
+    "serial_nrtm",
+    "source",
+    "origin",
+    "timestamp",
+]
+
+
+def upgrade():
+    connection = op.get_bind()
+    for column in UNPARTITIONED_INDEX_COLUMNS + ["serial_global"]:
+        op.drop_index(op.f(f"ix_rpsl_database_journal_{column}"), table_name="rpsl_database_journal")
+    op.drop_constraint("rpsl_objects_history_serial_nrtm_source_unique", "rpsl_database_journal")
+    op.drop_constraint("rpsl_database_journal_pkey", "rpsl_database_journal")
+    op.rename_table("rpsl_database_journal", "rpsl_database_journal_unpartitioned")
+
+    op.execute("""
+        CREATE TABLE rpsl_database_journal
+        (LIKE rpsl_database_journal_unpartitioned INCLUDING DEFAULTS)
+        PARTITION BY LIST (source)
+    """)
+    op.execute("CREATE TABLE rpsl_database_journal_default PARTITION OF rpsl_database_journal DEFAULT")
+
+    months_per_source = connection.execute(sa.text("""
+        SELECT source, array_agg(DISTINCT date_trunc('month', timestamp AT TIME ZONE 'UTC'))
+        FROM rpsl_database_journal_unpartitioned
+        GROUP BY source
+    """))
+    for source, months in months_per_source.fetchall():
+        create_journal_partitions(connection, source, months)
+
+    op.execute(f"""
+        INSERT INTO rpsl_database_journal ({JOURNAL_COLUMNS})
+        SELECT {JOURNAL_COLUMNS} FROM rpsl_database_journal_unpartitioned
+    """)
+    op.drop_table("rpsl_database_journal_unpartitioned")
+
+    op.create_primary_key(
+        "rpsl_database_journal_pkey", "rpsl_database_journal", ["pk", "source", "timestamp"]
+    )
+    op.create_index(
+        op.f("ix_rpsl_database_journal_serial_global"),
+        "rpsl_database_journal",
+        ["serial_global"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_rpsl_database_journal_source_serial_nrtm",
+        "rpsl_database_journal",
+        ["source", "serial_nrtm"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_rpsl_database_journal_source_rpsl_pk",
+        "rpsl_database_journal",
+        ["source", "rpsl_pk"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.rename_table("rpsl_database_journal", "rpsl_database_journal_partitioned")
+    op.execute("""
+        CREATE TABLE rpsl_database_journal
+        (LIKE rpsl_database_journal_partitioned INCLUDING DEFAULTS)
+    """)
+    op.execute(f"""
+        INSERT INTO rpsl_database_journal ({JOURNAL_COLUMNS})
+        SELECT {JOURNAL_COLUMNS} FROM rpsl_database_journal_partitioned
+    """)
+    # Dropping the partitioned table drops all partitions as well
+    op.drop_table("rpsl_database_journal_partitioned")
+
+    op.create_primary_key("rpsl_database_journal_pkey", "rpsl_database_journal", ["pk"])
+    op.create_unique_constraint(
+        "rpsl_objects_history_serial_nrtm_source_unique", "rpsl_database_journal", ["serial_nrtm", "source"]
+    )
+    op.create_index(
+        op.f("ix_rpsl_database_journal_serial_global"),
+        "rpsl_database_journal",
+        ["serial_global"],
+        unique=True,
+    )
+    for column in UNPARTITIONED_INDEX_COLUMNS:
+        op.create_index(
+            op.f(f"ix_rpsl_database_journal_{column}"), "rpsl_database_journal", [column], unique=False
+        )
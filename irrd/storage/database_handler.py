@@ -1,4 +1,9 @@
+import csv
+import enum
+import json
 import logging
+import time
+import uuid
 from collections import defaultdict
 from collections.abc import Iterable, Iterator
 from datetime import datetime, timezone
@@ -10,6 +15,7 @@ import sqlalchemy as sa
 from asgiref.sync import sync_to_async
 from IPy import IP
 from sqlalchemy.dialects import postgresql as pg
+from sqlalchemy.ext.compiler import compiles
 
 from irrd.conf import RPKI_IRR_PSEUDO_SOURCE, get_setting
 from irrd.routepref.status import RoutePreferenceStatus
@@ -21,11 +27,15 @@ from irrd.rpsl.rpsl_objects import (
     RPKI_RELEVANT_OBJECT_CLASSES,
 )
 from irrd.scopefilter.status import ScopeFilterStatus
-from irrd.utils.misc import chunked_iterable
+from irrd.utils.text import rpsl_content_hash
 from irrd.vendor import postgres_copy
 
 from . import get_engine
 from .event_stream import EventStreamPublisher
+from .journal_partitions import (
+    create_journal_partitions,
+    drop_journal_partitions_before,
+)
 from .models import (
     DatabaseOperation,
     JournalEntryOrigin,
@@ -37,6 +47,8 @@ from .models import (
     RPSLDatabaseObject,
     RPSLDatabaseObjectSuspended,
     RPSLDatabaseStatus,
+    RPSLObjectClassCount,
+    RPSLObjectLookup,
 )
 from .preload import Preloader
 from .queries import (
@@ -46,6 +58,20 @@ from .queries import (
     RPSLDatabaseJournalStatisticsQuery,
     RPSLDatabaseObjectStatisticsQuery,
 )
+from .query_metrics import record_database_time
+from .rpsl_object_lookups import (
+    delete_rpsl_object_lookups,
+    delete_rpsl_object_lookups_for_source,
+    insert_rpsl_object_lookups,
+    lookup_table_enabled,
+    refresh_rpsl_object_lookups,
+)
+from .rpsl_object_partitions import (
+    create_rpsl_objects_partition,
+    create_rpsl_objects_reload_table,
+    create_rpsl_objects_reload_table_indexes,
+    replace_rpsl_objects_partition,
+)
 
 QueryType = Union[
     BaseRPSLObjectDatabaseQuery,
@@ -57,9 +83,81 @@ QueryType = Union[
 
 logger = logging.getLogger(__name__)
 MAX_RECORDS_BUFFER_BEFORE_INSERT = 15000
-ROUTEPREF_STATUS_UPDATE_CHUNK_SIZE = 5000
+# Status updates and their journal entries for more objects than this are
+# done through a temporary table, rather than IN lists or individual inserts.
+BULK_STATUS_UPDATE_MIN_SIZE = 1000
+# Creating journal or RPSL object partitions gives up after waiting this many
+# seconds for the table lock, as queries on the table would be blocked meanwhile.
+PARTITION_LOCK_TIMEOUT = 10
+# Replacing the RPSL objects partition of a source after a full reload is
+# attempted this many times, waiting in between, before failing the reload.
+PARTITION_REPLACE_ATTEMPTS = 3
+PARTITION_REPLACE_RETRY_DELAY = 5
+# SQLSTATE for lock_not_available, raised when lock_timeout expires
+PGCODE_LOCK_NOT_AVAILABLE = "55P03"
 RPSLDatabaseResponse = Iterator[dict[str, Any]]
 
+# Temporary tables used for bulk status updates, see copy_into_temporary_table()
+_temporary_metadata = sa.MetaData()
+TEMPORARY_TABLE_STATUS_KEYS = {
+    key_column: sa.Table(
+        f"tmp_status_update_{key_column}",
+        _temporary_metadata,
+        sa.Column("key", key_type, primary_key=True),
+        prefixes=["TEMPORARY"],
+        postgresql_on_commit="DROP",
+    )
+    for key_column, key_type in [("pk", pg.UUID), ("rpsl_pk", sa.String)]
+}
+TEMPORARY_TABLE_JOURNAL = sa.Table(
+    "tmp_status_update_journal",
+    _temporary_metadata,
+    sa.Column("position", sa.Integer, primary_key=True),
+    sa.Column("rpsl_pk", sa.String),
+    sa.Column("object_class", sa.String),
+    sa.Column("object_text", sa.Text),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+# Staging table for full reloads of a source, see start_rpsl_staging()
+TEMPORARY_TABLE_RPSL_STAGING = sa.Table(
+    "tmp_rpsl_objects_staging",
+    _temporary_metadata,
+    sa.Column("position", sa.BigInteger, primary_key=True),
+    *[
+        sa.Column(column.name, column.type)
+        for column in RPSLDatabaseObject.__table__.columns
+        if column.name != "pk"
+    ],
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+RPSL_STAGING_COLUMNS = [
+    column.name for column in TEMPORARY_TABLE_RPSL_STAGING.columns if column.name != "position"
+]
+
+
+class DatabaseQueryCancelledError(Exception):
+    pass
+
+
+class RPSLObjectsPartitionLockError(Exception):
+    pass
+
+
+class Explain(sa.sql.expression.Executable, sa.sql.expression.ClauseElement):
+    """EXPLAIN of a statement, with the plan in JSON, see estimate_row_count()."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kwargs)
+
 
 def object_is_visible(
     rpki_status: RPKIStatus = RPKIStatus.not_found,
@@ -93,6 +191,10 @@ class DatabaseHandler:
     _rpsl_upsert_buffer: list[tuple[dict, JournalEntryOrigin, int | None]]
     # The ROA insert buffer is a list of dicts with columm names and their values.
     _roa_insert_buffer: list[dict[str, str | int]]
+    # The source being reloaded through the staging table, and the buffer of
+    # object dicts to be copied into it, see start_rpsl_staging()
+    _rpsl_staging_source: str | None
+    _rpsl_staging_buffer: list[dict]
 
     def __init__(self, readonly=False):
         """
@@ -108,6 +210,7 @@ class DatabaseHandler:
         else:
             self.readonly = readonly
         self.journaling_enabled = not readonly
+        self._query_cancelled = False
         self._connection = get_engine().connect()
         if self.readonly:
             self._connection.execution_options(isolation_level="AUTOCOMMIT")
@@ -147,6 +250,8 @@ class DatabaseHandler:
         self._rpsl_pk_source_seen: set[str] = set()
         self._rpsl_upsert_buffer = []
         self._roa_insert_buffer = []
+        self._rpsl_staging_source = None
+        self._rpsl_staging_buffer = []
         self._rpsl_guaranteed_no_existing = True
         if self.status_tracker:
             self.status_tracker.close()
@@ -166,6 +271,7 @@ class DatabaseHandler:
         """
         self._check_write_permitted()
         self._flush_rpsl_object_writing_buffer()
+        self._complete_rpsl_staging()
         self._flush_roa_writing_buffer()
         self.status_tracker.finalise_transaction()
         try:
@@ -192,6 +298,8 @@ class DatabaseHandler:
         """Roll back the current transaction, discarding all submitted changes."""
         self._rpsl_upsert_buffer = []
         self._rpsl_pk_source_seen = set()
+        self._rpsl_staging_source = None
+        self._rpsl_staging_buffer = []
         self.status_tracker.reset()
         self.changed_objects_tracker.reset()
         self._transaction.rollback()
@@ -215,32 +323,76 @@ class DatabaseHandler:
         """
 
         def execute_query():
+            if self._query_cancelled:
+                raise DatabaseQueryCancelledError("Queries on this database handler were cancelled")
             # To be able to query objects that were just created, flush the buffer.
             if not self.readonly and flush_rpsl_buffer:
                 self._flush_rpsl_object_writing_buffer()
             statement = query.finalise_statement()
             return self._connection.execute(statement)
 
+        start_time = time.perf_counter()
         try:
             result = execute_query()
         except Exception as exc:  # pragma: no cover
-            if refresh_on_error:
+            if refresh_on_error and not self._query_cancelled:
                 self.refresh_connection()
                 result = execute_query()
             else:
                 raise exc
 
         result_partition = result.fetchmany()
+        record_database_time(time.perf_counter() - start_time)
         while result_partition:
             for row in result_partition:
                 yield row._mapping
+            start_time = time.perf_counter()
             result_partition = result.fetchmany()
+            record_database_time(time.perf_counter() - start_time)
         result.close()
 
+    def estimate_row_count(self, query: QueryType) -> int:
+        """
+        Estimate the number of rows returned by a query, using the
+        PostgreSQL query planner. This only plans the query, it is not run.
+        """
+        plan = self._connection.execute(Explain(query.finalise_statement())).scalar()
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def cancel_query(self) -> None:
+        """
+        Cancel the currently running query, if any, and refuse any further
+        queries until reset_cancellation() is called. Unlike other methods,
+        this can be called from a different thread than the one running queries.
+        """
+        self._query_cancelled = True
+        self._connection.connection.cancel()
+
+    def reset_cancellation(self) -> None:
+        """Permit queries again after cancel_query()."""
+        self._query_cancelled = False
+
     def execute_statement(self, statement):
         """Execute a raw SQLAlchemy statement, without flushing the upsert buffer."""
         return self._connection.execute(statement)
 
+    def copy_into_temporary_table(self, table: sa.Table, rows: Iterable[Iterable[Any]]) -> None:
+        """
+        Fill a temporary table with rows, using COPY.
+        The table is created if it does not exist yet in this transaction,
+        and emptied if it does. Temporary tables are dropped on commit.
+        Rows must have values in the same order as the table columns.
+        """
+        self.execute_statement(sa.schema.CreateTable(table, if_not_exists=True))
+        self.execute_statement(sa.text(f"TRUNCATE {table.name}"))
+        rows_csv = StringIO()
+        csv.writer(rows_csv).writerows(rows)
+        rows_csv.seek(0)
+        postgres_copy.copy_from(
+            rows_csv, table, self._connection, columns=[c.name for c in table.columns], format="csv"
+        )
+        self.execute_statement(sa.text(f"ANALYZE {table.name}"))
+
     def upsert_rpsl_object(
         self,
         rpsl_object: RPSLObject,
@@ -266,6 +418,9 @@ class DatabaseHandler:
         If rpsl_guaranteed_no_existing is set to True, the caller guarantees that this
         PK is unique in the database. This essentially only applies to inserting
         RPKI psuedo-IRR objects.
+
+        If the source is being reloaded with start_rpsl_staging(), the object
+        is written to the staging table instead.
         """
         self._check_write_permitted()
         if not rpsl_guaranteed_no_existing:
@@ -289,12 +444,14 @@ class DatabaseHandler:
             self._flush_rpsl_object_writing_buffer()
 
         update_time = datetime.now(timezone.utc)
+        object_text = rpsl_object.render_rpsl_text(last_modified=update_time)
         object_dict = {
             "rpsl_pk": rpsl_object.pk(),
             "source": source,
             "object_class": rpsl_object.rpsl_object_class,
             "parsed_data": rpsl_object.parsed_data,
-            "object_text": rpsl_object.render_rpsl_text(last_modified=update_time),
+            "object_text": object_text,
+            "content_hash": rpsl_content_hash(object_text),
             "ip_version": rpsl_object.ip_version(),
             "ip_first": ip_first,
             "ip_last": ip_last,
@@ -311,13 +468,19 @@ class DatabaseHandler:
         if forced_created_value:
             object_dict["created"] = forced_created_value
 
-        self._rpsl_upsert_buffer.append((object_dict, origin, source_serial))
-
-        self._rpsl_pk_source_seen.add(rpsl_pk_source)
         self.changed_objects_tracker.object_modified(
             rpsl_object.rpsl_object_class, rpsl_object.source(), rpsl_object.prefix
         )
 
+        if source == self._rpsl_staging_source:
+            self._rpsl_staging_buffer.append(object_dict)
+            if len(self._rpsl_staging_buffer) > MAX_RECORDS_BUFFER_BEFORE_INSERT:
+                self._flush_rpsl_staging_buffer()
+            return
+
+        self._rpsl_upsert_buffer.append((object_dict, origin, source_serial))
+        self._rpsl_pk_source_seen.add(rpsl_pk_source)
+
         if len(self._rpsl_upsert_buffer) > MAX_RECORDS_BUFFER_BEFORE_INSERT:
             self._flush_rpsl_object_writing_buffer()
 
@@ -357,60 +520,44 @@ class DatabaseHandler:
         on RPKI status.
         """
         self._check_write_permitted()
-        table = RPSLDatabaseObject.__table__
-        if rpsl_objs_now_valid:
-            pks = {o["pk"] for o in rpsl_objs_now_valid}
-            stmt = table.update().where(table.c.pk.in_(pks)).values(rpki_status=RPKIStatus.valid)
-            self.execute_statement(stmt)
-        if rpsl_objs_now_invalid:
-            pks = {o["pk"] for o in rpsl_objs_now_invalid}
-            stmt = table.update().where(table.c.pk.in_(pks)).values(rpki_status=RPKIStatus.invalid)
-            self.execute_statement(stmt)
-        if rpsl_objs_now_not_found:
-            pks = {o["pk"] for o in rpsl_objs_now_not_found}
-            stmt = table.update().where(table.c.pk.in_(pks)).values(rpki_status=RPKIStatus.not_found)
-            self.execute_statement(stmt)
-
-        for rpsl_obj in rpsl_objs_now_valid + rpsl_objs_now_not_found:
-            visible_previously = object_is_visible(
+        self._update_status_column("pk", rpsl_objs_now_valid, rpki_status=RPKIStatus.valid)
+        self._update_status_column("pk", rpsl_objs_now_invalid, rpki_status=RPKIStatus.invalid)
+        self._update_status_column("pk", rpsl_objs_now_not_found, rpki_status=RPKIStatus.not_found)
+
+        rpsl_objs_now_visible = [
+            rpsl_obj
+            for rpsl_obj in rpsl_objs_now_valid + rpsl_objs_now_not_found
+            if not object_is_visible(
                 rpki_status=rpsl_obj["old_status"],
                 scopefilter_status=rpsl_obj["scopefilter_status"],
                 route_preference_status=rpsl_obj["route_preference_status"],
             )
-            visible_now = object_is_visible(
+            and object_is_visible(
                 rpki_status=rpsl_obj["rpki_status"],
                 scopefilter_status=rpsl_obj["scopefilter_status"],
                 route_preference_status=rpsl_obj["route_preference_status"],
             )
-            if visible_now and not visible_previously:
-                self.status_tracker.record_operation_from_rpsl_dict(
-                    operation=DatabaseOperation.add_or_update,
-                    origin=JournalEntryOrigin.rpki_status,
-                    rpsl_obj=rpsl_obj,
-                )
-                self.changed_objects_tracker.object_modified_dict(
-                    rpsl_obj, origin=JournalEntryOrigin.rpki_status
-                )
-        for rpsl_obj in rpsl_objs_now_invalid:
-            visible_previously = object_is_visible(
+        ]
+        rpsl_objs_now_invisible = [
+            rpsl_obj
+            for rpsl_obj in rpsl_objs_now_invalid
+            if object_is_visible(
                 rpki_status=rpsl_obj["old_status"],
                 scopefilter_status=rpsl_obj["scopefilter_status"],
                 route_preference_status=rpsl_obj["route_preference_status"],
             )
-            visible_now = object_is_visible(
+            and not object_is_visible(
                 rpki_status=rpsl_obj["rpki_status"],
                 scopefilter_status=rpsl_obj["scopefilter_status"],
                 route_preference_status=rpsl_obj["route_preference_status"],
             )
-            if not visible_now and visible_previously:
-                self.status_tracker.record_operation_from_rpsl_dict(
-                    operation=DatabaseOperation.delete,
-                    origin=JournalEntryOrigin.rpki_status,
-                    rpsl_obj=rpsl_obj,
-                )
-                self.changed_objects_tracker.object_modified_dict(
-                    rpsl_obj, origin=JournalEntryOrigin.rpki_status
-                )
+        ]
+        self._record_status_change(
+            DatabaseOperation.add_or_update, JournalEntryOrigin.rpki_status, rpsl_objs_now_visible
+        )
+        self._record_status_change(
+            DatabaseOperation.delete, JournalEntryOrigin.rpki_status, rpsl_objs_now_invisible
+        )
 
     def update_scopefilter_status(
         self,
@@ -427,73 +574,50 @@ class DatabaseHandler:
         on scopefilter status.
         """
         self._check_write_permitted()
-        table = RPSLDatabaseObject.__table__
-        if rpsl_objs_now_in_scope:
-            pks = {o["rpsl_pk"] for o in rpsl_objs_now_in_scope}
-            stmt = (
-                table.update()
-                .where(table.c.rpsl_pk.in_(pks))
-                .values(scopefilter_status=ScopeFilterStatus.in_scope)
-            )
-            self.execute_statement(stmt)
-        if rpsl_objs_now_out_scope_as:
-            pks = {o["rpsl_pk"] for o in rpsl_objs_now_out_scope_as}
-            stmt = (
-                table.update()
-                .where(table.c.rpsl_pk.in_(pks))
-                .values(scopefilter_status=ScopeFilterStatus.out_scope_as)
-            )
-            self.execute_statement(stmt)
-        if rpsl_objs_now_out_scope_prefix:
-            pks = {o["rpsl_pk"] for o in rpsl_objs_now_out_scope_prefix}
-            stmt = (
-                table.update()
-                .where(table.c.rpsl_pk.in_(pks))
-                .values(scopefilter_status=ScopeFilterStatus.out_scope_prefix)
-            )
-            self.execute_statement(stmt)
+        self._update_status_column(
+            "rpsl_pk", rpsl_objs_now_in_scope, scopefilter_status=ScopeFilterStatus.in_scope
+        )
+        self._update_status_column(
+            "rpsl_pk", rpsl_objs_now_out_scope_as, scopefilter_status=ScopeFilterStatus.out_scope_as
+        )
+        self._update_status_column(
+            "rpsl_pk", rpsl_objs_now_out_scope_prefix, scopefilter_status=ScopeFilterStatus.out_scope_prefix
+        )
 
-        for rpsl_obj in rpsl_objs_now_in_scope:
-            visible_previously = object_is_visible(
+        rpsl_objs_now_visible = [
+            rpsl_obj
+            for rpsl_obj in rpsl_objs_now_in_scope
+            if not object_is_visible(
                 scopefilter_status=rpsl_obj["old_status"],
                 rpki_status=rpsl_obj["rpki_status"],
                 route_preference_status=rpsl_obj["route_preference_status"],
             )
-            visible_now = object_is_visible(
+            and object_is_visible(
                 scopefilter_status=rpsl_obj["scopefilter_status"],
                 rpki_status=rpsl_obj["rpki_status"],
                 route_preference_status=rpsl_obj["route_preference_status"],
             )
-            if visible_now and not visible_previously:
-                self.status_tracker.record_operation_from_rpsl_dict(
-                    operation=DatabaseOperation.add_or_update,
-                    origin=JournalEntryOrigin.scope_filter,
-                    rpsl_obj=rpsl_obj,
-                )
-                self.changed_objects_tracker.object_modified_dict(
-                    rpsl_obj, origin=JournalEntryOrigin.scope_filter
-                )
-
-        for rpsl_obj in rpsl_objs_now_out_scope_as + rpsl_objs_now_out_scope_prefix:
-            visible_previously = object_is_visible(
+        ]
+        rpsl_objs_now_invisible = [
+            rpsl_obj
+            for rpsl_obj in rpsl_objs_now_out_scope_as + rpsl_objs_now_out_scope_prefix
+            if object_is_visible(
                 scopefilter_status=rpsl_obj["old_status"],
                 rpki_status=rpsl_obj["rpki_status"],
                 route_preference_status=rpsl_obj["route_preference_status"],
             )
-            visible_now = object_is_visible(
+            and not object_is_visible(
                 scopefilter_status=rpsl_obj["scopefilter_status"],
                 rpki_status=rpsl_obj["rpki_status"],
                 route_preference_status=rpsl_obj["route_preference_status"],
             )
-            if not visible_now and visible_previously:
-                self.status_tracker.record_operation_from_rpsl_dict(
-                    operation=DatabaseOperation.delete,
-                    origin=JournalEntryOrigin.scope_filter,
-                    rpsl_obj=rpsl_obj,
-                )
-                self.changed_objects_tracker.object_modified_dict(
-                    rpsl_obj, origin=JournalEntryOrigin.scope_filter
-                )
+        ]
+        self._record_status_change(
+            DatabaseOperation.add_or_update, JournalEntryOrigin.scope_filter, rpsl_objs_now_visible
+        )
+        self._record_status_change(
+            DatabaseOperation.delete, JournalEntryOrigin.scope_filter, rpsl_objs_now_invisible
+        )
 
     def update_route_preference_status(
         self,
@@ -511,54 +635,75 @@ class DatabaseHandler:
 
         self._check_write_permitted()
 
-        # Note that these loops are slightly simpler than for RPKI/scope filter,
+        # Note that this is slightly simpler than for RPKI/scope filter,
         # because route preference only has two statuses: visible or suppressed.
-        for rpsl_obj in rpsl_objs_now_visible:
-            if object_is_visible(
-                rpki_status=rpsl_obj["rpki_status"], scopefilter_status=rpsl_obj["scopefilter_status"]
-            ):
-                self.status_tracker.record_operation_from_rpsl_dict(
-                    operation=DatabaseOperation.add_or_update,
-                    origin=JournalEntryOrigin.route_preference,
-                    rpsl_obj=rpsl_obj,
+        self._record_status_change(
+            DatabaseOperation.add_or_update,
+            JournalEntryOrigin.route_preference,
+            [
+                rpsl_obj
+                for rpsl_obj in rpsl_objs_now_visible
+                if object_is_visible(
+                    rpki_status=rpsl_obj["rpki_status"], scopefilter_status=rpsl_obj["scopefilter_status"]
                 )
-                self.changed_objects_tracker.object_modified_dict(
-                    rpsl_obj, origin=JournalEntryOrigin.route_preference
+            ],
+        )
+        self._record_status_change(
+            DatabaseOperation.delete,
+            JournalEntryOrigin.route_preference,
+            [
+                rpsl_obj
+                for rpsl_obj in rpsl_objs_now_suppressed
+                if object_is_visible(
+                    rpki_status=rpsl_obj["rpki_status"], scopefilter_status=rpsl_obj["scopefilter_status"]
                 )
+            ],
+        )
 
-        for rpsl_obj in rpsl_objs_now_suppressed:
-            if object_is_visible(
-                rpki_status=rpsl_obj["rpki_status"], scopefilter_status=rpsl_obj["scopefilter_status"]
-            ):
-                self.status_tracker.record_operation_from_rpsl_dict(
-                    operation=DatabaseOperation.delete,
-                    origin=JournalEntryOrigin.route_preference,
-                    rpsl_obj=rpsl_obj,
-                )
-                self.changed_objects_tracker.object_modified_dict(
-                    rpsl_obj, origin=JournalEntryOrigin.route_preference
-                )
+        self._update_status_column(
+            "pk", rpsl_objs_now_visible, route_preference_status=RoutePreferenceStatus.visible
+        )
+        self._update_status_column(
+            "pk", rpsl_objs_now_suppressed, route_preference_status=RoutePreferenceStatus.suppressed
+        )
 
+    def _update_status_column(self, key_column: str, rpsl_objs: list[dict[str, Any]], **values) -> None:
+        """
+        Update status columns to the given values, for all objects whose
+        key_column (pk or rpsl_pk) matches one of rpsl_objs.
+
+        Small sets use a plain IN list. For large sets, the keys are copied
+        into a temporary table and updated with a single UPDATE .. FROM,
+        as huge IN lists are slow to plan and produce enormous statements.
+        """
+        if not rpsl_objs:
+            return
         table = RPSLDatabaseObject.__table__
-        if rpsl_objs_now_visible:
-            for chunk in chunked_iterable(rpsl_objs_now_visible, ROUTEPREF_STATUS_UPDATE_CHUNK_SIZE):
-                pks = {o["pk"] for o in chunk}
-                stmt = (
-                    table.update()
-                    .where(table.c.pk.in_(pks))
-                    .values(route_preference_status=RoutePreferenceStatus.visible)
-                )
-                self.execute_statement(stmt)
-
-        if rpsl_objs_now_suppressed:
-            for chunk in chunked_iterable(rpsl_objs_now_suppressed, ROUTEPREF_STATUS_UPDATE_CHUNK_SIZE):
-                pks = {o["pk"] for o in chunk}
-                stmt = (
-                    table.update()
-                    .where(table.c.pk.in_(pks))
-                    .values(route_preference_status=RoutePreferenceStatus.suppressed)
-                )
-                self.execute_statement(stmt)
+        keys = {o[key_column] for o in rpsl_objs}
+        if len(keys) < BULK_STATUS_UPDATE_MIN_SIZE:
+            stmt = table.update().where(table.c[key_column].in_(keys)).values(**values)
+        else:
+            keys_table = TEMPORARY_TABLE_STATUS_KEYS[key_column]
+            self.copy_into_temporary_table(keys_table, ((key,) for key in keys))
+            stmt = table.update().where(table.c[key_column] == keys_table.c.key).values(**values)
+        self.execute_statement(stmt)
+
+    def _record_status_change(
+        self, operation: DatabaseOperation, origin: JournalEntryOrigin, rpsl_objs: list[dict[str, Any]]
+    ) -> None:
+        """
+        Record a change in visibility of rpsl_objs due to a status change,
+        in the journal and changed objects tracker.
+        """
+        if not rpsl_objs:
+            return
+        self.status_tracker.record_operations_from_rpsl_dicts(
+            operation=operation,
+            origin=origin,
+            rpsl_objs=rpsl_objs,
+        )
+        for rpsl_obj in rpsl_objs:
+            self.changed_objects_tracker.object_modified_dict(rpsl_obj, origin=origin)
 
     def delete_rpsl_object(
         self,
@@ -607,6 +752,8 @@ class DatabaseHandler:
             return None
 
         result = results.fetchone()
+        if lookup_table_enabled():
+            delete_rpsl_object_lookups(self._connection, [(result.source, result.pk)])
         self.status_tracker.record_operation(
             operation=DatabaseOperation.delete,
             rpsl_pk=result.rpsl_pk,
@@ -616,6 +763,7 @@ class DatabaseHandler:
             origin=origin,
             source_serial=source_serial,
         )
+        self.status_tracker.record_object_count_change(result.source, result.object_class, -1)
         self.changed_objects_tracker.object_modified_dict(result._mapping, origin)
 
         if (
@@ -632,6 +780,72 @@ class DatabaseHandler:
                 )
             )
 
+    def delete_rpsl_objects(
+        self,
+        origin: JournalEntryOrigin,
+        source: str,
+        deletions: list[tuple[str, str, int | None]],
+    ) -> None:
+        """
+        Delete multiple RPSL objects from a source from the database,
+        in a single statement. Each deletion is a tuple of RPSL PK,
+        object class, and the source serial of the deletion, if any.
+
+        This has the same effect as calling delete_rpsl_object() for
+        each deletion in order, including journal entries in that order.
+        """
+        if not deletions:
+            return
+        self._check_write_permitted()
+        self._flush_rpsl_object_writing_buffer()
+        table = RPSLDatabaseObject.__table__
+        stmt = (
+            table.delete()
+            .where(
+                sa.and_(
+                    table.c.source == source,
+                    sa.tuple_(table.c.rpsl_pk, table.c.object_class).in_(
+                        {(rpsl_pk, object_class) for rpsl_pk, object_class, _ in deletions}
+                    ),
+                ),
+            )
+            .returning(
+                table.c.pk,
+                table.c.rpsl_pk,
+                table.c.source,
+                table.c.object_class,
+                table.c.prefix,
+                table.c.object_text,
+            )
+        )
+        results = {
+            (result.rpsl_pk, result.object_class): result
+            for result in self.execute_statement(stmt).fetchall()
+        }
+        if lookup_table_enabled():
+            delete_rpsl_object_lookups(
+                self._connection, [(result.source, result.pk) for result in results.values()]
+            )
+
+        for rpsl_pk, object_class, source_serial in deletions:
+            result = results.pop((rpsl_pk, object_class), None)
+            if not result:
+                logger.error(
+                    f"Attempted to remove/suspend object {rpsl_pk}/{source}, but no database row matched"
+                )
+                continue
+            self.status_tracker.record_operation(
+                operation=DatabaseOperation.delete,
+                rpsl_pk=result.rpsl_pk,
+                source=result.source,
+                object_class=result.object_class,
+                object_text=result.object_text,
+                origin=origin,
+                source_serial=source_serial,
+            )
+            self.status_tracker.record_object_count_change(result.source, result.object_class, -1)
+            self.changed_objects_tracker.object_modified_dict(result._mapping, origin)
+
     def suspend_rpsl_object(self, pk_uuid: str) -> None:
         """
         Suspend an RPSL object from the database.
@@ -667,6 +881,8 @@ class DatabaseHandler:
             raise ValueError(f"Attempt to suspend obect with PK {pk_uuid} which does not exist")
 
         result = results.fetchone()
+        if lookup_table_enabled():
+            delete_rpsl_object_lookups(self._connection, [(result.source, result.pk)])
 
         self.execute_statement(
             RPSLDatabaseObjectSuspended.__table__.insert().values(
@@ -689,6 +905,7 @@ class DatabaseHandler:
             origin=JournalEntryOrigin.suspension,
             source_serial=None,
         )
+        self.status_tracker.record_object_count_change(result.source, result.object_class, -1)
         self.changed_objects_tracker.object_modified_dict(
             result._mapping, origin=JournalEntryOrigin.suspension
         )
@@ -720,7 +937,13 @@ class DatabaseHandler:
         self._check_write_permitted()
 
         rpsl_composite_key = ["rpsl_pk", "source", "object_class"]
-        stmt = pg.insert(RPSLDatabaseObject).values([x[0] for x in self._rpsl_upsert_buffer])
+        # The pk is only set for newly inserted rows, not for updated rows, which
+        # is used to keep the object counts up to date. This can not use xmax,
+        # as system columns can not be returned from partitioned tables.
+        new_pks = [uuid.uuid4() for _ in self._rpsl_upsert_buffer]
+        stmt = pg.insert(RPSLDatabaseObject).values(
+            [dict(x[0], pk=new_pk) for x, new_pk in zip(self._rpsl_upsert_buffer, new_pks)]
+        )
 
         if not self._rpsl_guaranteed_no_existing:
             columns_to_update = {
@@ -732,13 +955,27 @@ class DatabaseHandler:
                 set_=columns_to_update,
             )
 
+        stmt = stmt.returning(
+            RPSLDatabaseObject.__table__.c.pk,
+            RPSLDatabaseObject.__table__.c.source,
+            RPSLDatabaseObject.__table__.c.object_class,
+        )
+
         try:
-            self._connection.execute(stmt)
+            results = self._connection.execute(stmt)
         except Exception as exc:  # pragma: no cover
             self._transaction.rollback()
             logger.error(f"Exception occurred while executing statement: {stmt}, rolling back", exc_info=exc)
             raise
 
+        new_pks_set = set(new_pks)
+        upserted = results.fetchall()
+        for result in upserted:
+            if result.pk in new_pks_set:
+                self.status_tracker.record_object_count_change(result.source, result.object_class, 1)
+        if lookup_table_enabled():
+            refresh_rpsl_object_lookups(self._connection, [(result.source, result.pk) for result in upserted])
+
         for obj, origin, source_serial in self._rpsl_upsert_buffer:
             # Suppressed objects through RPKI, scope filter or status should
             # not generate an NRTM entry as mirrors should not see them.
@@ -785,12 +1022,52 @@ class DatabaseHandler:
         postgres_copy.copy_from(roa_csv, ROADatabaseObject, self._connection, columns=columns, format="csv")
         self._roa_insert_buffer = []
 
+    def create_journal_partitions(self, source: str, months: list[datetime]) -> list[str]:
+        """
+        Create the journal partitions for a source and months, if they do not exist.
+        Fails if the journal table can not be locked within PARTITION_LOCK_TIMEOUT,
+        which applies to the rest of the transaction.
+        Returns the names of the created partitions.
+        """
+        self._check_write_permitted()
+        self._flush_rpsl_object_writing_buffer()
+        self._connection.execute(sa.text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}s'"))
+        return create_journal_partitions(self._connection, source, months)
+
+    def create_rpsl_objects_partition(self, source: str) -> bool:
+        """
+        Create the RPSL objects partition for a source, if it does not exist.
+        Fails if the objects table can not be locked within PARTITION_LOCK_TIMEOUT,
+        which applies to the rest of the transaction.
+        Returns whether the partition was created.
+        """
+        self._check_write_permitted()
+        self._flush_rpsl_object_writing_buffer()
+        self._connection.execute(sa.text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}s'"))
+        return create_rpsl_objects_partition(self._connection, source)
+
+    def rebuild_rpsl_object_lookups(self) -> None:
+        """
+        Rebuild the lookup table from the parsed data of all objects,
+        which is needed after enabling lookup_index_table.
+        Other writers are blocked until commit, but queries keep using
+        the current contents of the table until then.
+        """
+        self._check_write_permitted()
+        self._flush_rpsl_object_writing_buffer()
+        self._connection.execute(sa.text(f"LOCK TABLE {RPSLObjectLookup.__tablename__} IN EXCLUSIVE MODE"))
+        self._connection.execute(RPSLObjectLookup.__table__.delete())
+        insert_rpsl_object_lookups(self._connection)
+
     def delete_journal_entries_before_date(self, timestamp: datetime, source: str):
         """
         Expire journal entries older than a certain timestamp.
+        Partitions of entire months before the timestamp are dropped,
+        remaining entries are deleted.
         """
         self._check_write_permitted()
         self._flush_rpsl_object_writing_buffer()
+        drop_journal_partitions_before(self._connection, source, timestamp)
         table = RPSLDatabaseJournal.__table__
         stmt = table.delete().where(sa.and_(table.c.source == source, table.c.timestamp < timestamp))
         self._connection.execute(stmt)
@@ -807,6 +1084,15 @@ class DatabaseHandler:
         table = RPSLDatabaseObject.__table__
         stmt = table.delete().where(table.c.source == source)
         self._connection.execute(stmt)
+        if lookup_table_enabled():
+            delete_rpsl_object_lookups_for_source(self._connection, source)
+        self._delete_journal_and_status(source, journal_guaranteed_empty)
+
+    def _delete_journal_and_status(self, source: str, journal_guaranteed_empty=False) -> None:
+        """
+        Delete all journal entries, the database status and the
+        object counts of a source, as part of deleting all its objects.
+        """
         if not journal_guaranteed_empty:
             table = RPSLDatabaseJournal.__table__
             stmt = table.delete().where(table.c.source == source)
@@ -814,9 +1100,137 @@ class DatabaseHandler:
         table = RPSLDatabaseStatus.__table__
         stmt = table.delete().where(table.c.source == source)
         self._connection.execute(stmt)
+        self.status_tracker.reset_object_counts(source)
         # All objects are presumed to have been changed.
         self.changed_objects_tracker.all_object_classes_updated()
 
+    def start_rpsl_staging(self, source: str) -> None:
+        """
+        Start a full reload of a source through a staging table.
+
+        Until commit, objects for this source passed to upsert_rpsl_object()
+        are copied into a temporary staging table, and the current objects
+        of the source are left untouched. On commit, the staged objects are
+        copied into a new table, including all indexes. The journal entries and
+        status of the source are deleted, as in delete_all_rpsl_objects_with_journal(),
+        and the new table replaces the partition of the source in rpsl_objects.
+        If the same object was staged multiple times, the last version is kept.
+
+        This keeps the current objects available and unlocked for all but
+        the final step of a long import, and avoids individual upserts and
+        deletions. Staged objects can not be queried before commit.
+        """
+        self._check_write_permitted()
+        self._flush_rpsl_object_writing_buffer()
+        self.execute_statement(sa.schema.CreateTable(TEMPORARY_TABLE_RPSL_STAGING, if_not_exists=True))
+        self.execute_statement(sa.text(f"TRUNCATE {TEMPORARY_TABLE_RPSL_STAGING.name}"))
+        self._rpsl_staging_source = source
+        self._rpsl_staging_buffer = []
+
+    def _flush_rpsl_staging_buffer(self) -> None:
+        """
+        Flush the staging buffer into the staging table, using COPY.
+        """
+        if not self._rpsl_staging_buffer:
+            return
+
+        def csv_value(value):
+            if isinstance(value, dict):
+                return json.dumps(value)
+            if isinstance(value, enum.Enum):
+                return value.name
+            if isinstance(value, datetime):
+                return value.isoformat()
+            return value
+
+        rows_csv = StringIO()
+        csv.writer(rows_csv).writerows(
+            [csv_value(obj.get(column)) for column in RPSL_STAGING_COLUMNS]
+            for obj in self._rpsl_staging_buffer
+        )
+        rows_csv.seek(0)
+        postgres_copy.copy_from(
+            rows_csv,
+            TEMPORARY_TABLE_RPSL_STAGING,
+            self._connection,
+            columns=RPSL_STAGING_COLUMNS,
+            format="csv",
+        )
+        self._rpsl_staging_buffer = []
+
+    def _complete_rpsl_staging(self) -> None:
+        """
+        Replace the objects of the source being staged, if any,
+        with those in the staging table. Called from commit().
+        """
+        source = self._rpsl_staging_source
+        if not source:
+            return
+        self._flush_rpsl_staging_buffer()
+
+        c_staging = TEMPORARY_TABLE_RPSL_STAGING.c
+        staged_objects = (
+            sa.select(
+                *[
+                    (
+                        sa.func.coalesce(c_staging.created, sa.func.now())
+                        if column == "created"
+                        else c_staging[column]
+                    )
+                    for column in RPSL_STAGING_COLUMNS
+                ]
+            )
+            .distinct(c_staging.rpsl_pk, c_staging.object_class)
+            .order_by(c_staging.rpsl_pk, c_staging.object_class, c_staging.position.desc())
+        )
+        reload_table_name = create_rpsl_objects_reload_table(self._connection, source)
+        reload_table = sa.table(reload_table_name, *[sa.column(column) for column in RPSL_STAGING_COLUMNS])
+        self.execute_statement(reload_table.insert().from_select(RPSL_STAGING_COLUMNS, staged_objects))
+        object_counts = self.execute_statement(
+            sa.select(reload_table.c.object_class, sa.func.count()).group_by(reload_table.c.object_class)
+        ).fetchall()
+        create_rpsl_objects_reload_table_indexes(self._connection, reload_table_name)
+
+        if lookup_table_enabled():
+            delete_rpsl_object_lookups_for_source(self._connection, source)
+            insert_rpsl_object_lookups(self._connection, objects_table=reload_table_name)
+
+        self._delete_journal_and_status(source)
+        self._replace_rpsl_objects_partition(source, reload_table_name)
+        for object_class, count in object_counts:
+            self.status_tracker.record_object_count_change(source, object_class, count)
+        self.status_tracker.record_rpsl_data_updated(source)
+        self._rpsl_staging_source = None
+
+    def _replace_rpsl_objects_partition(self, source: str, reload_table_name: str) -> None:
+        """
+        Replace the RPSL objects partition of source with the reload table.
+        This needs a lock on rpsl_objects, and all other queries on it queue
+        behind a waiting lock request, so each attempt gives up after
+        PARTITION_LOCK_TIMEOUT. After PARTITION_REPLACE_ATTEMPTS, the
+        transaction is rolled back and RPSLObjectsPartitionLockError raised.
+        """
+        self._connection.execute(sa.text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}s'"))
+        for attempt in range(1, PARTITION_REPLACE_ATTEMPTS + 1):
+            try:
+                with self._connection.begin_nested():
+                    replace_rpsl_objects_partition(self._connection, source, reload_table_name)
+                return
+            except sa.exc.OperationalError as exc:
+                if getattr(exc.orig, "pgcode", None) != PGCODE_LOCK_NOT_AVAILABLE:
+                    raise
+                logger.warning(
+                    f"Unable to lock RPSL objects to replace the partition of {source}, "
+                    f"attempt {attempt} of {PARTITION_REPLACE_ATTEMPTS}"
+                )
+            if attempt < PARTITION_REPLACE_ATTEMPTS:
+                time.sleep(PARTITION_REPLACE_RETRY_DELAY)
+
+        self.rollback()
+        raise RPSLObjectsPartitionLockError(
+            f"Unable to lock RPSL objects to replace the partition of {source}, reload cancelled"
+        )
+
     def delete_all_roa_objects(self):
         """
         Delete all ROA objects from the database.
@@ -957,6 +1371,7 @@ class DatabaseStatusTracker:
     _exported_serials: dict[str, int]
     _nrtm4_client_status: dict[str, NRTM4ClientDatabaseStatus]
     _nrtm4_server_status: dict[str, NRTM4ServerDatabaseStatus]
+    _object_count_changes: dict[tuple[str, str], int]
     _journal_table_locked = False
 
     c_journal = RPSLDatabaseJournal.__table__.c
@@ -1006,6 +1421,32 @@ class DatabaseStatusTracker:
         self._sources_seen.add(source)
         self._nrtm4_server_status[source] = status
 
+    def record_object_count_change(self, source: str, object_class: str, change: int) -> None:
+        """
+        Record a change in the number of objects of an object class in a source,
+        e.g. -1 for a deleted object. Changes are written in finalise_transaction().
+        """
+        self._object_count_changes[(source, object_class)] += change
+
+    def record_rpsl_data_updated(self, source: str) -> None:
+        """
+        Record that RPSL objects in a source were changed,
+        without recording individual operations.
+        """
+        self._sources_seen.add(source)
+        self._sources_rpsl_data_updated.add(source)
+
+    def reset_object_counts(self, source: str) -> None:
+        """
+        Reset the object counts for a source to zero, typically
+        after all objects for the source were deleted.
+        """
+        for key in list(self._object_count_changes):
+            if key[0] == source:
+                del self._object_count_changes[key]
+        table = RPSLObjectClassCount.__table__
+        self.database_handler.execute_statement(table.delete().where(table.c.source == source))
+
     def record_operation_from_rpsl_dict(
         self, operation: DatabaseOperation, rpsl_obj: dict[str, Any], origin: JournalEntryOrigin
     ) -> None:
@@ -1023,6 +1464,84 @@ class DatabaseStatusTracker:
             source_serial=None,
         )
 
+    def record_operations_from_rpsl_dicts(
+        self, operation: DatabaseOperation, rpsl_objs: list[dict[str, Any]], origin: JournalEntryOrigin
+    ) -> None:
+        """
+        Record the same operation for many RPSL object dicts, typically
+        from a change in RPKI, scope filter or route preference status.
+
+        For large numbers of objects in a source with a journal, the journal
+        entries are created with one INSERT .. SELECT per source from a
+        temporary table, rather than one INSERT per object. The NRTM serials
+        are assigned consecutively in the order of rpsl_objs.
+        """
+        rpsl_objs_per_source = defaultdict(list)
+        for rpsl_obj in rpsl_objs:
+            rpsl_objs_per_source[rpsl_obj["source"]].append(rpsl_obj)
+
+        for source, source_rpsl_objs in rpsl_objs_per_source.items():
+            serial_nrtm_first = None
+            if (
+                len(source_rpsl_objs) >= BULK_STATUS_UPDATE_MIN_SIZE
+                and self.journaling_enabled
+                and get_setting(f"sources.{source}.keep_journal")
+                and not self._is_serial_synchronised(source)
+            ):
+                self._lock_journal_table()
+                serial_nrtm_first = self._next_serial_nrtm(source)
+                if not isinstance(serial_nrtm_first, int):
+                    serial_nrtm_first = self.database_handler.execute_statement(
+                        sa.select(serial_nrtm_first)
+                    ).scalar()
+
+            if serial_nrtm_first is None:
+                for rpsl_obj in source_rpsl_objs:
+                    self.record_operation_from_rpsl_dict(
+                        operation=operation, rpsl_obj=rpsl_obj, origin=origin
+                    )
+                continue
+
+            self._sources_seen.add(source)
+            self._sources_rpsl_data_updated.add(source)
+            self.database_handler.copy_into_temporary_table(
+                TEMPORARY_TABLE_JOURNAL,
+                (
+                    (position, rpsl_obj["rpsl_pk"], rpsl_obj["object_class"], rpsl_obj["object_text"])
+                    for position, rpsl_obj in enumerate(source_rpsl_objs)
+                ),
+            )
+            c_temporary = TEMPORARY_TABLE_JOURNAL.c
+            journal_entries = sa.select(
+                c_temporary.rpsl_pk,
+                sa.literal(source, sa.String),
+                sa.literal(operation, self.c_journal.operation.type),
+                c_temporary.object_class,
+                c_temporary.object_text,
+                sa.literal(serial_nrtm_first, sa.Integer) + c_temporary.position,
+                sa.literal(origin, self.c_journal.origin.type),
+                sa.literal(datetime.now(timezone.utc), self.c_journal.timestamp.type),
+            ).order_by(c_temporary.position)
+            stmt = (
+                RPSLDatabaseJournal.__table__.insert()
+                .from_select(
+                    [
+                        "rpsl_pk",
+                        "source",
+                        "operation",
+                        "object_class",
+                        "object_text",
+                        "serial_nrtm",
+                        "origin",
+                        "timestamp",
+                    ],
+                    journal_entries,
+                )
+                .returning(self.c_journal.serial_nrtm)
+            )
+            insert_results = self.database_handler.execute_statement(stmt)
+            self._new_serials_per_source[source].update(row.serial_nrtm for row in insert_results)
+
     def record_operation(
         self,
         operation: DatabaseOperation,
@@ -1046,31 +1565,13 @@ class DatabaseStatusTracker:
         self._sources_seen.add(source)
         self._sources_rpsl_data_updated.add(source)
         if self.journaling_enabled and get_setting(f"sources.{source}.keep_journal"):
-            serial_nrtm: Any  # int | None | sa.sql.expression.Select | sa.sql.expression.ScalarSelect
-            journal_tablename = RPSLDatabaseJournal.__tablename__
-
-            # Locking this table is one of the few ways to guarantee serial_global in order (#685)
-            if not self._journal_table_locked:
-                self.database_handler.execute_statement(
-                    sa.text(f"LOCK TABLE {journal_tablename} IN EXCLUSIVE MODE")
-                )
-                self._journal_table_locked = True
+            serial_nrtm: Any  # int | None | sa.sql.expression.ScalarSelect
+            self._lock_journal_table()
 
             if self._is_serial_synchronised(source):
                 serial_nrtm = source_serial
             else:
-                if source in self._new_serials_per_source and self._new_serials_per_source[source]:
-                    serial_nrtm = max(self._new_serials_per_source[source]) + 1
-                else:
-                    serial_nrtm = sa.select(
-                        sa.text("COALESCE(MAX(serial_nrtm), MAX(serial_newest_seen), 0) + 1")
-                    )
-                    serial_nrtm = serial_nrtm.select_from(
-                        RPSLDatabaseStatus.__table__.outerjoin(
-                            RPSLDatabaseJournal.__table__, self.c_status.source == self.c_journal.source
-                        )
-                    )
-                    serial_nrtm = serial_nrtm.where(self.c_status.source == source).scalar_subquery()
+                serial_nrtm = self._next_serial_nrtm(source)
 
             timestamp = datetime.now(timezone.utc)
 
@@ -1092,6 +1593,34 @@ class DatabaseStatusTracker:
 
             self._new_serials_per_source[source].add(insert_result.serial_nrtm)
 
+    def _lock_journal_table(self) -> None:
+        """
+        Lock the journal table for writing, if not already locked in this transaction.
+        Locking this table is one of the few ways to guarantee serial_global in order (#685)
+        """
+        if not self._journal_table_locked:
+            journal_tablename = RPSLDatabaseJournal.__tablename__
+            self.database_handler.execute_statement(
+                sa.text(f"LOCK TABLE {journal_tablename} IN EXCLUSIVE MODE")
+            )
+            self._journal_table_locked = True
+
+    def _next_serial_nrtm(self, source: str) -> int | sa.sql.expression.ScalarSelect:
+        """
+        Determine the next NRTM serial for a source that does not use
+        synchronised serials. This is either an int, if serials were already
+        created in this transaction, or a subquery otherwise.
+        """
+        if source in self._new_serials_per_source and self._new_serials_per_source[source]:
+            return max(self._new_serials_per_source[source]) + 1
+        serial_nrtm = sa.select(sa.text("COALESCE(MAX(serial_nrtm), MAX(serial_newest_seen), 0) + 1"))
+        serial_nrtm = serial_nrtm.select_from(
+            RPSLDatabaseStatus.__table__.outerjoin(
+                RPSLDatabaseJournal.__table__, self.c_status.source == self.c_journal.source
+            )
+        )
+        return serial_nrtm.where(self.c_status.source == source).scalar_subquery()
+
     def finalise_transaction(self):
         """
         - Create a new status object for all seen sources if it does not exist.
@@ -1099,6 +1628,7 @@ class DatabaseStatusTracker:
         - If new serials were recorded for a source, update the database
           serial stats in the status object.
         - Update the latest source errors.
+        - Update the object counts per object class.
         """
         for source in self._sources_seen:
             stmt = pg.insert(RPSLDatabaseStatus).values(
@@ -1235,6 +1765,21 @@ class DatabaseStatusTracker:
             )
             self.database_handler.execute_statement(stmt)
 
+        # Counts are updated in a consistent order, to avoid deadlocks
+        # with other transactions updating the same counts.
+        count_changes = [
+            {"source": source, "object_class": object_class, "count": change}
+            for (source, object_class), change in sorted(self._object_count_changes.items())
+            if change
+        ]
+        if count_changes:
+            stmt = pg.insert(RPSLObjectClassCount).values(count_changes)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["source", "object_class"],
+                set_={"count": RPSLObjectClassCount.__table__.c.count + stmt.excluded.count},
+            )
+            self.database_handler.execute_statement(stmt)
+
     def publish_event_stream(self):
         """
         Publish the changed sources to the event stream.
@@ -1262,6 +1807,7 @@ class DatabaseStatusTracker:
         self._exported_serials = dict()
         self._nrtm4_client_status = dict()
         self._nrtm4_server_status = dict()
+        self._object_count_changes = defaultdict(int)
         self._is_serial_synchronised.cache_clear()
 
 
@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import re
+from collections.abc import Iterable
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+from .models import RPSLDatabaseJournal
+
+"""
+Partitioning of the journal.
+
+The journal table is partitioned by list of source, and the partition
+of each source by range of the timestamp, per month. This keeps the
+indexes small, and allows expiring the journal by dropping partitions.
+Journal entries for sources or months without a partition are stored
+in a default partition. When a partition is created, entries in the
+default partition that belong in the new partition, are moved into it.
+"""
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_TABLE_NAME = RPSLDatabaseJournal.__tablename__
+JOURNAL_DEFAULT_PARTITION_NAME = f"{JOURNAL_TABLE_NAME}_default"
+# Partitions are created for the current month and this many months ahead
+JOURNAL_PARTITION_MONTHS_AHEAD = 1
+# PostgreSQL truncates longer identifiers
+MAX_IDENTIFIER_LENGTH = 63
+MONTH_SUFFIX_RE = re.compile(r"_(\d{4})_(\d{2})$")
+TEMPORARY_TABLE_MOVED_ENTRIES = "tmp_journal_partition_moved_entries"
+
+
+def month_start(timestamp: datetime) -> datetime:
+    """
+    Return the start of the month of timestamp, in UTC.
+    Timestamps without timezone are assumed to be in UTC.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month_start(timestamp: datetime) -> datetime:
+    """Return the start of the month after the month of timestamp, in UTC."""
+    month = month_start(timestamp)
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def journal_partition_name(source: str, month: datetime | None = None) -> str:
+    """
+    Return the name of the partition of source, or of the partition
+    for a month within that. Source names can not contain underscores,
+    so these never overlap with each other or with the default partition.
+    """
+    suffix = f"_{month_start(month):%Y_%m}" if month else ""
+    name = f"{JOURNAL_TABLE_NAME}_source_{source.lower().replace('-', '_')}{suffix}"
+    if len(name) > MAX_IDENTIFIER_LENGTH:
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+        name = f"{JOURNAL_TABLE_NAME}_source_{digest}{suffix}"
+    return name
+
+
+def journal_source_default_partition_name(source: str) -> str:
+    """Return the name of the partition for months without a partition of source."""
+    return journal_partition_name(source) + "_default"
+
+
+def create_journal_partitions(connection: Connection, source: str, months: Iterable[datetime]) -> list[str]:
+    """
+    Create the partition of source, if it does not exist yet, and the
+    partitions for the given months. Partitions are also created for
+    any months of entries of source that are in a default partition.
+    If any partition needs to be created, this locks the journal table.
+    Returns the names of the created partitions.
+    """
+    source_partition = journal_partition_name(source)
+    source_default_partition = journal_source_default_partition_name(source)
+    source_partition_exists = _table_exists(connection, source_partition)
+    default_partition = (
+        source_default_partition if source_partition_exists else JOURNAL_DEFAULT_PARTITION_NAME
+    )
+
+    months = {month_start(month) for month in months}
+    months.update(_months_in_partition(connection, default_partition, source))
+    missing_months = sorted(
+        month for month in months if not _table_exists(connection, journal_partition_name(source, month))
+    )
+    if source_partition_exists and not missing_months:
+        return []
+
+    connection.execute(sa.text(f"LOCK TABLE {JOURNAL_TABLE_NAME} IN ACCESS EXCLUSIVE MODE"))
+    created = []
+    if not source_partition_exists:
+        source_literal = "'" + source.replace("'", "''") + "'"
+        _create_partition(
+            connection,
+            [
+                (
+                    f"CREATE TABLE {source_partition} PARTITION OF {JOURNAL_TABLE_NAME} "
+                    f"FOR VALUES IN ({source_literal}) PARTITION BY RANGE (timestamp)"
+                ),
+                f"CREATE TABLE {source_default_partition} PARTITION OF {source_partition} DEFAULT",
+            ],
+            moved_from=JOURNAL_DEFAULT_PARTITION_NAME,
+            moved_condition="source = :source",
+            params={"source": source},
+        )
+        created += [source_partition, source_default_partition]
+
+    for month in missing_months:
+        month_partition = journal_partition_name(source, month)
+        _create_partition(
+            connection,
+            [
+                (
+                    f"CREATE TABLE {month_partition} PARTITION OF {source_partition} FOR VALUES "
+                    f"FROM ('{month.isoformat()}') TO ('{next_month_start(month).isoformat()}')"
+                ),
+            ],
+            moved_from=source_default_partition,
+            moved_condition="timestamp >= :start AND timestamp < :end",
+            params={"start": month, "end": next_month_start(month)},
+        )
+        created.append(month_partition)
+
+    logger.info(f"Created journal partitions for {source}: {', '.join(created)}")
+    return created
+
+
+def drop_journal_partitions_before(connection: Connection, source: str, timestamp: datetime) -> list[str]:
+    """
+    Drop the partitions of source for months that end on or before timestamp,
+    i.e. that only contain journal entries from before timestamp.
+    Returns the names of the dropped partitions.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    result = connection.execute(
+        sa.text("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :parent
+        """),
+        {"parent": journal_partition_name(source)},
+    )
+    dropped = []
+    for (partition_name,) in result.fetchall():
+        match = MONTH_SUFFIX_RE.search(partition_name)
+        if not match:
+            continue
+        month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+        if partition_name == journal_partition_name(source, month) and next_month_start(month) <= timestamp:
+            connection.execute(sa.text(f"DROP TABLE {partition_name}"))
+            dropped.append(partition_name)
+    return sorted(dropped)
+
+
+def _create_partition(
+    connection: Connection, statements: list[str], moved_from: str, moved_condition: str, params: dict
+) -> None:
+    """
+    Run statements to create a partition. Entries in default partition
+    moved_from that match moved_condition are moved out before creating it,
+    as PostgreSQL refuses to create it otherwise, and inserted again after.
+    """
+    connection.execute(
+        sa.text(f"CREATE TEMPORARY TABLE {TEMPORARY_TABLE_MOVED_ENTRIES} (LIKE {JOURNAL_TABLE_NAME})")
+    )
+    connection.execute(
+        sa.text(
+            f"WITH moved AS (DELETE FROM {moved_from} WHERE {moved_condition} RETURNING *) "
+            f"INSERT INTO {TEMPORARY_TABLE_MOVED_ENTRIES} SELECT * FROM moved"
+        ),
+        params,
+    )
+    for statement in statements:
+        connection.execute(sa.text(statement))
+    connection.execute(
+        sa.text(f"INSERT INTO {JOURNAL_TABLE_NAME} SELECT * FROM {TEMPORARY_TABLE_MOVED_ENTRIES}")
+    )
+    connection.execute(sa.text(f"DROP TABLE {TEMPORARY_TABLE_MOVED_ENTRIES}"))
+
+
+def _table_exists(connection: Connection, name: str) -> bool:
+    return connection.execute(sa.text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+
+def _months_in_partition(connection: Connection, partition_name: str, source: str) -> set[datetime]:
+    result = connection.execute(
+        sa.text(
+            f"SELECT DISTINCT date_trunc('month', timestamp AT TIME ZONE 'UTC') FROM {partition_name} "
+            "WHERE source = :source"
+        ),
+        {"source": source},
+    )
+    return {month.replace(tzinfo=timezone.utc) for (month,) in result.fetchall()}
@@ -111,6 +111,10 @@ class RPSLDatabaseObject(Base):  # type: ignore
 
     Note that SQLAlchemy does not require you to use the ORM for ORM
     objects - as that can be slower with large queries.
+
+    The table is partitioned by source, see irrd.storage.rpsl_object_partitions.
+    The partition key must be part of the primary key and any unique constraint,
+    so the primary key is pk and source, and references to objects include both.
     """
 
     __tablename__ = "rpsl_objects"
@@ -119,11 +123,13 @@ class RPSLDatabaseObject(Base):  # type: ignore
     # in alembic: op.execute('create EXTENSION if not EXISTS 'pgcrypto';')
     pk = sa.Column(pg.UUID(as_uuid=True), server_default=sa.text("gen_random_uuid()"), primary_key=True)
     rpsl_pk = sa.Column(sa.String, index=True, nullable=False)
-    source = sa.Column(sa.String, index=True, nullable=False)
+    source = sa.Column(sa.String, index=True, primary_key=True, nullable=False)
 
     object_class = sa.Column(sa.String, nullable=False, index=True)
     parsed_data = sa.Column(pg.JSONB, nullable=False)
     object_text = sa.Column(sa.Text, nullable=False)
+    # Hash of object_text without last-modified, see rpsl_content_hash()
+    content_hash = sa.Column(sa.String(64), nullable=True)
 
     ip_version = sa.Column(sa.Integer, index=True)
     ip_first = sa.Column(pg.INET, index=True)
@@ -173,15 +179,32 @@ class RPSLDatabaseObject(Base):  # type: ignore
             index_name = "ix_rpsl_objects_parsed_data_" + name.replace("-", "_")
             index_on = sa.text(f"(parsed_data->'{name}')")
             args.append(sa.Index(index_name, index_on, postgresql_using="gin"))
-        return tuple(args)
+        return tuple(args) + ({"postgresql_partition_by": "LIST (source)"},)
 
     def __repr__(self):
         return f"<{self.rpsl_pk}/{self.source}/{self.pk}>"
 
 
+# Objects for sources without a partition are kept here
+sa.event.listen(
+    RPSLDatabaseObject.__table__,
+    "after_create",
+    sa.DDL(
+        f"CREATE TABLE {RPSLDatabaseObject.__tablename__}_default "
+        f"PARTITION OF {RPSLDatabaseObject.__tablename__} DEFAULT"
+    ),
+)
+
+
 class RPSLDatabaseJournal(Base):  # type: ignore
     """
     SQLAlchemy ORM object for change history of RPSL database objects.
+
+    The journal is partitioned by source, and each source by month of
+    the timestamp, see irrd.storage.journal_partitions. The partition
+    keys must be part of the primary key and any unique constraint,
+    so serial_global and serial_nrtm are not enforced unique by the
+    database, but by locking the journal table when writing.
     """
 
     __tablename__ = "rpsl_database_journal"
@@ -200,41 +223,50 @@ class RPSLDatabaseJournal(Base):  # type: ignore
         server_default=serial_global_seq.next_value(),
         nullable=False,
         index=True,
-        unique=True,
     )
 
-    rpsl_pk = sa.Column(sa.String, index=True, nullable=False)
-    source = sa.Column(sa.String, index=True, nullable=False)
+    rpsl_pk = sa.Column(sa.String, nullable=False)
+    source = sa.Column(sa.String, primary_key=True, nullable=False)
     origin = sa.Column(
         sa.Enum(JournalEntryOrigin),
         nullable=False,
-        index=True,
         server_default=JournalEntryOrigin.unknown.name,
     )
 
-    serial_nrtm = sa.Column(sa.Integer, index=True, nullable=False)
+    serial_nrtm = sa.Column(sa.Integer, nullable=False)
     operation = sa.Column(sa.Enum(DatabaseOperation), nullable=False)
 
-    object_class = sa.Column(sa.String, nullable=False, index=True)
+    object_class = sa.Column(sa.String, nullable=False)
     object_text = sa.Column(sa.Text, nullable=False)
 
     # These objects are not mutable, so creation time is sufficient.
     timestamp = sa.Column(
-        sa.DateTime(timezone=True), server_default=sa.func.now(), index=True, nullable=False
+        sa.DateTime(timezone=True), server_default=sa.func.now(), primary_key=True, nullable=False
     )
 
     @declared_attr
     def __table_args__(cls):  # noqa
         return (
-            sa.UniqueConstraint(
-                "serial_nrtm", "source", name="rpsl_objects_history_serial_nrtm_source_unique"
-            ),
+            sa.Index("ix_rpsl_database_journal_source_serial_nrtm", "source", "serial_nrtm"),
+            sa.Index("ix_rpsl_database_journal_source_rpsl_pk", "source", "rpsl_pk"),
+            {"postgresql_partition_by": "LIST (source)"},
         )
 
     def __repr__(self):
         return f"<{self.source}/{self.serial}/{self.operation}/{self.rpsl_pk}>"
 
 
+# Rows for sources and months without their own partition are kept here
+sa.event.listen(
+    RPSLDatabaseJournal.__table__,
+    "after_create",
+    sa.DDL(
+        f"CREATE TABLE {RPSLDatabaseJournal.__tablename__}_default "
+        f"PARTITION OF {RPSLDatabaseJournal.__tablename__} DEFAULT"
+    ),
+)
+
+
 class RPSLDatabaseObjectSuspended(Base):  # type: ignore
     """
     SQLAlchemy ORM object for suspended RPSL objects (#577)
@@ -314,6 +346,59 @@ class RPSLDatabaseStatus(Base):  # type: ignore
         return self.source
 
 
+class RPSLObjectClassCount(Base):  # type: ignore
+    """
+    SQLAlchemy ORM object for the number of RPSL objects per object class
+    per source. This is kept up to date by the DatabaseHandler on every
+    change, so that statistics do not need to count all objects.
+    """
+
+    __tablename__ = "rpsl_object_class_count"
+
+    source = sa.Column(sa.String, primary_key=True)
+    object_class = sa.Column(sa.String, primary_key=True)
+    count = sa.Column(sa.BigInteger, nullable=False, server_default="0")
+
+    def __repr__(self):
+        return f"<{self.source}/{self.object_class}: {self.count}>"
+
+
+class RPSLObjectLookup(Base):  # type: ignore
+    """
+    SQLAlchemy ORM object for the values of lookup fields of RPSL objects,
+    with one row per object, lookup field and value. This is only kept
+    up to date by the DatabaseHandler if lookup_index_table is enabled,
+    and used for lookups if lookup_index_table_queries is enabled as well,
+    see irrd.storage.rpsl_object_lookups.
+
+    The primary key starts with source, so that all rows of a source, or of
+    specific objects, can be found without a separate index.
+    """
+
+    __tablename__ = "rpsl_object_lookup"
+
+    source = sa.Column(sa.String, primary_key=True)
+    rpsl_object_pk = sa.Column(pg.UUID(as_uuid=True), primary_key=True)
+    attribute = sa.Column(sa.String, primary_key=True)
+    value = sa.Column(sa.String, primary_key=True)
+    object_class = sa.Column(sa.String, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):  # noqa
+        args = [
+            sa.Index(
+                "ix_rpsl_object_lookup_attribute_value",
+                "attribute",
+                "value",
+                postgresql_include=["source", "rpsl_object_pk"],
+            ),
+        ]
+        return tuple(args)
+
+    def __repr__(self):
+        return f"<{self.attribute}: {self.value}/{self.source}/{self.rpsl_object_pk}>"
+
+
 class ROADatabaseObject(Base):  # type: ignore
     """
     SQLAlchemy ORM object for ROA objects.
@@ -544,7 +629,6 @@ class AuthMntner(Base):  # type: ignore
     rpsl_mntner_pk = sa.Column(sa.String, index=True, nullable=False)
     rpsl_mntner_obj_id = sa.Column(
         pg.UUID,
-        sa.ForeignKey("rpsl_objects.pk", ondelete="RESTRICT"),
         index=True,
         unique=True,
         nullable=False,
@@ -574,6 +658,12 @@ class AuthMntner(Base):  # type: ignore
                 "rpsl_mntner_source",
                 name="auth_mntner_rpsl_mntner_obj_id_source_unique",
             ),
+            sa.ForeignKeyConstraint(
+                ["rpsl_mntner_obj_id", "rpsl_mntner_source"],
+                ["rpsl_objects.pk", "rpsl_objects.source"],
+                name="auth_mntner_rpsl_mntner_obj_fkey",
+                ondelete="RESTRICT",
+            ),
         ]
         return tuple(args)
 
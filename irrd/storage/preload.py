@@ -1,29 +1,49 @@
+import json
 import logging
+import os
 import random
 import signal
 import sys
 import threading
 import time
-from collections import defaultdict, namedtuple
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
+import radix
 import redis
 from setproctitle import setproctitle
 
 from irrd.conf import get_setting
 from irrd.utils.process_support import ExceptionLoggingProcess
 
-from .queries import RPSLDatabaseQuery
+from .preload_encoding import (
+    KIND_PREFIXES_V4,
+    KIND_PREFIXES_V6,
+    KIND_SET_MEMBERS,
+    PreloadStore,
+    decode_store,
+    encode_store,
+)
+from .queries import (
+    PreloadRouteOriginsQuery,
+    PreloadRoutePrefixesQuery,
+    PreloadSetMembersQuery,
+    RPSLDatabaseJournalStatisticsQuery,
+)
+from .query_metrics import measure_preload
 
-SENTINEL_HASH_CREATED = b"SENTINEL_HASH_CREATED"
 REDIS_ORIGIN_ROUTE4_STORE_KEY = b"irrd-preload-origin-route4"
 REDIS_ORIGIN_ROUTE6_STORE_KEY = b"irrd-preload-origin-route6"
 REDIS_AS_SET_STORE_KEY = b"irrd-preload-as-set"
 REDIS_ROUTE_SET_STORE_KEY = b"irrd-preload-route-set"
+REDIS_ROUTE_PREFIX_STORE_KEY = b"irrd-preload-route-prefix"
 REDIS_PRELOAD_RELOAD_CHANNEL = "irrd-preload-reload-channel"
 REDIS_PRELOAD_ALL_MESSAGE = "unknown-classes-changed-preload-all"
 REDIS_PRELOAD_COMPLETE_CHANNEL = "irrd-preload-complete-channel"
 REDIS_CONTENTS_LIST_SEPARATOR = ","
 REDIS_KEY_PK_SOURCE_SEPARATOR = "_"
+# Increase when the format of the snapshot or of the stores in it changes
+PRELOAD_SNAPSHOT_FORMAT_VERSION = 2
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +56,7 @@ large data sets, this can improve performance.
 
 
 SetMembers = namedtuple("SetMembers", ["members", "object_class"])
+PreloadedRoute = namedtuple("PreloadedRoute", ["prefix", "origin", "rpsl_pk"])
 
 
 class PersistentPubSubWorkerThread(redis.client.PubSubWorkerThread):  # type: ignore
@@ -92,7 +113,13 @@ class Preloader:
         which is automatically updated.
         """
         self._redis_conn = redis.Redis.from_url(get_setting("redis_url"))
+        self._load_lock = threading.Lock()
         if enable_queries:
+            if get_setting("preload_snapshot_path") and not get_setting("readonly_standby"):
+                # The store manager restores a snapshot on startup, which is
+                # usable right away, without waiting for a signal after the
+                # first full reload.
+                threading.Thread(target=self._load_preload_data_into_memory, daemon=True).start()
             self._pubsub = self._redis_conn.pubsub()
             self._pubsub_thread = PersistentPubSubWorkerThread(
                 callback=self._load_preload_data_into_memory, pubsub=self._pubsub, sleep_time=5, daemon=True
@@ -122,6 +149,7 @@ class Preloader:
         )
         self._redis_conn.publish(REDIS_PRELOAD_RELOAD_CHANNEL, message)
 
+    @measure_preload()
     def set_members(self, set_pk: str, sources: list[str], object_classes: list[str]) -> SetMembers | None:
         """
         Retrieve all members of set set_pk in given sources from in memory store.
@@ -134,20 +162,17 @@ class Preloader:
             time.sleep(1)  # pragma: no cover
         if not object_classes or "as-set" in object_classes:
             for source in sources:
-                try:
-                    members = self._as_set_store[source][set_pk].split(REDIS_CONTENTS_LIST_SEPARATOR)
+                members = self._as_set_store.get(source, set_pk)
+                if members is not None:
                     return SetMembers(members, "as-set")
-                except KeyError:
-                    continue
         if not object_classes or "route-set" in object_classes:
             for source in sources:
-                try:
-                    members = self._route_set_store[source][set_pk].split(REDIS_CONTENTS_LIST_SEPARATOR)
+                members = self._route_set_store.get(source, set_pk)
+                if members is not None:
                     return SetMembers(members, "route-set")
-                except KeyError:
-                    continue
         return None
 
+    @measure_preload()
     def routes_for_origins(
         self, origins: list[str] | set[str], sources: list[str], ip_version: int | None = None
     ) -> set[str]:
@@ -169,33 +194,51 @@ class Preloader:
         if not origins or not sources:
             return set()
 
+        stores = []
+        if not ip_version or ip_version == 4:
+            stores.append(self._origin_route4_store)
+        if not ip_version or ip_version == 6:
+            stores.append(self._origin_route6_store)
+
         prefix_sets: set[str] = set()
         for source in sources:
             for origin in origins:
-                if (
-                    (not ip_version or ip_version == 4)
-                    and source in self._origin_route4_store
-                    and origin in self._origin_route4_store[source]
-                ):
-                    prefix_sets.update(
-                        self._origin_route4_store[source][origin].split(REDIS_CONTENTS_LIST_SEPARATOR)
-                    )
-                if (
-                    (not ip_version or ip_version == 6)
-                    and source in self._origin_route6_store
-                    and origin in self._origin_route6_store[source]
-                ):
-                    prefix_sets.update(
-                        self._origin_route6_store[source][origin].split(REDIS_CONTENTS_LIST_SEPARATOR)
-                    )
+                for store in stores:
+                    prefixes = store.get(source, origin)
+                    if prefixes:
+                        prefix_sets.update(prefixes)
 
         return prefix_sets
 
+    @measure_preload()
+    def route_prefix_trees(self, sources: list[str]) -> dict[str, radix.Radix] | None:
+        """
+        Retrieve the radix trees of route(6) objects for the given sources,
+        keyed by source. The data of each node is a list of PreloadedRoute
+        for that prefix.
+
+        Returns None if preloading routes by prefix is not enabled.
+        This call will block until the preload store is loaded.
+        """
+        if not get_setting("preload_route_search"):
+            return None
+        while not self._memory_loaded:
+            time.sleep(1)  # pragma: no cover
+        return {
+            source: self._route_prefix_store[source]
+            for source in sources
+            if source in self._route_prefix_store
+        }
+
     def _load_preload_data_into_memory(self, redis_message=None):
         """
         Update the in-memory store. This is called whenever a
         message is sent to REDIS_PRELOAD_COMPLETE_CHANNEL.
         """
+        with self._load_lock:
+            self._load_preload_data_into_memory_locked()
+
+    def _load_preload_data_into_memory_locked(self):
         while not self._redis_conn.exists(REDIS_ORIGIN_ROUTE4_STORE_KEY):
             time.sleep(1)  # pragma: no cover
 
@@ -203,29 +246,30 @@ class Preloader:
         if not getattr(sys, "_called_from_test", None):
             time.sleep(random.random())  # pragma: no cover
 
-        new_origin_route4_store = dict()
-        new_origin_route6_store = dict()
-        new_as_set_store = dict()
-        new_route_set_store = dict()
-
-        def _load(redis_key, target):
-            for key, routes in self._redis_conn.hgetall(redis_key).items():
-                if key == SENTINEL_HASH_CREATED:
-                    continue
-                source, origin = key.decode("ascii").split(REDIS_KEY_PK_SOURCE_SEPARATOR, 1)
-                if source not in target:
-                    target[source] = dict()
-                target[source][origin] = routes.decode("ascii")
-
-        _load(REDIS_ORIGIN_ROUTE4_STORE_KEY, new_origin_route4_store)
-        _load(REDIS_ORIGIN_ROUTE6_STORE_KEY, new_origin_route6_store)
-        _load(REDIS_AS_SET_STORE_KEY, new_as_set_store)
-        _load(REDIS_ROUTE_SET_STORE_KEY, new_route_set_store)
+        def _load(redis_key) -> PreloadStore:
+            data = self._redis_conn.get(redis_key)
+            return decode_store(data) if data is not None else PreloadStore()
+
+        new_origin_route4_store = _load(REDIS_ORIGIN_ROUTE4_STORE_KEY)
+        new_origin_route6_store = _load(REDIS_ORIGIN_ROUTE6_STORE_KEY)
+        new_as_set_store = _load(REDIS_AS_SET_STORE_KEY)
+        new_route_set_store = _load(REDIS_ROUTE_SET_STORE_KEY)
+
+        new_route_prefix_store: dict[str, radix.Radix] = dict()
+        if get_setting("preload_route_search"):
+            for source, prefix, routes in _load(REDIS_ROUTE_PREFIX_STORE_KEY).items():
+                if source not in new_route_prefix_store:
+                    new_route_prefix_store[source] = radix.Radix()
+                node = new_route_prefix_store[source].add(prefix)
+                node.data = [
+                    PreloadedRoute(prefix, *route.split(REDIS_KEY_PK_SOURCE_SEPARATOR, 1)) for route in routes
+                ]
 
         self._origin_route4_store = new_origin_route4_store
         self._origin_route6_store = new_origin_route6_store
         self._as_set_store = new_as_set_store
         self._route_set_store = new_route_set_store
+        self._route_prefix_store = new_route_prefix_store
 
         self._memory_loaded = True
 
@@ -259,6 +303,8 @@ class PreloadStoreManager(ExceptionLoggingProcess):
         logging.info("Starting preload store manager")
 
         self._clear_existing_data()
+        if self.restore_snapshot():
+            self.signal_redis_store_updated()
         self._pubsub = self._redis_conn.pubsub()
 
         self._reload_lock = threading.Lock()
@@ -286,15 +332,91 @@ class PreloadStoreManager(ExceptionLoggingProcess):
         queries are being answered with outdated data.
         """
         try:
-            self._redis_conn.delete(
-                REDIS_ORIGIN_ROUTE4_STORE_KEY, REDIS_ORIGIN_ROUTE6_STORE_KEY, REDIS_AS_SET_STORE_KEY
-            )
+            self._redis_conn.delete(*self._store_keys())
         except redis.ConnectionError as rce:  # pragma: no cover
             logger.error(
                 "Failed to empty preload store due to redis connection error, "
                 f"queries may have outdated results until full reload is completed (max 30s): {rce}"
             )
 
+    def _store_keys(self) -> list[bytes]:
+        return [
+            REDIS_ORIGIN_ROUTE4_STORE_KEY,
+            REDIS_ORIGIN_ROUTE6_STORE_KEY,
+            REDIS_AS_SET_STORE_KEY,
+            REDIS_ROUTE_SET_STORE_KEY,
+            REDIS_ROUTE_PREFIX_STORE_KEY,
+        ]
+
+    def write_snapshot(self, serial_global: int) -> None:
+        """
+        Write a snapshot of the current preload store to preload_snapshot_path.
+        The snapshot contains the Redis serialisation of each store,
+        and the journal serial that the store reflects.
+        The file is replaced atomically, so that a crash never leaves
+        a partial snapshot.
+        """
+        path = get_setting("preload_snapshot_path")
+        stores = []
+        for key in self._store_keys():
+            dump = self._redis_conn.dump(key)
+            if dump is not None:
+                stores.append((key, dump))
+        header = {
+            "format_version": PRELOAD_SNAPSHOT_FORMAT_VERSION,
+            "serial_global": serial_global,
+            "stores": [
+                [key.decode("ascii") if isinstance(key, bytes) else key, len(dump)] for key, dump in stores
+            ],
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as snapshot_file:
+            snapshot_file.write(json.dumps(header).encode("ascii") + b"\n")
+            for key, dump in stores:
+                snapshot_file.write(dump)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(tmp_path, path)
+        logger.debug(f"Wrote preload snapshot to {path}, reflecting journal serial {serial_global}")
+
+    def restore_snapshot(self) -> bool:
+        """
+        Restore the preload store from the snapshot in preload_snapshot_path,
+        if set and present. Returns True if the snapshot was restored.
+
+        The snapshot may be outdated, and a full reload is always performed
+        afterwards. This makes the store usable while the reload runs.
+        If the snapshot can not be restored, e.g. due to a different format
+        or Redis version, the store remains empty until the full reload.
+        """
+        path = get_setting("preload_snapshot_path")
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, "rb") as snapshot_file:
+                header = json.loads(snapshot_file.readline())
+                if header.get("format_version") != PRELOAD_SNAPSHOT_FORMAT_VERSION:
+                    logger.info(f"Ignoring preload snapshot {path}, as it has an incompatible format")
+                    return False
+                pipeline = self._redis_conn.pipeline(transaction=True)
+                pipeline.delete(*self._store_keys())
+                for key, length in header["stores"]:
+                    dump = snapshot_file.read(length)
+                    if len(dump) != length:
+                        raise ValueError("snapshot file is truncated")
+                    pipeline.restore(key, 0, dump, replace=True)
+                pipeline.execute()
+        except (OSError, ValueError, KeyError, redis.ResponseError) as exc:
+            logger.error(f"Failed to restore preload snapshot {path}, waiting for full reload: {exc}")
+            self._clear_existing_data()
+            return False
+
+        logger.info(
+            f"Restored preload store from snapshot {path}, reflecting journal serial "
+            f"{header['serial_global']}, starting full reload"
+        )
+        return True
+
     def perform_reload(self, message: str) -> None:
         """
         Perform a (re)load.
@@ -348,20 +470,14 @@ class PreloadStoreManager(ExceptionLoggingProcess):
         """
         try:
             pipeline = self._redis_conn.pipeline(transaction=True)
-            pipeline.delete(REDIS_ORIGIN_ROUTE4_STORE_KEY, REDIS_ORIGIN_ROUTE6_STORE_KEY)
-            # The redis store can't store sets, only strings
-            origin_route4_str_dict = {
-                k: REDIS_CONTENTS_LIST_SEPARATOR.join(v) for k, v in new_origin_route4_store.items()
-            }
-            origin_route6_str_dict = {
-                k: REDIS_CONTENTS_LIST_SEPARATOR.join(v) for k, v in new_origin_route6_store.items()
-            }
-            # Redis can't handle empty dicts, but the dict needs to be present
-            # in order not to block queries.
-            origin_route4_str_dict[SENTINEL_HASH_CREATED] = "1"
-            origin_route6_str_dict[SENTINEL_HASH_CREATED] = "1"
-            pipeline.hset(REDIS_ORIGIN_ROUTE4_STORE_KEY, mapping=origin_route4_str_dict)
-            pipeline.hset(REDIS_ORIGIN_ROUTE6_STORE_KEY, mapping=origin_route6_str_dict)
+            pipeline.set(
+                REDIS_ORIGIN_ROUTE4_STORE_KEY,
+                encode_store(self._store_entries(new_origin_route4_store), KIND_PREFIXES_V4),
+            )
+            pipeline.set(
+                REDIS_ORIGIN_ROUTE6_STORE_KEY,
+                encode_store(self._store_entries(new_origin_route6_store), KIND_PREFIXES_V6),
+            )
             pipeline.execute()
 
             return True
@@ -381,21 +497,28 @@ class PreloadStoreManager(ExceptionLoggingProcess):
         """
         return self.update_set_store(new_route_set_store, REDIS_ROUTE_SET_STORE_KEY)
 
+    def update_route_prefix_store(self, new_route_prefix_store) -> bool:
+        """
+        Store the new route information by prefix in redis. Returns True on success, False on failure.
+        """
+        return self.update_set_store(new_route_prefix_store, REDIS_ROUTE_PREFIX_STORE_KEY)
+
     def update_set_store(self, new_store, redis_key) -> bool:
         try:
-            pipeline = self._redis_conn.pipeline(transaction=True)
-            pipeline.delete(redis_key)
-            # The redis store can't store sets, only strings
-            set_str_dict = {k: REDIS_CONTENTS_LIST_SEPARATOR.join(v) for k, v in new_store.items()}
-            # Redis can't handle empty dicts, but the dict needs to be present
-            # in order not to block queries.
-            set_str_dict[SENTINEL_HASH_CREATED] = "1"
-            pipeline.hset(redis_key, mapping=set_str_dict)
-            pipeline.execute()
+            self._redis_conn.set(redis_key, encode_store(self._store_entries(new_store), KIND_SET_MEMBERS))
             return True
         except redis.ConnectionError as rce:  # pragma: no cover
             return self._handle_preload_update_error(rce)
 
+    def _store_entries(self, new_store):
+        """
+        Convert a store keyed by source and key, joined with
+        REDIS_KEY_PK_SOURCE_SEPARATOR, into (source, key, values) tuples.
+        """
+        for source_key, values in new_store.items():
+            source, key = source_key.split(REDIS_KEY_PK_SOURCE_SEPARATOR, 1)
+            yield source, key, values
+
     def signal_redis_store_updated(self):
         try:
             self._redis_conn.publish(REDIS_PRELOAD_COMPLETE_CHANNEL, "complete")
@@ -481,98 +604,88 @@ class PreloadUpdater(threading.Thread):
         """
         logger.debug(f"Starting preload store update from thread {self}")
 
-        if not mock_database_handler:  # pragma: no cover
-            from .database_handler import DatabaseHandler
-
-            dh = DatabaseHandler(readonly=True)
-        else:
-            dh = mock_database_handler
+        snapshot_enabled = bool(get_setting("preload_snapshot_path"))
+        if snapshot_enabled:
+            # Retrieved before the stores, so that the stores reflect at least this serial
+            serial_global = self._with_database_handler(
+                lambda dh: next(dh.execute_query(RPSLDatabaseJournalStatisticsQuery()))["max_serial_global"],
+                mock_database_handler,
+            )
 
+        # Each store is built in parallel, on its own database connection
+        tasks = []
         if self.update_routes:
-            self._update_routes(dh)
-        self._update_all_sets(dh)
+            tasks.append(self._update_routes)
+        if self.update_as_sets:
+            tasks.append(self._update_as_sets)
+        if self.update_route_sets:
+            tasks.append(self._update_route_sets)
+        with ThreadPoolExecutor(max_workers=max(len(tasks), 1)) as executor:
+            futures = [
+                executor.submit(self._with_database_handler, task, mock_database_handler) for task in tasks
+            ]
+            for future in futures:
+                future.result()
 
         if self.preloader.signal_redis_store_updated():
             logger.info(f"Completed preload store update from thread {self}, notified workers")
+            if snapshot_enabled:
+                self.preloader.write_snapshot(serial_global)
 
-        dh.close()
+    def _with_database_handler(self, func, mock_database_handler=None):
+        """
+        Run func with a new readonly database handler, closed afterwards.
+        For tests, mock_database_handler can be used to provide a mock.
+        """
+        if not mock_database_handler:  # pragma: no cover
+            from .database_handler import DatabaseHandler
 
-    def _update_routes(self, dh):
-        new_origin_route4_store: dict[str, set] = defaultdict(set)
-        new_origin_route6_store: dict[str, set] = defaultdict(set)
+            dh = DatabaseHandler(readonly=True)
+        else:
+            dh = mock_database_handler
+        try:
+            return func(dh)
+        finally:
+            dh.close()
 
-        q = RPSLDatabaseQuery(
-            column_names=["ip_version", "ip_first", "prefix_length", "asn_first", "source"],
-            enable_ordering=False,
-        )
-        q = q.object_classes(["route", "route6"]).default_suppression()
-        for result in dh.execute_query(q):
-            prefix = result["ip_first"]
-            key = result["source"] + REDIS_KEY_PK_SOURCE_SEPARATOR + "AS" + str(result["asn_first"])
-            length = result["prefix_length"]
-
-            if result["ip_version"] == 4:
-                new_origin_route4_store[key].add(f"{prefix}/{length}")
-            if result["ip_version"] == 6:
-                new_origin_route6_store[key].add(f"{prefix}/{length}")
+    def _update_routes(self, dh):
+        new_origin_route4_store: dict[str, set] = dict()
+        new_origin_route6_store: dict[str, set] = dict()
+
+        for row in dh.execute_query(PreloadRouteOriginsQuery()):
+            key = row["source"] + REDIS_KEY_PK_SOURCE_SEPARATOR + "AS" + str(row["asn_first"])
+            if row["ip_version"] == 4:
+                new_origin_route4_store[key] = set(row["prefixes"])
+            if row["ip_version"] == 6:
+                new_origin_route6_store[key] = set(row["prefixes"])
         if self.preloader.update_route_store(new_origin_route4_store, new_origin_route6_store):
             logger.debug(f"Completed updating preload route store from thread {self}")
 
-    def _update_all_sets(self, dh):
-        if self.update_as_sets:
-            as_set_store = self._update_set(dh, "as-set", ["aut-num"])
-            if self.preloader.update_as_set_store(as_set_store):
-                logger.debug(f"Completed updating preload as-set store from thread {self}")
-
-        if self.update_route_sets:
-            route_set_store = self._update_set(dh, "route-set", ["route", "route6"])
-            if self.preloader.update_route_set_store(route_set_store):
-                logger.debug(f"Completed updating preload route-set store from thread {self}")
+        # Routes by prefix are only kept if enabled, as they use
+        # significant memory in every worker process.
+        if get_setting("preload_route_search"):
+            new_route_prefix_store: dict[str, set] = dict()
+            for row in dh.execute_query(PreloadRoutePrefixesQuery()):
+                key = row["source"] + REDIS_KEY_PK_SOURCE_SEPARATOR + row["prefix"]
+                new_route_prefix_store[key] = {
+                    f"AS{asn}{REDIS_KEY_PK_SOURCE_SEPARATOR}{rpsl_pk}"
+                    for asn, rpsl_pk in zip(row["asns"], row["rpsl_pks"])
+                }
+            if self.preloader.update_route_prefix_store(new_route_prefix_store):
+                logger.debug(f"Completed updating preload route prefix store from thread {self}")
+
+    def _update_as_sets(self, dh):
+        as_set_store = self._update_set(dh, "as-set", ["aut-num"])
+        if self.preloader.update_as_set_store(as_set_store):
+            logger.debug(f"Completed updating preload as-set store from thread {self}")
+
+    def _update_route_sets(self, dh):
+        route_set_store = self._update_set(dh, "route-set", ["route", "route6"])
+        if self.preloader.update_route_set_store(route_set_store):
+            logger.debug(f"Completed updating preload route-set store from thread {self}")
 
     def _update_set(self, dh, set_class, member_classes):
-        q = (
-            RPSLDatabaseQuery(
-                column_names=["rpsl_pk", "parsed_data", "source"],
-                enable_ordering=False,
-            )
-            .object_classes([set_class])
-            .default_suppression()
-        )
-
-        member_store: dict[str, set] = {}
-        mbrs_by_ref_per_set = {}
-
-        for row in dh.execute_query(q):
-            key = row["source"] + REDIS_KEY_PK_SOURCE_SEPARATOR + str(row["rpsl_pk"])
-            member_store[key] = set(
-                row["parsed_data"].get("members", []) + row["parsed_data"].get("mp-members", [])
-            )
-            mbrs_by_ref = set(row["parsed_data"].get("mbrs-by-ref", []))
-            if mbrs_by_ref:
-                mbrs_by_ref_per_set[(row["source"], row["rpsl_pk"])] = mbrs_by_ref
-
-        # This query retrieves all member objects with a member-of, because it
-        # is much faster than the more specific but much larger alternative.
-        q = (
-            RPSLDatabaseQuery(
-                column_names=["rpsl_pk", "parsed_data", "source", "object_class"],
-                enable_ordering=False,
-            )
-            .lookup_attr("member-of", True)
-            .object_classes(member_classes)
-            .default_suppression()
-        )
-        for row in dh.execute_query(q):
-            for member_of in row["parsed_data"].get("member-of", []):
-                try:
-                    expected_mntners = mbrs_by_ref_per_set[(row["source"], member_of)]
-                except KeyError:
-                    continue
-
-                if "ANY" in expected_mntners or expected_mntners.intersection(
-                    set(row["parsed_data"]["mnt-by"])
-                ):
-                    key = row["source"] + REDIS_KEY_PK_SOURCE_SEPARATOR + member_of
-                    member_store[key].add(row["parsed_data"][row["object_class"]])
-
-        return member_store
+        return {
+            row["source"] + REDIS_KEY_PK_SOURCE_SEPARATOR + row["rpsl_pk"]: set(row["members"])
+            for row in dh.execute_query(PreloadSetMembersQuery(set_class, member_classes))
+        }
@@ -0,0 +1,227 @@
+import socket
+import struct
+import zlib
+from collections.abc import Callable, Iterable, Iterator
+
+"""
+Compact binary encoding of the stores in the preload store.
+
+Each store is kept in redis as a single binary value, which every worker
+retrieves on each reload. The value starts with a fixed header:
+
+    magic (4 bytes), encoding version (1 byte), kind (1 byte), flags (1 byte)
+
+followed by the payload, which is zlib compressed if FLAG_ZLIB is set:
+
+    - varint count of names, followed by each name as a varint length
+      and UTF-8 bytes. Names are sources, keys and set members.
+    - varint count of entries, followed by each entry as a varint name
+      index of the source, a varint name index of the key, a varint length
+      of the value, and the value.
+
+For KIND_PREFIXES_V4/V6, a value is a varint count of prefixes, followed
+by each prefix as its network address as an integer, delta-encoded
+from the previous address as a varint, and a single byte prefix length.
+Prefixes are sorted, so deltas are small.
+For KIND_SET_MEMBERS, a value is a varint count of members, followed
+by the varint name index of each member.
+
+Values are only decoded when they are first retrieved from a PreloadStore,
+so loading a store in a worker only decodes the names. Decoded values are
+kept in the PreloadStore, which is replaced on the next reload, so queries
+only pay the decoding cost once per key per reload.
+"""
+
+PRELOAD_ENCODING_MAGIC = b"IRPL"
+# Increase when the encoding changes
+PRELOAD_ENCODING_VERSION = 1
+KIND_SET_MEMBERS = 0
+KIND_PREFIXES_V4 = 4
+KIND_PREFIXES_V6 = 6
+FLAG_ZLIB = 0x01
+# Smaller payloads are not worth compressing
+COMPRESSION_MIN_SIZE = 1024
+
+_HEADER = struct.Struct("!4sBBB")
+_ADDRESS_FAMILIES = {
+    KIND_PREFIXES_V4: (socket.AF_INET, 4),
+    KIND_PREFIXES_V6: (socket.AF_INET6, 16),
+}
+
+
+class PreloadStore:
+    """
+    A decoded preload store, with values per key per source.
+    Values are decoded on their first retrieval, and then kept.
+    Retrieved values must not be modified.
+    """
+
+    def __init__(self, kind: int = KIND_SET_MEMBERS, names: list[str] | None = None, entries=None):
+        self.kind = kind
+        self._names = names if names is not None else []
+        self._entries: dict[str, dict[str, bytes]] = entries if entries is not None else {}
+        self._decoded: dict[tuple[str, str], list[str]] = {}
+
+    def get(self, source: str, key: str) -> list[str] | None:
+        """Retrieve the values for key in source, or None if not present."""
+        try:
+            return self._decoded[(source, key)]
+        except KeyError:
+            pass
+        try:
+            value = self._entries[source][key]
+        except KeyError:
+            return None
+        values = self._decode_value(value)
+        self._decoded[(source, key)] = values
+        return values
+
+    def items(self) -> Iterator[tuple[str, str, list[str]]]:
+        """Iterate over all (source, key, values) in the store."""
+        for source, entries in self._entries.items():
+            for key, value in entries.items():
+                yield source, key, self._decode_value(value)
+
+    def _decode_value(self, value: bytes) -> list[str]:
+        count, offset = _decode_varint(value, 0)
+        if self.kind == KIND_SET_MEMBERS:
+            members = []
+            for _ in range(count):
+                name_index, offset = _decode_varint(value, offset)
+                members.append(self._names[name_index])
+            return members
+
+        family, width = _ADDRESS_FAMILIES[self.kind]
+        prefixes = []
+        address = 0
+        for _ in range(count):
+            delta, offset = _decode_varint(value, offset)
+            address += delta
+            prefixes.append(f"{socket.inet_ntop(family, address.to_bytes(width, 'big'))}/{value[offset]}")
+            offset += 1
+        return prefixes
+
+
+def encode_store(entries: Iterable[tuple[str, str, Iterable[str]]], kind: int, compress=True) -> bytes:
+    """
+    Encode a store from (source, key, values) tuples. For the prefix kinds,
+    values are prefixes as strings, e.g. 192.0.2.0/24.
+    """
+    names: dict[str, int] = {}
+
+    def name_index(name: str) -> int:
+        return names.setdefault(name, len(names))
+
+    body = bytearray()
+    entry_count = 0
+    for source, key, values in entries:
+        _encode_varint(name_index(source), body)
+        _encode_varint(name_index(key), body)
+        if kind == KIND_SET_MEMBERS:
+            value = _encode_members(values, name_index)
+        else:
+            value = _encode_prefixes(values, kind)
+        _encode_varint(len(value), body)
+        body += value
+        entry_count += 1
+
+    payload = bytearray()
+    _encode_varint(len(names), payload)
+    for name in names:
+        encoded_name = name.encode("utf-8")
+        _encode_varint(len(encoded_name), payload)
+        payload += encoded_name
+    _encode_varint(entry_count, payload)
+    payload += body
+
+    flags = 0
+    if compress and len(payload) >= COMPRESSION_MIN_SIZE:
+        payload = bytearray(zlib.compress(payload, 1))
+        flags |= FLAG_ZLIB
+    return _HEADER.pack(PRELOAD_ENCODING_MAGIC, PRELOAD_ENCODING_VERSION, kind, flags) + payload
+
+
+def decode_store(data: bytes) -> PreloadStore:
+    """
+    Decode a store encoded by encode_store().
+    Raises ValueError if the data is invalid or in an unsupported encoding.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Preload store data is too short")
+    magic, version, kind, flags = _HEADER.unpack_from(data)
+    if magic != PRELOAD_ENCODING_MAGIC or version != PRELOAD_ENCODING_VERSION:
+        raise ValueError(f"Unsupported preload store encoding: {magic!r} version {version}")
+    if kind != KIND_SET_MEMBERS and kind not in _ADDRESS_FAMILIES:
+        raise ValueError(f"Unknown preload store kind: {kind}")
+
+    payload = data[_HEADER.size :]
+    try:
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+
+        name_count, offset = _decode_varint(payload, 0)
+        names = []
+        for _ in range(name_count):
+            length, offset = _decode_varint(payload, offset)
+            names.append(payload[offset : offset + length].decode("utf-8"))
+            offset += length
+
+        entry_count, offset = _decode_varint(payload, offset)
+        entries: dict[str, dict[str, bytes]] = {}
+        for _ in range(entry_count):
+            source_index, offset = _decode_varint(payload, offset)
+            key_index, offset = _decode_varint(payload, offset)
+            length, offset = _decode_varint(payload, offset)
+            entries.setdefault(names[source_index], {})[names[key_index]] = payload[offset : offset + length]
+            offset += length
+    except (IndexError, UnicodeDecodeError, zlib.error) as exc:
+        raise ValueError(f"Invalid preload store data: {exc}")
+    if offset != len(payload):
+        raise ValueError("Invalid preload store data: unexpected length")
+    return PreloadStore(kind, names, entries)
+
+
+def _encode_members(members: Iterable[str], name_index: Callable[[str], int]) -> bytes:
+    indexes = [name_index(member) for member in members]
+    value = bytearray()
+    _encode_varint(len(indexes), value)
+    for index in indexes:
+        _encode_varint(index, value)
+    return bytes(value)
+
+
+def _encode_prefixes(prefixes: Iterable[str], kind: int) -> bytes:
+    family, _ = _ADDRESS_FAMILIES[kind]
+    parsed = []
+    for prefix in prefixes:
+        address_str, length_str = prefix.split("/")
+        parsed.append((int.from_bytes(socket.inet_pton(family, address_str), "big"), int(length_str)))
+    parsed.sort()
+
+    value = bytearray()
+    _encode_varint(len(parsed), value)
+    previous_address = 0
+    for address, length in parsed:
+        _encode_varint(address - previous_address, value)
+        value.append(length)
+        previous_address = address
+    return bytes(value)
+
+
+def _encode_varint(number: int, target: bytearray) -> None:
+    while number > 0x7F:
+        target.append((number & 0x7F) | 0x80)
+        number >>= 7
+    target.append(number)
+
+
+def _decode_varint(data: bytes, offset: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, offset
+        shift += 7
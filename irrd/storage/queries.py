@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Iterable
 from datetime import datetime
 
 import sqlalchemy as sa
@@ -18,7 +19,10 @@ from irrd.storage.models import (
     RPSLDatabaseObject,
     RPSLDatabaseObjectSuspended,
     RPSLDatabaseStatus,
+    RPSLObjectClassCount,
+    RPSLObjectLookup,
 )
+from irrd.storage.rpsl_object_lookups import lookup_table_queries_enabled
 from irrd.utils.validators import ValidationError, parse_as_number
 
 logger = logging.getLogger(__name__)
@@ -194,21 +198,43 @@ class RPSLDatabaseQuery(BaseRPSLObjectDatabaseQuery):
         """
         return self.lookup_attrs_in([attr_name], [attr_value])
 
-    def lookup_attrs_in(self, attr_names: list[str], attr_values: list[str | bool]):
+    def lookup_attrs_in(
+        self,
+        attr_names: list[str],
+        attr_values: list[str | bool],
+        use_lookup_table: bool | None = None,
+    ):
         """
         Filter on one or more lookup attributes, e.g. mnt-by, or ['admin-c', 'tech-c']
         At least one of the values for at least one of the lookup attributes must
         match one of the items in attr_values. Matching is case-insensitive.
         If the value is True (the literal object), matches with any value.
+
+        Values are looked up in the rpsl_object_lookup table if use_lookup_table
+        is set, by default if lookup_index_table_queries is enabled, and otherwise
+        in parsed_data. True values are always checked in parsed_data.
         """
         attr_names = [attr_name.lower() for attr_name in attr_names]
         for attr_name in attr_names:
             if attr_name not in self.lookup_field_names:
                 raise ValueError(f"Invalid lookup attribute: {attr_name}")
         self._check_query_frozen()
+        if use_lookup_table is None:
+            use_lookup_table = lookup_table_queries_enabled()
 
         value_filters = []
         statement_params = {}
+        if use_lookup_table:
+            lookup_values = [str(attr_value).upper() for attr_value in attr_values if attr_value is not True]
+            if lookup_values:
+                lookups = RPSLObjectLookup.__table__
+                matching_objects = sa.select(lookups.c.source, lookups.c.rpsl_object_pk).where(
+                    lookups.c.attribute.in_(attr_names),
+                    lookups.c.value.in_(lookup_values),
+                )
+                value_filters.append(sa.tuple_(self.columns.source, self.columns.pk).in_(matching_objects))
+            attr_values = [attr_value for attr_value in attr_values if attr_value is True]
+
         for attr_name in attr_names:
             for attr_value in attr_values:
                 counter = self._lookup_attr_counter
@@ -254,6 +280,26 @@ class RPSLDatabaseQuery(BaseRPSLObjectDatabaseQuery):
             )
         return self._filter(fltr)
 
+    def ip_less_specific_of(self, ips: Iterable[IP]):
+        """
+        Filter any less specifics or exact matches of any of the
+        given prefixes, i.e. ip_less_specific() for multiple prefixes at once.
+        """
+        if self._prefix_query_permitted():
+            fltr = sa.or_(*[self.columns.prefix.op(">>=")(sa.cast(str(ip), pg.CIDR)) for ip in ips])
+        else:
+            fltr = sa.or_(
+                *[
+                    sa.and_(
+                        self.columns.ip_first <= str(ip.net()),
+                        self.columns.ip_last >= str(ip.broadcast()),
+                        self.columns.ip_version == ip.version(),
+                    )
+                    for ip in ips
+                ]
+            )
+        return self._filter(fltr)
+
     def ip_less_specific_one_level(self, ip: IP):
         """
         Filter one level less specific of a prefix.
@@ -339,6 +385,29 @@ class RPSLDatabaseQuery(BaseRPSLObjectDatabaseQuery):
             )
         return self._filter(fltr)
 
+    def ip_any_of(self, ips: Iterable[IP]):
+        """
+        Filter any less specifics, more specifics or exact matches of any
+        of the given prefixes, i.e. ip_any() for multiple prefixes at once.
+
+        The prefixes are unnested and joined on the prefix column, so that
+        each of them is a single GiST index lookup. An object overlapping
+        multiple prefixes is returned once for each of those prefixes.
+        Only supported for object classes with a prefix column, not inetnum.
+        """
+        if not self._prefix_query_permitted():
+            raise ValueError("ip_any_of() is not supported for inetnum objects")
+        self._check_query_frozen()
+        filter_prefixes = (
+            sa.func.unnest(sa.cast(sorted({str(ip) for ip in ips}), pg.ARRAY(pg.CIDR)))
+            .table_valued("prefix", name="filter_prefixes")
+            .render_derived()
+        )
+        self.statement = self.statement.join(
+            filter_prefixes, self.columns.prefix.op("&&")(filter_prefixes.c.prefix)
+        )
+        return self
+
     def asn(self, asn: int):
         """
         Filter for exact matches on an ASN.
@@ -476,6 +545,8 @@ class RPSLDatabaseJournalQuery(BaseRPSLObjectDatabaseQuery):
         self.statement = sa.select(*columns).order_by(
             self.columns.source.asc(), self.columns.serial_nrtm.asc()
         )
+        self._latest_per_object = False
+        self._stream_results = False
 
     def entries_before_date(self, timestamp: datetime):
         """
@@ -495,6 +566,53 @@ class RPSLDatabaseJournalQuery(BaseRPSLObjectDatabaseQuery):
         """
         return self._filter_range(self.columns.serial_global, start, end)
 
+    def latest_per_object(self):
+        """
+        Only include the latest entry for each object, i.e. each combination
+        of source, object class and RPSL PK, from the entries matching the
+        other filters. Entries are then ordered by global serial.
+        The latest entry is included even if it is a deletion of an object
+        added within the matching entries, as the journal may not contain
+        earlier entries for that object, e.g. after expiry or an import
+        with journaling disabled.
+        """
+        self._check_query_frozen()
+        self._latest_per_object = True
+        return self
+
+    def stream_results(self):
+        """
+        Stream the results through a server side cursor,
+        to limit memory use on the client side for large results.
+        """
+        self._check_query_frozen()
+        self._stream_results = True
+        return self
+
+    def finalise_statement(self) -> Select:
+        statement = super().finalise_statement()
+        if self._latest_per_object:
+            row_number = sa.func.row_number().over(
+                partition_by=(self.columns.source, self.columns.object_class, self.columns.rpsl_pk),
+                order_by=self.columns.serial_global.desc(),
+            )
+            entries = (
+                statement.add_columns(
+                    row_number.label("latest_row_number"),
+                    self.columns.serial_global.label("latest_serial_global"),
+                )
+                .order_by(None)
+                .subquery()
+            )
+            statement = (
+                sa.select(*[entries.c[column.name] for column in statement.selected_columns])
+                .where(entries.c.latest_row_number == 1)
+                .order_by(entries.c.latest_serial_global.asc())
+            )
+        if self._stream_results:
+            statement = statement.execution_options(stream_results=True)
+        return statement
+
     def _filter_range(self, target: sa.Column, start: int, end: int | None = None):
         if end is not None:
             fltr = sa.and_(target >= start, target <= end)
@@ -503,6 +621,17 @@ class RPSLDatabaseJournalQuery(BaseRPSLObjectDatabaseQuery):
         return self._filter(fltr)
 
 
+class RPSLDatabaseJournalCountQuery(RPSLDatabaseJournalQuery):
+    """
+    Count the journal entries matching the filters,
+    which are the same as for RPSLDatabaseJournalQuery.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, enable_ordering=False, **kwargs)
+        self.statement = sa.select(sa.func.count().label("count")).select_from(self.table)
+
+
 class RPSLDatabaseJournalStatisticsQuery(BaseDatabaseQuery):
     """
     Special journal statistics query.
@@ -613,19 +742,148 @@ class DatabaseStatusQuery(BaseDatabaseQuery):
 
 class RPSLDatabaseObjectStatisticsQuery(BaseDatabaseQuery):
     """
-    Special statistics query, calculating the number of
+    Special statistics query, retrieving the number of
     objects per object class per source.
+    The counts are kept up to date by the DatabaseHandler,
+    so this does not need to count the objects themselves.
+    """
+
+    table = RPSLObjectClassCount.__table__
+    columns = RPSLObjectClassCount.__table__.c
+
+    def __init__(self):
+        self.statement = (
+            sa.select(
+                self.columns.source,
+                self.columns.object_class,
+                self.columns.count,
+            )
+            .where(self.columns.count > 0)
+            .order_by(self.columns.source, self.columns.object_class)
+        )
+
+
+class BasePreloadQuery(BaseDatabaseQuery):
+    """
+    Base for aggregated queries that build the preload store.
+    These only include objects that pass the default suppression,
+    aggregate in the database, and stream their results through
+    a server side cursor, to limit memory use on the client side.
     """
 
     table = RPSLDatabaseObject.__table__
     columns = RPSLDatabaseObject.__table__.c
 
+    def finalise_statement(self):
+        return self.statement.execution_options(stream_results=True)
+
+    @staticmethod
+    def _visible_filter(columns: ColumnCollection, object_classes: list[str]):
+        return sa.and_(
+            columns.object_class.in_(object_classes),
+            columns.rpki_status.in_([RPKIStatus.not_found, RPKIStatus.valid]),
+            columns.scopefilter_status == ScopeFilterStatus.in_scope,
+            columns.route_preference_status == RoutePreferenceStatus.visible,
+        )
+
+    def _prefix(self):
+        return sa.func.host(self.columns.ip_first).concat("/").concat(self.columns.prefix_length)
+
+
+class PreloadRouteOriginsQuery(BasePreloadQuery):
+    """
+    Query for the preload store, returning the distinct prefixes
+    of all route(6) objects per source, origin and IP version.
+    """
+
     def __init__(self):
-        self.statement = sa.select(
-            self.columns.source,
-            self.columns.object_class,
-            sa.func.count(self.columns.pk).label("count"),
-        ).group_by(self.columns.source, self.columns.object_class)
+        self.statement = (
+            sa.select(
+                self.columns.source,
+                self.columns.asn_first,
+                self.columns.ip_version,
+                sa.func.array_agg(sa.distinct(self._prefix())).label("prefixes"),
+            )
+            .where(self._visible_filter(self.columns, ["route", "route6"]))
+            .group_by(self.columns.source, self.columns.asn_first, self.columns.ip_version)
+        )
+
+
+class PreloadRoutePrefixesQuery(BasePreloadQuery):
+    """
+    Query for the preload store, returning the origins and RPSL PKs
+    of all route(6) objects per source and prefix.
+    """
+
+    def __init__(self):
+        self.statement = (
+            sa.select(
+                self.columns.source,
+                self._prefix().label("prefix"),
+                sa.func.array_agg(pg.aggregate_order_by(self.columns.asn_first, self.columns.rpsl_pk)).label(
+                    "asns"
+                ),
+                sa.func.array_agg(pg.aggregate_order_by(self.columns.rpsl_pk, self.columns.rpsl_pk)).label(
+                    "rpsl_pks"
+                ),
+            )
+            .where(self._visible_filter(self.columns, ["route", "route6"]))
+            .group_by(self.columns.source, self.columns.ip_first, self.columns.prefix_length)
+        )
+
+
+class PreloadSetMembersQuery(BasePreloadQuery):
+    """
+    Query for the preload store, returning the distinct members of all
+    sets of set_class per source, from their members and mp-members,
+    and from objects of member_classes that refer to the set in member-of,
+    if permitted by the mbrs-by-ref of the set.
+    """
+
+    def __init__(self, set_class: str, member_classes: list[str]):
+        sets = self.table.alias("sets")
+        member_objects = self.table.alias("member_objects")
+        empty_list = sa.literal([], type_=pg.JSONB)
+
+        direct_members = sa.select(
+            sa.func.jsonb_array_elements_text(
+                sa.func.coalesce(sets.c.parsed_data["members"], empty_list).concat(
+                    sa.func.coalesce(sets.c.parsed_data["mp-members"], empty_list)
+                )
+            ).label("member")
+        ).correlate(sets)
+        member_mntners = (
+            sa.func.jsonb_array_elements_text(member_objects.c.parsed_data["mnt-by"])
+            .table_valued("mntner")
+            .render_derived()
+        )
+        member_of_members = (
+            sa.select(member_objects.c.parsed_data.op("->>")(member_objects.c.object_class).label("member"))
+            .select_from(member_objects.join(member_mntners, sa.true()))
+            .correlate(sets)
+            .where(
+                self._visible_filter(member_objects.c, member_classes),
+                member_objects.c.source == sets.c.source,
+                member_objects.c.parsed_data["member-of"].has_key(sets.c.rpsl_pk),
+                sets.c.parsed_data.has_key("mbrs-by-ref"),
+                sa.or_(
+                    sets.c.parsed_data["mbrs-by-ref"].has_key("ANY"),
+                    sets.c.parsed_data["mbrs-by-ref"].has_key(member_mntners.c.mntner),
+                ),
+            )
+        )
+        members = sa.union(direct_members, member_of_members).subquery().lateral("members")
+
+        self.statement = (
+            sa.select(
+                sets.c.source,
+                sets.c.rpsl_pk,
+                sa.func.array_remove(sa.func.array_agg(members.c.member), None).label("members"),
+            )
+            .select_from(sets.outerjoin(members, sa.true()))
+            .where(self._visible_filter(sets.c, [set_class]))
+            .group_by(sets.c.source, sets.c.rpsl_pk)
+        )
 
 
 class ROADatabaseObjectQuery(BaseDatabaseQuery):
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import redis
+
+from irrd.conf import get_setting
+
+"""
+Query metrics, aggregated over all whois and HTTP worker processes.
+
+Each process records its queries in a QueryMetricsRecorder, which keeps
+totals in memory and regularly adds them to a hash in redis, so that
+recording a query does not need a call to redis. The hash has a field
+per interface, command and statistic, e.g. "whois|!g|count", and is
+exported by the MetricsGenerator.
+
+The time spent in the database and in the preload store, and the
+cache lookups, are collected in a QueryTiming, which is available
+to the code running the query through query_timing().
+"""
+
+logger = logging.getLogger(__name__)
+
+REDIS_QUERY_METRICS_KEY = "irrd-query-metrics"
+QUERY_METRICS_FIELD_SEPARATOR = "|"
+# Upper bounds in seconds of the buckets of the latency histograms
+QUERY_METRICS_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+QUERY_METRICS_FLUSH_INTERVAL = 5
+
+_current_timing: ContextVar["QueryTiming | None"] = ContextVar("irrd_query_timing", default=None)
+
+
+class QueryTiming:
+    """
+    Time spent in the database and preload store,
+    and cache lookups, for a single query.
+    """
+
+    def __init__(self):
+        self.database_seconds = 0.0
+        self.preload_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+@contextmanager
+def query_timing() -> Iterator[QueryTiming]:
+    """
+    Collect the timing of the code run in this context in a new QueryTiming.
+    The timing is shared with threads that run in a copy of this context.
+    """
+    timing = QueryTiming()
+    token = _current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        _current_timing.reset(token)
+
+
+def record_database_time(seconds: float) -> None:
+    timing = _current_timing.get()
+    if timing:
+        timing.database_seconds += seconds
+
+
+def record_cache_lookup(hit: bool) -> None:
+    timing = _current_timing.get()
+    if timing:
+        if hit:
+            timing.cache_hits += 1
+        else:
+            timing.cache_misses += 1
+
+
+@contextmanager
+def measure_preload() -> Iterator[None]:
+    """Record the time spent in this context as preload store time."""
+    timing = _current_timing.get()
+    if not timing:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.preload_seconds += time.perf_counter() - start_time
+
+
+class QueryMetricsRecorder:
+    """
+    Records query metrics for this process. Totals are kept in memory,
+    and added to redis by a background thread every
+    QUERY_METRICS_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._redis_conn = redis.Redis.from_url(get_setting("redis_url"))
+        self._lock = threading.Lock()
+        self._pending: dict[str, float] = defaultdict(float)
+        self._flush_thread: threading.Thread | None = None
+
+    def record(
+        self,
+        interface: str,
+        command: str,
+        elapsed: float,
+        response_bytes: int | None = None,
+        timing: QueryTiming | None = None,
+    ) -> None:
+        """
+        Record a query to interface (e.g. whois) of type command (e.g. !g),
+        that took elapsed seconds in total.
+        """
+        prefix = QUERY_METRICS_FIELD_SEPARATOR.join([interface, command, ""])
+        bucket = next(
+            (str(bound) for bound in QUERY_METRICS_LATENCY_BUCKETS if elapsed <= bound),
+            "+Inf",
+        )
+        with self._lock:
+            self._pending[prefix + "count"] += 1
+            self._pending[prefix + "duration_seconds"] += elapsed
+            self._pending[prefix + "bucket" + QUERY_METRICS_FIELD_SEPARATOR + bucket] += 1
+            if response_bytes is not None:
+                self._pending[prefix + "response_bytes"] += response_bytes
+            if timing:
+                self._pending[prefix + "database_seconds"] += timing.database_seconds
+                self._pending[prefix + "preload_seconds"] += timing.preload_seconds
+                self._pending[prefix + "cache_hits"] += timing.cache_hits
+                self._pending[prefix + "cache_misses"] += timing.cache_misses
+            if not self._flush_thread:
+                self._flush_thread = threading.Thread(
+                    target=self._run_flush_thread, name="irrd-query-metrics", daemon=True
+                )
+                self._flush_thread.start()
+
+    def flush(self) -> None:
+        """Add the totals recorded since the last flush to redis."""
+        with self._lock:
+            pending = self._pending
+            self._pending = defaultdict(float)
+        if not pending:
+            return
+        try:
+            pipeline = self._redis_conn.pipeline(transaction=False)
+            for field, value in pending.items():
+                if value:
+                    pipeline.hincrbyfloat(REDIS_QUERY_METRICS_KEY, field, value)
+            pipeline.execute()
+        except redis.RedisError as error:
+            logger.error(f"Failed to store query metrics in redis, metrics are lost: {error}")
+
+    def _run_flush_thread(self) -> None:
+        while True:
+            time.sleep(QUERY_METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+
+def load_query_metrics() -> dict[tuple[str, str], dict[str, float]]:
+    """
+    Load the query metrics of all processes from redis.
+    Returns a dict keyed by (interface, command), with dicts of the
+    statistics as values. Histogram buckets are included as
+    statistics named "bucket|<upper bound>".
+    """
+    redis_conn = redis.Redis.from_url(get_setting("redis_url"), decode_responses=True)
+    try:
+        fields: dict[str, str] = redis_conn.hgetall(REDIS_QUERY_METRICS_KEY)  # type: ignore
+    finally:
+        redis_conn.close()
+    metrics: dict[tuple[str, str], dict[str, float]] = defaultdict(dict)
+    for field, value in fields.items():
+        interface, command, statistic = field.split(QUERY_METRICS_FIELD_SEPARATOR, 2)
+        metrics[(interface, command)][statistic] = float(value)
+    return metrics
@@ -0,0 +1,112 @@
+from collections.abc import Iterable
+from uuid import UUID
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+from irrd.conf import get_setting
+from irrd.rpsl.rpsl_objects import lookup_field_names
+
+from .models import RPSLDatabaseObject, RPSLObjectLookup
+
+"""
+Lookup table for inverse queries.
+
+Lookups on fields like mnt-by or member-of normally use the GIN indexes
+on parsed_data. If lookup_index_table is enabled, every string value of
+every lookup field of every object is also stored as a row in the
+rpsl_object_lookup table, which has a plain btree index on the field
+name and value. If lookup_index_table_queries is enabled as well,
+RPSLDatabaseQuery.lookup_attrs_in() then finds objects through that
+table instead. These are separate settings, so that the table can be
+filled with irrd_rebuild_lookup_table before queries depend on it.
+
+The rows of an object are always derived from its parsed_data in the
+database, in the same way the ? operator on parsed_data matches values,
+so both lookup methods return the same objects.
+"""
+
+RPSL_OBJECTS_TABLE_NAME = RPSLDatabaseObject.__tablename__
+LOOKUP_TABLE_NAME = RPSLObjectLookup.__tablename__
+
+
+def lookup_table_enabled() -> bool:
+    """Return whether the lookup table should be maintained."""
+    return bool(get_setting("lookup_index_table"))
+
+
+def lookup_table_queries_enabled() -> bool:
+    """Return whether the lookup table should be used for lookups."""
+    return lookup_table_enabled() and bool(get_setting("lookup_index_table_queries"))
+
+
+def insert_rpsl_object_lookups(
+    connection: Connection,
+    objects_table: str = RPSL_OBJECTS_TABLE_NAME,
+    sources: Iterable[str] | None = None,
+    pks: Iterable[UUID] | None = None,
+) -> None:
+    """
+    Insert the lookup rows for objects in objects_table, which must have
+    the columns of rpsl_objects. Optionally restricted to objects from
+    sources, and/or objects with pks. Existing lookup rows for these
+    objects must have been deleted first.
+    """
+    conditions = []
+    params: dict[str, list] = {"lookup_field_names": sorted(lookup_field_names())}
+    if sources is not None:
+        conditions.append("AND objects.source = ANY(:sources)")
+        params["sources"] = list(sources)
+    if pks is not None:
+        conditions.append("AND objects.pk = ANY(CAST(:pks AS uuid[]))")
+        params["pks"] = [str(pk) for pk in pks]
+
+    # Scalar string values are matched as well, like the ? operator does
+    connection.execute(
+        sa.text(f"""
+            INSERT INTO {LOOKUP_TABLE_NAME} (source, rpsl_object_pk, attribute, value, object_class)
+            SELECT DISTINCT objects.source, objects.pk, field.key, element.value #>> '{{}}', objects.object_class
+            FROM {objects_table} AS objects
+            CROSS JOIN LATERAL jsonb_each(objects.parsed_data) AS field(key, value)
+            CROSS JOIN LATERAL jsonb_array_elements(
+                CASE jsonb_typeof(field.value) WHEN 'array' THEN field.value
+                ELSE jsonb_build_array(field.value) END
+            ) AS element(value)
+            WHERE field.key = ANY(:lookup_field_names) AND jsonb_typeof(element.value) = 'string'
+            {" ".join(conditions)}
+        """),
+        params,
+    )
+
+
+def delete_rpsl_object_lookups(connection: Connection, source_pks: Iterable[tuple[str, UUID]]) -> None:
+    """Delete the lookup rows for objects, identified by tuples of source and pk."""
+    source_pks = set(source_pks)
+    if not source_pks:
+        return
+    table = RPSLObjectLookup.__table__
+    connection.execute(
+        table.delete().where(sa.tuple_(table.c.source, table.c.rpsl_object_pk).in_(source_pks))
+    )
+
+
+def delete_rpsl_object_lookups_for_source(connection: Connection, source: str) -> None:
+    """Delete the lookup rows for all objects of a source."""
+    table = RPSLObjectLookup.__table__
+    connection.execute(table.delete().where(table.c.source == source))
+
+
+def refresh_rpsl_object_lookups(connection: Connection, source_pks: Iterable[tuple[str, UUID]]) -> None:
+    """
+    Replace the lookup rows for objects, identified by tuples of source
+    and pk, with rows for their current parsed_data.
+    """
+    source_pks = set(source_pks)
+    if not source_pks:
+        return
+    delete_rpsl_object_lookups(connection, source_pks)
+    insert_rpsl_object_lookups(
+        connection,
+        sources={source for source, pk in source_pks},
+        pks={pk for source, pk in source_pks},
+    )
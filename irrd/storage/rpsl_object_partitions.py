@@ -0,0 +1,190 @@
+import hashlib
+import logging
+import re
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+from .models import RPSLDatabaseObject
+
+"""
+Partitioning of RPSL objects.
+
+The rpsl_objects table is partitioned by list of source, so that scans,
+index lookups and bulk changes for one source only touch the table and
+indexes of that source. Objects of sources without a partition are stored
+in a default partition. When a partition is created, objects in the
+default partition that belong in the new partition, are moved into it.
+
+A full reload of a source builds a new table, which then replaces the
+partition of the source, see replace_rpsl_objects_partition(). The indexes
+of that table are only created after all objects have been loaded.
+"""
+
+logger = logging.getLogger(__name__)
+
+RPSL_OBJECTS_TABLE_NAME = RPSLDatabaseObject.__tablename__
+RPSL_OBJECTS_DEFAULT_PARTITION_NAME = f"{RPSL_OBJECTS_TABLE_NAME}_default"
+# PostgreSQL truncates longer identifiers
+MAX_IDENTIFIER_LENGTH = 63
+TEMPORARY_TABLE_MOVED_OBJECTS = "tmp_rpsl_objects_partition_moved_objects"
+RE_INDEX_DEFINITION = re.compile(
+    r"^CREATE (?P<unique>UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ (?P<method>USING .+)$"
+)
+
+
+def rpsl_objects_partition_name(source: str, suffix: str = "") -> str:
+    """
+    Return the name of the partition of source. Source names can not
+    contain underscores, so these never overlap with each other or with
+    the default partition. A suffix can be added for related tables.
+    """
+    name = f"{RPSL_OBJECTS_TABLE_NAME}_source_{source.lower().replace('-', '_')}{suffix}"
+    if len(name) > MAX_IDENTIFIER_LENGTH:
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+        name = f"{RPSL_OBJECTS_TABLE_NAME}_source_{digest}{suffix}"
+    return name
+
+
+def rpsl_objects_reload_table_name(source: str) -> str:
+    """Return the name of the table used while reloading source."""
+    return rpsl_objects_partition_name(source, "_reload")
+
+
+def create_rpsl_objects_partition(connection: Connection, source: str) -> bool:
+    """
+    Create the partition of source, if it does not exist yet, and move
+    any objects of source from the default partition into it.
+    If the partition needs to be created, this locks the rpsl_objects table.
+    Returns whether the partition was created.
+    """
+    partition = rpsl_objects_partition_name(source)
+    if _table_exists(connection, partition):
+        return False
+
+    connection.execute(sa.text(f"LOCK TABLE {RPSL_OBJECTS_TABLE_NAME} IN ACCESS EXCLUSIVE MODE"))
+    connection.execute(
+        sa.text(f"CREATE TEMPORARY TABLE {TEMPORARY_TABLE_MOVED_OBJECTS} (LIKE {RPSL_OBJECTS_TABLE_NAME})")
+    )
+    connection.execute(
+        sa.text(
+            f"WITH moved AS (DELETE FROM {RPSL_OBJECTS_DEFAULT_PARTITION_NAME} WHERE source = :source"
+            f" RETURNING *) INSERT INTO {TEMPORARY_TABLE_MOVED_OBJECTS} SELECT * FROM moved"
+        ),
+        {"source": source},
+    )
+    connection.execute(
+        sa.text(
+            f"CREATE TABLE {partition} PARTITION OF {RPSL_OBJECTS_TABLE_NAME} "
+            f"FOR VALUES IN ({_source_literal(source)})"
+        )
+    )
+    connection.execute(
+        sa.text(f"INSERT INTO {RPSL_OBJECTS_TABLE_NAME} SELECT * FROM {TEMPORARY_TABLE_MOVED_OBJECTS}")
+    )
+    connection.execute(sa.text(f"DROP TABLE {TEMPORARY_TABLE_MOVED_OBJECTS}"))
+    logger.info(f"Created RPSL objects partition for {source}: {partition}")
+    return True
+
+
+def create_rpsl_objects_reload_table(connection: Connection, source: str) -> str:
+    """
+    Create an empty table to reload all objects of source into, with the
+    same columns, defaults and check constraints as rpsl_objects, but
+    without indexes, so that loading does not have to update them for
+    each row. Call create_rpsl_objects_reload_table_indexes() when done.
+    The table can only contain objects of source, which also allows
+    attaching it as a partition without scanning it.
+    Returns the name of the table.
+    """
+    reload_table = rpsl_objects_reload_table_name(source)
+    connection.execute(
+        sa.text(
+            f"CREATE TABLE {reload_table} (LIKE {RPSL_OBJECTS_TABLE_NAME} "
+            "INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    connection.execute(
+        sa.text(
+            f"ALTER TABLE {reload_table} ADD CONSTRAINT {reload_table}_source "
+            f"CHECK (source = {_source_literal(source)})"
+        )
+    )
+    return reload_table
+
+
+def create_rpsl_objects_reload_table_indexes(connection: Connection, reload_table: str) -> None:
+    """
+    Create the primary key, unique constraints and indexes of rpsl_objects
+    on reload_table, created by create_rpsl_objects_reload_table(), after
+    all objects have been loaded into it. Attaching the table as a partition
+    then uses these indexes, rather than building them again.
+    Index names are chosen by PostgreSQL, as those of the current partition
+    of the source are still in use.
+    """
+    constraint_definitions = connection.execute(
+        sa.text(
+            "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND contype IN ('p', 'u') ORDER BY conname"
+        ),
+        {"table": RPSL_OBJECTS_TABLE_NAME},
+    ).fetchall()
+    for (constraint_definition,) in constraint_definitions:
+        connection.execute(sa.text(f"ALTER TABLE {reload_table} ADD {constraint_definition}"))
+
+    index_definitions = connection.execute(
+        sa.text(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index "
+            "WHERE indrelid = CAST(:table AS regclass) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = indexrelid) "
+            "ORDER BY indexrelid"
+        ),
+        {"table": RPSL_OBJECTS_TABLE_NAME},
+    ).fetchall()
+    for (index_definition,) in index_definitions:
+        match = RE_INDEX_DEFINITION.match(index_definition)
+        if not match:  # pragma: no cover
+            raise ValueError(
+                f"Unable to parse index definition of {RPSL_OBJECTS_TABLE_NAME}: {index_definition}"
+            )
+        connection.execute(
+            sa.text(f"CREATE {match.group('unique') or ''}INDEX ON {reload_table} {match.group('method')}")
+        )
+
+
+def replace_rpsl_objects_partition(connection: Connection, source: str, reload_table: str) -> None:
+    """
+    Replace the partition of source with reload_table, created by
+    create_rpsl_objects_reload_table() and with indexes created by
+    create_rpsl_objects_reload_table_indexes(). The current partition of source
+    and all objects in it are dropped, as are any objects of source in
+    the default partition. This locks the rpsl_objects table until commit,
+    but all steps only change the catalog, or involve the default partition.
+    As queries on rpsl_objects queue behind the lock request, callers should
+    set a lock_timeout.
+    """
+    partition = rpsl_objects_partition_name(source)
+    connection.execute(sa.text(f"LOCK TABLE {RPSL_OBJECTS_TABLE_NAME} IN ACCESS EXCLUSIVE MODE"))
+    if _table_exists(connection, partition):
+        connection.execute(sa.text(f"ALTER TABLE {RPSL_OBJECTS_TABLE_NAME} DETACH PARTITION {partition}"))
+        connection.execute(sa.text(f"DROP TABLE {partition}"))
+    connection.execute(
+        sa.text(f"DELETE FROM {RPSL_OBJECTS_DEFAULT_PARTITION_NAME} WHERE source = :source"),
+        {"source": source},
+    )
+    connection.execute(
+        sa.text(
+            f"ALTER TABLE {RPSL_OBJECTS_TABLE_NAME} ATTACH PARTITION {reload_table} "
+            f"FOR VALUES IN ({_source_literal(source)})"
+        )
+    )
+    connection.execute(sa.text(f"ALTER TABLE {reload_table} DROP CONSTRAINT {reload_table}_source"))
+    connection.execute(sa.text(f"ALTER TABLE {reload_table} RENAME TO {partition}"))
+
+
+def _source_literal(source: str) -> str:
+    return "'" + source.replace("'", "''") + "'"
+
+
+def _table_exists(connection: Connection, name: str) -> bool:
+    return connection.execute(sa.text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
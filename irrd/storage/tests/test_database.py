@@ -1,26 +1,35 @@
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from unittest.mock import Mock
 
 import pytest
+import sqlalchemy as sa
 from IPy import IP
 from pytest import raises
 
 from irrd.routepref.status import RoutePreferenceStatus
 from irrd.rpki.status import RPKIStatus
+from irrd.rpsl.rpsl_objects import OBJECT_CLASS_MAPPING
 from irrd.scopefilter.status import ScopeFilterStatus
 from irrd.utils.test_utils import flatten_mock_calls
+from irrd.utils.text import rpsl_content_hash
 
-from ..database_handler import DatabaseHandler
+from ..database_handler import DatabaseHandler, RPSLObjectsPartitionLockError
+from ..journal_partitions import journal_partition_name
 from ..models import (
     DatabaseOperation,
     JournalEntryOrigin,
     NRTM4ClientDatabaseStatus,
     NRTM4ServerDatabaseStatus,
+    RPSLDatabaseJournal,
+    RPSLObjectLookup,
 )
 from ..preload import Preloader
 from ..queries import (
     DatabaseStatusQuery,
+    PreloadRouteOriginsQuery,
+    PreloadRoutePrefixesQuery,
+    PreloadSetMembersQuery,
     ProtectedRPSLNameQuery,
     ROADatabaseObjectQuery,
     RPSLDatabaseJournalQuery,
@@ -42,6 +51,16 @@ def irrd_db_mock_preload(irrd_db, monkeypatch):
     )
 
 
+@pytest.fixture(params=[False, True], ids=["in_list", "temporary_table"])
+def bulk_status_update(request, monkeypatch):
+    """
+    Run status update tests both with small updates, and with the bulk
+    update path through temporary tables forced for any number of objects.
+    """
+    if request.param:
+        monkeypatch.setattr("irrd.storage.database_handler.BULK_STATUS_UPDATE_MIN_SIZE", 0)
+
+
 # noinspection PyTypeChecker
 @pytest.fixture()
 def database_handler_with_route():
@@ -157,6 +176,11 @@ class TestDatabaseHandlerLive:
         result = list(self.dh.execute_query(query))
         assert len(result) == 2
 
+        query = RPSLDatabaseQuery(column_names=["content_hash"])
+        assert {row["content_hash"] for row in self.dh.execute_query(query)} == {
+            rpsl_content_hash("object-text")
+        }
+
         self.dh.close()
 
     def test_object_writing_and_status_checking(self, monkeypatch, irrd_db_mock_preload, config_override):
@@ -307,6 +331,11 @@ class TestDatabaseHandlerLive:
         self.dh.record_serial_exported("TEST2", "424242")
         self.dh.commit()
 
+        statistics = list(self.dh.execute_query(RPSLDatabaseObjectStatisticsQuery()))
+        assert statistics == [
+            {"source": "TEST", "object_class": "route", "count": 1},
+        ]
+
         journal = self._clean_result(self.dh.execute_query(RPSLDatabaseJournalQuery()))
 
         # The IPv6 object was created in a different source, so it should
@@ -495,6 +524,12 @@ class TestDatabaseHandlerLive:
         assert not len(list(self.dh.execute_query(RPSLDatabaseQuery().sources(["TEST"]))))
         assert not len(list(self.dh.execute_query(DatabaseStatusQuery().sources(["TEST"]))))
         assert len(list(self.dh.execute_query(RPSLDatabaseQuery().sources(["TEST2"])))) == 1
+        self.dh.commit()
+
+        statistics = list(self.dh.execute_query(RPSLDatabaseObjectStatisticsQuery()))
+        assert statistics == [
+            {"source": "TEST2", "object_class": "route", "count": 1},
+        ]
 
         assert self.dh.timestamp_last_committed_transaction() > initial_tx_timestamp
 
@@ -503,6 +538,7 @@ class TestDatabaseHandlerLive:
         assert flatten_mock_calls(self.dh.changed_objects_tracker.preloader.signal_reload) == [
             ["", ({"route"},), {}],
             ["", ({"route"},), {}],
+            ["", (set(OBJECT_CLASS_MAPPING.keys()),), {}],
         ]
 
     def test_disable_journaling(self, monkeypatch, irrd_db_mock_preload):
@@ -743,7 +779,9 @@ class TestDatabaseHandlerLive:
 
         self.dh.close()
 
-    def test_rpki_status_storage(self, monkeypatch, irrd_db_mock_preload, database_handler_with_route):
+    def test_rpki_status_storage(
+        self, monkeypatch, irrd_db_mock_preload, bulk_status_update, database_handler_with_route
+    ):
         monkeypatch.setenv("IRRD_SOURCES_TEST_KEEP_JOURNAL", "1")
         dh = database_handler_with_route
 
@@ -841,7 +879,9 @@ class TestDatabaseHandlerLive:
         dh.delete_journal_entries_before_date(datetime.utcnow(), "TEST")
         assert not list(dh.execute_query(RPSLDatabaseJournalQuery()))
 
-    def test_scopefilter_status_storage(self, monkeypatch, irrd_db_mock_preload, database_handler_with_route):
+    def test_scopefilter_status_storage(
+        self, monkeypatch, irrd_db_mock_preload, bulk_status_update, database_handler_with_route
+    ):
         monkeypatch.setenv("IRRD_SOURCES_TEST_KEEP_JOURNAL", "1")
         dh = database_handler_with_route
         route_rpsl_objs = [
@@ -928,7 +968,7 @@ class TestDatabaseHandlerLive:
         assert len(list(dh.execute_query(RPSLDatabaseJournalQuery()))) == 2  # no new entry since last test
 
     def test_route_preference_status_storage(
-        self, monkeypatch, irrd_db_mock_preload, database_handler_with_route
+        self, monkeypatch, irrd_db_mock_preload, bulk_status_update, database_handler_with_route
     ):
         monkeypatch.setenv("IRRD_SOURCES_TEST_KEEP_JOURNAL", "1")
         dh = database_handler_with_route
@@ -1090,6 +1130,513 @@ class TestDatabaseHandlerLive:
         assert list(self.dh.execute_query(query))
         self.dh.close()
 
+    def test_delete_rpsl_objects(self, irrd_db_mock_preload, config_override, caplog):
+        config_override({"sources": {"TEST": {"keep_journal": True}}})
+        self.dh = DatabaseHandler()
+        for rpsl_pk in ["PERSON1", "PERSON2", "PERSON3"]:
+            self.dh.upsert_rpsl_object(
+                Mock(
+                    pk=lambda rpsl_pk=rpsl_pk: rpsl_pk,
+                    source=lambda: "TEST",
+                    rpsl_object_class="person",
+                    parsed_data={"person": rpsl_pk, "source": "TEST"},
+                    render_rpsl_text=lambda last_modified: "object-text",
+                    ip_version=lambda: None,
+                    ip_first=None,
+                    ip_last=None,
+                    prefix=None,
+                    prefix_length=None,
+                    asn_first=None,
+                    asn_last=None,
+                    rpki_status=RPKIStatus.not_found,
+                    scopefilter_status=ScopeFilterStatus.in_scope,
+                    route_preference_status=RoutePreferenceStatus.visible,
+                ),
+                JournalEntryOrigin.mirror,
+            )
+
+        self.dh.delete_rpsl_objects(
+            origin=JournalEntryOrigin.mirror,
+            source="TEST",
+            deletions=[
+                ("PERSON3", "person", 10),
+                ("PERSON1", "person", 11),
+                ("PERSON1", "person", 12),
+                ("PERSON2", "role", 13),
+            ],
+        )
+        assert [row["rpsl_pk"] for row in self.dh.execute_query(RPSLDatabaseQuery())] == ["PERSON2"]
+        assert "Attempted to remove/suspend object PERSON1/TEST, but no database row matched" in caplog.text
+        assert "Attempted to remove/suspend object PERSON2/TEST, but no database row matched" in caplog.text
+
+        journal = [
+            (entry["rpsl_pk"], entry["operation"])
+            for entry in self.dh.execute_query(RPSLDatabaseJournalQuery())
+        ]
+        assert journal[3:] == [
+            ("PERSON3", DatabaseOperation.delete),
+            ("PERSON1", DatabaseOperation.delete),
+        ]
+        self.dh.close()
+
+    def test_rpsl_staging(self, irrd_db_mock_preload):
+        def rpsl_object(rpsl_pk, source, object_text="object-text", **kwargs):
+            return Mock(
+                **{
+                    "pk": lambda: rpsl_pk,
+                    "source": lambda: source,
+                    "rpsl_object_class": "person",
+                    "parsed_data": {"person": rpsl_pk, "source": source},
+                    "render_rpsl_text": lambda last_modified: object_text,
+                    "ip_version": lambda: None,
+                    "ip_first": None,
+                    "ip_last": None,
+                    "prefix": None,
+                    "prefix_length": None,
+                    "asn_first": None,
+                    "asn_last": None,
+                    "rpki_status": RPKIStatus.not_found,
+                    "scopefilter_status": ScopeFilterStatus.in_scope,
+                    "route_preference_status": RoutePreferenceStatus.visible,
+                    **kwargs,
+                }
+            )
+
+        self.dh = DatabaseHandler()
+        self.dh.upsert_rpsl_object(rpsl_object("PERSON1", "TEST"), JournalEntryOrigin.mirror)
+        self.dh.upsert_rpsl_object(rpsl_object("PERSON1", "TEST2"), JournalEntryOrigin.mirror)
+        self.dh.commit()
+
+        self.dh.start_rpsl_staging("TEST")
+        self.dh.upsert_rpsl_object(
+            rpsl_object(
+                "192.0.2.0/24AS65537",
+                "TEST",
+                rpsl_object_class="route",
+                parsed_data={"route": "192.0.2.0/24", "descr": ['a "quoted", text'], "source": "TEST"},
+                ip_version=lambda: 4,
+                ip_first=IP("192.0.2.0"),
+                ip_last=IP("192.0.2.255"),
+                prefix=IP("192.0.2.0/24"),
+                prefix_length=24,
+                asn_first=65537,
+                asn_last=65537,
+                rpki_status=RPKIStatus.invalid,
+            ),
+            JournalEntryOrigin.mirror,
+        )
+        self.dh.upsert_rpsl_object(rpsl_object("PERSON2", "TEST", "old,\ntext"), JournalEntryOrigin.mirror)
+        self.dh.upsert_rpsl_object(rpsl_object("PERSON2", "TEST", 'new "text"'), JournalEntryOrigin.mirror)
+        self.dh.upsert_rpsl_object(rpsl_object("PERSON2", "TEST2"), JournalEntryOrigin.mirror)
+
+        # Staged objects are not visible before commit, other sources are updated as usual
+        assert [row["rpsl_pk"] for row in self.dh.execute_query(RPSLDatabaseQuery().sources(["TEST"]))] == [
+            "PERSON1"
+        ]
+        assert len(list(self.dh.execute_query(RPSLDatabaseQuery().sources(["TEST2"])))) == 2
+        self.dh.commit()
+
+        rows = {row["rpsl_pk"]: row for row in self.dh.execute_query(RPSLDatabaseQuery().sources(["TEST"]))}
+        assert set(rows.keys()) == {"192.0.2.0/24AS65537", "PERSON2"}
+        assert rows["PERSON2"]["object_text"] == 'new "text"'
+        route = rows["192.0.2.0/24AS65537"]
+        assert route["parsed_data"]["descr"] == ['a "quoted", text']
+        assert route["ip_first"] == "192.0.2.0"
+        assert route["prefix_length"] == 24
+        assert route["asn_first"] == 65537
+        assert route["rpki_status"] == RPKIStatus.invalid
+        assert len(list(self.dh.execute_query(RPSLDatabaseQuery().sources(["TEST2"])))) == 2
+        assert len(list(self.dh.execute_query(DatabaseStatusQuery().sources(["TEST"])))) == 1
+
+        statistics = list(self.dh.execute_query(RPSLDatabaseObjectStatisticsQuery()))
+        assert statistics == [
+            {"source": "TEST", "object_class": "person", "count": 1},
+            {"source": "TEST", "object_class": "route", "count": 1},
+            {"source": "TEST2", "object_class": "person", "count": 2},
+        ]
+
+        def partitions_per_rpsl_pk():
+            result = self.dh.execute_statement(
+                sa.text("SELECT rpsl_pk, tableoid::regclass::text FROM rpsl_objects WHERE source = 'TEST'")
+            )
+            return dict(result.fetchall())
+
+        assert partitions_per_rpsl_pk() == {
+            "192.0.2.0/24AS65537": "rpsl_objects_source_test",
+            "PERSON2": "rpsl_objects_source_test",
+        }
+
+        # A second reload replaces the partition created by the first
+        self.dh.start_rpsl_staging("TEST")
+        self.dh.upsert_rpsl_object(rpsl_object("PERSON3", "TEST"), JournalEntryOrigin.mirror)
+        self.dh.commit()
+        assert partitions_per_rpsl_pk() == {"PERSON3": "rpsl_objects_source_test"}
+
+        # Each index of the partition is attached to an index of rpsl_objects
+        index_counts = self.dh.execute_statement(
+            sa.text(
+                "SELECT count(*), count(pg_inherits.inhparent) FROM pg_index LEFT JOIN pg_inherits "
+                "ON pg_inherits.inhrelid = pg_index.indexrelid "
+                "WHERE pg_index.indrelid IN ('rpsl_objects'::regclass, 'rpsl_objects_source_test'::regclass) "
+                "GROUP BY pg_index.indrelid ORDER BY pg_index.indrelid = 'rpsl_objects'::regclass"
+            )
+        ).fetchall()
+        parent_index_count = index_counts[1][0]
+        assert parent_index_count > 2
+        assert index_counts == [(parent_index_count, parent_index_count), (parent_index_count, 0)]
+        statistics = list(self.dh.execute_query(RPSLDatabaseObjectStatisticsQuery()))
+        assert statistics == [
+            {"source": "TEST", "object_class": "person", "count": 1},
+            {"source": "TEST2", "object_class": "person", "count": 2},
+        ]
+        self.dh.close()
+
+    def test_rpsl_staging_partition_lock_timeout(self, irrd_db_mock_preload, monkeypatch, caplog):
+        monkeypatch.setattr("irrd.storage.database_handler.PARTITION_LOCK_TIMEOUT", 0.1)
+        monkeypatch.setattr("irrd.storage.database_handler.PARTITION_REPLACE_RETRY_DELAY", 0)
+
+        def rpsl_object(rpsl_pk):
+            return Mock(
+                pk=lambda: rpsl_pk,
+                source=lambda: "TEST",
+                rpsl_object_class="person",
+                parsed_data={"person": rpsl_pk, "source": "TEST"},
+                render_rpsl_text=lambda last_modified: "object-text",
+                ip_version=lambda: None,
+                ip_first=None,
+                ip_last=None,
+                prefix=None,
+                prefix_length=None,
+                asn_first=None,
+                asn_last=None,
+                rpki_status=RPKIStatus.not_found,
+                scopefilter_status=ScopeFilterStatus.in_scope,
+                route_preference_status=RoutePreferenceStatus.visible,
+            )
+
+        self.dh = DatabaseHandler()
+        self.dh.upsert_rpsl_object(rpsl_object("PERSON1"), JournalEntryOrigin.mirror)
+        self.dh.commit()
+
+        # An open transaction of another reader holds a lock on rpsl_objects
+        reader_dh = DatabaseHandler()
+        assert len(list(reader_dh.execute_query(RPSLDatabaseQuery().sources(["TEST"])))) == 1
+
+        try:
+            self.dh.start_rpsl_staging("TEST")
+            self.dh.upsert_rpsl_object(rpsl_object("PERSON2"), JournalEntryOrigin.mirror)
+            with raises(RPSLObjectsPartitionLockError):
+                self.dh.commit()
+        finally:
+            reader_dh.rollback()
+            reader_dh.close()
+        assert caplog.text.count("Unable to lock RPSL objects to replace the partition of TEST") == 3
+
+        # The reload is rolled back entirely, and the handler remains usable
+        rows = list(self.dh.execute_query(RPSLDatabaseQuery().sources(["TEST"])))
+        assert [row["rpsl_pk"] for row in rows] == ["PERSON1"]
+        assert len(list(self.dh.execute_query(DatabaseStatusQuery().sources(["TEST"])))) == 1
+        self.dh.close()
+
+    def test_create_rpsl_objects_partition(self, irrd_db_mock_preload):
+        self.dh = DatabaseHandler()
+        for rpsl_pk in ["PERSON1", "PERSON2"]:
+            self.dh.upsert_rpsl_object(
+                Mock(
+                    pk=lambda rpsl_pk=rpsl_pk: rpsl_pk,
+                    source=lambda: "TEST-PARTITION",
+                    rpsl_object_class="person",
+                    parsed_data={"person": rpsl_pk, "source": "TEST-PARTITION"},
+                    render_rpsl_text=lambda last_modified: "object-text",
+                    ip_version=lambda: None,
+                    ip_first=None,
+                    ip_last=None,
+                    prefix=None,
+                    prefix_length=None,
+                    asn_first=None,
+                    asn_last=None,
+                    rpki_status=RPKIStatus.not_found,
+                    scopefilter_status=ScopeFilterStatus.in_scope,
+                    route_preference_status=RoutePreferenceStatus.visible,
+                ),
+                JournalEntryOrigin.mirror,
+            )
+        self.dh.commit()
+
+        def partitions():
+            result = self.dh.execute_statement(
+                sa.text(
+                    "SELECT DISTINCT tableoid::regclass::text FROM rpsl_objects WHERE source = 'TEST-PARTITION'"
+                )
+            )
+            return [partition for (partition,) in result.fetchall()]
+
+        assert partitions() == ["rpsl_objects_default"]
+        assert self.dh.create_rpsl_objects_partition("TEST-PARTITION")
+        assert not self.dh.create_rpsl_objects_partition("TEST-PARTITION")
+        self.dh.commit()
+        assert partitions() == ["rpsl_objects_source_test_partition"]
+        assert len(list(self.dh.execute_query(RPSLDatabaseQuery().sources(["TEST-PARTITION"])))) == 2
+        statistics = list(self.dh.execute_query(RPSLDatabaseObjectStatisticsQuery()))
+        assert statistics == [{"source": "TEST-PARTITION", "object_class": "person", "count": 2}]
+        self.dh.close()
+
+    def test_rpsl_object_lookups(self, irrd_db_mock_preload, config_override):
+        config_override({"lookup_index_table": True})
+
+        def rpsl_object(rpsl_pk, source, parsed_data):
+            return Mock(
+                pk=lambda: rpsl_pk,
+                source=lambda: source,
+                rpsl_object_class="route",
+                parsed_data={"route": rpsl_pk, "source": source, **parsed_data},
+                render_rpsl_text=lambda last_modified: "object-text",
+                ip_version=lambda: None,
+                ip_first=None,
+                ip_last=None,
+                prefix=None,
+                prefix_length=None,
+                asn_first=None,
+                asn_last=None,
+                rpki_status=RPKIStatus.not_found,
+                scopefilter_status=ScopeFilterStatus.in_scope,
+                route_preference_status=RoutePreferenceStatus.visible,
+            )
+
+        def lookups():
+            table = RPSLObjectLookup.__table__
+            result = self.dh.execute_statement(
+                sa.select(table.c.source, table.c.attribute, table.c.value, table.c.object_class)
+            )
+            return sorted(tuple(row) for row in result.fetchall())
+
+        def lookup_rpsl_pks(attr_names, attr_values):
+            rpsl_pks = []
+            for use_lookup_table in [False, True]:
+                query = RPSLDatabaseQuery().lookup_attrs_in(attr_names, attr_values, use_lookup_table)
+                rpsl_pks.append(sorted(row["rpsl_pk"] for row in self.dh.execute_query(query)))
+            assert rpsl_pks[0] == rpsl_pks[1]
+            return rpsl_pks[0]
+
+        self.dh = DatabaseHandler()
+        self.dh.upsert_rpsl_object(
+            rpsl_object("R1", "TEST", {"mnt-by": ["MNT-A", "MNT-B", "MNT-A"], "origin": "AS65537"}),
+            JournalEntryOrigin.auth_change,
+        )
+        self.dh.upsert_rpsl_object(
+            rpsl_object("R2", "TEST", {"mnt-by": ["MNT-B"], "descr": ["MNT-A"]}),
+            JournalEntryOrigin.auth_change,
+        )
+        self.dh.upsert_rpsl_object(
+            rpsl_object("R1", "TEST2", {"mnt-by": ["MNT-A"]}), JournalEntryOrigin.auth_change
+        )
+        self.dh.commit()
+
+        assert lookups() == [
+            ("TEST", "mnt-by", "MNT-A", "route"),
+            ("TEST", "mnt-by", "MNT-B", "route"),
+            ("TEST", "mnt-by", "MNT-B", "route"),
+            ("TEST", "origin", "AS65537", "route"),
+            ("TEST2", "mnt-by", "MNT-A", "route"),
+        ]
+        assert lookup_rpsl_pks(["mnt-by"], ["mnt-a"]) == ["R1", "R1"]
+        assert lookup_rpsl_pks(["mnt-by", "origin"], ["MNT-B", "AS65537"]) == ["R1", "R2"]
+        assert lookup_rpsl_pks(["mnt-by"], ["MNT-B", True]) == ["R1", "R1", "R2"]
+        assert lookup_rpsl_pks(["origin"], ["MNT-A"]) == []
+
+        self.dh.upsert_rpsl_object(
+            rpsl_object("R1", "TEST", {"mnt-by": ["MNT-C"]}), JournalEntryOrigin.mirror
+        )
+        self.dh.delete_rpsl_object(
+            origin=JournalEntryOrigin.mirror, source="TEST", rpsl_pk="R2", object_class="route"
+        )
+        self.dh.commit()
+        assert lookups() == [
+            ("TEST", "mnt-by", "MNT-C", "route"),
+            ("TEST2", "mnt-by", "MNT-A", "route"),
+        ]
+        assert lookup_rpsl_pks(["mnt-by"], ["MNT-A", "MNT-C"]) == ["R1", "R1"]
+
+        self.dh.start_rpsl_staging("TEST")
+        self.dh.upsert_rpsl_object(
+            rpsl_object("R3", "TEST", {"mnt-by": ["MNT-D"]}), JournalEntryOrigin.mirror
+        )
+        self.dh.commit()
+        assert lookups() == [
+            ("TEST", "mnt-by", "MNT-D", "route"),
+            ("TEST2", "mnt-by", "MNT-A", "route"),
+        ]
+
+        self.dh.delete_all_rpsl_objects_with_journal("TEST2")
+        self.dh.commit()
+        assert lookups() == [("TEST", "mnt-by", "MNT-D", "route")]
+
+        # The table is only used for queries by default with lookup_index_table_queries
+        query = RPSLDatabaseQuery().lookup_attrs_in(["mnt-by"], ["MNT-D"])
+        assert "rpsl_object_lookup" not in str(query.finalise_statement())
+        config_override({"lookup_index_table": True, "lookup_index_table_queries": True})
+        query = RPSLDatabaseQuery().lookup_attrs_in(["mnt-by"], ["MNT-D"])
+        assert "rpsl_object_lookup" in str(query.finalise_statement())
+
+        # Queries on the table are not blocked by a rebuild, and see the old rows until commit
+        self.dh.execute_statement(
+            RPSLObjectLookup.__table__.insert().values(
+                source="TEST",
+                rpsl_object_pk=uuid.uuid4(),
+                attribute="mnt-by",
+                value="MNT-X",
+                object_class="route",
+            )
+        )
+        self.dh.commit()
+        self.dh.rebuild_rpsl_object_lookups()
+        reader_dh = DatabaseHandler()
+        try:
+            reader_dh.execute_statement(sa.text("SET LOCAL lock_timeout = '1s'"))
+            rows = reader_dh.execute_statement(sa.select(RPSLObjectLookup.__table__.c.value)).fetchall()
+            assert sorted(value for (value,) in rows) == ["MNT-D", "MNT-X"]
+        finally:
+            reader_dh.rollback()
+            reader_dh.close()
+        self.dh.commit()
+        assert lookups() == [("TEST", "mnt-by", "MNT-D", "route")]
+        assert lookup_rpsl_pks(["mnt-by"], ["MNT-D"]) == ["R3"]
+        self.dh.close()
+
+    def test_journal_partitions(self, irrd_db_mock_preload):
+        self.dh = DatabaseHandler()
+        now = datetime.now(timezone.utc)
+        timestamps = [
+            datetime(2022, 1, 10, tzinfo=timezone.utc),
+            datetime(2022, 2, 10, tzinfo=timezone.utc),
+            datetime(2022, 2, 20, tzinfo=timezone.utc),
+            now,
+        ]
+        for serial_nrtm, timestamp in enumerate(timestamps, start=1):
+            for source in ["TEST", "TEST2"]:
+                self.dh.execute_statement(
+                    RPSLDatabaseJournal.__table__.insert().values(
+                        rpsl_pk=f"PK{serial_nrtm}",
+                        source=source,
+                        operation=DatabaseOperation.add_or_update,
+                        object_class="mntner",
+                        object_text="object-text",
+                        serial_nrtm=serial_nrtm,
+                        origin=JournalEntryOrigin.auth_change,
+                        timestamp=timestamp,
+                    )
+                )
+
+        def partitions_per_serial(source):
+            result = self.dh.execute_statement(
+                sa.text(
+                    "SELECT serial_nrtm, tableoid::regclass::text AS partition FROM rpsl_database_journal "
+                    "WHERE source = :source ORDER BY serial_nrtm"
+                ).bindparams(source=source)
+            )
+            return [(row.serial_nrtm, row.partition) for row in result]
+
+        try:
+            # Entries in the default partition are moved into the new partitions
+            created = self.dh.create_journal_partitions("TEST", [datetime(2022, 3, 1)])
+            assert created == [
+                journal_partition_name("TEST"),
+                journal_partition_name("TEST") + "_default",
+                "rpsl_database_journal_source_test_2022_01",
+                "rpsl_database_journal_source_test_2022_02",
+                "rpsl_database_journal_source_test_2022_03",
+                journal_partition_name("TEST", now),
+            ]
+            assert partitions_per_serial("TEST") == [
+                (1, "rpsl_database_journal_source_test_2022_01"),
+                (2, "rpsl_database_journal_source_test_2022_02"),
+                (3, "rpsl_database_journal_source_test_2022_02"),
+                (4, journal_partition_name("TEST", now)),
+            ]
+            assert {partition for _, partition in partitions_per_serial("TEST2")} == {
+                "rpsl_database_journal_default"
+            }
+            assert not self.dh.create_journal_partitions("TEST", [datetime(2022, 3, 1)])
+
+            # Entire months are dropped, other entries before the timestamp are deleted
+            self.dh.delete_journal_entries_before_date(datetime(2022, 2, 15, tzinfo=timezone.utc), "TEST")
+            assert partitions_per_serial("TEST") == [
+                (3, "rpsl_database_journal_source_test_2022_02"),
+                (4, journal_partition_name("TEST", now)),
+            ]
+            result = self.dh.execute_statement(sa.text(f"SELECT to_regclass('{created[2]}')"))
+            assert result.scalar() is None
+            assert len(partitions_per_serial("TEST2")) == 4
+        finally:
+            self.dh.rollback()
+            self.dh.close()
+
+    def test_journal_latest_per_object(self, irrd_db_mock_preload):
+        self.dh = DatabaseHandler()
+        entries = [
+            ("TEST", "mntner", "PK1", DatabaseOperation.add_or_update),
+            ("TEST", "mntner", "PK2", DatabaseOperation.add_or_update),
+            ("TEST", "mntner", "PK1", DatabaseOperation.delete),
+            ("TEST", "person", "PK1", DatabaseOperation.add_or_update),
+            ("TEST2", "mntner", "PK1", DatabaseOperation.add_or_update),
+            ("TEST", "mntner", "PK2", DatabaseOperation.add_or_update),
+            # Added and deleted within the range, may still have existed before
+            ("TEST", "mntner", "PK3", DatabaseOperation.add_or_update),
+            ("TEST", "mntner", "PK3", DatabaseOperation.delete),
+            # Existed before the range, updated and deleted within it
+            ("TEST", "mntner", "PK2", DatabaseOperation.delete),
+        ]
+        for serial_nrtm, (source, object_class, rpsl_pk, operation) in enumerate(entries, start=1):
+            self.dh.execute_statement(
+                RPSLDatabaseJournal.__table__.insert().values(
+                    rpsl_pk=rpsl_pk,
+                    source=source,
+                    operation=operation,
+                    object_class=object_class,
+                    object_text=f"object-text-{serial_nrtm}",
+                    serial_nrtm=serial_nrtm,
+                    origin=JournalEntryOrigin.auth_change,
+                    timestamp=datetime.now(timezone.utc),
+                )
+            )
+        serial_global_start = min(
+            entry["serial_global"] for entry in self.dh.execute_query(RPSLDatabaseJournalQuery())
+        )
+
+        query = (
+            RPSLDatabaseJournalQuery()
+            .sources(["TEST"])
+            .serial_global_range(serial_global_start + 2)
+            .latest_per_object()
+            .stream_results()
+        )
+        result = [
+            (entry["object_class"], entry["rpsl_pk"], entry["operation"], entry["object_text"])
+            for entry in self.dh.execute_query(query)
+        ]
+        assert result == [
+            ("mntner", "PK1", DatabaseOperation.delete, "object-text-3"),
+            ("person", "PK1", DatabaseOperation.add_or_update, "object-text-4"),
+            ("mntner", "PK3", DatabaseOperation.delete, "object-text-8"),
+            ("mntner", "PK2", DatabaseOperation.delete, "object-text-9"),
+        ]
+
+        # Deletions are included even without any earlier entries
+        query = RPSLDatabaseJournalQuery().sources(["TEST"]).latest_per_object()
+        result = [(entry["object_class"], entry["rpsl_pk"]) for entry in self.dh.execute_query(query)]
+        assert result == [("mntner", "PK1"), ("person", "PK1"), ("mntner", "PK3"), ("mntner", "PK2")]
+        self.dh.rollback()
+        self.dh.close()
+
+    def test_journal_partition_name(self):
+        month = datetime(2022, 12, 31, 23, 59, tzinfo=timezone.utc)
+        assert journal_partition_name("TEST-DB") == "rpsl_database_journal_source_test_db"
+        assert journal_partition_name("TEST-DB", month) == "rpsl_database_journal_source_test_db_2022_12"
+        long_name = journal_partition_name("LONG-SOURCE-NAME-THAT-EXCEEDS-THE-LIMIT", month)
+        assert long_name.startswith("rpsl_database_journal_source_")
+        assert long_name.endswith("_2022_12")
+        assert len(long_name) <= 63
+
 
 # noinspection PyTypeChecker
 class TestRPSLDatabaseQueryLive:
@@ -1109,6 +1656,7 @@ class TestRPSLDatabaseQueryLive:
         self._assert_match(RPSLDatabaseQuery().ip_more_specific(IP("192.0.0.0/21")))
         self._assert_match(RPSLDatabaseQuery().ip_less_specific(IP("192.0.2.0/24")))
         self._assert_match(RPSLDatabaseQuery().ip_less_specific(IP("192.0.2.0/25")))
+        self._assert_match(RPSLDatabaseQuery().ip_less_specific_of([IP("192.0.3.0/24"), IP("192.0.2.0/25")]))
         self._assert_match(RPSLDatabaseQuery().ip_any(IP("192.0.0.0/21")))
         self._assert_match(RPSLDatabaseQuery().ip_any(IP("192.0.2.0/24")))
         self._assert_match(RPSLDatabaseQuery().ip_any(IP("192.0.2.0/25")))
@@ -1120,6 +1668,20 @@ class TestRPSLDatabaseQueryLive:
         self._assert_match(RPSLDatabaseQuery().scopefilter_status([ScopeFilterStatus.in_scope]))
         self._assert_match(RPSLDatabaseQuery().route_preference_status([RoutePreferenceStatus.visible]))
 
+    def test_estimate_row_count(self, irrd_db_mock_preload, database_handler_with_route):
+        self.dh = database_handler_with_route
+        query = (
+            RPSLDatabaseQuery()
+            .object_classes(["route"])
+            .rpki_status([RPKIStatus.invalid])
+            .ip_less_specific(IP("192.0.2.0/25"))
+        )
+        estimate = self.dh.estimate_row_count(query)
+        assert isinstance(estimate, int)
+        assert estimate >= 1
+        # The query can still be executed normally afterwards
+        assert len(list(self.dh.execute_query(query))) == 1
+
     def test_chained_filters(self, irrd_db_mock_preload, database_handler_with_route):
         self.dh = database_handler_with_route
 
@@ -1157,6 +1719,12 @@ class TestRPSLDatabaseQueryLive:
         self._assert_no_match(RPSLDatabaseQuery().asn_less_specific(23455))
         self._assert_no_match(RPSLDatabaseQuery().ip_more_specific(IP("192.0.2.0/24")))
         self._assert_no_match(RPSLDatabaseQuery().ip_less_specific(IP("192.0.2.0/23")))
+        self._assert_no_match(
+            RPSLDatabaseQuery().ip_less_specific_of([IP("192.0.2.0/23"), IP("2001:db8::/48")])
+        )
+        self._assert_no_match(
+            RPSLDatabaseQuery().object_classes(["inetnum"]).ip_less_specific_of([IP("192.0.2.0/25")])
+        )
         self._assert_no_match(RPSLDatabaseQuery().ip_any(IP("192.0.3.0/24")))
         self._assert_no_match(RPSLDatabaseQuery().text_search("192.0.2.0/23"))
         self._assert_no_match(RPSLDatabaseQuery().text_search("AS2914"))
@@ -1331,6 +1899,24 @@ class TestRPSLDatabaseQueryLive:
         assert "192.0.2.0/25,AS65537" in rpsl_pks
         assert "192.0.2.0/26,AS65537" in rpsl_pks
 
+        q = (
+            RPSLDatabaseQuery()
+            .object_classes(["route"])
+            .ip_any_of([IP("192.0.2.0/26"), IP("192.0.2.128/25")])
+        )
+        rpsl_pks = [r["rpsl_pk"] for r in self.dh.execute_query(q)]
+        # The /24 overlaps both prefixes, and is therefore returned twice
+        assert sorted(rpsl_pks) == [
+            "192.0.2.0/24,AS65537",
+            "192.0.2.0/24,AS65537",
+            "192.0.2.0/25,AS65537",
+            "192.0.2.0/26,AS65537",
+            "192.0.2.128/25,AS65537",
+        ], f"Failed query: {q}"
+
+        with pytest.raises(ValueError):
+            RPSLDatabaseQuery().ip_any_of([IP("192.0.2.0/26")])
+
         q = RPSLDatabaseQuery().ip_more_specific(IP("192.0.2.0/24"))
         rpsl_pks = [r["rpsl_pk"] for r in self.dh.execute_query(q)]
         assert len(rpsl_pks) == 3, f"Failed query: {q}"
@@ -1357,6 +1943,91 @@ class TestRPSLDatabaseQueryLive:
         q = RPSLDatabaseQuery().sources(["TEST"]).ip_less_specific_one_level(IP("192.0.2.0/27"))
         self._assert_match(q)
 
+    def test_preload_queries(self, irrd_db_mock_preload):
+        self.dh = DatabaseHandler()
+
+        def upsert(object_class, rpsl_pk, parsed_data, source="TEST", prefix=None, asn=None, **kwargs):
+            self.dh.upsert_rpsl_object(
+                Mock(
+                    pk=lambda: rpsl_pk,
+                    rpsl_object_class=object_class,
+                    parsed_data={"source": source, "mnt-by": ["MNT-TEST"], **parsed_data},
+                    render_rpsl_text=lambda last_modified: "object-text",
+                    ip_version=lambda: prefix.version() if prefix else None,
+                    ip_first=prefix.net() if prefix else None,
+                    ip_last=prefix.broadcast() if prefix else None,
+                    prefix=prefix,
+                    prefix_length=prefix.prefixlen() if prefix else None,
+                    asn_first=asn,
+                    asn_last=asn,
+                    rpki_status=kwargs.get("rpki_status", RPKIStatus.not_found),
+                    scopefilter_status=ScopeFilterStatus.in_scope,
+                    route_preference_status=RoutePreferenceStatus.visible,
+                ),
+                JournalEntryOrigin.auth_change,
+            )
+
+        upsert("route", "192.0.2.0/24AS65537", {}, prefix=IP("192.0.2.0/24"), asn=65537)
+        upsert("route", "192.0.2.0/24AS65538", {}, prefix=IP("192.0.2.0/24"), asn=65538)
+        upsert("route", "198.51.100.0/24AS65537", {}, prefix=IP("198.51.100.0/24"), asn=65537)
+        upsert("route6", "2001:DB8::/32AS65537", {}, prefix=IP("2001:db8::/32"), asn=65537)
+        upsert("route", "192.0.2.0/24AS65537", {}, source="TEST2", prefix=IP("192.0.2.0/24"), asn=65537)
+        upsert(
+            "route",
+            "203.0.113.0/24AS65537",
+            {},
+            prefix=IP("203.0.113.0/24"),
+            asn=65537,
+            rpki_status=RPKIStatus.invalid,
+        )
+
+        upsert("as-set", "AS-EMPTY", {})
+        upsert("as-set", "AS-DIRECT", {"members": ["AS65537", "AS-OTHER"], "mp-members": ["AS65537"]})
+        upsert("as-set", "AS-NOREF", {"members": ["AS65530"]})
+        upsert("as-set", "AS-REF", {"mbrs-by-ref": ["MNT-TEST"]})
+        upsert("as-set", "AS-ANY", {"members": ["AS65530"], "mbrs-by-ref": ["ANY"]})
+        upsert("aut-num", "AS65531", {"aut-num": "AS65531", "member-of": ["AS-REF", "AS-NOREF", "AS-ANY"]})
+        upsert(
+            "aut-num",
+            "AS65532",
+            {"aut-num": "AS65532", "member-of": ["AS-REF", "AS-ANY"], "mnt-by": ["MNT-OTHER"]},
+        )
+        upsert("aut-num", "AS65533", {"aut-num": "AS65533", "member-of": ["AS-ANY"]}, source="TEST2")
+        self.dh.commit()
+
+        route_origins = {
+            (row["source"], row["asn_first"], row["ip_version"]): sorted(row["prefixes"])
+            for row in self.dh.execute_query(PreloadRouteOriginsQuery())
+        }
+        route_prefixes = {
+            (row["source"], row["prefix"]): list(zip(row["asns"], row["rpsl_pks"]))
+            for row in self.dh.execute_query(PreloadRoutePrefixesQuery())
+        }
+        set_members = {
+            (row["source"], row["rpsl_pk"]): sorted(row["members"])
+            for row in self.dh.execute_query(PreloadSetMembersQuery("as-set", ["aut-num"]))
+        }
+        self.dh.close()
+
+        assert route_origins == {
+            ("TEST", 65537, 4): ["192.0.2.0/24", "198.51.100.0/24"],
+            ("TEST", 65537, 6): ["2001:db8::/32"],
+            ("TEST", 65538, 4): ["192.0.2.0/24"],
+            ("TEST2", 65537, 4): ["192.0.2.0/24"],
+        }
+        assert route_prefixes[("TEST", "192.0.2.0/24")] == [
+            (65537, "192.0.2.0/24AS65537"),
+            (65538, "192.0.2.0/24AS65538"),
+        ]
+        assert len(route_prefixes) == 4
+        assert set_members == {
+            ("TEST", "AS-EMPTY"): [],
+            ("TEST", "AS-DIRECT"): ["AS-OTHER", "AS65537"],
+            ("TEST", "AS-NOREF"): ["AS65530"],
+            ("TEST", "AS-REF"): ["AS65531"],
+            ("TEST", "AS-ANY"): ["AS65530", "AS65531", "AS65532"],
+        }
+
     def test_modify_frozen_filter(self):
         with raises(ValueError) as ve:
             RPSLDatabaseQuery().ip_less_specific_one_level(IP("192.0.2.0/27")).sources(["TEST"])
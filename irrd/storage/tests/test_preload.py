@@ -10,16 +10,22 @@ from ..database_handler import DatabaseHandler
 from ..preload import (
     REDIS_KEY_PK_SOURCE_SEPARATOR,
     REDIS_PRELOAD_ALL_MESSAGE,
+    PreloadedRoute,
     Preloader,
     PreloadStoreManager,
     PreloadUpdater,
     SetMembers,
 )
-from ..queries import RPSLDatabaseQuery
+from ..queries import (
+    PreloadRouteOriginsQuery,
+    PreloadRoutePrefixesQuery,
+    PreloadSetMembersQuery,
+)
 
 # Use different stores in tests
 TEST_REDIS_ORIGIN_ROUTE4_STORE_KEY = "TEST-irrd-preload-origin-route4"
 TEST_REDIS_ORIGIN_ROUTE6_STORE_KEY = "TEST-irrd-preload-origin-route6"
+TEST_REDIS_ROUTE_PREFIX_STORE_KEY = "TEST-irrd-preload-route-prefix"
 TEST_REDIS_PRELOAD_RELOAD_CHANNEL = "TEST-irrd-preload-reload-channel"
 TEST_REDIS_PRELOAD_COMPLETE_CHANNEL = "TEST-irrd-preload-complete-channel"
 
@@ -39,6 +45,9 @@ def mock_redis_keys(monkeypatch, config_override):
     monkeypatch.setattr(
         "irrd.storage.preload.REDIS_ORIGIN_ROUTE6_STORE_KEY", TEST_REDIS_ORIGIN_ROUTE6_STORE_KEY
     )
+    monkeypatch.setattr(
+        "irrd.storage.preload.REDIS_ROUTE_PREFIX_STORE_KEY", TEST_REDIS_ROUTE_PREFIX_STORE_KEY
+    )
     monkeypatch.setattr(
         "irrd.storage.preload.REDIS_PRELOAD_RELOAD_CHANNEL", TEST_REDIS_PRELOAD_RELOAD_CHANNEL
     )
@@ -198,192 +207,193 @@ class TestPreloading:
             preloader.routes_for_origins(["AS65547"], [], 2)
         assert "Invalid IP version: 2" in str(ve.value)
 
+    def test_route_prefix_trees(self, mock_redis_keys, config_override):
+        config_override({"preload_route_search": True})
+        preloader = Preloader()
+        preload_manager = PreloadStoreManager()
+
+        # Wait for the preloader instance to start listening on pubsub
+        time.sleep(1)
+
+        preload_manager.update_route_store({}, {})
+        preload_manager.update_route_prefix_store(
+            {
+                f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}192.0.2.0/24": {
+                    f"AS65546{REDIS_KEY_PK_SOURCE_SEPARATOR}192.0.2.0/24AS65546"
+                },
+                f"TEST2{REDIS_KEY_PK_SOURCE_SEPARATOR}2001:db8::/32": {
+                    f"AS65547{REDIS_KEY_PK_SOURCE_SEPARATOR}2001:DB8::/32AS65547"
+                },
+            }
+        )
+        preload_manager.signal_redis_store_updated()
+        time.sleep(1)
+
+        trees = preloader.route_prefix_trees(["TEST1", "TEST2", "TEST3"])
+        assert sorted(trees.keys()) == ["TEST1", "TEST2"]
+        assert trees["TEST1"].search_best("192.0.2.1").data == [
+            PreloadedRoute("192.0.2.0/24", "AS65546", "192.0.2.0/24AS65546")
+        ]
+        assert trees["TEST2"].search_exact("2001:db8::/32").data == [
+            PreloadedRoute("2001:db8::/32", "AS65547", "2001:DB8::/32AS65547")
+        ]
+        assert not trees["TEST2"].search_best("192.0.2.1")
+
+        config_override({"preload_route_search": False})
+        assert preloader.route_prefix_trees(["TEST1"]) is None
+
+    def test_snapshot(self, mock_redis_keys, config_override, tmp_path, caplog):
+        snapshot_path = str(tmp_path / "preload-snapshot")
+        config_override({"preload_snapshot_path": snapshot_path})
+        preload_manager = PreloadStoreManager()
+
+        # No snapshot present yet
+        assert not preload_manager.restore_snapshot()
+
+        preload_manager.update_route_store(
+            {f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}AS65546": {"192.0.2.0/25"}},
+            {f"TEST2{REDIS_KEY_PK_SOURCE_SEPARATOR}AS65547": {"2001:db8::/32"}},
+        )
+        preload_manager.write_snapshot(42)
+        preload_manager._clear_existing_data()
+        assert not preload_manager._redis_conn.exists(TEST_REDIS_ORIGIN_ROUTE4_STORE_KEY)
+
+        assert preload_manager.restore_snapshot()
+        assert "reflecting journal serial 42" in caplog.text
+        preload_manager.signal_redis_store_updated()
+        preloader = Preloader()
+        preloader._load_preload_data_into_memory()
+        assert preloader.routes_for_origins(["AS65546", "AS65547"], ["TEST1", "TEST2"]) == {
+            "192.0.2.0/25",
+            "2001:db8::/32",
+        }
+
+        # A snapshot in a different format is ignored
+        with open(snapshot_path, "rb") as snapshot_file:
+            contents = snapshot_file.read()
+        with open(snapshot_path, "wb") as snapshot_file:
+            snapshot_file.write(contents.replace(b'"format_version": 2', b'"format_version": 0'))
+        assert not preload_manager.restore_snapshot()
+        assert "incompatible format" in caplog.text
+
+        # A damaged snapshot is rejected, and leaves an empty store
+        with open(snapshot_path, "wb") as snapshot_file:
+            snapshot_file.write(contents[:-10] + b"0123456789")
+        assert not preload_manager.restore_snapshot()
+        assert "Failed to restore preload snapshot" in caplog.text
+        assert not preload_manager._redis_conn.exists(TEST_REDIS_ORIGIN_ROUTE4_STORE_KEY)
+
 
 class TestPreloadUpdater:
-    def test_preload_updater(self, monkeypatch):
+    def test_preload_updater(self, config_override):
+        config_override({"preload_route_search": True})
         mock_database_handler = Mock(spec=DatabaseHandler)
-        mock_database_query = Mock(spec=RPSLDatabaseQuery)
-        monkeypatch.setattr(
-            "irrd.storage.preload.RPSLDatabaseQuery",
-            lambda column_names, enable_ordering: mock_database_query,
-        )
         mock_reload_lock = Mock()
         mock_preload_obj = Mock()
 
-        mock_query_result = iter(
-            [
-                [
-                    {
-                        "ip_version": 4,
-                        "ip_first": "192.0.2.0",
-                        "prefix_length": 25,
-                        "asn_first": 65546,
-                        "source": "TEST1",
-                    },
-                    {
-                        "ip_version": 4,
-                        "ip_first": "192.0.2.128",
-                        "prefix_length": 25,
-                        "asn_first": 65547,
-                        "source": "TEST1",
-                    },
-                    {
-                        "ip_version": 4,
-                        "ip_first": "198.51.100.0",
-                        "prefix_length": 25,
-                        "asn_first": 65547,
-                        "source": "TEST1",
-                    },
-                    {
-                        "ip_version": 6,
-                        "ip_first": "2001:db8::",
-                        "prefix_length": 32,
-                        "asn_first": 65547,
-                        "source": "TEST2",
-                    },
-                ],
-                [
-                    {
-                        "rpsl_pk": "AS-SET1",
-                        "parsed_data": {"members": ["AS65530"], "mbrs-by-ref": ["TEST-MNT"]},
-                        "source": "TEST1",
-                    },
-                    {
-                        "rpsl_pk": "AS-SET-ANY",
-                        "parsed_data": {"members": ["AS65530"], "mbrs-by-ref": ["ANY"]},
-                        "source": "TEST1",
-                    },
-                ],
-                [
-                    {
-                        "object_class": "aut-num",
-                        "parsed_data": {
-                            "aut-num": "AS65531",
-                            "member-of": ["AS-SET1", "AS-SET-NOT-EXIST"],
-                            "mnt-by": ["TEST-MNT"],
-                        },
-                        "source": "TEST1",
-                    },
-                    {
-                        "object_class": "aut-num",
-                        "parsed_data": {
-                            "aut-num": "AS65532",
-                            "member-of": ["AS-SET-ANY"],
-                            "mnt-by": ["OTHER-MNT"],
-                        },
-                        "source": "TEST1",
-                    },
-                    {
-                        "object_class": "aut-num",
-                        "parsed_data": {
-                            "aut-num": "AS65533",
-                            "member-of": ["AS-SET1"],
-                            "mnt-by": ["OTHER-MNT"],
-                        },
-                        "source": "TEST1",
-                    },
-                    {
-                        "object_class": "aut-num",
-                        "parsed_data": {
-                            "aut-num": "AS65534",
-                            "member-of": "AS-SET1",
-                            "mnt-by": "TEST-MNT",
-                        },
-                        "source": "OTHER-SOURCE",
-                    },
-                ],
-                [
-                    {
-                        "rpsl_pk": "RS-SET1",
-                        "parsed_data": {
-                            "members": ["192.0.2.0/25"],
-                            "mp-members": ["2001:db8:1::/48"],
-                            "mbrs-by-ref": ["TEST-MNT"],
-                        },
-                        "source": "TEST1",
-                    },
-                ],
-                [
-                    {
-                        "object_class": "route",
-                        "parsed_data": {
-                            "route": "192.0.2.128/25",
-                            "member-of": ["RS-SET1"],
-                            "mnt-by": ["TEST-MNT"],
-                        },
-                        "source": "TEST1",
-                    },
-                    {
-                        "object_class": "route6",
-                        "parsed_data": {
-                            "route6": "2001:db8:2::/48",
-                            "member-of": ["RS-SET1"],
-                            "mnt-by": ["TEST-MNT"],
-                        },
-                        "source": "TEST1",
-                    },
-                ],
-            ]
-        )
-        mock_database_handler.execute_query = lambda query: next(mock_query_result)
+        query_results = {
+            PreloadRouteOriginsQuery: [
+                {"source": "TEST1", "asn_first": 65546, "ip_version": 4, "prefixes": ["192.0.2.0/25"]},
+                {
+                    "source": "TEST1",
+                    "asn_first": 65547,
+                    "ip_version": 4,
+                    "prefixes": ["192.0.2.128/25", "198.51.100.0/25"],
+                },
+                {"source": "TEST2", "asn_first": 65547, "ip_version": 6, "prefixes": ["2001:db8::/32"]},
+            ],
+            PreloadRoutePrefixesQuery: [
+                {
+                    "source": "TEST1",
+                    "prefix": "192.0.2.0/25",
+                    "asns": [65546, 65547],
+                    "rpsl_pks": ["192.0.2.0/25AS65546", "192.0.2.0/25AS65547"],
+                },
+            ],
+        }
+        queries = []
+
+        def execute_query(query):
+            queries.append(query)
+            if isinstance(query, PreloadSetMembersQuery):
+                return iter([{"source": "TEST1", "rpsl_pk": "SET1", "members": ["MEMBER1", "MEMBER2"]}])
+            return iter(query_results[type(query)])
+
+        mock_database_handler.execute_query = execute_query
         PreloadUpdater(mock_preload_obj, mock_reload_lock, True, True, True).run(mock_database_handler)
 
         assert flatten_mock_calls(mock_reload_lock) == [["acquire", (), {}], ["release", (), {}]]
-        assert flatten_mock_calls(mock_database_query) == [
-            ["object_classes", (["route", "route6"],), {}],
-            ["default_suppression", (), {}],
-            ["object_classes", (["as-set"],), {}],
-            ["default_suppression", (), {}],
-            ["lookup_attr", ("member-of", True), {}],
-            ["object_classes", (["aut-num"],), {}],
-            ["default_suppression", (), {}],
-            ["object_classes", (["route-set"],), {}],
-            ["default_suppression", (), {}],
-            ["lookup_attr", ("member-of", True), {}],
-            ["object_classes", (["route", "route6"],), {}],
-            ["default_suppression", (), {}],
+        assert sorted(type(query).__name__ for query in queries) == [
+            "PreloadRouteOriginsQuery",
+            "PreloadRoutePrefixesQuery",
+            "PreloadSetMembersQuery",
+            "PreloadSetMembersQuery",
         ]
-
-        assert flatten_mock_calls(mock_preload_obj) == [
+        # Stores are built in parallel, in no particular order
+        calls = sorted(flatten_mock_calls(mock_preload_obj)[:-1])
+        assert calls == [
             [
-                "update_route_store",
-                (
-                    {
-                        f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}AS65546": {"192.0.2.0/25"},
-                        f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}AS65547": {
-                            "192.0.2.128/25",
-                            "198.51.100.0/25",
-                        },
-                    },
-                    {f"TEST2{REDIS_KEY_PK_SOURCE_SEPARATOR}AS65547": {"2001:db8::/32"}},
-                ),
+                "update_as_set_store",
+                ({f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}SET1": {"MEMBER1", "MEMBER2"}},),
                 {},
             ],
             [
-                "update_as_set_store",
+                "update_route_prefix_store",
                 (
                     {
-                        "TEST1_AS-SET-ANY": {"AS65530", "AS65532"},
-                        "TEST1_AS-SET1": {"AS65530", "AS65531"},
+                        f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}192.0.2.0/25": {
+                            f"AS65546{REDIS_KEY_PK_SOURCE_SEPARATOR}192.0.2.0/25AS65546",
+                            f"AS65547{REDIS_KEY_PK_SOURCE_SEPARATOR}192.0.2.0/25AS65547",
+                        },
                     },
                 ),
                 {},
             ],
             [
                 "update_route_set_store",
+                ({f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}SET1": {"MEMBER1", "MEMBER2"}},),
+                {},
+            ],
+            [
+                "update_route_store",
                 (
                     {
-                        "TEST1_RS-SET1": {
-                            "192.0.2.0/25",
+                        f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}AS65546": {"192.0.2.0/25"},
+                        f"TEST1{REDIS_KEY_PK_SOURCE_SEPARATOR}AS65547": {
                             "192.0.2.128/25",
-                            "2001:db8:1::/48",
-                            "2001:db8:2::/48",
+                            "198.51.100.0/25",
                         },
                     },
+                    {f"TEST2{REDIS_KEY_PK_SOURCE_SEPARATOR}AS65547": {"2001:db8::/32"}},
                 ),
                 {},
             ],
+        ]
+        assert flatten_mock_calls(mock_preload_obj)[-1] == ["signal_redis_store_updated", (), {}]
+
+    def test_preload_updater_partial(self):
+        mock_database_handler = Mock(spec=DatabaseHandler)
+        mock_database_handler.execute_query = lambda query: iter([])
+        mock_preload_obj = Mock()
+        PreloadUpdater(mock_preload_obj, Mock(), False, True, False).run(mock_database_handler)
+
+        assert flatten_mock_calls(mock_preload_obj) == [
+            ["update_as_set_store", ({},), {}],
+            ["signal_redis_store_updated", (), {}],
+        ]
+
+    def test_preload_updater_snapshot(self, config_override):
+        config_override({"preload_snapshot_path": "/tmp/snapshot"})
+        mock_database_handler = Mock(spec=DatabaseHandler)
+        mock_query_result = iter([iter([{"max_serial_global": 42}]), iter([])])
+        mock_database_handler.execute_query = lambda query: next(mock_query_result)
+        mock_preload_obj = Mock()
+        PreloadUpdater(mock_preload_obj, Mock(), True, False, False).run(mock_database_handler)
+
+        assert flatten_mock_calls(mock_preload_obj) == [
+            ["update_route_store", ({}, {}), {}],
             ["signal_redis_store_updated", (), {}],
+            ["write_snapshot", (42,), {}],
         ]
 
     def test_preload_updater_failure(self, caplog):
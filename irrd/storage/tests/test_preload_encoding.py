@@ -0,0 +1,96 @@
+import pytest
+
+from ..preload_encoding import (
+    FLAG_ZLIB,
+    KIND_PREFIXES_V4,
+    KIND_PREFIXES_V6,
+    KIND_SET_MEMBERS,
+    PreloadStore,
+    decode_store,
+    encode_store,
+)
+
+
+class TestPreloadEncoding:
+    def test_encode_decode_prefixes(self):
+        data = encode_store(
+            [
+                ("TEST1", "AS65546", {"192.0.2.128/25", "192.0.2.0/24", "192.0.2.0/25", "0.0.0.0/0"}),
+                ("TEST2", "AS65546", ["198.51.100.0/24"]),
+                ("TEST2", "AS65547", []),
+            ],
+            KIND_PREFIXES_V4,
+        )
+        store = decode_store(data)
+        assert store.get("TEST1", "AS65546") == [
+            "0.0.0.0/0",
+            "192.0.2.0/24",
+            "192.0.2.0/25",
+            "192.0.2.128/25",
+        ]
+        assert store.get("TEST2", "AS65546") == ["198.51.100.0/24"]
+        # Decoded values are kept until the store is replaced
+        assert store.get("TEST2", "AS65546") is store.get("TEST2", "AS65546")
+        assert store.get("TEST2", "AS65547") == []
+        assert store.get("TEST1", "AS65547") is None
+        assert store.get("TEST3", "AS65546") is None
+        assert len(list(store.items())) == 3
+
+        data = encode_store(
+            [("TEST1", "AS65546", {"2001:db8::/32", "2001:db8:ffff::/48", "::/0"})], KIND_PREFIXES_V6
+        )
+        assert decode_store(data).get("TEST1", "AS65546") == ["::/0", "2001:db8::/32", "2001:db8:ffff::/48"]
+
+    def test_encode_decode_set_members(self):
+        data = encode_store(
+            [
+                ("TEST1", "AS-SET1", ["AS65530", "AS-SET2"]),
+                ("TEST1", "AS-SET2", ["AS65530", "AS65531"]),
+                ("TEST1", "AS-ÉMPTY", []),
+            ],
+            KIND_SET_MEMBERS,
+        )
+        # Each name is only included once
+        assert data.count(b"AS65530") == 1
+        assert data.count(b"AS-SET2") == 1
+        store = decode_store(data)
+        assert sorted(store.items()) == [
+            ("TEST1", "AS-SET1", ["AS65530", "AS-SET2"]),
+            ("TEST1", "AS-SET2", ["AS65530", "AS65531"]),
+            ("TEST1", "AS-ÉMPTY", []),
+        ]
+
+        assert decode_store(encode_store([], KIND_SET_MEMBERS)).get("TEST1", "AS-SET1") is None
+        assert PreloadStore().get("TEST1", "AS-SET1") is None
+
+    def test_compression(self):
+        entries = [("TEST1", f"AS{asn}", [f"10.{asn % 256}.0.0/16"]) for asn in range(1000)]
+        compressed = encode_store(entries, KIND_PREFIXES_V4)
+        uncompressed = encode_store(entries, KIND_PREFIXES_V4, compress=False)
+        assert compressed[6] & FLAG_ZLIB
+        assert not uncompressed[6] & FLAG_ZLIB
+        assert len(compressed) < len(uncompressed)
+        assert list(decode_store(compressed).items()) == list(decode_store(uncompressed).items())
+        assert decode_store(compressed).get("TEST1", "AS257") == ["10.1.0.0/16"]
+
+    def test_decode_invalid(self):
+        data = encode_store([("TEST1", "AS-SET1", ["AS65530"])], KIND_SET_MEMBERS)
+
+        with pytest.raises(ValueError) as ve:
+            decode_store(data[:5])
+        assert "too short" in str(ve.value)
+        with pytest.raises(ValueError) as ve:
+            decode_store(data[:4] + b"\x00" + data[5:])
+        assert "Unsupported preload store encoding" in str(ve.value)
+        with pytest.raises(ValueError) as ve:
+            decode_store(data[:5] + b"\x09" + data[6:])
+        assert "Unknown preload store kind" in str(ve.value)
+        with pytest.raises(ValueError) as ve:
+            decode_store(data[:-2])
+        assert "Invalid preload store data" in str(ve.value)
+        with pytest.raises(ValueError) as ve:
+            decode_store(data + b"\x00")
+        assert "Invalid preload store data" in str(ve.value)
+        with pytest.raises(ValueError) as ve:
+            decode_store(data[:6] + bytes([FLAG_ZLIB]) + data[7:])
+        assert "Invalid preload store data" in str(ve.value)
@@ -0,0 +1,80 @@
+import contextvars
+import threading
+
+import redis
+
+from irrd.conf import get_setting
+
+from ..query_metrics import (
+    REDIS_QUERY_METRICS_KEY,
+    QueryMetricsRecorder,
+    load_query_metrics,
+    measure_preload,
+    query_timing,
+    record_cache_lookup,
+    record_database_time,
+)
+
+
+def test_query_timing():
+    # Outside of a timing context, recording has no effect
+    record_database_time(1)
+    record_cache_lookup(True)
+
+    with query_timing() as timing:
+        record_database_time(0.5)
+        with measure_preload():
+            pass
+        record_cache_lookup(True)
+        record_cache_lookup(False)
+        record_cache_lookup(False)
+
+        # Threads running in a copy of the context record in the same timing
+        context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(record_database_time, 0.25))
+        thread.start()
+        thread.join()
+
+    assert timing.database_seconds == 0.75
+    assert 0 < timing.preload_seconds < 1
+    assert timing.cache_hits == 1
+    assert timing.cache_misses == 2
+
+
+def test_query_metrics_recorder_redis():
+    redis_conn = redis.Redis.from_url(get_setting("redis_url"))
+    redis_conn.delete(REDIS_QUERY_METRICS_KEY)
+    try:
+        recorder = QueryMetricsRecorder()
+        with query_timing() as timing:
+            record_database_time(0.5)
+            record_cache_lookup(False)
+        recorder.record("whois", "!g", 0.002, 100, timing)
+        recorder.record("whois", "!g", 0.2, 50)
+        recorder.record("http", "-i", 100)
+        # Nothing is stored until the recorder is flushed
+        assert not load_query_metrics()
+
+        recorder.flush()
+        recorder.record("whois", "!g", 0.002, 10)
+        recorder.flush()
+        recorder.flush()
+
+        assert load_query_metrics() == {
+            ("whois", "!g"): {
+                "count": 3.0,
+                "duration_seconds": 0.204,
+                "bucket|0.005": 2.0,
+                "bucket|0.5": 1.0,
+                "response_bytes": 160.0,
+                "database_seconds": 0.5,
+                "cache_misses": 1.0,
+            },
+            ("http", "-i"): {
+                "count": 1.0,
+                "duration_seconds": 100.0,
+                "bucket|+Inf": 1.0,
+            },
+        }
+    finally:
+        redis_conn.delete(REDIS_QUERY_METRICS_KEY)
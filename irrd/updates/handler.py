@@ -15,6 +15,7 @@ from irrd.utils import email
 from ..utils.validators import RPSLChangeSubmission, RPSLSuspensionSubmission
 from .parser import ChangeRequest, SuspensionRequest, parse_change_requests
 from .parser_state import UpdateRequestStatus, UpdateRequestType
+from .prefetch import UpdatePrefetcher
 from .validators import AuthValidator, ReferenceValidator
 
 logger = logging.getLogger(__name__)
@@ -40,9 +41,14 @@ class ChangeSubmissionHandler:
         self.request_meta = request_meta if request_meta else {}
         self._pgp_key_id = self._resolve_pgp_key_id(pgp_fingerprint) if pgp_fingerprint else None
 
-        reference_validator = ReferenceValidator(self.database_handler)
+        prefetcher = UpdatePrefetcher(self.database_handler)
+        reference_validator = ReferenceValidator(self.database_handler, prefetcher)
         auth_validator = AuthValidator(
-            self.database_handler, origin, self._pgp_key_id, internal_authenticated_user
+            self.database_handler,
+            origin,
+            self._pgp_key_id,
+            internal_authenticated_user,
+            prefetcher=prefetcher,
         )
         change_requests = parse_change_requests(
             object_texts_blob,
@@ -50,9 +56,10 @@ class ChangeSubmissionHandler:
             auth_validator,
             reference_validator,
             self.request_meta,
+            prefetcher,
         )
 
-        self._handle_change_requests(change_requests, reference_validator, auth_validator)
+        self._handle_change_requests(change_requests, reference_validator, auth_validator, prefetcher)
         self.database_handler.commit()
         self.database_handler.close()
         return self
@@ -68,8 +75,11 @@ class ChangeSubmissionHandler:
         self.database_handler = DatabaseHandler()
         self.request_meta = request_meta if request_meta else {}
 
-        reference_validator = ReferenceValidator(self.database_handler)
-        auth_validator = AuthValidator(self.database_handler, origin, remote_ip=remote_ip)
+        prefetcher = UpdatePrefetcher(self.database_handler)
+        reference_validator = ReferenceValidator(self.database_handler, prefetcher)
+        auth_validator = AuthValidator(
+            self.database_handler, origin, remote_ip=remote_ip, prefetcher=prefetcher
+        )
         change_requests: list[ChangeRequest | SuspensionRequest] = []
 
         delete_reason = None
@@ -99,10 +109,12 @@ class ChangeSubmissionHandler:
                     reference_validator,
                     delete_reason,
                     self.request_meta,
+                    prefetcher,
                 )
             )
+        prefetcher.retrieve_existing_versions(change_requests)
 
-        self._handle_change_requests(change_requests, reference_validator, auth_validator)
+        self._handle_change_requests(change_requests, reference_validator, auth_validator, prefetcher)
         self.database_handler.commit()
         self.database_handler.close()
         return self
@@ -142,28 +154,32 @@ class ChangeSubmissionHandler:
         change_requests: list[ChangeRequest | SuspensionRequest],
         reference_validator: ReferenceValidator,
         auth_validator: AuthValidator,
+        prefetcher: UpdatePrefetcher | None = None,
     ) -> None:
         objects = ", ".join(
             [f"{request.rpsl_obj_new} (request {id(request)})" for request in change_requests]
         )
         logger.info(f"Processing change requests for {objects}, metadata is {self.request_meta}")
+        # The objects needed for validation are retrieved in bulk first, rather than
+        # by each change request and validator separately.
+        if prefetcher:
+            prefetcher.prefetch(change_requests)
         # When an object references another object, e.g. tech-c referring a person or mntner,
         # an add/update is only valid if those referred objects exist. To complicate matters,
         # the object referred to may be part of this very same submission. For this reason, the
         # reference validator can be provided with all new objects to be added in this submission.
         # However, a possible scenario is that A, B and C are submitted. Object A refers to B,
         # B refers to C, C refers to D and D does not exist - or C fails authentication.
-        # At a first scan, A is valid because B exists, B is valid because C exists. C
-        # becomes invalid on the first scan, which is why another scan is performed, which
-        # will mark B invalid due to the reference to an invalid C, etc. This continues until
-        # all references are resolved and repeated scans lead to the same conclusions.
+        # At a first validation, A is valid because B exists, B is valid because C exists,
+        # and C is invalid. As A and B depend on C, through the dependency graph, B is
+        # validated again, which makes it invalid, and then A. Requests that do not depend
+        # on an invalid request are validated only once.
+        dependents = self._build_dependents_graph(change_requests)
         valid_changes = [r for r in change_requests if r.is_valid()]
-        previous_valid_changes: list[ChangeRequest | SuspensionRequest] = []
-        loop_count = 0
-        loop_max = len(change_requests) + 10
+        to_validate = valid_changes
+        validation_count = 0
 
-        while valid_changes != previous_valid_changes:
-            previous_valid_changes = valid_changes
+        while to_validate:
             reference_validator.preload(valid_changes)
             valid_potential_new_mntners = [
                 r.rpsl_obj_new
@@ -172,18 +188,21 @@ class ChangeSubmissionHandler:
             ]
             auth_validator.pre_approve(valid_potential_new_mntners)
 
-            for result in valid_changes:
+            newly_invalid = []
+            for result in to_validate:
                 result.validate()
+                if not result.is_valid():
+                    newly_invalid.append(result)
+            validation_count += len(to_validate)
+
             valid_changes = [r for r in change_requests if r.is_valid()]
+            affected = {dependent for result in newly_invalid for dependent in dependents[result]}
+            to_validate = [r for r in valid_changes if r in affected]
 
-            loop_count += 1
-            if loop_count > loop_max:  # pragma: no cover
-                msg = (
-                    "Update validity resolver ran an excessive amount of loops, may be stuck, aborting "
-                    f"processing. Message metadata: {self.request_meta}"
-                )
-                logger.error(msg)
-                raise ValueError(msg)
+        logger.debug(
+            f"Validated {len(change_requests)} change requests in {validation_count} validations, "
+            f"metadata is {self.request_meta}"
+        )
 
         for result in change_requests:
             if result.is_valid():
@@ -191,6 +210,64 @@ class ChangeSubmissionHandler:
 
         self.results = change_requests
 
+    def _build_dependents_graph(
+        self, change_requests: list[ChangeRequest | SuspensionRequest]
+    ) -> dict[ChangeRequest | SuspensionRequest, set[ChangeRequest | SuspensionRequest]]:
+        """
+        Build a graph of the change requests whose validity depends on
+        the validity of other change requests in the same submission.
+        Returns a dict with, for each change request, the requests that
+        may become invalid if that change request is invalid.
+
+        A change request depends on:
+        - creations and modifications of objects referred to by its object
+        - creations of mntners in its mnt-by, as those are pre-approved
+        - deletions of objects that refer to its object, when deleting it,
+          or when creating it, due to the protected name check
+        """
+        new_objects = defaultdict(list)
+        new_mntners = defaultdict(list)
+        deletions_referring = defaultdict(list)
+        for request in change_requests:
+            rpsl_obj = request.rpsl_obj_new
+            if not isinstance(request, ChangeRequest) or not rpsl_obj or not request.is_valid():
+                continue
+            source = rpsl_obj.source()
+            if request.request_type in [UpdateRequestType.CREATE, UpdateRequestType.MODIFY]:
+                new_objects[(rpsl_obj.rpsl_object_class, rpsl_obj.pk(), source)].append(request)
+                if request.request_type == UpdateRequestType.CREATE and isinstance(rpsl_obj, RPSLMntner):
+                    new_mntners[(rpsl_obj.pk(), source)].append(request)
+            elif request.request_type == UpdateRequestType.DELETE and request.rpsl_obj_current:
+                for _, _, object_pks in request.rpsl_obj_current.referred_strong_objects():
+                    for object_pk in object_pks:
+                        deletions_referring[(object_pk, source)].append(request)
+
+        dependents: dict[ChangeRequest | SuspensionRequest, set[ChangeRequest | SuspensionRequest]]
+        dependents = defaultdict(set)
+        for request in change_requests:
+            rpsl_obj = request.rpsl_obj_new
+            if not isinstance(request, ChangeRequest) or not rpsl_obj or not request.is_valid():
+                continue
+            source = rpsl_obj.source()
+            dependencies = []
+            if request.request_type in [UpdateRequestType.CREATE, UpdateRequestType.DELETE]:
+                dependencies += deletions_referring[(rpsl_obj.pk(), source)]
+            if request.request_type in [UpdateRequestType.CREATE, UpdateRequestType.MODIFY]:
+                for _, object_classes, object_pks in rpsl_obj.referred_strong_objects():
+                    for object_class in object_classes:
+                        for object_pk in object_pks:
+                            dependencies += new_objects[(object_class, object_pk, source)]
+            mntner_pks = list(rpsl_obj.parsed_data.get("mnt-by", []))
+            if request.rpsl_obj_current:
+                mntner_pks += request.rpsl_obj_current.parsed_data.get("mnt-by", [])
+            for mntner_pk in mntner_pks:
+                dependencies += new_mntners[(mntner_pk, source)]
+
+            for dependency in dependencies:
+                if dependency is not request:
+                    dependents[dependency].add(request)
+        return dependents
+
     def _resolve_pgp_key_id(self, pgp_fingerprint: str) -> str | None:
         """
         Find a PGP key ID for a given fingerprint.
@@ -1,7 +1,7 @@
 import datetime
 import difflib
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 import sqlalchemy.orm as saorm
 
@@ -27,6 +27,9 @@ from .validators import (
     ValidatorResult,
 )
 
+if TYPE_CHECKING:  # pragma: no cover
+    from .prefetch import UpdatePrefetcher
+
 logger = logging.getLogger(__name__)
 DATETIME_SENTINEL = datetime.datetime(1970, 1, 1)
 
@@ -43,6 +46,7 @@ class ChangeRequest:
     rpsl_obj_current: RPSLObject | None = None
     status = UpdateRequestStatus.PROCESSING
     request_type: UpdateRequestType | None = None
+    existing_version_pending = False
 
     error_messages: list[str]
     info_messages: list[str]
@@ -55,6 +59,7 @@ class ChangeRequest:
         reference_validator: ReferenceValidator,
         delete_reason: str | None,
         request_meta: dict[str, str | None],
+        prefetcher: Optional["UpdatePrefetcher"] = None,
     ) -> None:
         """
         Initialise a new change request for a single RPSL object.
@@ -64,6 +69,7 @@ class ChangeRequest:
         :param auth_validator: a AuthValidator instance, to resolve authentication requirements
         :param reference_validator: a ReferenceValidator instance, to resolve references between objects
         :param delete_reason: a string with the deletion reason, if this was a deletion request
+        :param prefetcher: an UpdatePrefetcher instance, to retrieve existing versions in bulk
 
         The rpsl_text passed into this function should be cleaned from any
         meta attributes like delete/override/password. Those should be passed
@@ -73,10 +79,15 @@ class ChangeRequest:
         different instances, to benefit from caching, and to resolve references
         between different objects that are part of the same submission with
         possibly multiple changes.
+
+        If a prefetcher is provided, the existing version of the object is not
+        retrieved here, but by UpdatePrefetcher.retrieve_existing_versions(),
+        along with those of the other change requests in the submission.
         """
         self.database_handler = database_handler
         self.auth_validator = auth_validator
         self.reference_validator = reference_validator
+        self.prefetcher = prefetcher
         self.rpsl_text_submitted = rpsl_text_submitted
         self._auth_result: ValidatorResult | None = None
         self._cached_roa_validity: bool | None = None
@@ -139,6 +150,18 @@ class ChangeRequest:
                 self.status = UpdateRequestStatus.ERROR_OBJECT_FILTER
                 return
 
+        if prefetcher:
+            self.existing_version_pending = True
+        else:
+            self.retrieve_existing_version()
+
+    def retrieve_existing_version(self) -> None:
+        """
+        Retrieve the current version of this object, if any, and
+        reject deletions of objects that do not exist.
+        """
+        self.existing_version_pending = False
+        if self.is_valid() and self.rpsl_obj_new:
             self._retrieve_existing_version()
 
         if self.request_type == UpdateRequestType.DELETE and not self.rpsl_obj_current:
@@ -156,9 +179,17 @@ class ChangeRequest:
         Retrieve the current version of this object, if any, and store it in rpsl_obj_current.
         Update self.status appropriately.
         """
-        query = RPSLDatabaseQuery().sources([self.rpsl_obj_new.source()])
-        query = query.object_classes([self.rpsl_obj_new.rpsl_object_class]).rpsl_pk(self.rpsl_obj_new.pk())
-        results = list(self.database_handler.execute_query(query))
+        results = None
+        if self.prefetcher:
+            results = self.prefetcher.objects(
+                [self.rpsl_obj_new.rpsl_object_class], self.rpsl_obj_new.pk(), self.rpsl_obj_new.source()
+            )
+        if results is None:
+            query = RPSLDatabaseQuery().sources([self.rpsl_obj_new.source()])
+            query = query.object_classes([self.rpsl_obj_new.rpsl_object_class]).rpsl_pk(
+                self.rpsl_obj_new.pk()
+            )
+            results = list(self.database_handler.execute_query(query))
 
         if not results:
             self.request_type = UpdateRequestType.CREATE if not self.request_type else self.request_type
@@ -646,6 +677,7 @@ def parse_change_requests(
     auth_validator: AuthValidator,
     reference_validator: ReferenceValidator,
     request_meta: dict[str, str | None],
+    prefetcher: Optional["UpdatePrefetcher"] = None,
 ) -> list[ChangeRequest | SuspensionRequest]:
     """
     Parse change requests, a text of RPSL objects along with metadata like
@@ -655,6 +687,7 @@ def parse_change_requests(
     :param database_handler: a DatabaseHandler instance
         :param auth_validator: a AuthValidator instance, to resolve authentication requirements
     :param reference_validator: a ReferenceValidator instance
+    :param prefetcher: an UpdatePrefetcher instance, to retrieve existing versions in bulk
     :return: a list of ChangeRequest instances
     """
     results: list[ChangeRequest | SuspensionRequest] = []
@@ -711,9 +744,12 @@ def parse_change_requests(
                     reference_validator,
                     delete_reason=delete_reason,
                     request_meta=request_meta,
+                    prefetcher=prefetcher,
                 )
             )
 
+    if prefetcher:
+        prefetcher.retrieve_existing_versions(results)
     if auth_validator:
         auth_validator.passwords = passwords
         auth_validator.overrides = overrides
@@ -0,0 +1,288 @@
+import bisect
+import itertools
+import logging
+from collections import defaultdict
+from collections.abc import Iterable
+
+from IPy import IP
+
+from irrd.conf import get_setting
+from irrd.rpsl.parser import RPSLObject
+from irrd.rpsl.rpsl_objects import RPSLSet
+from irrd.storage.database_handler import DatabaseHandler
+from irrd.storage.queries import RPSLDatabaseQuery
+from irrd.utils.validators import ValidationError, parse_as_number
+
+from .parser import ChangeRequest, SuspensionRequest
+from .parser_state import RPSLSetAutnumAuthenticationMode, UpdateRequestType
+
+"""
+Prefetching of the objects needed to validate a submission.
+
+Validating a change request requires the current version of its object,
+the objects it refers to, the mntners in its mnt-by, and for creations,
+a related object like the covering inetnum of a route. Rather than
+looking these up per change request, the UpdatePrefetcher collects them
+for all change requests in a submission, and retrieves them with a few
+set-based queries. The validators and change requests consult the
+prefetcher first, and only query the database for anything that was
+not prefetched.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of RPSL PKs or prefixes in a single query
+PREFETCH_QUERY_CHUNK_SIZE = 1000
+
+RELATED_INETNUM_CLASS = {
+    "route": "inetnum",
+    "route6": "inet6num",
+}
+
+ObjectKey = tuple[str, str, str]
+
+
+class UpdatePrefetcher:
+    """
+    Retrieves and caches the objects needed to validate a submission of
+    change requests. Objects are kept as dicts as returned by the
+    database handler, keyed by object class, RPSL PK and source.
+    """
+
+    def __init__(self, database_handler: DatabaseHandler) -> None:
+        self.database_handler = database_handler
+        self._objects: dict[ObjectKey, dict] = {}
+        self._retrieved: set[ObjectKey] = set()
+        self._related_objects: dict[RPSLObject, dict | None] = {}
+
+    def retrieve_existing_versions(self, change_requests: list[ChangeRequest | SuspensionRequest]) -> None:
+        """
+        Retrieve the current versions of the objects of all change requests
+        that were created with this prefetcher, and complete those requests.
+        """
+        pending = [
+            request
+            for request in change_requests
+            if isinstance(request, ChangeRequest) and request.existing_version_pending
+        ]
+        self._retrieve_objects(
+            _object_key(
+                request.rpsl_obj_new.rpsl_object_class,
+                request.rpsl_obj_new.pk(),
+                request.rpsl_obj_new.source(),
+            )
+            for request in pending
+            if request.is_valid() and request.rpsl_obj_new
+        )
+        for request in pending:
+            request.retrieve_existing_version()
+
+    def prefetch(self, change_requests: list[ChangeRequest | SuspensionRequest]) -> None:
+        """
+        Prefetch the objects referred to by the valid change requests,
+        the mntners of their new and current versions, and the related
+        objects, and their mntners, of created routes and sets.
+        """
+        requests = [
+            request
+            for request in change_requests
+            if isinstance(request, ChangeRequest) and request.is_valid() and request.rpsl_obj_new
+        ]
+
+        keys: set[ObjectKey] = set()
+        route_creations = []
+        autnum_keys: set[ObjectKey] = set()
+        for request in requests:
+            rpsl_obj = request.rpsl_obj_new
+            assert rpsl_obj
+            source = rpsl_obj.source()
+            if request.request_type != UpdateRequestType.DELETE:
+                for _, object_classes, object_pks in rpsl_obj.referred_strong_objects():
+                    keys.update(
+                        _object_key(object_class, object_pk, source)
+                        for object_class in object_classes
+                        for object_pk in object_pks
+                    )
+            keys.update(self._mntner_keys(rpsl_obj, source))
+            if request.rpsl_obj_current:
+                keys.update(self._mntner_keys(request.rpsl_obj_current, source))
+            elif rpsl_obj.rpsl_object_class in RELATED_INETNUM_CLASS:
+                route_creations.append(rpsl_obj)
+            elif isinstance(rpsl_obj, RPSLSet):
+                # pk_asn_segment is only set once the object is validated
+                pk_asn_segment = rpsl_obj.pk().split(":")[0]
+                mode = RPSLSetAutnumAuthenticationMode.for_set_name(rpsl_obj.rpsl_object_class)
+                if mode != RPSLSetAutnumAuthenticationMode.DISABLED and _is_as_number(pk_asn_segment):
+                    autnum_keys.add(_object_key("aut-num", pk_asn_segment, source))
+        self._retrieve_objects(keys | autnum_keys)
+
+        related_objects: list[dict] = []
+        if route_creations and get_setting("auth.authenticate_parents_route_creation"):
+            self._retrieve_related_objects_route(route_creations)
+            related_objects += [obj for obj in self._related_objects.values() if obj]
+        related_objects += [self._objects[key] for key in autnum_keys if key in self._objects]
+        self._retrieve_objects(
+            _object_key("mntner", mntner_pk, related_object["source"])
+            for related_object in related_objects
+            for mntner_pk in related_object.get("parsed_data", {}).get("mnt-by", [])
+        )
+
+    def objects(self, object_classes: list[str], rpsl_pk: str, source: str) -> list[dict] | None:
+        """
+        Return the objects of any of object_classes with rpsl_pk in source.
+        Returns None if these were not all prefetched, in which case the
+        caller should query the database.
+        """
+        keys = [_object_key(object_class, rpsl_pk, source) for object_class in object_classes]
+        if not all(key in self._retrieved for key in keys):
+            return None
+        return [self._objects[key] for key in keys if key in self._objects]
+
+    def has_related_object_route(self, rpsl_obj: RPSLObject) -> bool:
+        return rpsl_obj in self._related_objects
+
+    def related_object_route(self, rpsl_obj: RPSLObject) -> dict | None:
+        """
+        Return the prefetched related inetnum or route of a new route(6),
+        as found by AuthValidator._find_related_object_route().
+        """
+        return self._related_objects[rpsl_obj]
+
+    def _mntner_keys(self, rpsl_obj: RPSLObject, source: str) -> list[ObjectKey]:
+        return [
+            _object_key("mntner", mntner_pk, source) for mntner_pk in rpsl_obj.parsed_data.get("mnt-by", [])
+        ]
+
+    def _retrieve_objects(self, keys: Iterable[ObjectKey]) -> None:
+        """
+        Retrieve the objects for keys that have not been retrieved yet,
+        with one query per source and chunk of RPSL PKs.
+        """
+        per_source: dict[str, tuple[set[str], set[str]]] = defaultdict(lambda: (set(), set()))
+        for key in keys:
+            if key not in self._retrieved:
+                object_class, rpsl_pk, source = key
+                per_source[source][0].add(object_class)
+                per_source[source][1].add(rpsl_pk)
+
+        for source, (object_classes, rpsl_pks) in per_source.items():
+            sorted_pks = sorted(rpsl_pks)
+            for chunk_start in range(0, len(sorted_pks), PREFETCH_QUERY_CHUNK_SIZE):
+                chunk = sorted_pks[chunk_start : chunk_start + PREFETCH_QUERY_CHUNK_SIZE]
+                query = RPSLDatabaseQuery().sources([source]).object_classes(sorted(object_classes))
+                query = query.rpsl_pks(chunk)
+                for result in self.database_handler.execute_query(query):
+                    key = _object_key(result["object_class"], result["rpsl_pk"], result["source"])
+                    self._objects[key] = result
+                self._retrieved.update(
+                    (object_class, rpsl_pk, source) for object_class in object_classes for rpsl_pk in chunk
+                )
+        if per_source:
+            logger.debug(f"Prefetched objects for {sum(len(pks) for _, pks in per_source.values())} RPSL PKs")
+
+    def _retrieve_related_objects_route(self, rpsl_objs: list[RPSLObject]) -> None:
+        """
+        Find the related objects of new route(6) objects: an exact match or
+        one level less specific inetnum/inet6num, or otherwise, a one level
+        less specific route/route6. All less specifics of the prefixes are
+        retrieved in a query per source and object class, and the most
+        specific match is then selected for each object.
+        """
+        per_class: dict[tuple[str, str], list[RPSLObject]] = defaultdict(list)
+        for rpsl_obj in rpsl_objs:
+            per_class[(rpsl_obj.source(), rpsl_obj.rpsl_object_class)].append(rpsl_obj)
+
+        for (source, route_class), route_objs in per_class.items():
+            inetnum_class = RELATED_INETNUM_CLASS[route_class]
+            prefixes = [obj.prefix for obj in route_objs]
+            inetnums = _LessSpecificIndex(self._less_specifics(source, inetnum_class, prefixes))
+            routes = _LessSpecificIndex(self._less_specifics(source, route_class, prefixes))
+            for rpsl_obj in route_objs:
+                self._related_objects[rpsl_obj] = inetnums.most_specific_match(
+                    rpsl_obj.prefix, include_exact=True
+                ) or routes.most_specific_match(rpsl_obj.prefix, include_exact=False)
+
+    def _less_specifics(self, source: str, object_class: str, prefixes: list[IP]) -> list[dict]:
+        results = []
+        for chunk_start in range(0, len(prefixes), PREFETCH_QUERY_CHUNK_SIZE):
+            query = RPSLDatabaseQuery().sources([source]).object_classes([object_class])
+            query = query.ip_less_specific_of(prefixes[chunk_start : chunk_start + PREFETCH_QUERY_CHUNK_SIZE])
+            results += list(self.database_handler.execute_query(query))
+        return results
+
+
+def _object_key(object_class: str, rpsl_pk: str, source: str) -> ObjectKey:
+    return object_class, rpsl_pk.upper().strip(), source.upper().strip()
+
+
+def _is_as_number(value: str) -> bool:
+    try:
+        parse_as_number(value)
+        return True
+    except ValidationError:
+        return False
+
+
+class _LessSpecificIndex:
+    """
+    Index of candidate objects by IP range, to find the most specific
+    candidate that covers a prefix. Per IP version, candidates are sorted
+    by ip_first, along with the highest ip_last of the candidates up to each
+    position. A search walks back from the prefix, and stops when no earlier
+    candidate can cover the prefix, or be more specific than the best match.
+    """
+
+    def __init__(self, candidates: list[dict]) -> None:
+        self._entries: dict[int, list[tuple[int, int, dict]]] = defaultdict(list)
+        for candidate in candidates:
+            ip_first, ip_last = IP(candidate["ip_first"]), IP(candidate["ip_last"])
+            self._entries[ip_first.version()].append((ip_first.int(), ip_last.int(), candidate))
+        self._ip_firsts: dict[int, list[int]] = {}
+        self._max_ip_lasts: dict[int, list[int]] = {}
+        for version, entries in self._entries.items():
+            entries.sort(key=lambda entry: entry[0])
+            self._ip_firsts[version] = [ip_first for ip_first, _, _ in entries]
+            self._max_ip_lasts[version] = list(
+                itertools.accumulate((ip_last for _, ip_last, _ in entries), max)
+            )
+
+    def most_specific_match(self, prefix: IP, include_exact: bool) -> dict | None:
+        """
+        Find the most specific candidate that is an exact match or less
+        specific of prefix. An exact match is always preferred, if
+        include_exact is set, otherwise exact matches are excluded.
+        Ties are resolved like the ordering of RPSLDatabaseQuery:
+        ip_first, asn_first, rpsl_pk.
+        """
+        version = prefix.version()
+        entries = self._entries.get(version)
+        if not entries:
+            return None
+        max_ip_lasts = self._max_ip_lasts[version]
+        net, broadcast = prefix.net().int(), prefix.broadcast().int()
+
+        best_key: tuple | None = None
+        best_match = None
+        for position in range(bisect.bisect_right(self._ip_firsts[version], net) - 1, -1, -1):
+            ip_first, ip_last, candidate = entries[position]
+            if max_ip_lasts[position] < broadcast:
+                break
+            # From here on, candidates can only be larger than the best match
+            if best_key is not None and ip_first < net and broadcast - ip_first + 1 > best_key[0]:
+                break
+            if ip_last < broadcast:
+                continue
+            is_exact = ip_first == net and ip_last == broadcast
+            if is_exact and not include_exact:
+                continue
+            asn_first = candidate.get("asn_first")
+            key = (
+                0 if is_exact else ip_last - ip_first + 1,
+                ip_first,
+                asn_first is None,
+                asn_first or 0,
+                candidate["rpsl_pk"],
+            )
+            if best_key is None or key < best_key:
+                best_key, best_match = key, candidate
+        return best_match
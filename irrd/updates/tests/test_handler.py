@@ -12,7 +12,9 @@ from irrd.utils.test_utils import flatten_mock_calls
 from ...utils.validators import RPSLChangeSubmission, RPSLSuspensionSubmission
 from ...vendor.mock_alchemy.mocking import UnifiedAlchemyMagicMock
 from ..handler import ChangeSubmissionHandler
-from ..parser_state import SuspensionRequestType
+from ..parser import ChangeRequest, parse_change_requests
+from ..parser_state import SuspensionRequestType, UpdateRequestStatus
+from ..validators import AuthValidator, ReferenceValidator
 
 
 @pytest.fixture()
@@ -23,6 +25,7 @@ def prepare_mocks(monkeypatch, config_override):
     mock_dq = Mock()
     monkeypatch.setattr("irrd.updates.handler.RPSLDatabaseQuery", lambda: mock_dq)
     monkeypatch.setattr("irrd.updates.parser.RPSLDatabaseQuery", lambda: mock_dq)
+    monkeypatch.setattr("irrd.updates.prefetch.RPSLDatabaseQuery", lambda: mock_dq)
     monkeypatch.setattr("irrd.updates.validators.RPSLDatabaseQuery", lambda: mock_dq)
     mock_email = Mock()
     monkeypatch.setattr("irrd.utils.email.send_email", mock_email)
@@ -94,14 +97,11 @@ class TestChangeSubmissionHandler:
 
         assert flatten_mock_calls(mock_dq) == [
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pk", ("TEST-MNT",), {}],
+            ["object_classes", (["inetnum", "mntner", "person"],), {}],
+            ["rpsl_pks", (["80.16.151.184 - 80.16.151.191", "PERSON-TEST", "TEST-MNT"],), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["inetnum"],), {}],
-            ["rpsl_pk", ("80.16.151.184 - 80.16.151.191",), {}],
+            ["object_classes", (["role"],), {}],
+            ["rpsl_pks", (["PERSON-TEST"],), {}],
             ["sources", (["TEST"],), {}],
             ["lookup_attrs_in", ({"admin-c", "tech-c", "zone-c"}, ["PERSON-TEST"]), {}],
             ["sources", (["TEST"],), {}],
@@ -191,9 +191,15 @@ class TestChangeSubmissionHandler:
         query_responses = iter(
             [
                 [{"parsed_data": {"fingerpr": "8626 1D8D BEBD A4F5 4692  D64D A838 3BA7 80F2 38C6"}}],
+                [
+                    {
+                        "object_class": "mntner",
+                        "rpsl_pk": "TEST-MNT",
+                        "source": "TEST",
+                        "object_text": mntner_text,
+                    }
+                ],
                 [],
-                [{"object_text": mntner_text}],
-                [{"object_text": mntner_text}],
                 [],
                 [],
             ]
@@ -208,18 +214,17 @@ class TestChangeSubmissionHandler:
         )
         assert handler.status() == "SUCCESS", handler.submitter_report_human()
 
+        # The existing versions, and then the references and mntners, are prefetched
+        # for all objects, after which the validators do not need to query them
         assert flatten_mock_calls(mock_dq) == [
             ["object_classes", (["key-cert"],), {}],
             ["rpsl_pk", ("PGPKEY-80F238C6",), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
+            ["object_classes", (["mntner", "person"],), {}],
+            ["rpsl_pks", (["PERSON-TEST", "TEST-MNT"],), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pk", ("TEST-MNT",), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pks", ({"TEST-MNT"},), {}],
+            ["object_classes", (["role"],), {}],
+            ["rpsl_pks", (["PERSON-TEST"],), {}],
             ["sources", (["TEST"],), {}],
             ["lookup_attrs_in", ({"admin-c", "tech-c", "zone-c"}, ["PERSON-TEST"]), {}],
         ]
@@ -352,10 +357,14 @@ class TestChangeSubmissionHandler:
         query_responses = iter(
             [
                 [{"parsed_data": {"fingerpr": "8626 1D8D BEBD A4F5 XXXX  D64D A838 3BA7 80F2 38C6"}}],
-                [],
-                [{"object_text": mntner_text}],
-                [{"object_text": mntner_text}],
-                [],
+                [
+                    {
+                        "object_class": "mntner",
+                        "rpsl_pk": "TEST-MNT",
+                        "source": "TEST",
+                        "object_text": mntner_text,
+                    }
+                ],
                 [],
             ]
         )
@@ -372,14 +381,11 @@ class TestChangeSubmissionHandler:
             ["object_classes", (["key-cert"],), {}],
             ["rpsl_pk", ("PGPKEY-80F238C6",), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
+            ["object_classes", (["mntner", "person"],), {}],
+            ["rpsl_pks", (["PERSON-TEST", "TEST-MNT"],), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pk", ("TEST-MNT",), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pks", ({"TEST-MNT"},), {}],
+            ["object_classes", (["role"],), {}],
+            ["rpsl_pks", (["PERSON-TEST"],), {}],
         ]
 
         assert mock_dh.mock_calls[0][0] == "commit"
@@ -404,8 +410,22 @@ class TestChangeSubmissionHandler:
 
         query_responses = iter(
             [
-                [{"object_text": rpsl_person}],
-                [{"object_text": SAMPLE_MNTNER}],
+                [
+                    {
+                        "object_class": "person",
+                        "rpsl_pk": "PERSON-TEST",
+                        "source": "TEST",
+                        "object_text": rpsl_person,
+                    }
+                ],
+                [
+                    {
+                        "object_class": "mntner",
+                        "rpsl_pk": "TEST-MNT",
+                        "source": "TEST",
+                        "object_text": SAMPLE_MNTNER,
+                    }
+                ],
                 [],
             ]
         )
@@ -419,10 +439,10 @@ class TestChangeSubmissionHandler:
         assert flatten_mock_calls(mock_dq) == [
             ["sources", (["TEST"],), {}],
             ["object_classes", (["person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
+            ["rpsl_pks", (["PERSON-TEST"],), {}],
             ["sources", (["TEST"],), {}],
             ["object_classes", (["mntner"],), {}],
-            ["rpsl_pks", ({"TEST-MNT"},), {}],
+            ["rpsl_pks", (["TEST-MNT"],), {}],
             ["sources", (["TEST"],), {}],
             ["lookup_attrs_in", ({"tech-c", "zone-c", "admin-c"}, ["PERSON-TEST"]), {}],
         ]
@@ -595,32 +615,17 @@ class TestChangeSubmissionHandler:
 
         assert flatten_mock_calls(mock_dq) == [
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pk", ("TEST-MNT",), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["inetnum"],), {}],
-            ["rpsl_pk", ("80.16.151.184 - 80.16.151.191",), {}],
+            ["object_classes", (["inetnum", "mntner", "person"],), {}],
+            ["rpsl_pks", (["80.16.151.184 - 80.16.151.191", "PERSON-TEST", "TEST-MNT"],), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
+            ["object_classes", (["mntner", "role"],), {}],
+            ["rpsl_pks", (["OTHER-MNT", "PERSON-TEST"],), {}],
             ["sources", (["TEST"],), {}],
             ["lookup_attrs_in", ({"mnt-by"}, ["TEST-MNT"]), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pk", ("OTHER-MNT",), {}],
-            ["sources", (["TEST"],), {}],
             ["lookup_attrs_in", ({"admin-c", "tech-c", "zone-c"}, ["PERSON-TEST"]), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["role", "person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
-            ["sources", (["TEST"],), {}],
             ["lookup_attrs_in", ({"mnt-by"}, ["TEST-MNT"]), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["role", "person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["role", "person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
         ]
         assert flatten_mock_calls(mock_dh) == [
             ["commit", (), {}],
@@ -808,7 +813,14 @@ class TestChangeSubmissionHandler:
         query_results = iter(
             [
                 [],
-                [{"object_text": SAMPLE_MNTNER}],
+                [
+                    {
+                        "object_class": "mntner",
+                        "rpsl_pk": "TEST-MNT",
+                        "source": "TEST",
+                        "object_text": SAMPLE_MNTNER,
+                    }
+                ],
             ]
         )
         mock_dh.execute_query = lambda query: next(query_results)
@@ -841,10 +853,10 @@ class TestChangeSubmissionHandler:
         assert flatten_mock_calls(mock_dq) == [
             ["sources", (["TEST"],), {}],
             ["object_classes", (["person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
+            ["rpsl_pks", (["PERSON-TEST"],), {}],
             ["sources", (["TEST"],), {}],
             ["object_classes", (["mntner"],), {}],
-            ["rpsl_pks", ({"TEST-MNT"},), {}],
+            ["rpsl_pks", (["TEST-MNT"],), {}],
         ]
         assert flatten_mock_calls(mock_dh) == [
             ["commit", (), {}],
@@ -927,13 +939,15 @@ class TestChangeSubmissionHandler:
 
         query_results = iter(
             [
+                [
+                    {
+                        "object_class": "mntner",
+                        "rpsl_pk": "TEST-MNT",
+                        "source": "TEST",
+                        "object_text": SAMPLE_MNTNER,
+                    }
+                ],
                 [],
-                [{"object_text": SAMPLE_MNTNER}],
-                [],
-                [{"object_text": SAMPLE_MNTNER}],
-                [{"object_text": SAMPLE_MNTNER}],
-                [{"object_text": SAMPLE_MNTNER}],
-                [{"object_text": SAMPLE_MNTNER}],
             ]
         )
         mock_dh.execute_query = lambda query: next(query_results)
@@ -978,20 +992,11 @@ class TestChangeSubmissionHandler:
 
         assert flatten_mock_calls(mock_dq) == [
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["person"],), {}],
-            ["rpsl_pk", ("PERSON-TEST",), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pk", ("TEST-MNT",), {}],
+            ["object_classes", (["inetnum", "mntner", "person"],), {}],
+            ["rpsl_pks", (["80.16.151.184 - 80.16.151.191", "PERSON-TEST", "TEST-MNT"],), {}],
             ["sources", (["TEST"],), {}],
-            ["object_classes", (["inetnum"],), {}],
-            ["rpsl_pk", ("80.16.151.184 - 80.16.151.191",), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pks", ({"TEST-MNT"},), {}],
-            ["sources", (["TEST"],), {}],
-            ["object_classes", (["mntner"],), {}],
-            ["rpsl_pks", ({"OTHER1-MNT", "OTHER2-MNT"},), {}],
+            ["object_classes", (["mntner", "role"],), {}],
+            ["rpsl_pks", (["OTHER1-MNT", "OTHER2-MNT", "PERSON-TEST"],), {}],
         ]
         assert flatten_mock_calls(mock_dh) == [
             ["commit", (), {}],
@@ -1123,6 +1128,117 @@ class TestChangeSubmissionHandler:
         ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         """)
 
+    def test_validates_independent_requests_once(self, prepare_mocks, monkeypatch):
+        mock_dq, mock_dh, mock_email = prepare_mocks
+        mock_dh.execute_query = lambda query: []
+        mock_sa_session = UnifiedAlchemyMagicMock()
+        monkeypatch.setattr("irrd.updates.validators.saorm.Session", lambda bind: mock_sa_session)
+
+        validated_pks = []
+        original_validate = ChangeRequest.validate
+
+        def validate(self):
+            validated_pks.append(self.rpsl_obj_new.pk())
+            return original_validate(self)
+
+        monkeypatch.setattr("irrd.updates.parser.ChangeRequest.validate", validate)
+
+        rpsl_text = textwrap.dedent("""
+        person:         Placeholder Person Object
+        address:        The Netherlands
+        phone:          +31 20 000 0000
+        nic-hdl:        PERSON-TEST
+        mnt-by:         TEST-MNT
+        e-mail:         email@example.com
+        changed:        changed@example.com 20190701 # comment
+        source:         TEST
+
+        mntner:         TEST-MNT
+        admin-c:        PERSON-TEST
+        upd-to:         unread@ripe.net
+        auth:           MD5-pw $1$fgW84Y9r$kKEn9MUq8PChNKpQhO6BM.  # md5-password
+        mnt-by:         TEST-MNT
+        changed:        changed@example.com 20190701 # comment
+        source:         TEST
+
+        override: override-password
+
+        inetnum:        80.16.151.184 - 80.16.151.191
+        netname:        NETECONOMY-MG41731
+        descr:          TELECOM ITALIA LAB SPA
+        country:        IT
+        admin-c:        OTHER-TEST
+        tech-c:         PERSON-TEST
+        status:         ASSIGNED PA
+        mnt-by:         TEST-MNT
+        changed:        changed@example.com 20190701 # comment
+        source:         TEST
+
+        route:          192.0.2.0/24
+        descr:          description
+        origin:         AS65537
+        mnt-by:         OTHER-MNT
+        changed:        changed@example.com 20190701 # comment
+        source:         TEST
+        """)
+
+        handler = ChangeSubmissionHandler().load_text_blob(rpsl_text, AuthoritativeChangeOrigin.email)
+        assert [result.status for result in handler.results] == [
+            UpdateRequestStatus.SAVED,
+            UpdateRequestStatus.SAVED,
+            UpdateRequestStatus.ERROR_REFERENCE,
+            UpdateRequestStatus.ERROR_REFERENCE,
+        ]
+        # Nothing depends on the invalid inetnum or route, so nothing is validated again
+        assert validated_pks == [
+            "PERSON-TEST",
+            "TEST-MNT",
+            "80.16.151.184 - 80.16.151.191",
+            "192.0.2.0/24AS65537",
+        ]
+
+    def test_dependents_graph(self, prepare_mocks):
+        mock_dq, mock_dh, mock_email = prepare_mocks
+        mock_dh.execute_query = lambda query: []
+
+        rpsl_text = textwrap.dedent("""
+        person:         Placeholder Person Object
+        address:        The Netherlands
+        phone:          +31 20 000 0000
+        nic-hdl:        PERSON-TEST
+        mnt-by:         TEST-MNT
+        e-mail:         email@example.com
+        changed:        changed@example.com 20190701 # comment
+        source:         TEST
+
+        mntner:         TEST-MNT
+        admin-c:        PERSON-TEST
+        upd-to:         unread@ripe.net
+        auth:           MD5-pw $1$fgW84Y9r$kKEn9MUq8PChNKpQhO6BM.  # md5-password
+        mnt-by:         TEST-MNT
+        changed:        changed@example.com 20190701 # comment
+        source:         TEST
+
+        route:          192.0.2.0/24
+        descr:          description
+        origin:         AS65537
+        mnt-by:         OTHER-MNT
+        changed:        changed@example.com 20190701 # comment
+        source:         TEST
+        """)
+        handler = ChangeSubmissionHandler()
+        handler.database_handler = mock_dh
+        reference_validator = ReferenceValidator(mock_dh)
+        auth_validator = AuthValidator(mock_dh)
+        person, mntner, route = parse_change_requests(
+            rpsl_text, mock_dh, auth_validator, reference_validator, {}
+        )
+
+        dependents = handler._build_dependents_graph([person, mntner, route])
+        # The mntner is created, and depends on the person through admin-c, the person
+        # on the mntner through mnt-by. The mntner does not depend on itself.
+        assert dependents == {person: {mntner}, mntner: {person}}
+
     def test_load_suspension_submission(self, prepare_mocks, monkeypatch):
         mock_dq, mock_dh, mock_email = prepare_mocks
         mock_handle_change_requests = Mock(ChangeSubmissionHandler._handle_change_requests)
@@ -0,0 +1,162 @@
+from unittest.mock import Mock
+
+import pytest
+from IPy import IP
+
+from irrd.conf import AUTH_SET_CREATION_COMMON_KEY
+from irrd.utils.rpsl_samples import SAMPLE_AS_SET, SAMPLE_ROUTE
+from irrd.utils.test_utils import flatten_mock_calls
+
+from ..parser import parse_change_requests
+from ..parser_state import UpdateRequestType
+from ..prefetch import UpdatePrefetcher, _LessSpecificIndex
+from ..validators import AuthValidator, ReferenceValidator, ValidatorResult
+
+
+def _row(object_class, rpsl_pk, **kwargs):
+    return {"object_class": object_class, "rpsl_pk": rpsl_pk, "source": "TEST", **kwargs}
+
+
+@pytest.fixture()
+def prepare_mocks(monkeypatch, config_override):
+    monkeypatch.setenv("IRRD_SOURCES_TEST_AUTHORITATIVE", "1")
+    config_override(
+        {
+            "auth": {
+                "authenticate_parents_route_creation": True,
+                "set_creation": {AUTH_SET_CREATION_COMMON_KEY: {"autnum_authentication": "opportunistic"}},
+                "password_hashers": {"crypt-pw": "enabled"},
+            },
+            "rpki": {"roa_source": None},
+        }
+    )
+    mock_dh = Mock()
+    mock_dq = Mock()
+    monkeypatch.setattr("irrd.updates.parser.RPSLDatabaseQuery", lambda: mock_dq)
+    monkeypatch.setattr("irrd.updates.prefetch.RPSLDatabaseQuery", lambda: mock_dq)
+    monkeypatch.setattr("irrd.updates.validators.RPSLDatabaseQuery", lambda: mock_dq)
+    yield mock_dq, mock_dh
+
+
+class TestUpdatePrefetcher:
+    def test_prefetch(self, prepare_mocks):
+        mock_dq, mock_dh = prepare_mocks
+        inetnum_wide = _row(
+            "inetnum", "192.0.0.0 - 192.0.255.255", ip_first="192.0.0.0", ip_last="192.0.255.255"
+        )
+        inetnum_narrow = _row(
+            "inetnum",
+            "192.0.2.0 - 192.0.3.255",
+            ip_first="192.0.2.0",
+            ip_last="192.0.3.255",
+            parsed_data={"mnt-by": ["INETNUM-MNT"]},
+        )
+        mntner = _row("mntner", "TEST-MNT", object_text="mntner: TEST-MNT\nsource: TEST\n")
+        person = _row("person", "PERSON-TEST")
+        aut_num = _row("aut-num", "AS65537", parsed_data={"mnt-by": ["AUTNUM-MNT"]})
+        query_responses = iter(
+            [
+                [],
+                [mntner, person, aut_num],
+                [inetnum_wide, inetnum_narrow],
+                [],
+                [_row("mntner", "INETNUM-MNT")],
+            ]
+        )
+        mock_dh.execute_query = lambda query: next(query_responses)
+
+        prefetcher = UpdatePrefetcher(mock_dh)
+        reference_validator = ReferenceValidator(mock_dh, prefetcher)
+        auth_validator = AuthValidator(mock_dh, prefetcher=prefetcher)
+        change_requests = parse_change_requests(
+            SAMPLE_ROUTE + "\n" + SAMPLE_AS_SET,
+            mock_dh,
+            auth_validator,
+            reference_validator,
+            {},
+            prefetcher,
+        )
+        assert [r.request_type for r in change_requests] == [UpdateRequestType.CREATE] * 2
+        assert not any(r.existing_version_pending for r in change_requests)  # type: ignore
+
+        prefetcher.prefetch(change_requests)
+        assert flatten_mock_calls(mock_dq) == [
+            ["sources", (["TEST"],), {}],
+            ["object_classes", (["as-set", "route"],), {}],
+            ["rpsl_pks", (["192.0.2.0/24AS65537", "AS65537:AS-SETTEST"],), {}],
+            ["sources", (["TEST"],), {}],
+            ["object_classes", (["aut-num", "mntner", "person", "role"],), {}],
+            ["rpsl_pks", (["AS65537", "PERSON-TEST", "TEST-MNT"],), {}],
+            ["sources", (["TEST"],), {}],
+            ["object_classes", (["inetnum"],), {}],
+            ["ip_less_specific_of", ([IP("192.0.2.0/24")],), {}],
+            ["sources", (["TEST"],), {}],
+            ["object_classes", (["route"],), {}],
+            ["ip_less_specific_of", ([IP("192.0.2.0/24")],), {}],
+            ["sources", (["TEST"],), {}],
+            ["object_classes", (["mntner"],), {}],
+            ["rpsl_pks", (["AUTNUM-MNT", "INETNUM-MNT"],), {}],
+        ]
+
+        assert prefetcher.objects(["mntner"], "test-mnt", "test") == [mntner]
+        assert prefetcher.objects(["person", "role"], "PERSON-TEST", "TEST") == [person]
+        assert prefetcher.objects(["mntner"], "AUTNUM-MNT", "TEST") == []
+        assert prefetcher.objects(["mntner"], "OTHER-MNT", "TEST") is None
+
+        # Validators are now served from the prefetcher, without queries
+        mock_dh.execute_query = Mock(side_effect=AssertionError("unexpected query"))
+        route_obj = change_requests[0].rpsl_obj_new
+        assert prefetcher.related_object_route(route_obj) == inetnum_narrow
+        assert auth_validator._find_related_object_route(route_obj) == inetnum_narrow
+        as_set_obj = change_requests[1].rpsl_obj_new
+        assert as_set_obj.clean_for_create()
+        assert auth_validator._find_related_object_set(as_set_obj, ValidatorResult()) == aut_num
+        reference_validator.preload(change_requests)
+        assert reference_validator.check_references_to_others(as_set_obj).is_valid()
+        assert (
+            auth_validator._check_mntners(route_obj, ["TEST-MNT"], "TEST").associated_mntners[0].pk()
+            == "TEST-MNT"
+        )
+
+    def test_most_specific_match(self):
+        exact = _row("route", "192.0.2.0/24AS65537", ip_first="192.0.2.0", ip_last="192.0.2.255")
+        less_specific = _row("route", "192.0.2.0/23AS65537", ip_first="192.0.2.0", ip_last="192.0.3.255")
+        less_specific_other = _row(
+            "route", "192.0.2.0/23AS65536", ip_first="192.0.2.0", ip_last="192.0.3.255"
+        )
+        unrelated = _row("route", "198.51.100.0/24AS65537", ip_first="198.51.100.0", ip_last="198.51.100.255")
+        ipv6 = _row(
+            "route6",
+            "2001:db8::/32AS65537",
+            ip_first="2001:db8::",
+            ip_last="2001:db8:ffff:ffff:ffff:ffff:ffff:ffff",
+        )
+        index = _LessSpecificIndex([unrelated, less_specific, ipv6, exact, less_specific_other])
+
+        assert index.most_specific_match(IP("192.0.2.0/24"), include_exact=True) == exact
+        assert index.most_specific_match(IP("192.0.2.0/24"), include_exact=False) == less_specific_other
+        assert index.most_specific_match(IP("192.0.2.0/25"), include_exact=False) == exact
+        assert index.most_specific_match(IP("2001:db8::/48"), include_exact=False) == ipv6
+        assert index.most_specific_match(IP("203.0.113.0/24"), include_exact=True) is None
+        assert index.most_specific_match(IP("2001:db9::/48"), include_exact=True) is None
+
+    def test_most_specific_match_ordering(self):
+        # Like RPSLDatabaseQuery, ordered by ip_first, then asn_first, then rpsl_pk
+        origin_as10 = _row(
+            "route", "192.0.2.0/23AS10", ip_first="192.0.2.0", ip_last="192.0.3.255", asn_first=10
+        )
+        origin_as9 = _row(
+            "route", "192.0.2.0/23AS9", ip_first="192.0.2.0", ip_last="192.0.3.255", asn_first=9
+        )
+        inetnum = _row("inetnum", "192.0.0.0 - 192.0.3.255", ip_first="192.0.0.0", ip_last="192.0.3.255")
+        overlapping = _row("inetnum", "192.0.1.0 - 192.0.4.255", ip_first="192.0.1.0", ip_last="192.0.4.255")
+        non_covering = [
+            _row("inetnum", f"192.0.2.{i} - 192.0.2.{i}", ip_first=f"192.0.2.{i}", ip_last=f"192.0.2.{i}")
+            for i in range(1, 255)
+        ]
+
+        index = _LessSpecificIndex([origin_as10, origin_as9, inetnum])
+        assert index.most_specific_match(IP("192.0.2.0/24"), include_exact=False) == origin_as9
+        index = _LessSpecificIndex([inetnum, overlapping, *non_covering])
+        assert index.most_specific_match(IP("192.0.2.0/24"), include_exact=False) == inetnum
+        assert index.most_specific_match(IP("192.0.4.0/24"), include_exact=True) == overlapping
@@ -1,7 +1,7 @@
 import functools
 import logging
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Optional, Union
 
 import sqlalchemy.orm as saorm
 from IPy import IP
@@ -37,6 +37,7 @@ from .parser_state import AuthMethod, RPSLSetAutnumAuthenticationMode, UpdateReq
 if TYPE_CHECKING:  # pragma: no cover
     # http://mypy.readthedocs.io/en/latest/common_issues.html#import-cycles
     from .parser import ChangeRequest, SuspensionRequest  # noqa: F401
+    from .prefetch import UpdatePrefetcher
 
 logger = logging.getLogger(__name__)
 
@@ -100,10 +101,15 @@ class ReferenceValidator:
     Sometimes updates are made to objects, referencing objects newly created
     in the same update message. To handle this, the validator can be preloaded
     with objects that should be considered valid.
+
+    If a prefetcher is provided, references are looked up there first.
     """
 
-    def __init__(self, database_handler: DatabaseHandler) -> None:
+    def __init__(
+        self, database_handler: DatabaseHandler, prefetcher: Optional["UpdatePrefetcher"] = None
+    ) -> None:
         self.database_handler = database_handler
+        self.prefetcher = prefetcher
         self._cache: set[tuple[str, str, str]] = set()
         self._preloaded_new: set[tuple[str, str, str]] = set()
         self._preloaded_deleted: set[tuple[str, str, str]] = set()
@@ -169,8 +175,10 @@ class ReferenceValidator:
             if (object_class, object_pk, source) in self._preloaded_deleted:
                 return False
 
-        query = RPSLDatabaseQuery().sources([source]).object_classes(object_classes).rpsl_pk(object_pk)
-        results = list(self.database_handler.execute_query(query))
+        results = self.prefetcher.objects(object_classes, object_pk, source) if self.prefetcher else None
+        if results is None:
+            query = RPSLDatabaseQuery().sources([source]).object_classes(object_classes).rpsl_pk(object_pk)
+            results = list(self.database_handler.execute_query(query))
         for result in results:
             self._cache.add((result["object_class"], object_pk, source))
         if len(results):
@@ -296,6 +304,9 @@ class AuthValidator:
     When adding a mntner in an update, a check for that mntner in the DB will
     fail, as it does not exist yet. To prevent this failure, call pre_approve()
     with a list of UpdateRequests.
+
+    If a prefetcher is provided, mntners and related objects are looked
+    up there first.
     """
 
     passwords: list[str]
@@ -310,8 +321,10 @@ class AuthValidator:
         keycert_obj_pk=None,
         internal_authenticated_user: AuthUser | None = None,
         remote_ip: IP | None = None,
+        prefetcher: Optional["UpdatePrefetcher"] = None,
     ) -> None:
         self.database_handler = database_handler
+        self.prefetcher = prefetcher
         self.passwords = []
         self.overrides = []
         self.api_keys = []
@@ -482,6 +495,15 @@ class AuthValidator:
         ]
         mntner_pks_to_resolve: set[str] = mntner_pk_set - {m.pk() for m in mntner_objs}
 
+        if self.prefetcher:
+            for mntner_pk in list(mntner_pks_to_resolve):
+                prefetched = self.prefetcher.objects(["mntner"], mntner_pk, source)
+                if prefetched is not None:
+                    prefetched_mntner_objs: list[RPSLMntner] = [rpsl_object_from_text(r["object_text"], strict_validation=False) for r in prefetched]  # type: ignore
+                    self._mntner_db_cache.update(prefetched_mntner_objs)
+                    mntner_objs += prefetched_mntner_objs
+                    mntner_pks_to_resolve.remove(mntner_pk)
+
         if mntner_pks_to_resolve:
             query = RPSLDatabaseQuery().sources([source])
             query = query.object_classes(["mntner"]).rpsl_pks(mntner_pks_to_resolve)
@@ -625,6 +647,8 @@ class AuthValidator:
         """
         if not get_setting("auth.authenticate_parents_route_creation"):
             return None
+        if self.prefetcher and self.prefetcher.has_related_object_route(rpsl_obj_new):
+            return self.prefetcher.related_object_route(rpsl_obj_new)
 
         inetnum_class = {
             "route": "inetnum",
@@ -663,6 +687,12 @@ class AuthValidator:
 
         @functools.lru_cache(maxsize=50)
         def _find_in_db():
+            if self.prefetcher:
+                prefetched = self.prefetcher.objects(
+                    ["aut-num"], rpsl_obj_new.pk_asn_segment, rpsl_obj_new.source()
+                )
+                if prefetched is not None:
+                    return prefetched[0] if prefetched else None
             query = _init_related_object_query("aut-num", rpsl_obj_new).rpsl_pk(rpsl_obj_new.pk_asn_segment)
             aut_nums = list(self.database_handler.execute_query(query))
             if aut_nums:
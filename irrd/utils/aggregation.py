@@ -0,0 +1,88 @@
+import socket
+from collections import defaultdict
+from collections.abc import Iterable
+
+ADDRESS_BITS: dict[int, int] = {socket.AF_INET: 32, socket.AF_INET6: 128}
+
+
+def aggregate_prefixes(prefixes: Iterable[str]) -> list[str]:
+    """
+    Aggregate prefixes into prefix ranges, covering exactly the same prefixes.
+
+    Prefixes of the same length that together fill an aligned larger block
+    are combined, and blocks that cover prefixes of consecutive lengths are
+    combined into a length range. For example, 192.0.2.0/24, 192.0.2.0/25
+    and 192.0.2.128/25 aggregate to 192.0.2.0/24^24-25, and 192.0.2.0/25
+    and 192.0.2.128/25 to 192.0.2.0/24^25.
+    An aggregate only covers prefixes that were in the input, so no prefix
+    is added. Prefixes must be in str format with the network address,
+    e.g. 192.0.2.0/24. Returns IPv4 aggregates first, then IPv6, both
+    sorted by address and length.
+    """
+    addresses_per_length: dict[tuple[int, int], dict[int, str]] = defaultdict(dict)
+    for prefix in prefixes:
+        prefix_address, prefix_length = prefix.split("/")
+        prefix_family = socket.AF_INET6 if ":" in prefix_address else socket.AF_INET
+        address = int.from_bytes(socket.inet_pton(prefix_family, prefix_address), "big")
+        addresses_per_length[(prefix_family, int(prefix_length))][address] = prefix
+
+    # For each aggregate block, the prefix lengths it covers
+    block_lengths: dict[tuple[int, int, int], list[int]] = defaultdict(list)
+    for (family, length), addresses in sorted(addresses_per_length.items()):
+        block_size = 1 << (ADDRESS_BITS[family] - length)
+        # Ranges of consecutive addresses, as [start, end]
+        runs: list[list[int]] = []
+        for address in sorted(addresses):
+            if runs and runs[-1][1] == address:
+                runs[-1][1] = address + block_size
+            else:
+                runs.append([address, address + block_size])
+        for start, end in runs:
+            if end - start == block_size:
+                block_lengths[(family, start, length)].append(length)
+            else:
+                _add_blocks(block_lengths, family, length, start, end)
+
+    result = []
+    for key in sorted(block_lengths.keys()):
+        family, address, block_length = key
+        lengths = block_lengths[key]
+        if lengths == [block_length]:
+            # A single prefix that could not be aggregated
+            result.append(addresses_per_length[(family, block_length)][address])
+            continue
+        address_str = socket.inet_ntop(family, address.to_bytes(ADDRESS_BITS[family] // 8, "big"))
+        for min_length, max_length in _length_ranges(lengths):
+            if min_length == max_length == block_length:
+                result.append(f"{address_str}/{block_length}")
+            elif min_length == max_length:
+                result.append(f"{address_str}/{block_length}^{min_length}")
+            else:
+                result.append(f"{address_str}/{block_length}^{min_length}-{max_length}")
+    return result
+
+
+def _add_blocks(block_lengths, family: int, length: int, start: int, end: int) -> None:
+    """
+    Split the consecutive address range start-end, consisting of
+    prefixes of length, into the largest aligned blocks.
+    """
+    address_bits = ADDRESS_BITS[family]
+    while start < end:
+        # Largest block size that start is aligned to, and that fits in the range
+        block_size = min(
+            start & -start if start else 1 << address_bits, 1 << ((end - start).bit_length() - 1)
+        )
+        block_lengths[(family, start, address_bits - block_size.bit_length() + 1)].append(length)
+        start += block_size
+
+
+def _length_ranges(lengths: list[int]) -> list[tuple[int, int]]:
+    """Combine sorted lengths into ranges of consecutive lengths."""
+    ranges: list[tuple[int, int]] = []
+    for length in lengths:
+        if ranges and ranges[-1][1] == length - 1:
+            ranges[-1] = (ranges[-1][0], length)
+        else:
+            ranges.append((length, length))
+    return ranges
@@ -13,6 +13,7 @@ from irrd.storage.database_handler import (
 from irrd.storage.models import DatabaseOperation, JournalEntryOrigin
 from irrd.storage.queries import (
     DatabaseStatusQuery,
+    RPSLDatabaseJournalCountQuery,
     RPSLDatabaseJournalQuery,
     RPSLDatabaseJournalStatisticsQuery,
 )
@@ -136,6 +137,7 @@ class MockDatabaseHandler(metaclass=MockSingletonMeta):
     def reset_mock(self):
         self.query_responses = {
             RPSLDatabaseJournalQuery: self._default_rpsl_database_journal_query_iterator(),
+            RPSLDatabaseJournalCountQuery: iter([{"count": 1}]),
             DatabaseStatusQuery: self._default_rpsl_database_status_query_iterator(),
         }
         self.queries = []
@@ -0,0 +1,41 @@
+from ..aggregation import aggregate_prefixes
+
+
+def test_aggregate_prefixes():
+    assert aggregate_prefixes([]) == []
+    assert aggregate_prefixes(["192.0.2.0/24"]) == ["192.0.2.0/24"]
+
+    # Adjacent prefixes are aggregated, covering prefixes added as a length range
+    assert aggregate_prefixes(["192.0.2.0/25", "192.0.2.128/25"]) == ["192.0.2.0/24^25"]
+    assert aggregate_prefixes(["192.0.2.128/25", "192.0.2.0/24", "192.0.2.0/25"]) == ["192.0.2.0/24^24-25"]
+    assert aggregate_prefixes(
+        ["192.0.2.0/24", "192.0.3.0/24", "192.0.2.0/23", "192.0.2.0/25", "192.0.2.128/25"]
+    ) == ["192.0.2.0/23^23-24", "192.0.2.0/24^25"]
+
+    # Non-aligned or incomplete blocks are only aggregated as far as exact
+    assert aggregate_prefixes(["192.0.1.0/24", "192.0.2.0/24", "192.0.3.0/24", "192.0.4.0/24"]) == [
+        "192.0.1.0/24",
+        "192.0.2.0/23^24",
+        "192.0.4.0/24",
+    ]
+    assert aggregate_prefixes(["192.0.2.0/24", "192.0.2.0/26", "192.0.2.128/25"]) == [
+        "192.0.2.0/24",
+        "192.0.2.0/26",
+        "192.0.2.128/25",
+    ]
+
+    # Non-consecutive lengths are separate ranges
+    assert aggregate_prefixes(
+        ["192.0.2.0/24", "192.0.2.0/26", "192.0.2.64/26", "192.0.2.128/26", "192.0.2.192/26"]
+    ) == [
+        "192.0.2.0/24",
+        "192.0.2.0/24^26",
+    ]
+
+    assert aggregate_prefixes(["0.0.0.0/1", "128.0.0.0/1", "0.0.0.0/0"]) == ["0.0.0.0/0^0-1"]
+    assert aggregate_prefixes(["2001:db8:1::/48", "192.0.2.0/24", "2001:db8::/48", "2001:db8::/32"]) == [
+        "192.0.2.0/24",
+        "2001:db8::/32",
+        "2001:db8::/47^48",
+    ]
+    assert aggregate_prefixes(["::/1", "8000::/1"]) == ["::/0^1"]
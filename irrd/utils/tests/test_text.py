@@ -9,6 +9,7 @@ from ..text import (
     dummify_object_text,
     remove_auth_hashes,
     remove_last_modified,
+    rpsl_content_hash,
     snake_to_camel_case,
     split_paragraphs_rpsl,
     splitline_unicodesafe,
@@ -41,6 +42,13 @@ def test_remove_last_modified():
     assert result == expected_text
 
 
+def test_rpsl_content_hash():
+    content_hash = rpsl_content_hash(SAMPLE_MNTNER)
+    assert len(content_hash) == 64
+    assert rpsl_content_hash(SAMPLE_MNTNER + "last-modified:  2020-01-01T00:00:00Z\n") == content_hash
+    assert rpsl_content_hash(SAMPLE_MNTNER + "remarks: changed\n") != content_hash
+
+
 def test_splitline_unicodesafe():
     # U+2028 is the unicode line separator
     assert list(splitline_unicodesafe("")) == []
@@ -1,3 +1,4 @@
+import hashlib
 import re
 import textwrap
 from collections.abc import Iterator
@@ -33,6 +34,17 @@ def remove_last_modified(rpsl_text: str):
     return re_remove_last_modified.sub("", rpsl_text)
 
 
+def rpsl_content_hash(rpsl_text: str) -> str:
+    """
+    Return a hash of the content of an RPSL text, for detecting changes.
+    The text is normalised by removing last-modified attributes, so
+    that objects only differing in last-modified have the same hash.
+    This must match the hashes calculated in the database migration
+    that added the rpsl_objects.content_hash column.
+    """
+    return hashlib.sha256(remove_last_modified(rpsl_text).encode("utf-8")).hexdigest()
+
+
 def splitline_unicodesafe(input: str) -> Iterator[str]:
     """
     Split an input string by newlines, and return an iterator of the lines.
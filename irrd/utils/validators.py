@@ -1,3 +1,5 @@
+from typing import Literal
+
 import pydantic
 
 from irrd.conf import get_setting
@@ -115,3 +117,15 @@ class RPSLSuspensionSubmission(pydantic.main.BaseModel):
 
     objects: list[RPSLSuspensionSubmissionObject]
     override: str | None = None
+
+
+class SetBatchQuery(pydantic.main.BaseModel):
+    """Model for a batch query of set members or prefixes"""
+
+    set_names: list[str]
+    query: Literal["members", "prefixes"]
+    recursive: bool = False
+    ip_version: Literal[4, 6] | None = None
+    aggregate: bool = False
+    sources: list[str] | None = None
+    exclude_sets: list[str] = pydantic.Field(default_factory=list)
@@ -646,6 +646,7 @@ async def notify_mntner(session_provider, user: AuthUser, mntner: AuthMntner, ex
     query = session_provider.session.query(RPSLDatabaseObject).outerjoin(AuthMntner)
     query = query.filter(
         RPSLDatabaseObject.pk == str(mntner.rpsl_mntner_obj_id),
+        RPSLDatabaseObject.source == mntner.rpsl_mntner_source,
     )
     rpsl_mntner = await session_provider.run(query.one)
     recipients = set(rpsl_mntner.parsed_data.get("mnt-nfy", []) + rpsl_mntner.parsed_data.get("notify", []))